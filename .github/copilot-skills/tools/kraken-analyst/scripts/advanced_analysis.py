@@ -8,6 +8,7 @@ All indicators work with existing Kraken OHLC data without requiring additional
 Usage:
     python advanced_analysis.py < market_data.json
     python fetch_data.py --pair BTC/USD | python advanced_analysis.py
+    python advanced_analysis.py --pair BTC/USD --interval 240   # stored candles, resampled locally
 
 Features:
     - Support & Resistance level detection
@@ -17,6 +18,8 @@ Features:
     - Ichimoku Cloud components
     - Divergence detection (price vs indicators)
     - Advanced volume indicators
+    - Fused single-pass pipeline (the default --backend auto, see FusedIndicators)
+    - Optional vectorized NumPy backend (--backend numpy)
 """
 
 import json
@@ -24,7 +27,18 @@ import sys
 import argparse
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
+from array import array
 import math
+from candle_store import load_pair
+from ohlc_series import OHLCSeries
+from streaming_indicators import RollingExtremum, rolling_extrema
+
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
 
 
 @dataclass
@@ -40,6 +54,7 @@ class AdvancedAnalysisResult:
     ichimoku: Optional[Dict]
     divergences: List[str]
     advanced_signals: List[str]
+    ichimoku_timeframes: Optional[Dict] = None
     
     def to_dict(self):
         return asdict(self)
@@ -48,6 +63,11 @@ class AdvancedAnalysisResult:
 class AdvancedIndicators:
     """Advanced technical indicator calculations"""
     
+    @staticmethod
+    def prepare(values) -> List[float]:
+        """Convert an OHLCSeries column to the list representation used here"""
+        return values.tolist() if hasattr(values, "tolist") else list(values)
+    
     @staticmethod
     def calculate_ema(prices: List[float], period: int) -> List[Optional[float]]:
         """
@@ -136,42 +156,52 @@ class AdvancedIndicators:
         return atr
     
     @staticmethod
-    def calculate_stochastic_rsi(prices: List[float], rsi_period: int = 14, 
-                                 stoch_period: int = 14, k_period: int = 3, 
-                                 d_period: int = 3) -> Optional[Dict]:
+    def calculate_rsi(prices: List[float], period: int = 14) -> List[float]:
         """
-        Calculate Stochastic RSI
-        More sensitive oscillator than standard RSI
+        Calculate RSI from simple averages of gains and losses
+        Returns one value per complete window (no leading None values)
         """
-        if len(prices) < rsi_period + stoch_period + k_period + d_period:
-            return None
-        
-        # First calculate RSI
         deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
         gains = [max(d, 0) for d in deltas]
         losses = [abs(min(d, 0)) for d in deltas]
         
         rsi_values = []
-        for i in range(rsi_period - 1, len(gains)):
-            avg_gain = sum(gains[i - rsi_period + 1:i + 1]) / rsi_period
-            avg_loss = sum(losses[i - rsi_period + 1:i + 1]) / rsi_period
+        for i in range(period - 1, len(gains)):
+            avg_gain = sum(gains[i - period + 1:i + 1]) / period
+            avg_loss = sum(losses[i - period + 1:i + 1]) / period
             
             if avg_loss == 0:
-                rsi = 100
+                rsi_values.append(100.0)
             else:
                 rs = avg_gain / avg_loss
-                rsi = 100 - (100 / (1 + rs))
-            rsi_values.append(rsi)
+                rsi_values.append(100 - (100 / (1 + rs)))
+        
+        return rsi_values
+    
+    @staticmethod
+    def calculate_stochastic_rsi(prices: List[float], rsi_period: int = 14, 
+                                 stoch_period: int = 14, k_period: int = 3, 
+                                 d_period: int = 3) -> Optional[Dict]:
+        """
+        Calculate Stochastic RSI
+        More sensitive oscillator than standard RSI
+        """
+        if len(prices) < rsi_period + stoch_period + k_period + d_period:
+            return None
+        
+        # First calculate RSI
+        rsi_values = AdvancedIndicators.calculate_rsi(prices, rsi_period)
         
         if len(rsi_values) < stoch_period:
             return None
         
-        # Apply stochastic calculation to RSI
+        # Apply stochastic calculation to RSI (rolling RSI range in O(n))
+        highest = rolling_extrema(rsi_values, stoch_period, "max")
+        lowest = rolling_extrema(rsi_values, stoch_period, "min")
         stoch_rsi = []
         for i in range(stoch_period - 1, len(rsi_values)):
-            window = rsi_values[i - stoch_period + 1:i + 1]
-            min_rsi = min(window)
-            max_rsi = max(window)
+            min_rsi = lowest[i]
+            max_rsi = highest[i]
             
             if max_rsi - min_rsi == 0:
                 stoch_rsi.append(0)
@@ -216,39 +246,63 @@ class AdvancedIndicators:
         recent_close = close[-lookback:]
         current_price = close[-1]
         
-        # Find potential support levels (local lows)
-        support_levels = []
-        for i in range(2, len(recent_low) - 2):
-            if (recent_low[i] < recent_low[i-1] and recent_low[i] < recent_low[i-2] and
-                recent_low[i] < recent_low[i+1] and recent_low[i] < recent_low[i+2]):
-                support_levels.append(recent_low[i])
-        
-        # Find potential resistance levels (local highs)
-        resistance_levels = []
-        for i in range(2, len(recent_high) - 2):
-            if (recent_high[i] > recent_high[i-1] and recent_high[i] > recent_high[i-2] and
-                recent_high[i] > recent_high[i+1] and recent_high[i] > recent_high[i+2]):
-                resistance_levels.append(recent_high[i])
-        
-        # Cluster nearby levels
-        def cluster_levels(levels, threshold_pct):
-            if not levels:
-                return []
-            levels_sorted = sorted(levels)
-            clusters = []
-            current_cluster = [levels_sorted[0]]
-            
-            for level in levels_sorted[1:]:
-                if abs(level - current_cluster[-1]) / current_cluster[-1] <= threshold_pct:
-                    current_cluster.append(level)
-                else:
-                    clusters.append(sum(current_cluster) / len(current_cluster))
-                    current_cluster = [level]
-            clusters.append(sum(current_cluster) / len(current_cluster))
-            return clusters
+        # Potential support levels (local lows) and resistance levels (local highs):
+        # strictly below/above the two candles on either side
+        support_levels = AdvancedIndicators.local_extrema(recent_low, "min")
+        resistance_levels = AdvancedIndicators.local_extrema(recent_high, "max")
         
-        support = cluster_levels(support_levels, threshold)
-        resistance = cluster_levels(resistance_levels, threshold)
+        return AdvancedIndicators.summarize_levels(support_levels, resistance_levels,
+                                                   current_price, threshold)
+    
+    @staticmethod
+    def local_extrema(values: List[float], mode: str, radius: int = 2,
+                      window_extreme: Optional[List[Optional[float]]] = None) -> List[float]:
+        """
+        Values that are strictly lower (mode="min") or higher (mode="max") than
+        the `radius` values on either side, in order
+        
+        window_extreme: rolling_extrema(values, 2 * radius + 1, mode) if the
+        caller already has it (only its full windows are read)
+        """
+        values = list(values)
+        if window_extreme is None:
+            window_extreme = rolling_extrema(values, 2 * radius + 1, mode)
+        
+        levels = []
+        for i in range(radius, len(values) - radius):
+            value = values[i]
+            # The centered window's extreme is a candidate; it must also be unique
+            if window_extreme[i + radius] != value:
+                continue
+            neighbours = values[i - radius:i] + values[i + 1:i + radius + 1]
+            if value not in neighbours:
+                levels.append(value)
+        return levels
+    
+    @staticmethod
+    def cluster_levels(levels: List[float], threshold_pct: float) -> List[float]:
+        """Cluster nearby levels into their average"""
+        if not levels:
+            return []
+        levels_sorted = sorted(levels)
+        clusters = []
+        current_cluster = [levels_sorted[0]]
+        
+        for level in levels_sorted[1:]:
+            if abs(level - current_cluster[-1]) / current_cluster[-1] <= threshold_pct:
+                current_cluster.append(level)
+            else:
+                clusters.append(sum(current_cluster) / len(current_cluster))
+                current_cluster = [level]
+        clusters.append(sum(current_cluster) / len(current_cluster))
+        return clusters
+    
+    @staticmethod
+    def summarize_levels(support_levels: List[float], resistance_levels: List[float],
+                         current_price: float, threshold: float) -> Dict:
+        """Cluster detected levels and report the nearest ones to price"""
+        support = AdvancedIndicators.cluster_levels(support_levels, threshold)
+        resistance = AdvancedIndicators.cluster_levels(resistance_levels, threshold)
         
         # Find nearest levels
         nearest_support = max([s for s in support if s < current_price], default=None)
@@ -272,30 +326,53 @@ class AdvancedIndicators:
         if len(high) < 52:  # Need at least 52 periods for Senkou Span B
             return None
         
-        def midpoint(data, period):
-            """Calculate midpoint of highest high and lowest low"""
-            if len(data) < period:
-                return None
-            window = data[-period:]
-            return (max(window) + min(window)) / 2
+        # Only the last 52 periods matter for the current values
+        series = AdvancedIndicators.ichimoku_series(high[-52:], low[-52:], close[-52:])
+        return AdvancedIndicators.summarize_ichimoku(
+            series["tenkan_sen"][-1], series["kijun_sen"][-1], series["senkou_span_b"][-1], close[-1]
+        )
+    
+    @staticmethod
+    def ichimoku_series(high: List[float], low: List[float], close: List[float],
+                        tenkan_period: int = 9, kijun_period: int = 26,
+                        senkou_b_period: int = 52) -> Dict[str, List[Optional[float]]]:
+        """
+        Ichimoku lines for every candle in O(n) (rolling extrema, any period length)
+        
+        Senkou spans are the values computed on each candle (plotted
+        kijun_period candles ahead); Chikou is the close (plotted behind).
+        """
+        high = list(high)
+        low = list(low)
         
-        # Tenkan-sen (Conversion Line): 9-period
-        tenkan = midpoint(high[-9:] + low[-9:], 9)
+        def midpoints(period):
+            highest = rolling_extrema(high, period, "max")
+            lowest = rolling_extrema(low, period, "min")
+            return [(h + l) / 2 if h is not None else None for h, l in zip(highest, lowest)]
         
-        # Kijun-sen (Base Line): 26-period
-        kijun = midpoint(high[-26:] + low[-26:], 26)
+        tenkan = midpoints(tenkan_period)
+        kijun = midpoints(kijun_period)
+        senkou_a = [(t + k) / 2 if t is not None and k is not None else None for t, k in zip(tenkan, kijun)]
         
+        return {
+            "tenkan_sen": tenkan,
+            "kijun_sen": kijun,
+            "senkou_span_a": senkou_a,
+            "senkou_span_b": midpoints(senkou_b_period),
+            "chikou_span": list(close)
+        }
+    
+    @staticmethod
+    def summarize_ichimoku(tenkan: Optional[float], kijun: Optional[float],
+                           senkou_b: Optional[float], current_price: float) -> Dict:
+        """Cloud color, price position and signal from the current Ichimoku lines"""
         # Senkou Span A (Leading Span A): (Tenkan + Kijun) / 2, shifted 26 periods ahead
         senkou_a = (tenkan + kijun) / 2 if tenkan and kijun else None
         
-        # Senkou Span B (Leading Span B): 52-period midpoint, shifted 26 periods ahead
-        senkou_b = midpoint(high[-52:] + low[-52:], 52)
-        
         # Chikou Span (Lagging Span): Current close, shifted 26 periods back
-        chikou = close[-1]
+        chikou = current_price
         
         # Determine cloud color and position
-        current_price = close[-1]
         cloud_color = "bullish" if senkou_a and senkou_b and senkou_a > senkou_b else "bearish"
         price_vs_cloud = "above" if current_price > max(senkou_a or 0, senkou_b or 0) else "below" if current_price < min(senkou_a or float('inf'), senkou_b or float('inf')) else "inside"
         
@@ -322,6 +399,42 @@ class AdvancedIndicators:
             "signal": signal
         }
     
+    @staticmethod
+    def multi_timeframe_ichimoku(high: List[float], low: List[float], close: List[float],
+                                 factors: List[int] = (1, 4, 24),
+                                 interval: Optional[int] = None) -> Dict[str, Optional[Dict]]:
+        """
+        Current Ichimoku for several timeframes from one base series
+        
+        A timeframe `factor` times the base interval uses periods of 9, 26 and
+        52 times `factor` base candles (rolling windows, updated every base
+        candle). Rolling extrema keep every timeframe O(n), so 10k+ candle
+        histories with long windows stay linear.
+        
+        Args:
+            high, low, close: Base interval columns
+            factors: Timeframe multiples of the base interval
+            interval: Base interval in minutes (labels become e.g. "240m")
+        
+        Returns:
+            {label: Ichimoku dict, or None if the history is too short}
+        """
+        result = {}
+        for factor in factors:
+            label = f"{interval * factor}m" if interval else f"{factor}x"
+            if len(high) < 52 * factor:
+                result[label] = None
+                continue
+            
+            tail = 52 * factor
+            series = AdvancedIndicators.ichimoku_series(
+                high[-tail:], low[-tail:], close[-tail:], 9 * factor, 26 * factor, 52 * factor
+            )
+            result[label] = AdvancedIndicators.summarize_ichimoku(
+                series["tenkan_sen"][-1], series["kijun_sen"][-1], series["senkou_span_b"][-1], close[-1]
+            )
+        return result
+    
     @staticmethod
     def detect_divergences(prices: List[float], rsi: List[Optional[float]], 
                           macd: List[Optional[float]], lookback: int = 20) -> List[str]:
@@ -364,50 +477,452 @@ class AdvancedIndicators:
         return divergences
 
 
-def analyze_advanced(data: Dict) -> AdvancedAnalysisResult:
+def _ema_scan(values: "np.ndarray", alpha: float, initial: float) -> "np.ndarray":
+    """
+    Vectorized recursive smoothing: y[i] = (1 - alpha) * y[i-1] + alpha * values[i]
+    
+    Uses the closed form within fixed-size blocks (cumulative sums of
+    decay-scaled values), so the Python loop runs once per block instead of
+    once per element. Block size keeps the decay powers well inside float64.
+    """
+    decay = 1.0 - alpha
+    if len(values) == 0:
+        return np.empty(0, dtype=np.float64)
+    if decay <= 0.0:
+        return values.astype(np.float64, copy=True)
+    
+    block = max(1, min(1024, int(30.0 / -math.log(decay))))
+    steps = np.arange(block, dtype=np.float64)
+    decay_pow = decay ** steps                 # decay^i
+    inv_decay_pow = decay ** -steps            # decay^-j
+    
+    out = np.empty(len(values), dtype=np.float64)
+    prev = initial
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        k = len(chunk)
+        acc = np.cumsum(chunk * inv_decay_pow[:k])
+        out[start:start + k] = decay_pow[:k] * (decay * prev + alpha * acc)
+        prev = out[start + k - 1]
+    return out
+
+
+def _with_leading_none(values: "np.ndarray", count: int) -> List[Optional[float]]:
+    """Convert an array to the reference list shape with `count` leading None values"""
+    return [None] * count + values.tolist()
+
+
+class NumpyIndicators(AdvancedIndicators):
+    """
+    NumPy implementation of AdvancedIndicators
+    
+    Same signatures and outputs as the pure-Python reference, computed on
+    contiguous float64 arrays with convolution, cumulative sums and
+    sliding-window views. Inputs may be lists or arrays.
+    """
+    
+    @staticmethod
+    def prepare(values) -> "np.ndarray":
+        """Zero-copy float64 view of an array('d') column (copies other sequences)"""
+        if isinstance(values, array) and values.typecode == 'd':
+            return np.frombuffer(values, dtype=np.float64)
+        return np.asarray(values, dtype=np.float64)
+    
+    @staticmethod
+    def calculate_ema(prices: List[float], period: int) -> List[Optional[float]]:
+        """Calculate Exponential Moving Average (vectorized)"""
+        x = np.asarray(prices, dtype=np.float64)
+        if len(x) < period:
+            return [None] * len(x)
+        
+        sma = float(x[:period].sum() / period)
+        tail = _ema_scan(x[period:], 2 / (period + 1), sma)
+        return [None] * (period - 1) + [sma] + tail.tolist()
+    
+    @staticmethod
+    def calculate_wma(prices: List[float], period: int) -> List[Optional[float]]:
+        """Calculate Weighted Moving Average (convolution)"""
+        x = np.asarray(prices, dtype=np.float64)
+        if len(x) < period:
+            return [None] * len(x)
+        
+        # np.convolve flips the kernel, so reversed weights put the largest weight on the newest price
+        weights = np.arange(period, 0, -1, dtype=np.float64)
+        wma = np.convolve(x, weights, mode="valid") / weights.sum()
+        return _with_leading_none(wma, period - 1)
+    
+    @staticmethod
+    def calculate_atr(high: List[float], low: List[float], close: List[float], 
+                     period: int = 14) -> List[Optional[float]]:
+        """Calculate Average True Range (vectorized true range + Wilder scan)"""
+        h = np.asarray(high, dtype=np.float64)
+        l = np.asarray(low, dtype=np.float64)
+        c = np.asarray(close, dtype=np.float64)
+        if len(h) < period + 1:
+            return [None] * len(h)
+        
+        prev_close = c[:-1]
+        true_ranges = np.maximum.reduce([
+            h[1:] - l[1:],
+            np.abs(h[1:] - prev_close),
+            np.abs(l[1:] - prev_close)
+        ])
+        
+        initial_atr = float(true_ranges[:period].sum() / period)
+        tail = _ema_scan(true_ranges[period:], 1 / period, initial_atr)
+        return [None, initial_atr] + tail.tolist()
+    
+    @staticmethod
+    def rsi_array(prices: List[float], period: int = 14) -> "np.ndarray":
+        """RSI as a float64 array (see AdvancedIndicators.calculate_rsi)"""
+        x = np.asarray(prices, dtype=np.float64)
+        deltas = np.diff(x)
+        if len(deltas) < period:
+            return np.empty(0, dtype=np.float64)
+        
+        gains = np.maximum(deltas, 0.0)
+        losses = np.abs(np.minimum(deltas, 0.0))
+        
+        # Rolling sums from cumulative sums; an all-zero window differences to exactly 0
+        cum_gains = np.concatenate(([0.0], np.cumsum(gains)))
+        cum_losses = np.concatenate(([0.0], np.cumsum(losses)))
+        avg_gain = (cum_gains[period:] - cum_gains[:-period]) / period
+        avg_loss = (cum_losses[period:] - cum_losses[:-period]) / period
+        
+        rsi = np.full(len(avg_gain), 100.0)
+        nonzero = avg_loss != 0
+        rs = avg_gain[nonzero] / avg_loss[nonzero]
+        rsi[nonzero] = 100 - (100 / (1 + rs))
+        return rsi
+    
+    @staticmethod
+    def calculate_rsi(prices: List[float], period: int = 14) -> List[float]:
+        """Calculate RSI (cumulative-sum rolling averages)"""
+        return NumpyIndicators.rsi_array(prices, period).tolist()
+    
+    @staticmethod
+    def calculate_stochastic_rsi(prices: List[float], rsi_period: int = 14, 
+                                 stoch_period: int = 14, k_period: int = 3, 
+                                 d_period: int = 3) -> Optional[Dict]:
+        """Calculate Stochastic RSI (sliding-window min/max)"""
+        if len(prices) < rsi_period + stoch_period + k_period + d_period:
+            return None
+        
+        rsi_values = NumpyIndicators.rsi_array(prices, rsi_period)
+        if len(rsi_values) < stoch_period:
+            return None
+        
+        windows = sliding_window_view(rsi_values, stoch_period)
+        min_rsi = windows.min(axis=1)
+        max_rsi = windows.max(axis=1)
+        spread = max_rsi - min_rsi
+        
+        stoch_rsi = np.zeros(len(spread))
+        nonzero = spread != 0
+        stoch_rsi[nonzero] = (rsi_values[stoch_period - 1:][nonzero] - min_rsi[nonzero]) / spread[nonzero] * 100
+        
+        if len(stoch_rsi) < k_period:
+            return None
+        k_values = sliding_window_view(stoch_rsi, k_period).sum(axis=1) / k_period
+        
+        if len(k_values) < d_period:
+            return None
+        d_values = sliding_window_view(k_values, d_period).sum(axis=1) / d_period
+        
+        k = float(k_values[-1])
+        return {
+            "k": k,
+            "d": float(d_values[-1]),
+            "signal": "oversold" if k < 20 else "overbought" if k > 80 else "neutral"
+        }
+    
+    @staticmethod
+    def detect_support_resistance(high: List[float], low: List[float], 
+                                  close: List[float], threshold: float = 0.02,
+                                  lookback: int = 50) -> Dict:
+        """Detect support and resistance levels (vectorized local extrema)"""
+        if len(close) < lookback:
+            lookback = len(close)
+        
+        recent_high = np.asarray(high[-lookback:], dtype=np.float64)
+        recent_low = np.asarray(low[-lookback:], dtype=np.float64)
+        current_price = float(close[-1])
+        
+        # Compare each point with its two neighbours on either side
+        mid = recent_low[2:-2]
+        is_support = ((mid < recent_low[1:-3]) & (mid < recent_low[:-4]) &
+                      (mid < recent_low[3:-1]) & (mid < recent_low[4:]))
+        
+        mid_high = recent_high[2:-2]
+        is_resistance = ((mid_high > recent_high[1:-3]) & (mid_high > recent_high[:-4]) &
+                         (mid_high > recent_high[3:-1]) & (mid_high > recent_high[4:]))
+        
+        return AdvancedIndicators.summarize_levels(
+            mid[is_support].tolist(), mid_high[is_resistance].tolist(),
+            current_price, threshold
+        )
+    
+    @staticmethod
+    def calculate_ichimoku(high: List[float], low: List[float], close: List[float]) -> Optional[Dict]:
+        """Ichimoku only reads the last 52 periods, so reuse the reference on the tail"""
+        if len(high) < 52:
+            return None
+        return AdvancedIndicators.calculate_ichimoku(
+            [float(v) for v in high[-52:]],
+            [float(v) for v in low[-52:]],
+            [float(v) for v in close[-52:]]
+        )
+
+
+class FusedIndicators:
+    """
+    Every analyze_advanced indicator from one pass over the candles
+    
+    The recursive indicators (EMA 12/26 and Wilder ATR) need the whole
+    history and share a single loop. Everything else only depends on the
+    last few windows: RSI is taken once for the tail (with
+    AdvancedIndicators.calculate_rsi) and shared by Stochastic RSI and the
+    divergence check, and one rolling 5-candle high/low over the last 52
+    candles serves both support/resistance and Ichimoku. Results are
+    identical to the per-indicator AdvancedIndicators path.
+    """
+    
+    RSI_PERIOD = 14
+    STOCH_PERIOD = 14
+    K_PERIOD = 3
+    D_PERIOD = 3
+    ATR_PERIOD = 14
+    EMA_FAST = 12
+    EMA_SLOW = 26
+    WMA_PERIOD = 20
+    DIVERGENCE_LOOKBACK = 20
+    LEVEL_LOOKBACK = 50
+    LEVEL_RADIUS = 2
+    LEVEL_THRESHOLD = 0.02
+    ICHIMOKU_PERIODS = (9, 26, 52)
+    
+    @classmethod
+    def compute(cls, highs, lows, closes) -> Dict:
+        """
+        Args:
+            highs, lows, closes: Column sequences (lists or array('d'))
+        
+        Returns:
+            Dict with support_resistance, atr, stochastic_rsi, ema, ichimoku, divergences
+        """
+        n = len(closes)
+        
+        # --- Single pass: EMA 12, EMA 26 and ATR, plus the MACD tail ---
+        fast, slow, atr_period = cls.EMA_FAST, cls.EMA_SLOW, cls.ATR_PERIOD
+        fast_mult = 2 / (fast + 1)
+        slow_mult = 2 / (slow + 1)
+        macd_start = n - cls.DIVERGENCE_LOOKBACK
+        
+        ema_fast = ema_slow = None
+        fast_sum = slow_sum = 0.0
+        atr = None
+        tr_sum = 0.0
+        prev_close = None
+        macd_tail: List[Optional[float]] = []
+        
+        for i, (high, low, close) in enumerate(zip(highs, lows, closes)):
+            if i < fast:
+                fast_sum += close
+                if i == fast - 1:
+                    ema_fast = fast_sum / fast
+            else:
+                ema_fast = (close - ema_fast) * fast_mult + ema_fast
+            
+            if i < slow:
+                slow_sum += close
+                if i == slow - 1:
+                    ema_slow = slow_sum / slow
+            else:
+                ema_slow = (close - ema_slow) * slow_mult + ema_slow
+            
+            if prev_close is not None:
+                tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+                if i <= atr_period:
+                    tr_sum += tr
+                    if i == atr_period:
+                        atr = tr_sum / atr_period
+                else:
+                    atr = (atr * (atr_period - 1) + tr) / atr_period
+            prev_close = close
+            
+            if i >= macd_start:
+                macd_tail.append(ema_fast - ema_slow if ema_fast is not None and ema_slow is not None else None)
+        
+        if n < fast:
+            ema_fast = None
+        if n < slow:
+            ema_slow = None
+        
+        # --- Tail: RSI windows for Stochastic RSI and divergences ---
+        rsi_tail = cls._rsi_tail(closes)
+        stoch_rsi = cls._stochastic_rsi(rsi_tail, n)
+        
+        # --- Tail: WMA 20 (only the last value is reported) ---
+        wma = None
+        period = cls.WMA_PERIOD
+        if n >= period:
+            window = closes[n - period:]
+            wma = sum(w * p for w, p in zip(range(1, period + 1), window)) / (period * (period + 1) // 2)
+        
+        ema = {
+            "ema_12": ema_fast,
+            "ema_26": ema_slow,
+            "wma_20": wma,
+            "ema_crossover": "bullish" if ema_fast and ema_slow and ema_fast > ema_slow else "bearish"
+        }
+        
+        support_resistance, ichimoku = cls._levels_and_ichimoku(highs, lows, closes)
+        return {
+            "support_resistance": support_resistance,
+            "atr": atr,
+            "stochastic_rsi": stoch_rsi,
+            "ema": ema,
+            "ichimoku": ichimoku,
+            "divergences": AdvancedIndicators.detect_divergences(closes, rsi_tail, macd_tail,
+                                                                 cls.DIVERGENCE_LOOKBACK)
+        }
+    
+    @classmethod
+    def _rsi_tail(cls, closes) -> List[float]:
+        """Last RSI values needed downstream, from AdvancedIndicators.calculate_rsi on the tail"""
+        period = cls.RSI_PERIOD
+        n = len(closes)
+        needed = min(max(n - period, 0), max(cls.DIVERGENCE_LOOKBACK,
+                                             cls.STOCH_PERIOD + cls.K_PERIOD + cls.D_PERIOD - 2))
+        if not needed:
+            return []
+        # The last `needed` windows only read the last needed + period closes
+        return AdvancedIndicators.calculate_rsi(closes[n - (needed + period):], period)
+    
+    @classmethod
+    def _levels_and_ichimoku(cls, highs, lows, closes) -> Tuple[Dict, Optional[Dict]]:
+        """
+        Support/resistance and Ichimoku from one rolling high/low over the tail
+        
+        Support/resistance takes local extrema from the rolling 5-candle
+        windows; each Ichimoku window (9, 26, 52 candles) ending at the last
+        candle is covered by a few of those same windows, so its highest
+        high and lowest low come from them as well.
+        """
+        n = len(closes)
+        width = 2 * cls.LEVEL_RADIUS + 1
+        tail = max(n - max(cls.LEVEL_LOOKBACK, cls.ICHIMOKU_PERIODS[-1]), 0)
+        recent_high = list(highs[tail:])
+        recent_low = list(lows[tail:])
+        rolling_high = rolling_extrema(recent_high, width, "max")
+        rolling_low = rolling_extrema(recent_low, width, "min")
+        
+        start = max(len(recent_high) - cls.LEVEL_LOOKBACK, 0)
+        support_resistance = AdvancedIndicators.summarize_levels(
+            AdvancedIndicators.local_extrema(recent_low[start:], "min", cls.LEVEL_RADIUS, rolling_low[start:]),
+            AdvancedIndicators.local_extrema(recent_high[start:], "max", cls.LEVEL_RADIUS, rolling_high[start:]),
+            closes[-1], cls.LEVEL_THRESHOLD
+        )
+        
+        if n < cls.ICHIMOKU_PERIODS[-1]:
+            return support_resistance, None
+        
+        size = len(recent_high)
+        midpoints = []
+        for period in cls.ICHIMOKU_PERIODS:
+            # Window ends every `width` candles back, plus one flush with the window start
+            ends = list(range(size - 1, size - period + width - 1, -width)) + [size - period + width - 1]
+            midpoints.append((max(rolling_high[e] for e in ends) + min(rolling_low[e] for e in ends)) / 2)
+        return support_resistance, AdvancedIndicators.summarize_ichimoku(*midpoints, closes[-1])
+    
+    @classmethod
+    def _stochastic_rsi(cls, rsi_tail: List[float], n: int) -> Optional[Dict]:
+        """Stochastic RSI %K/%D from the RSI tail (see AdvancedIndicators.calculate_stochastic_rsi)"""
+        stoch_period, k_period, d_period = cls.STOCH_PERIOD, cls.K_PERIOD, cls.D_PERIOD
+        if n < cls.RSI_PERIOD + stoch_period + k_period + d_period:
+            return None
+        
+        highest = RollingExtremum(stoch_period, "max")
+        lowest = RollingExtremum(stoch_period, "min")
+        stoch_rsi = []
+        for rsi in rsi_tail:
+            max_rsi = highest.push(rsi)
+            min_rsi = lowest.push(rsi)
+            if max_rsi is None:
+                continue
+            spread = max_rsi - min_rsi
+            stoch_rsi.append(0 if spread == 0 else (rsi - min_rsi) / spread * 100)
+        
+        k_values = [sum(stoch_rsi[i - k_period + 1:i + 1]) / k_period
+                    for i in range(k_period - 1, len(stoch_rsi))]
+        d_values = [sum(k_values[i - d_period + 1:i + 1]) / d_period
+                    for i in range(d_period - 1, len(k_values))]
+        
+        k = k_values[-1]
+        return {
+            "k": k,
+            "d": d_values[-1],
+            "signal": "oversold" if k < 20 else "overbought" if k > 80 else "neutral"
+        }
+
+
+BACKENDS = ("auto", "fused", "numpy", "python")
+
+
+def get_indicators(backend: str = "python") -> AdvancedIndicators:
+    """
+    Select a per-indicator implementation (the "numpy" and "python" backends)
+    
+    Args:
+        backend: "numpy" or "python"
+    """
+    if backend == "python":
+        return AdvancedIndicators()
+    if backend != "numpy":
+        raise ValueError(f"Unknown per-indicator backend '{backend}'. Valid: numpy, python")
+    if not NUMPY_AVAILABLE:
+        raise ValueError("NumPy backend requested but numpy is not installed (pip install numpy)")
+    return NumpyIndicators()
+
+
+def analyze_advanced(data, backend: str = "auto",
+                     ichimoku_timeframes: Optional[List[int]] = None) -> AdvancedAnalysisResult:
     """
     Perform advanced technical analysis on OHLC data
+    
+    Args:
+        data: OHLCSeries, or dict with pair and data: [candles] (any shape OHLCSeries accepts)
+        backend: "auto" or "fused" (the FusedIndicators pipeline), "numpy" or "python"
+        ichimoku_timeframes: Also report Ichimoku at these multiples of the candle interval
     """
-    pair = data.get("pair", "UNKNOWN")
-    ohlc_data = data.get("data", [])
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Valid: {', '.join(BACKENDS)}")
     
-    if not ohlc_data:
+    series = OHLCSeries.from_document(data)
+    
+    if len(series) == 0:
         raise ValueError("No OHLC data provided")
     
-    # Extract OHLC arrays - handle both formats
-    # Format 1: Array of arrays [timestamp, open, high, low, close, vwap, volume, count]
-    # Format 2: Array of objects {timestamp, open, high, low, close, volume, ...}
-    
-    timestamps = []
-    opens = []
-    highs = []
-    lows = []
-    closes = []
-    volumes = []
-    
-    for candle in ohlc_data:
-        if isinstance(candle, dict):
-            # Object format from fetch_data
-            timestamps.append(candle.get("timestamp", 0))
-            opens.append(float(candle.get("open", 0)))
-            highs.append(float(candle.get("high", 0)))
-            lows.append(float(candle.get("low", 0)))
-            closes.append(float(candle.get("close", 0)))
-            volumes.append(float(candle.get("volume", 0)))
-        else:
-            # Array format [timestamp, open, high, low, close, vwap, volume, count]
-            timestamps.append(candle[0])
-            opens.append(float(candle[1]))
-            highs.append(float(candle[2]))
-            lows.append(float(candle[3]))
-            closes.append(float(candle[4]))
-            volumes.append(float(candle[6]))
+    if backend in ("auto", "fused"):
+        components = FusedIndicators.compute(series.high, series.low, series.close)
+    else:
+        components = compute_indicators(series, get_indicators(backend))
     
-    current_price = closes[-1]
-    current_timestamp = timestamps[-1]
+    result = build_result(series, **components)
     
-    # Calculate advanced indicators
-    indicators = AdvancedIndicators()
+    if ichimoku_timeframes:
+        result.ichimoku_timeframes = AdvancedIndicators.multi_timeframe_ichimoku(
+            series.high, series.low, series.close, ichimoku_timeframes, series.interval
+        )
+    return result
+
+
+def compute_indicators(series: OHLCSeries, indicators: AdvancedIndicators) -> Dict:
+    """Indicator components with one call per indicator (reference path)"""
+    # Columns in the representation the backend works on (lists or float64 arrays)
+    highs = indicators.prepare(series.high)
+    lows = indicators.prepare(series.low)
+    closes = indicators.prepare(series.close)
     
     # Support & Resistance
     sr = indicators.detect_support_resistance(highs, lows, closes)
@@ -435,21 +950,7 @@ def analyze_advanced(data: Dict) -> AdvancedAnalysisResult:
     ichimoku = indicators.calculate_ichimoku(highs, lows, closes)
     
     # Calculate RSI for divergence detection
-    deltas = [closes[i] - closes[i-1] for i in range(1, len(closes))]
-    gains = [max(d, 0) for d in deltas]
-    losses = [abs(min(d, 0)) for d in deltas]
-    
-    rsi = []
-    rsi_period = 14
-    for i in range(rsi_period - 1, len(gains)):
-        avg_gain = sum(gains[i - rsi_period + 1:i + 1]) / rsi_period
-        avg_loss = sum(losses[i - rsi_period + 1:i + 1]) / rsi_period
-        
-        if avg_loss == 0:
-            rsi.append(100.0)
-        else:
-            rs = avg_gain / avg_loss
-            rsi.append(100 - (100 / (1 + rs)))
+    rsi = indicators.calculate_rsi(closes, 14)
     
     # Simple MACD for divergence
     macd_values: List[Optional[float]] = []
@@ -464,6 +965,25 @@ def analyze_advanced(data: Dict) -> AdvancedAnalysisResult:
     
     divergences = indicators.detect_divergences(closes, rsi, macd_values)
     
+    return {
+        "support_resistance": sr,
+        "atr": current_atr,
+        "stochastic_rsi": stoch_rsi,
+        "ema": ema_dict,
+        "ichimoku": ichimoku,
+        "divergences": divergences
+    }
+
+
+def build_result(series: OHLCSeries, support_resistance: Dict, atr: Optional[float],
+                 stochastic_rsi: Optional[Dict], ema: Dict, ichimoku: Optional[Dict],
+                 divergences: List[str]) -> AdvancedAnalysisResult:
+    """Derive the advanced signals from indicator components"""
+    sr = support_resistance
+    current_atr = atr
+    stoch_rsi = stochastic_rsi
+    current_price = series.close[-1]
+    
     # Generate advanced signals
     signals = []
     
@@ -496,92 +1016,170 @@ def analyze_advanced(data: Dict) -> AdvancedAnalysisResult:
     signals.extend(divergences)
     
     return AdvancedAnalysisResult(
-        pair=pair,
-        timestamp=current_timestamp,
+        pair=series.pair,
+        timestamp=series.timestamp[-1],
         current_price=current_price,
         support_resistance=sr,
         atr=current_atr,
         stochastic_rsi=stoch_rsi,
-        ema=ema_dict,
+        ema=ema,
         ichimoku=ichimoku,
         divergences=divergences,
         advanced_signals=signals
     )
 
 
+def benchmark_backends(count: int = 720, seed: int = 7) -> Dict:
+    """Time analyze_advanced per backend on a synthetic random walk"""
+    import random
+    import time
+    
+    rng = random.Random(seed)
+    series = OHLCSeries("BENCH", 60)
+    price = 30000.0
+    for i in range(count):
+        open_price = price
+        price = max(1.0, price * (1 + rng.gauss(0, 0.01)))
+        series.append(1700000000 + i * 3600, open_price, max(open_price, price) * 1.002,
+                      min(open_price, price) * 0.998, price, price, rng.random() * 100, 10)
+    
+    backends = ["python", "fused"] + (["numpy"] if NUMPY_AVAILABLE else [])
+    repeats = max(3, 20000 // max(count, 1))
+    reference = analyze_advanced(series, backend="python").to_dict()
+    timings = {}
+    
+    for backend in backends:
+        result = analyze_advanced(series, backend=backend).to_dict()
+        start = time.perf_counter()
+        for _ in range(repeats):
+            analyze_advanced(series, backend=backend)
+        elapsed = (time.perf_counter() - start) / repeats
+        timings[backend] = {"ms": round(elapsed * 1000, 3), "identical_to_python": result == reference}
+    
+    for backend in timings:
+        timings[backend]["speedup"] = round(timings["python"]["ms"] / timings[backend]["ms"], 1)
+    
+    return {"candles": count, "repeats": repeats, "timings": timings}
+
+
+def format_text(result: AdvancedAnalysisResult) -> str:
+    """Human-readable report (--format text)"""
+    lines = []
+    
+    lines.append(f"\n{'='*60}")
+    lines.append(f"ADVANCED TECHNICAL ANALYSIS: {result.pair}")
+    lines.append(f"{'='*60}\n")
+    
+    lines.append(f"Current Price: ${result.current_price:,.2f}")
+    lines.append(f"Timestamp: {result.timestamp}\n")
+    
+    # Support & Resistance
+    sr = result.support_resistance
+    lines.append("📊 Support & Resistance:")
+    if sr.get("nearest_support"):
+        lines.append(f"  Nearest Support: ${sr['nearest_support']:,.2f} ({sr.get('distance_to_support', 0):.2f}% away)")
+    if sr.get("nearest_resistance"):
+        lines.append(f"  Nearest Resistance: ${sr['nearest_resistance']:,.2f} ({sr.get('distance_to_resistance', 0):.2f}% away)")
+    lines.append("")
+    
+    # ATR
+    if result.atr:
+        atr_pct = (result.atr / result.current_price) * 100
+        lines.append(f"📈 ATR (Volatility): ${result.atr:.2f} ({atr_pct:.2f}%)")
+        lines.append("")
+    
+    # Stochastic RSI
+    if result.stochastic_rsi:
+        lines.append("🎯 Stochastic RSI:")
+        lines.append(f"  %K: {result.stochastic_rsi['k']:.2f}")
+        lines.append(f"  %D: {result.stochastic_rsi['d']:.2f}")
+        lines.append(f"  Signal: {result.stochastic_rsi['signal'].upper()}")
+        lines.append("")
+    
+    # Ichimoku
+    if result.ichimoku:
+        ich = result.ichimoku
+        lines.append("☁️  Ichimoku Cloud:")
+        lines.append(f"  Tenkan-sen: ${ich['tenkan_sen']}")
+        lines.append(f"  Kijun-sen: ${ich['kijun_sen']}")
+        lines.append(f"  Cloud: {ich['cloud_color'].upper()}")
+        lines.append(f"  Price vs Cloud: {ich['price_vs_cloud'].upper()}")
+        if ich.get('signal'):
+            lines.append(f"  Signal: {ich['signal'].upper()}")
+        lines.append("")
+    
+    # Multi-timeframe Ichimoku
+    if result.ichimoku_timeframes:
+        lines.append("🕰️  Ichimoku by Timeframe:")
+        for label, ich in result.ichimoku_timeframes.items():
+            if ich is None:
+                lines.append(f"  {label}: not enough history")
+            else:
+                lines.append(f"  {label}: {(ich['signal'] or 'neutral').upper()} "
+                             f"(cloud {ich['cloud_color']}, price {ich['price_vs_cloud']})")
+        lines.append("")
+    
+    # Signals
+    if result.advanced_signals:
+        lines.append("🚨 Advanced Signals:")
+        for signal in result.advanced_signals:
+            lines.append(f"  • {signal.replace('_', ' ').title()}")
+        lines.append("")
+    
+    # Divergences
+    if result.divergences:
+        lines.append("⚠️  Divergences Detected:")
+        for div in result.divergences:
+            lines.append(f"  • {div.replace('_', ' ').title()}")
+        lines.append("")
+    
+    return "\n".join(lines)
+
+
 def main():
     """Main entry point for advanced analysis"""
     parser = argparse.ArgumentParser(description="Advanced technical analysis for crypto")
     parser.add_argument("--format", choices=["json", "text"], default="json",
                        help="Output format")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto",
+                       help="Indicator backend: auto/fused (single-pass pipeline), numpy (vectorized, "
+                            "needs numpy) or python (per-indicator reference). Default: auto")
+    parser.add_argument("--ichimoku-timeframes", type=str, metavar="FACTORS",
+                       help="Comma-separated interval multiples for multi-timeframe Ichimoku (e.g. 1,4,24)")
+    parser.add_argument("--benchmark", type=int, metavar="CANDLES",
+                       help="Time each backend on CANDLES synthetic candles and exit")
+    parser.add_argument("--pair", type=str,
+                       help="Analyze stored candles for this pair instead of reading stdin (no network access)")
+    parser.add_argument("--interval", type=int, default=60,
+                       help="With --pair: interval in minutes, resampled from a finer stored series if needed")
+    parser.add_argument("--count", type=int, help="With --pair: use only the newest COUNT candles")
+    parser.add_argument("--base-interval", type=int, metavar="MINUTES",
+                       help="With --pair: stored interval to resample from (default: automatic)")
+    parser.add_argument("--store", type=str, help="With --pair: candle store path")
     args = parser.parse_args()
     
+    if args.benchmark:
+        print(json.dumps(benchmark_backends(args.benchmark), indent=2))
+        return
+    
     try:
-        # Read market data from stdin
-        input_data = json.load(sys.stdin)
+        if args.pair:
+            input_data = load_pair(args.pair, args.interval, count=args.count,
+                                   base_interval=args.base_interval, path=args.store)
+            if input_data is None:
+                sys.exit(1)
+        else:
+            # Read market data from stdin
+            input_data = json.load(sys.stdin)
         
         # Perform advanced analysis
-        result = analyze_advanced(input_data)
+        factors = [int(f) for f in args.ichimoku_timeframes.split(",")] if args.ichimoku_timeframes else None
+        result = analyze_advanced(input_data, backend=args.backend, ichimoku_timeframes=factors)
         
         if args.format == "json":
             print(json.dumps(result.to_dict(), indent=2))
         else:
-            # Text format
-            print(f"\n{'='*60}")
-            print(f"ADVANCED TECHNICAL ANALYSIS: {result.pair}")
-            print(f"{'='*60}\n")
-            
-            print(f"Current Price: ${result.current_price:,.2f}")
-            print(f"Timestamp: {result.timestamp}\n")
-            
-            # Support & Resistance
-            sr = result.support_resistance
-            print("📊 Support & Resistance:")
-            if sr.get("nearest_support"):
-                print(f"  Nearest Support: ${sr['nearest_support']:,.2f} ({sr.get('distance_to_support', 0):.2f}% away)")
-            if sr.get("nearest_resistance"):
-                print(f"  Nearest Resistance: ${sr['nearest_resistance']:,.2f} ({sr.get('distance_to_resistance', 0):.2f}% away)")
-            print()
-            
-            # ATR
-            if result.atr:
-                atr_pct = (result.atr / result.current_price) * 100
-                print(f"📈 ATR (Volatility): ${result.atr:.2f} ({atr_pct:.2f}%)")
-                print()
-            
-            # Stochastic RSI
-            if result.stochastic_rsi:
-                print("🎯 Stochastic RSI:")
-                print(f"  %K: {result.stochastic_rsi['k']:.2f}")
-                print(f"  %D: {result.stochastic_rsi['d']:.2f}")
-                print(f"  Signal: {result.stochastic_rsi['signal'].upper()}")
-                print()
-            
-            # Ichimoku
-            if result.ichimoku:
-                ich = result.ichimoku
-                print("☁️  Ichimoku Cloud:")
-                print(f"  Tenkan-sen: ${ich['tenkan_sen']}")
-                print(f"  Kijun-sen: ${ich['kijun_sen']}")
-                print(f"  Cloud: {ich['cloud_color'].upper()}")
-                print(f"  Price vs Cloud: {ich['price_vs_cloud'].upper()}")
-                if ich.get('signal'):
-                    print(f"  Signal: {ich['signal'].upper()}")
-                print()
-            
-            # Signals
-            if result.advanced_signals:
-                print("🚨 Advanced Signals:")
-                for signal in result.advanced_signals:
-                    print(f"  • {signal.replace('_', ' ').title()}")
-                print()
-            
-            # Divergences
-            if result.divergences:
-                print("⚠️  Divergences Detected:")
-                for div in result.divergences:
-                    print(f"  • {div.replace('_', ' ').title()}")
-                print()
+            print(format_text(result))
     
     except json.JSONDecodeError:
         print("Error: Invalid JSON input", file=sys.stderr)
@@ -0,0 +1,196 @@
+import unittest
+import random
+import math
+from advanced_analysis import AdvancedIndicators, NumpyIndicators, NUMPY_AVAILABLE, analyze_advanced, get_indicators
+from streaming_indicators import RollingExtremum, rolling_extrema
+
+
+def make_candles(count, seed=0, start_price=30000.0):
+    """Random-walk OHLC candles in fetch_data.py format"""
+    rng = random.Random(seed)
+    price = start_price
+    candles = []
+    for i in range(count):
+        open_price = price
+        price = max(1.0, price * (1 + rng.gauss(0, 0.01)))
+        candles.append({
+            "timestamp": 1700000000 + i * 3600,
+            "open": open_price,
+            "high": max(open_price, price) * (1 + rng.random() * 0.005),
+            "low": min(open_price, price) * (1 - rng.random() * 0.005),
+            "close": price,
+            "volume": rng.random() * 100
+        })
+    return candles
+
+
+def columns(candles):
+    return ([c["high"] for c in candles], [c["low"] for c in candles],
+            [c["close"] for c in candles])
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+@unittest.skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+class TestNumpyBackendEquivalence(unittest.TestCase):
+    """The NumPy backend must reproduce the pure-Python reference"""
+    
+    LENGTHS = [0, 1, 5, 13, 14, 15, 30, 52, 60, 200, 720, 5000]
+    
+    def assertSeriesClose(self, expected, actual):
+        self.assertEqual(len(expected), len(actual))
+        for e, a in zip(expected, actual):
+            if e is None:
+                self.assertIsNone(a)
+            elif isinstance(e, str):
+                self.assertEqual(e, a)
+            else:
+                self.assertTrue(math.isclose(e, a, rel_tol=1e-9, abs_tol=1e-9), f"{e} != {a}")
+    
+    def assertValuesClose(self, expected, actual):
+        if isinstance(expected, dict):
+            self.assertEqual(expected.keys(), actual.keys())
+            for key in expected:
+                self.assertValuesClose(expected[key], actual[key])
+        elif isinstance(expected, list):
+            self.assertSeriesClose(expected, actual)
+        elif isinstance(expected, float) and actual is not None:
+            self.assertTrue(math.isclose(expected, actual, rel_tol=1e-9, abs_tol=1e-9),
+                            f"{expected} != {actual}")
+        else:
+            self.assertEqual(expected, actual)
+    
+    def test_moving_averages(self):
+        for n in self.LENGTHS:
+            closes = columns(make_candles(n, seed=n))[2]
+            for period in (1, 2, 12, 20, 26):
+                with self.subTest(n=n, period=period):
+                    self.assertSeriesClose(AdvancedIndicators.calculate_ema(closes, period),
+                                           NumpyIndicators.calculate_ema(closes, period))
+                    self.assertSeriesClose(AdvancedIndicators.calculate_wma(closes, period),
+                                           NumpyIndicators.calculate_wma(closes, period))
+    
+    def test_atr(self):
+        for n in self.LENGTHS:
+            high, low, close = columns(make_candles(n, seed=n))
+            for period in (1, 14):
+                with self.subTest(n=n, period=period):
+                    self.assertSeriesClose(AdvancedIndicators.calculate_atr(high, low, close, period),
+                                           NumpyIndicators.calculate_atr(high, low, close, period))
+    
+    def test_rsi_and_stochastic_rsi(self):
+        for n in self.LENGTHS:
+            closes = columns(make_candles(n, seed=n))[2]
+            with self.subTest(n=n):
+                self.assertSeriesClose(AdvancedIndicators.calculate_rsi(closes),
+                                       NumpyIndicators.calculate_rsi(closes))
+                self.assertValuesClose(AdvancedIndicators.calculate_stochastic_rsi(closes),
+                                       NumpyIndicators.calculate_stochastic_rsi(closes))
+    
+    def test_rsi_flat_prices(self):
+        closes = [100.0] * 40 + [101.0, 102.0] + [102.0] * 40
+        self.assertSeriesClose(AdvancedIndicators.calculate_rsi(closes),
+                               NumpyIndicators.calculate_rsi(closes))
+        self.assertValuesClose(AdvancedIndicators.calculate_stochastic_rsi(closes),
+                               NumpyIndicators.calculate_stochastic_rsi(closes))
+    
+    def test_support_resistance(self):
+        for n in self.LENGTHS[1:]:
+            high, low, close = columns(make_candles(n, seed=n))
+            for lookback in (3, 50, 200):
+                with self.subTest(n=n, lookback=lookback):
+                    self.assertValuesClose(
+                        AdvancedIndicators.detect_support_resistance(high, low, close, lookback=lookback),
+                        NumpyIndicators.detect_support_resistance(high, low, close, lookback=lookback))
+    
+    def test_ichimoku(self):
+        for n in self.LENGTHS:
+            high, low, close = columns(make_candles(n, seed=n))
+            with self.subTest(n=n):
+                self.assertValuesClose(AdvancedIndicators.calculate_ichimoku(high, low, close),
+                                       NumpyIndicators.calculate_ichimoku(high, low, close))
+    
+    def test_analyze_advanced(self):
+        for n in (60, 200, 720):
+            data = {"pair": "BTC/USD", "data": make_candles(n, seed=n)}
+            with self.subTest(n=n):
+                expected = analyze_advanced(data, backend="python").to_dict()
+                actual = analyze_advanced(data, backend="numpy").to_dict()
+                self.assertValuesClose(expected, actual)
+
+
+
+class TestFusedPipeline(unittest.TestCase):
+    """The fused pipeline must reproduce the per-indicator reference exactly"""
+    
+    def test_matches_reference(self):
+        for n in list(range(1, 60)) + [200, 720, 5000]:
+            data = {"pair": "BTC/USD", "data": make_candles(n, seed=n)}
+            with self.subTest(n=n):
+                self.assertEqual(analyze_advanced(data, backend="python").to_dict(),
+                                 analyze_advanced(data, backend="fused").to_dict())
+    
+    def test_auto_is_fused(self):
+        data = {"pair": "BTC/USD", "data": make_candles(300, seed=3)}
+        self.assertEqual(analyze_advanced(data).to_dict(), analyze_advanced(data, backend="fused").to_dict())
+        self.assertIsInstance(get_indicators("python"), AdvancedIndicators)
+        for backend in ("auto", "fused", "cuda"):
+            with self.subTest(backend=backend), self.assertRaises(ValueError):
+                get_indicators(backend)
+        with self.assertRaises(ValueError):
+            analyze_advanced(data, backend="cuda")
+    
+    def test_flat_prices(self):
+        candles = [{"timestamp": i, "open": 100.0, "high": 100.0, "low": 100.0, "close": 100.0,
+                    "volume": 1.0} for i in range(80)]
+        data = {"pair": "BTC/USD", "data": candles}
+        self.assertEqual(analyze_advanced(data, backend="python").to_dict(),
+                         analyze_advanced(data, backend="fused").to_dict())
+    
+    def test_rolling_extremum(self):
+        rng = random.Random(1)
+        values = [rng.choice([1.0, 2.0, rng.random()]) for _ in range(300)]
+        for period in (1, 3, 14):
+            highest = RollingExtremum(period, "max")
+            lowest = RollingExtremum(period, "min")
+            for i, value in enumerate(values):
+                with self.subTest(period=period, i=i):
+                    window = values[max(0, i - period + 1):i + 1]
+                    expected_max = max(window) if i >= period - 1 else None
+                    expected_min = min(window) if i >= period - 1 else None
+                    self.assertEqual(highest.push(value), expected_max)
+                    self.assertEqual(lowest.push(value), expected_min)
+
+
+class TestRollingExtremaIndicators(unittest.TestCase):
+    """Indicators built on rolling extrema against brute-force window scans"""
+    
+    def test_rolling_extrema(self):
+        rng = random.Random(2)
+        values = [rng.choice([1.0, 2.0, rng.random()]) for _ in range(500)]
+        for period in (1, 5, 52):
+            for mode, pick in (("max", max), ("min", min)):
+                expected = [pick(values[i - period + 1:i + 1]) if i >= period - 1 else None
+                            for i in range(len(values))]
+                self.assertEqual(rolling_extrema(values, period, mode), expected)
+    
+    def test_ichimoku_series(self):
+        high, low, close = columns(make_candles(400, seed=3))
+        series = AdvancedIndicators.ichimoku_series(high, low, close)
+        for i in (51, 200, 399):
+            for key, period in (("tenkan_sen", 9), ("kijun_sen", 26), ("senkou_span_b", 52)):
+                expected = (max(high[i - period + 1:i + 1]) + min(low[i - period + 1:i + 1])) / 2
+                self.assertAlmostEqual(series[key][i], expected)
+        self.assertIsNone(series["senkou_span_b"][50])
+    
+    def test_multi_timeframe_ichimoku(self):
+        high, low, close = columns(make_candles(2000, seed=4))
+        result = AdvancedIndicators.multi_timeframe_ichimoku(high, low, close, [1, 4, 96], interval=60)
+        self.assertEqual(list(result), ["60m", "240m", "5760m"])
+        self.assertEqual(result["60m"], AdvancedIndicators.calculate_ichimoku(high, low, close))
+        self.assertIsNone(result["5760m"])
+        
+        kijun = (max(high[-104:]) + min(low[-104:])) / 2
+        self.assertEqual(result["240m"]["kijun_sen"], round(kijun, 2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+analysis_server.py - Kraken Analyst Skill: Resident Analysis Server
+
+Keeps the analysis modules imported and a warm cache of candles and
+indicator states in one long-running local process, so a tool call costs
+one HTTP round trip instead of a Python start-up, module imports, JSON
+pipes and a fresh Kraken request per pipeline stage.
+
+Usage:
+    python analysis_server.py                       # http://127.0.0.1:8765
+    python analysis_server.py --store --ttl 30      # serve candles from the candle store
+    
+    python kraken_client.py analyze --pair BTC/USD --interval 60 --count 200
+    python kraken_client.py fetch --pair BTC/USD | python kraken_client.py format
+
+Endpoints (POST JSON bodies, responses are exactly what the scripts print):
+    /fetch      {pair, interval, count, base_interval, columnar}           -> fetch_data.py
+    /analyze    {document | pair...,  momentum_threshold, ..., rsi_smoothing}  -> apply_rules.py
+    /advanced   {document | pair..., format, backend, ichimoku_timeframes} -> advanced_analysis.py
+    /optimize   {document, format, optimize, min_weight, max_weight, risk_free_rate} -> portfolio_optimizer.py
+    /format     {document, format, include_charts}                         -> format_output.py
+    GET /health                                                            -> cache statistics
+    
+    A pair's candles are fetched (from Kraken, or synced into the store with
+    --store; count defaults to 100). With "stored": true they are read from
+    the candle store ("store": path) without contacting Kraken, every stored
+    candle unless a count is given, like the scripts' own --pair.
+
+Caches:
+    - Candles per (pair, interval): reused for --ttl seconds; requests for
+      fewer candles are served from the tail of a larger cached series
+    - Indicator state per (pair, interval, analyzer settings): closed
+      candles are folded into a StreamingIndicators once; each request only
+      adds the newest (still forming) candle to a copy of that state. The
+      state is reused only if every candle it shares with the request is
+      unchanged; inline documents without a pair are not cached
+    - Each cached key has its own lock, so requests for different series
+      run in parallel
+"""
+
+import argparse
+import copy
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from advanced_analysis import analyze_advanced
+from advanced_analysis import format_text as format_advanced_text
+from apply_rules import KrakenAnalyzer
+from candle_store import CandleStore, read_pair
+from fetch_data import KrakenDataFetcher
+from format_output import ReportFormatter
+from ohlc_series import OHLCSeries
+from portfolio_optimizer import analyze_portfolio
+from portfolio_optimizer import format_text as format_portfolio_text
+from resample import resample_series
+from streaming_indicators import StreamingIndicators
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Candles requested from Kraken per cache fill (one full REST response)
+CACHE_CANDLES = 720
+
+# KrakenAnalyzer settings accepted by /analyze (apply_rules.py flags)
+ANALYZER_PARAMS = {
+    "momentum_threshold": float,
+    "volatility_threshold": float,
+    "rsi_period": int,
+    "ma_fast": int,
+    "ma_slow": int,
+    "rsi_smoothing": str
+}
+
+
+class RequestError(Exception):
+    """Invalid request (HTTP 400) or upstream failure (HTTP 502)"""
+    
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _param(request: Dict, name: str, cast, default=None):
+    """request[name] converted with `cast` (default when missing or null)"""
+    value = request.get(name)
+    if value is None:
+        return default
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise RequestError(f"Invalid '{name}': {value!r}")
+
+
+@dataclass
+class KeyLock:
+    """Lock for one cache key, and the number of requests holding or waiting for it"""
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    users: int = 0
+
+
+@dataclass
+class CachedSeries:
+    series: OHLCSeries
+    fetched_at: float
+
+
+@dataclass
+class CachedStream:
+    """Indicator state over all but the newest candle of a window"""
+    stream: StreamingIndicators
+    size: int
+    # (timestamp, open, close, volume) of the candles in the state's window
+    candles: List[Tuple]
+
+
+def _stream_candles(series: OHLCSeries, start: int, stop: int) -> List[Tuple]:
+    """The candle fields StreamingIndicators.push() reads, for series[start:stop]"""
+    return list(zip(series.timestamp[start:stop], series.open[start:stop],
+                    series.close[start:stop], series.volume[start:stop]))
+
+
+class AnalysisService:
+    """
+    Request handlers behind the HTTP server, usable in-process as well.
+    
+    Each method takes the decoded request body and returns the text the
+    equivalent script would print.
+    """
+    
+    def __init__(self, fetcher: Optional[KrakenDataFetcher] = None, store_path: Optional[str] = None,
+                 use_store: bool = False, offline: bool = False, ttl: float = 15.0,
+                 max_entries: int = 256):
+        """
+        Args:
+            fetcher: KrakenDataFetcher to use (default: one with a 0.5s rate limit)
+            store_path: Candle store location (with use_store)
+            use_store: Sync into and serve candles from the candle store
+            offline: With use_store, never contact Kraken
+            ttl: Seconds a cached candle series is reused
+            max_entries: Cached series and indicator states kept (least recently used dropped)
+        """
+        self.fetcher = fetcher or KrakenDataFetcher()
+        self.store_path = store_path
+        self.use_store = use_store
+        self.offline = offline
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.formatter = ReportFormatter()
+        
+        self._series: "OrderedDict[Tuple, CachedSeries]" = OrderedDict()
+        self._streams: "OrderedDict[Tuple, CachedStream]" = OrderedDict()
+        # Guards the caches, lock tables and stats; work on one key holds its KeyLock
+        self._lock = threading.Lock()
+        self._fetch_locks: Dict[Tuple, KeyLock] = {}
+        self._stream_locks: Dict[Tuple, KeyLock] = {}
+        self.started = time.time()
+        self.stats = {"requests": 0, "series_hits": 0, "series_misses": 0,
+                      "stream_hits": 0, "stream_seeds": 0}
+    
+    # ---- candles -------------------------------------------------------
+    
+    def _remember(self, cache: OrderedDict, locks: Dict[Tuple, KeyLock], key, value):
+        """Cache a value (with self._lock held), dropping the locks of unused evicted keys"""
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_entries:
+            evicted, _ = cache.popitem(last=False)
+            if evicted in locks and not locks[evicted].users:
+                del locks[evicted]
+    
+    @contextmanager
+    def _locked(self, cache: OrderedDict, locks: Dict[Tuple, KeyLock], key):
+        """
+        Hold the lock of one cache key. Its table entry is kept while a
+        request holds or waits for it, or while the key is cached.
+        """
+        with self._lock:
+            key_lock = locks.setdefault(key, KeyLock())
+            key_lock.users += 1
+        try:
+            with key_lock.lock:
+                yield
+        finally:
+            with self._lock:
+                key_lock.users -= 1
+                if not key_lock.users and key not in cache:
+                    del locks[key]
+    
+    def get_series(self, pair: str, interval: int, count: int,
+                   base_interval: Optional[int] = None) -> OHLCSeries:
+        """
+        Newest `count` candles, from the cache when fresh.
+        
+        Raises:
+            RequestError: Invalid parameters or the fetch failed
+        """
+        if count < 1 or (count > CACHE_CANDLES and not self.use_store):
+            limit = "a positive number" if self.use_store else f"1-{CACHE_CANDLES} without --store"
+            raise RequestError(f"Count must be {limit}, got {count}")
+        key = (pair.upper(), interval, base_interval)
+        
+        with self._lock:
+            cached = self._series.get(key)
+            if cached and time.time() - cached.fetched_at < self.ttl and len(cached.series) >= count:
+                self._series.move_to_end(key)
+                self.stats["series_hits"] += 1
+                return cached.series.tail(count)
+        
+        # One fetch per key at a time; concurrent requests wait and reuse it
+        with self._locked(self._series, self._fetch_locks, key):
+            with self._lock:
+                cached = self._series.get(key)
+                if cached and time.time() - cached.fetched_at < self.ttl and len(cached.series) >= count:
+                    self.stats["series_hits"] += 1
+                    return cached.series.tail(count)
+            
+            series = self._fetch(pair, interval, max(count, CACHE_CANDLES), base_interval)
+            with self._lock:
+                self.stats["series_misses"] += 1
+                self._remember(self._series, self._fetch_locks, key, CachedSeries(series, time.time()))
+        return series.tail(count)
+    
+    def _fetch(self, pair: str, interval: int, count: int, base_interval: Optional[int]) -> OHLCSeries:
+        if base_interval is not None and interval % base_interval:
+            raise RequestError(f"Interval {interval} is not a multiple of base interval {base_interval}")
+        
+        if self.use_store:
+            with CandleStore(self.store_path) as store:
+                series = self.fetcher.fetch_series(pair, interval, count, store=store,
+                                                   sync=not self.offline, base_interval=base_interval)
+        elif base_interval is not None and base_interval != interval:
+            # Resample a cached REST base series instead of a second request
+            base = self.get_series(pair, base_interval, CACHE_CANDLES)
+            series = resample_series(base, interval)
+        else:
+            series = self.fetcher.fetch_series(pair, interval, min(count, CACHE_CANDLES))
+        
+        if series is None:
+            raise RequestError(f"Could not fetch {pair} ({interval}m); see server log", 502)
+        return series
+    
+    def _source_series(self, request: Dict) -> OHLCSeries:
+        """Candles named by a request: an inline document or {pair, interval, count}"""
+        if "document" in request:
+            try:
+                return OHLCSeries.from_document(request["document"])
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                raise RequestError(f"Invalid OHLC document: {e}")
+        if "pair" not in request:
+            raise RequestError("Request needs a 'document' or a 'pair'")
+        interval = _param(request, "interval", int, 60)
+        base_interval = _param(request, "base_interval", int)
+        if request.get("stored"):
+            count = _param(request, "count", int)
+            try:
+                return read_pair(request["pair"], interval, count, base_interval,
+                                 request.get("store") or self.store_path)
+            except ValueError as e:
+                raise RequestError(str(e))
+        return self.get_series(request["pair"], interval, _param(request, "count", int, 100), base_interval)
+    
+    # ---- endpoints -----------------------------------------------------
+    
+    def fetch(self, request: Dict) -> str:
+        """fetch_data.py output"""
+        if "pair" not in request:
+            raise RequestError("Request needs a 'pair'")
+        series = self.get_series(request["pair"], _param(request, "interval", int, 60),
+                                 _param(request, "count", int, 100), _param(request, "base_interval", int))
+        if request.get("columnar"):
+            return json.dumps(series.to_columnar_dict(), indent=2)
+        return json.dumps(self.fetcher._to_document(series), indent=2)
+    
+    def analyze(self, request: Dict) -> str:
+        """apply_rules.py output, using a cached indicator state for the series"""
+        params = {}
+        for name, cast in ANALYZER_PARAMS.items():
+            if request.get(name) is not None:
+                params[name] = _param(request, name, cast)
+        try:
+            analyzer = KrakenAnalyzer(**params)
+        except ValueError as e:
+            raise RequestError(str(e))
+        series = self._source_series(request)
+        
+        needed = analyzer.ma_slow + 20
+        if len(series) < needed:
+            raise RequestError(f"Insufficient data. Need at least {needed} candles, got {len(series)}")
+        
+        # Inline documents without a pair have nothing to tell them apart by
+        anonymous = "document" in request and series.pair == "UNKNOWN"
+        key = None if anonymous else (series.pair, series.interval, tuple(sorted(params.items())))
+        if key is None:
+            live = self._advance_stream(None, analyzer, series)
+        else:
+            # Requests for other series go ahead; those for this one wait their turn
+            with self._locked(self._streams, self._stream_locks, key):
+                # The newest candle may still be forming: add it to a copy only
+                live = copy.deepcopy(self._advance_stream(key, analyzer, series))
+        
+        live.push(series.timestamp[-1], series.open[-1], series.close[-1], series.volume[-1])
+        result = analyzer.analyze_stream(live)
+        return json.dumps(result.to_dict(), indent=2)
+    
+    def _advance_stream(self, key: Optional[Tuple], analyzer: KrakenAnalyzer,
+                        series: OHLCSeries) -> StreamingIndicators:
+        """
+        Cached state over series[:-1]. It is advanced with newly closed
+        candles when the window slid forward over unchanged candles, and
+        reseeded when it cannot be (different window size, gap, older or
+        revised data, or Wilder RSI whose value depends on where the window
+        starts). Without a key the state is seeded and not cached; with
+        one, the caller holds the key's lock.
+        """
+        size = len(series)
+        with self._lock:
+            entry = self._streams.get(key) if key is not None else None
+        
+        if entry is not None and entry.size == size and entry.candles:
+            timestamps = series.timestamp
+            index = bisect_left(timestamps, entry.candles[-1][0])
+            slid = timestamps[0] != entry.candles[0][0]
+            if index < size - 1 and not (slid and analyzer.rsi_smoothing == "wilder"):
+                # Every candle the windows share must be unchanged, not just the last one
+                shared = _stream_candles(series, 0, index + 1)
+                if shared == entry.candles[len(entry.candles) - len(shared):]:
+                    stream = entry.stream
+                    for i in range(index + 1, size - 1):
+                        stream.push(timestamps[i], series.open[i], series.close[i], series.volume[i])
+                    entry.candles = shared + _stream_candles(series, index + 1, size - 1)
+                    with self._lock:
+                        if key in self._streams:
+                            self._streams.move_to_end(key)
+                        self.stats["stream_hits"] += 1
+                    return stream
+        
+        stream = analyzer.create_stream(series.pair, size)
+        stream.seed_series(series[:-1])
+        with self._lock:
+            if key is not None:
+                self._remember(self._streams, self._stream_locks, key,
+                               CachedStream(stream, size, _stream_candles(series, 0, size - 1)))
+            self.stats["stream_seeds"] += 1
+        return stream
+    
+    def advanced(self, request: Dict) -> str:
+        """advanced_analysis.py output"""
+        series = self._source_series(request)
+        timeframes = request.get("ichimoku_timeframes")
+        try:
+            if isinstance(timeframes, str):
+                timeframes = [int(f) for f in timeframes.split(",")]
+            result = analyze_advanced(series, backend=request.get("backend", "auto"),
+                                      ichimoku_timeframes=timeframes)
+        except (TypeError, ValueError) as e:
+            raise RequestError(str(e))
+        
+        if request.get("format", "json") == "text":
+            return format_advanced_text(result)
+        return json.dumps(result.to_dict(), indent=2)
+    
+    def optimize(self, request: Dict) -> str:
+        """portfolio_optimizer.py output"""
+        if "document" not in request:
+            raise RequestError("Request needs a portfolio 'document'")
+        objective = request.get("optimize")
+        try:
+            result = analyze_portfolio(
+                request["document"],
+                optimize=objective.replace("-", "_") if objective else None,
+                min_weight=float(request.get("min_weight", 0.0)),
+                max_weight=float(request.get("max_weight", 1.0)),
+                risk_free_rate=float(request.get("risk_free_rate", 0.02))
+            )
+        except (TypeError, ValueError) as e:
+            raise RequestError(str(e))
+        
+        if request.get("format", "json") == "text":
+            return format_portfolio_text(result)
+        return json.dumps(result.to_dict(), indent=2)
+    
+    def format(self, request: Dict) -> str:
+        """format_output.py output"""
+        if "document" not in request:
+            raise RequestError("Request needs an analysis 'document'")
+        data = request["document"]
+        style = request.get("format", "markdown")
+        if style == "markdown":
+            return self.formatter.format_markdown(data, bool(request.get("include_charts")))
+        if style == "text":
+            return self.formatter.format_text(data)
+        if style == "json":
+            return self.formatter.format_json(data)
+        raise RequestError(f"Unknown format '{style}'. Valid: markdown, text, json")
+    
+    def health(self) -> Dict:
+        with self._lock:
+            return {
+                "status": "ok",
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "cached_series": len(self._series),
+                "cached_streams": len(self._streams),
+                "store": self.use_store,
+                "ttl": self.ttl,
+                **self.stats
+            }
+    
+    def handle(self, endpoint: str, request: Dict) -> str:
+        """Dispatch one decoded request body to an endpoint"""
+        handler = {
+            "fetch": self.fetch,
+            "analyze": self.analyze,
+            "advanced": self.advanced,
+            "optimize": self.optimize,
+            "format": self.format
+        }.get(endpoint)
+        if handler is None:
+            raise RequestError(f"Unknown endpoint '/{endpoint}'", 404)
+        
+        with self._lock:
+            self.stats["requests"] += 1
+        return handler(request)
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 keep-alive front end for AnalysisService"""
+    
+    protocol_version = "HTTP/1.1"
+    server_version = "KrakenAnalyst/1.0"
+    
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+    
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            self._send(200, json.dumps(self.server.service.health()), "application/json")
+        else:
+            self._send_error(404, f"Unknown endpoint '{self.path}'")
+    
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        
+        try:
+            request = json.loads(body) if body else {}
+            if not isinstance(request, dict):
+                raise RequestError("Request body must be a JSON object")
+            output = self.server.service.handle(self.path.strip("/"), request)
+        except json.JSONDecodeError as e:
+            self._send_error(400, f"Invalid JSON input: {e}")
+        except RequestError as e:
+            self._send_error(e.status, e.message)
+        except Exception as e:
+            import traceback
+            traceback.print_exc(file=sys.stderr)
+            self._send_error(500, f"{type(e).__name__}: {e}")
+        else:
+            self._send(200, output, "text/plain; charset=utf-8")
+    
+    def _send_error(self, status: int, message: str):
+        self._send(status, json.dumps({"error": message}), "application/json")
+    
+    def _send(self, status: int, text: str, content_type: str):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class AnalysisServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, service: AnalysisService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 verbose: bool = False):
+        super().__init__((host, port), AnalysisRequestHandler)
+        self.service = service
+        self.verbose = verbose
+    
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Resident kraken-analyst server with warm candle and indicator caches",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python analysis_server.py
+  python analysis_server.py --store --ttl 30
+  python analysis_server.py --store --offline --port 9000
+
+Then use kraken_client.py with the usual script flags:
+  python kraken_client.py analyze --pair BTC/USD --interval 60 --count 200
+  python kraken_client.py fetch --pair ETH/USD | python kraken_client.py analyze | python kraken_client.py format
+        """
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Bind address (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument("--store", nargs="?", const="", default=None, metavar="PATH",
+                        help="Serve candles through the local candle store (default path: candle_store.db)")
+    parser.add_argument("--offline", action="store_true", help="With --store, never contact Kraken")
+    parser.add_argument("--ttl", type=float, default=15.0,
+                        help="Seconds a cached candle series is reused (default: 15)")
+    parser.add_argument("--rate-limit", type=float, default=0.5,
+                        help="Seconds between Kraken API requests (default: 0.5)")
+    parser.add_argument("--verbose", action="store_true", help="Log every request to stderr")
+    args = parser.parse_args()
+    if args.offline and args.store is None:
+        parser.error("--offline requires --store")
+    
+    service = AnalysisService(
+        fetcher=KrakenDataFetcher(rate_limit=args.rate_limit),
+        store_path=args.store or None,
+        use_store=args.store is not None,
+        offline=args.offline,
+        ttl=args.ttl
+    )
+    
+    try:
+        server = AnalysisServer(service, args.host, args.port, verbose=args.verbose)
+    except OSError as e:
+        print(f"ERROR: Cannot listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 1
+    
+    print(f"🚀 Kraken analyst server on {server.url} (Ctrl+C to stop)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
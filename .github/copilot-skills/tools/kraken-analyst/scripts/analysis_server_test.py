@@ -0,0 +1,267 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+import kraken_client
+from analysis_server import AnalysisServer, AnalysisService
+from apply_rules import KrakenAnalyzer
+from candle_store import CandleStore
+from fetch_data import KrakenDataFetcher
+from format_output import ReportFormatter
+from ohlc_series import OHLCSeries
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python analysis_server_test.py
+
+def kraken_rows(count, start=1700000000, step=3600):
+    """Raw Kraken OHLC rows with a deterministic zig-zag price"""
+    rows = []
+    for i in range(count):
+        price = 30000.0 + 40 * ((i * 7) % 13) + 3 * i
+        rows.append([start + i * step, f"{price - 5:.1f}", f"{price + 20:.1f}", f"{price - 20:.1f}",
+                     f"{price:.1f}", f"{price - 1:.1f}", f"{1 + (i % 5) / 3:.8f}", 10 + i % 4])
+    return rows
+
+
+class ReplayFetcher(KrakenDataFetcher):
+    """
+    KrakenDataFetcher over a recorded market: every request returns the
+    newest 720 of the first `visible` rows, like Kraken's OHLC endpoint.
+    """
+    
+    def __init__(self, rows, visible):
+        super().__init__(rate_limit=0)
+        self.rows = rows
+        self.visible = visible
+        self.requests = 0
+    
+    def _request_ohlc(self, api_pair, interval, since=None, rate_limit=True):
+        self.requests += 1
+        rows = self.rows[:self.visible][-720:]
+        return [list(map(str, row)) for row in rows], rows[-1][0]
+
+
+class AnalysisServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.fetcher = ReplayFetcher(kraken_rows(2000), visible=900)
+        self.service = AnalysisService(fetcher=self.fetcher, ttl=0)
+        self.server = AnalysisServer(self.service, port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+    
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def post(self, endpoint, request):
+        return kraken_client.post(self.server.url, f"/{endpoint}", json.dumps(request))
+    
+    def expected_series(self, count):
+        rows = self.fetcher.rows[:self.fetcher.visible][-count:]
+        return self.fetcher._build_series("BTC/USD", "XXBTZUSD", 60, count,
+                                          [list(map(str, row)) for row in rows])
+
+
+class TestEndpoints(AnalysisServerTestCase):
+    def test_analyze_matches_apply_rules_as_window_slides(self):
+        for params in ({}, {"rsi_smoothing": "wilder"}, {"ma_fast": 5, "ma_slow": 30}):
+            self.service._streams.clear()
+            self.fetcher.visible = 900
+            for step in range(12):
+                with self.subTest(params=params, step=step):
+                    status, text = self.post("analyze", {"pair": "BTC/USD", "count": 200, **params})
+                    self.assertEqual(status, 200, text)
+                    expected = KrakenAnalyzer(**params).analyze(self.expected_series(200))
+                    self.assertEqual(json.loads(text), json.loads(json.dumps(expected.to_dict())))
+                # Next closed candle; occasionally two at once
+                self.fetcher.visible += 1 + step % 2
+        
+        # Wilder RSI depends on where the window starts, so it is reseeded
+        # whenever the window slides; the simple settings are advanced
+        self.assertEqual(self.service.stats["stream_hits"], 22)
+        self.assertEqual(self.service.stats["stream_seeds"], 14)
+    
+    def test_revised_candles_reseed_the_state(self):
+        series = self.expected_series(200)
+        document = self.fetcher._to_document(series)
+        self.assertEqual(self.post("analyze", {"document": document})[0], 200)
+        
+        # Same last candle, but an interior one revised (a late correction)
+        for index in (120, 185):
+            revised = json.loads(json.dumps(document))
+            revised["data"][index]["close"] = float(revised["data"][index]["close"]) * 0.8
+            status, text = self.post("analyze", {"document": revised})
+            self.assertEqual(status, 200, text)
+            expected = KrakenAnalyzer().analyze(OHLCSeries.from_document(revised))
+            self.assertEqual(json.loads(text), json.loads(json.dumps(expected.to_dict())))
+        self.assertEqual(self.service.stats["stream_hits"], 0)
+        
+        # Documents without a pair do not share (or fill) a cache entry
+        for candles in (document["data"][:150], document["data"][50:]):
+            status, text = self.post("analyze", {"document": {"interval": 60, "data": candles}})
+            expected = KrakenAnalyzer().analyze(OHLCSeries.from_document({"interval": 60, "data": candles}))
+            self.assertEqual(json.loads(text), json.loads(json.dumps(expected.to_dict())))
+        self.assertEqual(self.service.health()["cached_streams"], 1)
+    
+    def test_candle_cache_serves_smaller_counts(self):
+        self.service.ttl = 60
+        self.post("fetch", {"pair": "BTC/USD", "count": 50})
+        status, text = self.post("fetch", {"pair": "BTC/USD", "count": 300, "columnar": True})
+        
+        self.assertEqual(status, 200)
+        self.assertEqual(self.fetcher.requests, 1)
+        self.assertEqual(json.loads(text)["columns"]["timestamp"], list(self.expected_series(300).timestamp))
+        self.assertEqual(self.service.health()["series_hits"], 1)
+    
+    def test_inline_document_pipeline(self):
+        document = self.fetcher._to_document(self.expected_series(120))
+        status, analysis = self.post("analyze", {"document": document})
+        self.assertEqual(status, 200)
+        self.assertEqual(self.fetcher.requests, 0)
+        
+        for style in ("markdown", "text", "json"):
+            status, text = self.post("format", {"document": json.loads(analysis), "format": style})
+            formatter = ReportFormatter()
+            expected = {"markdown": formatter.format_markdown, "text": formatter.format_text,
+                        "json": formatter.format_json}[style](json.loads(analysis))
+            self.assertEqual((status, text), (200, expected))
+    
+    def test_advanced_text(self):
+        status, text = self.post("advanced", {"pair": "BTC/USD", "count": 300, "format": "text"})
+        self.assertEqual(status, 200)
+        self.assertIn("ADVANCED TECHNICAL ANALYSIS: BTC/USD", text)
+    
+    def test_errors(self):
+        cases = [
+            ("analyze", {"pair": "BTC/USD", "count": 10}, 400, "Insufficient data"),
+            ("fetch", {"pair": "BTC/USD", "count": 5000}, 400, "Count must be"),
+            ("analyze", {"document": {"data": "nope"}}, 400, "Invalid OHLC document"),
+            ("format", {}, 400, "analysis 'document'"),
+            ("nothing", {}, 404, "Unknown endpoint")
+        ]
+        for endpoint, request, status, message in cases:
+            with self.subTest(endpoint=endpoint, request=request):
+                code, text = self.post(endpoint, request)
+                self.assertEqual(code, status)
+                self.assertIn(message, json.loads(text)["error"])
+        
+        code, text = kraken_client.post(self.server.url, "/analyze", "{not json")
+        self.assertEqual(code, 400)
+        
+        # Bad parameter values are the client's error, not a server failure
+        cases = [
+            ("analyze", {"pair": "BTC/USD", "count": "many"}, "Invalid 'count'"),
+            ("analyze", {"pair": "BTC/USD", "interval": [60]}, "Invalid 'interval'"),
+            ("analyze", {"pair": "BTC/USD", "rsi_period": "fourteen"}, "Invalid 'rsi_period'"),
+            ("analyze", {"pair": "BTC/USD", "rsi_smoothing": "ema"}, "Unknown RSI smoothing"),
+            ("analyze", {"pair": "BTC/USD", "ma_slow": 0}, "Periods must be >= 1"),
+            ("fetch", {"pair": "BTC/USD", "base_interval": "hourly"}, "Invalid 'base_interval'"),
+            ("advanced", {"pair": "BTC/USD", "count": 300, "ichimoku_timeframes": "4,x"}, "invalid literal"),
+            ("optimize", {"document": {}, "max_weight": [1]}, "float() argument")
+        ]
+        for endpoint, request, message in cases:
+            with self.subTest(endpoint=endpoint, request=request):
+                code, text = self.post(endpoint, request)
+                self.assertEqual(code, 400, text)
+                self.assertIn(message, json.loads(text)["error"])
+        
+        # A failed upstream fetch is reported, not cached
+        self.fetcher._request_ohlc = lambda *args, **kwargs: None
+        with contextlib.redirect_stderr(io.StringIO()):
+            code, _ = self.post("fetch", {"pair": "ETH/USD"})
+        self.assertEqual(code, 502)
+    
+    
+    def test_pairs_are_analyzed_concurrently(self):
+        self.service.ttl = 60
+        for pair in ("BTC/USD", "ETH/USD"):
+            self.assertEqual(self.post("analyze", {"pair": pair, "count": 200})[0], 200)
+        
+        # While a BTC/USD request holds its state, ETH/USD is still served...
+        results = []
+        with self.service._locked(self.service._streams, self.service._stream_locks, ("BTC/USD", 60, ())):
+            self.assertEqual(self.post("analyze", {"pair": "ETH/USD", "count": 200})[0], 200)
+            waiting = threading.Thread(
+                target=lambda: results.append(self.post("analyze", {"pair": "BTC/USD", "count": 200})[0]))
+            waiting.start()
+            waiting.join(0.5)
+            # ...and the next BTC/USD request waits for it
+            self.assertEqual(results, [])
+        waiting.join(5)
+        self.assertEqual(results, [200])
+    
+    def test_evicted_keys_drop_their_locks(self):
+        self.service.max_entries = 2
+        for pair in ("BTC/USD", "ETH/USD", "SOL/USD", "XRP/USD"):
+            self.assertEqual(self.post("analyze", {"pair": pair, "count": 200})[0], 200)
+        
+        self.assertEqual(set(self.service._stream_locks), set(self.service._streams))
+        self.assertEqual(set(self.service._fetch_locks), set(self.service._series))
+        self.assertEqual(len(self.service._streams), 2)
+
+
+class TestClient(AnalysisServerTestCase):
+    def run_client(self, argv, stdin=""):
+        stdout = io.StringIO()
+        saved = sys.argv, sys.stdin
+        sys.argv = ["kraken_client.py"] + argv
+        sys.stdin = io.StringIO(stdin)
+        try:
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+                code = kraken_client.main()
+        finally:
+            sys.argv, sys.stdin = saved
+        return code, stdout.getvalue()
+    
+    def test_pipes_stdin_document(self):
+        document = json.dumps(self.fetcher._to_document(self.expected_series(120)))
+        code, output = self.run_client(["--server", self.server.url, "analyze", "--rsi-period", "9"], document)
+        
+        self.assertEqual(code, 0)
+        expected = KrakenAnalyzer(rsi_period=9).analyze(self.expected_series(120))
+        self.assertEqual(json.loads(output), json.loads(json.dumps(expected.to_dict())))
+    
+    def test_falls_back_to_script_without_server(self):
+        document = json.dumps(self.fetcher._to_document(self.expected_series(120)))
+        _, served = self.run_client(["--server", self.server.url, "analyze"], document)
+        code, local = self.run_client(["--server", "http://127.0.0.1:9", "analyze"], document)
+        
+        self.assertEqual(code, 0)
+        self.assertEqual(local, served)
+    
+    def test_pair_reads_the_candle_store_like_the_scripts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "candles.db")
+            with CandleStore(path) as store:
+                store.save("XXBTZUSD", 60, self.expected_series(900))
+            
+            for argv in (["advanced", "--pair", "BTC/USD"],
+                         ["advanced", "--pair", "BTC/USD", "--count", "300", "--format", "text"],
+                         ["analyze", "--pair", "BTC/USD"],
+                         ["analyze", "--pair", "BTC/USD", "--interval", "240", "--rsi-smoothing", "wilder"]):
+                with self.subTest(argv=argv):
+                    requests = self.service.stats["requests"]
+                    served = self.run_client(["--server", self.server.url] + argv + ["--store", path])
+                    local = self.run_client(["--local"] + argv + ["--store", path])
+                    self.assertEqual(served[0], 0)
+                    self.assertEqual(served, local)
+                    self.assertEqual(self.service.stats["requests"], requests + 1)
+            
+            # Every stored candle, not the server's default count; and never Kraken
+            argv = ["--server", self.server.url, "advanced", "--pair", "BTC/USD", "--store", path]
+            self.assertNotEqual(self.run_client(argv), self.run_client(argv + ["--count", "100"]))
+        self.assertEqual(self.fetcher.requests, 0)
+    
+    def test_error_exit_code(self):
+        code, output = self.run_client(["--server", self.server.url, "analyze"], '{"pair": "X", "data": []}')
+        self.assertEqual((code, output), (1, ""))
+
+
+if __name__ == "__main__":
+    unittest.main()
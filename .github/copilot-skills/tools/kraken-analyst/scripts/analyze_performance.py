@@ -8,29 +8,30 @@ Compares actual portfolio performance to recommendations:
 - Identify best/worst recommendations
 - Generate performance reports
 
+Reports read rollup tables that triggers keep current as recommendations,
+outcomes and holdings are written (see db.py), so they take the same time
+however long the recommendation log gets.
+
 Usage:
     python3 analyze_performance.py --report         # Full performance report
     python3 analyze_performance.py --comparison     # Recommendations vs actuals
     python3 analyze_performance.py --assets         # Per-asset analysis
     python3 analyze_performance.py --trends         # Performance trends
+    python3 analyze_performance.py --benchmark      # Report time as the log grows (scratch db)
 """
 
-import sqlite3
+import json
 import sys
-from pathlib import Path
 from datetime import datetime, timedelta
 from typing import List, Dict
 
-DB_PATH = Path(__file__).parent.parent / 'portfolio_tracker.db'
+from db import Database, from_epoch, get_database, refresh_asset_rollups, to_epoch
 
 
 def get_portfolio_history() -> List[Dict]:
     """Get portfolio value history"""
     try:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        rows = get_database().query('''
             SELECT timestamp, total_value_usd
             FROM portfolio_snapshots
             ORDER BY timestamp
@@ -38,15 +39,14 @@ def get_portfolio_history() -> List[Dict]:
         
         history = [
             {
-                'timestamp': row[0],
+                'timestamp': from_epoch(row[0]).isoformat(),
                 'value': row[1]
             }
-            for row in cursor.fetchall()
+            for row in rows
         ]
         
-        conn.close()
         return history
-        
+    
     except Exception as e:
         print(f"✗ Error fetching history: {e}")
         return []
@@ -55,12 +55,10 @@ def get_portfolio_history() -> List[Dict]:
 def calculate_returns(days: int = 90) -> Dict:
     """Calculate portfolio returns"""
     try:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        
-        cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
+        db = get_database()
+        cutoff = to_epoch(datetime.utcnow() - timedelta(days=days))
         
-        cursor.execute('''
+        oldest = db.query_one('''
             SELECT total_value_usd
             FROM portfolio_snapshots
             WHERE timestamp > ?
@@ -68,17 +66,13 @@ def calculate_returns(days: int = 90) -> Dict:
             LIMIT 1
         ''', (cutoff,))
         
-        oldest = cursor.fetchone()
-        
-        cursor.execute('''
+        newest = db.query_one('''
             SELECT total_value_usd
             FROM portfolio_snapshots
             ORDER BY timestamp DESC
             LIMIT 1
         ''')
         
-        newest = cursor.fetchone()
-        
         if oldest and newest:
             start_value = oldest[0]
             end_value = newest[0]
@@ -93,88 +87,69 @@ def calculate_returns(days: int = 90) -> Dict:
                 'pct_return': pct_return
             }
         
-        conn.close()
         return {}
-        
+    
     except Exception as e:
         print(f"✗ Error calculating returns: {e}")
         return {}
 
 
-def per_asset_performance() -> Dict:
+def per_asset_performance(db_path=None) -> Dict:
     """Calculate per-asset performance"""
     try:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
+        db = get_database(db_path)
         
-        # Get latest holdings by asset
-        cursor.execute('''
-            SELECT DISTINCT asset FROM asset_holdings
+        # First and last holding per asset, kept by triggers on asset_holdings.
+        # Only rows left stale by deletes or updates need the write lock.
+        if db.query_one('SELECT 1 FROM asset_performance_rollup WHERE stale LIMIT 1'):
+            with db.transaction():
+                refresh_asset_rollups(db.conn)
+        rows = db.query('''
+            SELECT asset, first_value, last_value, snapshots
+            FROM asset_performance_rollup
         ''')
         
-        assets = [row[0] for row in cursor.fetchall()]
-        
         performance = {}
-        for asset in assets:
-            cursor.execute('''
-                SELECT ah.value_usd, ps.timestamp
-                FROM asset_holdings ah
-                JOIN portfolio_snapshots ps ON ah.snapshot_id = ps.id
-                WHERE ah.asset = ?
-                ORDER BY ps.timestamp
-            ''', (asset,))
-            
-            history = cursor.fetchall()
+        for asset, start_value, end_value, snapshots in rows:
+            total_return = end_value - start_value
+            pct_return = (total_return / start_value * 100) if start_value != 0 else 0
             
-            if history:
-                start_value = history[0][0]
-                end_value = history[-1][0]
-                total_return = end_value - start_value
-                pct_return = (total_return / start_value * 100) if start_value != 0 else 0
-                
-                performance[asset] = {
-                    'start_value': start_value,
-                    'end_value': end_value,
-                    'total_return': total_return,
-                    'pct_return': pct_return,
-                    'snapshots': len(history)
-                }
+            performance[asset] = {
+                'start_value': start_value,
+                'end_value': end_value,
+                'total_return': total_return,
+                'pct_return': pct_return,
+                'snapshots': snapshots
+            }
         
-        conn.close()
         return performance
-        
+    
     except Exception as e:
         print(f"✗ Error analyzing assets: {e}")
         return {}
 
 
-def recommendation_accuracy() -> Dict:
+def recommendation_accuracy(db_path=None) -> Dict:
     """Analyze recommendation accuracy"""
     try:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        
-        # Get all recommendations with outcomes
-        cursor.execute('''
-            SELECT r.asset, r.action, r.current_price, r.target_price, 
-                   r.confidence_score, o.executed, o.execution_price
-            FROM recommendations r
-            LEFT JOIN recommendation_outcomes o ON r.id = o.recommendation_id
+        # Counters per asset and action, kept by triggers on recommendations
+        # and recommendation_outcomes (one row per recommendation/outcome pair)
+        rows = get_database(db_path).query('''
+            SELECT asset, action, recommendations, executed, met_target, total_confidence
+            FROM recommendation_rollup
+            WHERE recommendations > 0
+            ORDER BY asset, action
         ''')
         
-        rows = cursor.fetchall()
-        
         stats = {
-            'total': len(rows),
+            'total': 0,
             'executed': 0,
             'met_target': 0,
             'by_asset': {},
             'by_action': {}
         }
         
-        for row in rows:
-            asset, action, curr, target, conf, executed, exec_price = row
-            
+        for asset, action, count, executed, met_target, total_confidence in rows:
             # Initialize asset
             if asset not in stats['by_asset']:
                 stats['by_asset'][asset] = {
@@ -193,24 +168,14 @@ def recommendation_accuracy() -> Dict:
                     'met_target': 0
                 }
             
-            stats['by_asset'][asset]['count'] += 1
-            stats['by_asset'][asset]['total_confidence'] += conf or 0
-            stats['by_action'][action]['count'] += 1
-            
-            if executed:
-                stats['executed'] += 1
-                stats['by_asset'][asset]['executed'] += 1
-                stats['by_action'][action]['executed'] += 1
-                
-                # Check if target met
-                if action == 'SELL' and exec_price >= target:
-                    stats['met_target'] += 1
-                    stats['by_asset'][asset]['met_target'] += 1
-                    stats['by_action'][action]['met_target'] += 1
-                elif action == 'BUY' and exec_price <= target:
-                    stats['met_target'] += 1
-                    stats['by_asset'][asset]['met_target'] += 1
-                    stats['by_action'][action]['met_target'] += 1
+            stats['total'] += count
+            stats['executed'] += executed
+            stats['met_target'] += met_target
+            stats['by_asset'][asset]['total_confidence'] += total_confidence
+            for group in (stats['by_asset'][asset], stats['by_action'][action]):
+                group['count'] += count
+                group['executed'] += executed
+                group['met_target'] += met_target
         
         # Calculate averages
         for asset in stats['by_asset']:
@@ -222,14 +187,114 @@ def recommendation_accuracy() -> Dict:
         stats['accuracy_pct'] = (stats['met_target'] / stats['executed'] * 100) \
             if stats['executed'] > 0 else 0
         
-        conn.close()
         return stats
-        
+    
     except Exception as e:
         print(f"✗ Error analyzing recommendations: {e}")
         return {}
 
 
+def daily_accuracy(days: int = 14, db_path=None) -> List[Dict]:
+    """Recommendation counts and accuracy per day, oldest first"""
+    try:
+        rows = get_database(db_path).query('''
+            SELECT day, SUM(recommendations), SUM(executed), SUM(met_target)
+            FROM recommendation_daily
+            WHERE day > date('now', '-' || ? || ' days')
+            GROUP BY day
+            HAVING SUM(recommendations) > 0
+            ORDER BY day
+        ''', (days,))
+        
+        return [
+            {
+                'day': day,
+                'count': count,
+                'executed': executed,
+                'met_target': met_target,
+                'accuracy_pct': (met_target / executed * 100) if executed > 0 else 0
+            }
+            for day, count, executed, met_target in rows
+        ]
+    
+    except Exception as e:
+        print(f"✗ Error analyzing recommendations by day: {e}")
+        return []
+
+
+def benchmark_reports(sizes=(1000, 10000, 100000, 300000), executed_ratio=0.5, repeats=5):
+    """
+    Grow a scratch recommendation log through `sizes` (logged through the
+    rollup triggers) and time recommendation_accuracy() at each size against
+    fetching the LEFT JOIN the report used to aggregate in Python.
+    """
+    import os
+    import random
+    import tempfile
+    import time
+    
+    rng = random.Random(7)
+    assets = ['BTC', 'ETH', 'SOL', 'DOT', 'ADA', 'XRP']
+    actions = ['BUY', 'SELL', 'HOLD', 'REDUCE']
+    start_time = to_epoch(datetime(2023, 1, 1))
+    
+    def best_ms(function):
+        timings = []
+        for _ in range(repeats):
+            begin = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - begin) * 1000)
+        return round(min(timings), 3)
+    
+    results = {'sizes': []}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.db')
+        db = Database(path)
+        logged = 0
+        for size in sizes:
+            recommendations = []
+            outcomes = []
+            for rec_id in range(logged + 1, size + 1):
+                price = rng.uniform(10, 100000)
+                recommendations.append((start_time + 300 * rec_id, rng.choice(assets), rng.choice(actions), price,
+                                        price * rng.uniform(0.9, 1.1), rng.random()))
+                if rng.random() < executed_ratio:
+                    outcomes.append((rec_id, to_epoch(), price * rng.uniform(0.85, 1.15)))
+            
+            begin = time.perf_counter()
+            with db.transaction():
+                db.executemany('''
+                    INSERT INTO recommendations
+                    (timestamp, asset, action, current_price, target_price, confidence_score)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', recommendations)
+                db.executemany('''
+                    INSERT INTO recommendation_outcomes
+                    (recommendation_id, execution_timestamp, execution_price, executed)
+                    VALUES (?, ?, ?, 1)
+                ''', outcomes)
+            insert_s = time.perf_counter() - begin
+            logged = size
+            
+            results['sizes'].append({
+                'recommendations': size,
+                'insert_rows_per_s': round((len(recommendations) + len(outcomes)) / insert_s),
+                'report_ms': best_ms(lambda: recommendation_accuracy(path)),
+                'daily_report_ms': best_ms(lambda: daily_accuracy(14, path)),
+                'join_fetch_ms': best_ms(lambda: db.query('''
+                    SELECT r.asset, r.action, r.current_price, r.target_price,
+                           r.confidence_score, o.executed, o.execution_price
+                    FROM recommendations r
+                    LEFT JOIN recommendation_outcomes o ON r.id = o.recommendation_id
+                '''))
+            })
+        
+        get_database(path).close()
+        db.close()
+    
+    return results
+
+
 def print_full_report():
     """Print comprehensive performance report"""
     print("\n" + "=" * 80)
@@ -315,6 +380,13 @@ def main():
         print(f"Met Target: {accuracy['met_target']}")
         print(f"Accuracy: {accuracy['accuracy_pct']:.1f}%")
         
+        daily = daily_accuracy(14)
+        if daily:
+            print("\nBy Day (last 14 days):")
+            for day in daily:
+                print(f"  {day['day']:<10} {day['count']:>4} recs, {day['executed']:>4} executed, "
+                      f"{day['accuracy_pct']:>5.1f}% accuracy")
+        
         return 0
     
     elif '--trends' in sys.argv:
@@ -334,6 +406,10 @@ def main():
         
         return 0
     
+    elif '--benchmark' in sys.argv:
+        print(json.dumps(benchmark_reports(), indent=2))
+        return 0
+    
     else:
         print("Portfolio Performance Analyzer")
         print("\nUsage:")
@@ -341,6 +417,7 @@ def main():
         print("  Asset trends:        python3 analyze_performance.py --assets")
         print("  Recommendations:     python3 analyze_performance.py --comparison")
         print("  Price trends:        python3 analyze_performance.py --trends")
+        print("  Benchmark:           python3 analyze_performance.py --benchmark")
         return 1
 
 
@@ -0,0 +1,231 @@
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+
+import analyze_performance
+from db import Database, MIGRATIONS, close_all, to_epoch
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python analyze_performance_test.py
+
+ASSETS = ["BTC", "ETH", "SOL", "DOT"]
+ACTIONS = ["BUY", "SELL", "HOLD"]
+
+
+def scan_accuracy(db):
+    """recommendation_accuracy() as computed before the rollups: over every joined row"""
+    rows = db.query("""
+        SELECT r.asset, r.action, r.target_price, r.confidence_score, o.executed, o.execution_price
+        FROM recommendations r
+        LEFT JOIN recommendation_outcomes o ON r.id = o.recommendation_id
+    """)
+    stats = {"total": len(rows), "executed": 0, "met_target": 0, "by_asset": {}, "by_action": {}}
+    for asset, action, target, conf, executed, exec_price in rows:
+        by_asset = stats["by_asset"].setdefault(asset, {"count": 0, "executed": 0, "met_target": 0,
+                                                        "total_confidence": 0})
+        by_action = stats["by_action"].setdefault(action, {"count": 0, "executed": 0, "met_target": 0})
+        by_asset["count"] += 1
+        by_asset["total_confidence"] += conf or 0
+        by_action["count"] += 1
+        if executed:
+            met = (action == "SELL" and exec_price >= target) or (action == "BUY" and exec_price <= target)
+            for group in (stats, by_asset, by_action):
+                group["executed"] += 1
+                group["met_target"] += met
+    return stats
+
+
+def scan_assets(db):
+    """per_asset_performance() as computed before the rollups"""
+    performance = {}
+    for asset, in db.query("SELECT DISTINCT asset FROM asset_holdings"):
+        history = db.query("""
+            SELECT ah.value_usd FROM asset_holdings ah
+            JOIN portfolio_snapshots ps ON ah.snapshot_id = ps.id
+            WHERE ah.asset = ? ORDER BY ps.timestamp, ah.id
+        """, (asset,))
+        if history:
+            performance[asset] = (history[0][0], history[-1][0], len(history))
+    return performance
+
+
+class RollupTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "tracker.db")
+        self.db = Database(self.path)
+        self.random = random.Random(7)
+    
+    def tearDown(self):
+        self.db.close()
+        close_all()
+        self.directory.cleanup()
+    
+    def add_recommendation(self):
+        self.db.execute("""
+            INSERT INTO recommendations (timestamp, asset, action, target_price, confidence_score)
+            VALUES (?, ?, ?, ?, ?)
+        """, (to_epoch(f"2024-01-{self.random.randint(1, 28):02d} 12:00:00"), self.random.choice(ASSETS),
+              self.random.choice(ACTIONS), self.random.uniform(90, 110),
+              self.random.choice([None, self.random.random()])))
+    
+    def ids(self, table):
+        return [row[0] for row in self.db.query(f"SELECT id FROM {table}")]
+    
+    def assertAccuracyMatches(self):
+        stats = analyze_performance.recommendation_accuracy(self.path)
+        expected = scan_accuracy(self.db)
+        for key in ("total", "executed", "met_target"):
+            self.assertEqual(stats[key], expected[key], key)
+        self.assertEqual(stats["by_action"], expected["by_action"])
+        self.assertEqual(stats["by_asset"].keys(), expected["by_asset"].keys())
+        for asset, group in expected["by_asset"].items():
+            for key in ("count", "executed", "met_target"):
+                self.assertEqual(stats["by_asset"][asset][key], group[key], (asset, key))
+            self.assertAlmostEqual(stats["by_asset"][asset]["total_confidence"], group["total_confidence"])
+
+
+class TestRecommendationRollups(RollupTestCase):
+    def test_random_writes_match_full_scan(self):
+        for step in range(400):
+            recommendations = self.ids("recommendations")
+            outcomes = self.ids("recommendation_outcomes")
+            choice = self.random.random()
+            with self.db.transaction():
+                if choice < 0.35 or not recommendations:
+                    self.add_recommendation()
+                elif choice < 0.65:
+                    self.db.execute("""
+                        INSERT INTO recommendation_outcomes (recommendation_id, executed, execution_price)
+                        VALUES (?, ?, ?)
+                    """, (self.random.choice(recommendations), self.random.choice([0, 1, 1]),
+                          self.random.uniform(80, 120)))
+                elif choice < 0.75:
+                    self.db.execute("UPDATE recommendations SET action = ?, target_price = ? WHERE id = ?",
+                                    (self.random.choice(ACTIONS), self.random.uniform(90, 110),
+                                     self.random.choice(recommendations)))
+                elif choice < 0.85 and outcomes:
+                    self.db.execute("""
+                        UPDATE recommendation_outcomes SET recommendation_id = ?, execution_price = ?
+                        WHERE id = ?
+                    """, (self.random.choice(recommendations), self.random.uniform(80, 120),
+                          self.random.choice(outcomes)))
+                elif choice < 0.93 and outcomes:
+                    self.db.execute("DELETE FROM recommendation_outcomes WHERE id = ?",
+                                    (self.random.choice(outcomes),))
+                else:
+                    self.db.execute("DELETE FROM recommendations WHERE id = ?",
+                                    (self.random.choice(recommendations),))
+            if step % 50 == 0:
+                self.assertAccuracyMatches()
+        self.assertAccuracyMatches()
+    
+    def test_daily(self):
+        with self.db.transaction():
+            for days, action, price in [(1, "BUY", 95), (1, "SELL", 95), (3, "BUY", 105), (40, "BUY", 95)]:
+                cursor = self.db.execute("""
+                    INSERT INTO recommendations (timestamp, asset, action, target_price)
+                    VALUES (?, 'BTC', ?, 100)
+                """, (to_epoch() - days * 86400, action))
+                self.db.execute("""
+                    INSERT INTO recommendation_outcomes (recommendation_id, executed, execution_price)
+                    VALUES (?, 1, ?)
+                """, (cursor.lastrowid, price))
+        
+        daily = analyze_performance.daily_accuracy(14, self.path)
+        self.assertEqual([(d["count"], d["executed"], d["met_target"]) for d in daily], [(1, 1, 0), (2, 2, 1)])
+        self.assertEqual(daily[1]["accuracy_pct"], 50.0)
+    
+    def test_backfills_existing_database(self):
+        self.db.close()
+        os.remove(self.path)
+        conn = sqlite3.connect(self.path)
+        for _, step in MIGRATIONS[:2]:
+            step(conn)
+        conn.execute("PRAGMA user_version = 2")
+        conn.executemany("INSERT INTO recommendations (asset, action, target_price, confidence_score) "
+                         "VALUES (?, ?, 100, 0.5)", [("BTC", "BUY"), ("BTC", "SELL"), ("ETH", "BUY")])
+        conn.executemany("INSERT INTO recommendation_outcomes (recommendation_id, executed, execution_price) "
+                         "VALUES (?, 1, ?)", [(1, 90), (1, 110), (2, 90)])
+        conn.executemany("INSERT INTO portfolio_snapshots (timestamp, total_value_usd, holdings_json) "
+                         "VALUES (?, 0, '{}')", [("2024-01-02",), ("2024-01-01",)])
+        conn.executemany("INSERT INTO asset_holdings (snapshot_id, asset, amount, price_usd, value_usd, "
+                         "allocation_pct) VALUES (?, 'BTC', 1, ?, ?, 0)", [(1, 120, 120), (2, 100, 100)])
+        conn.commit()
+        conn.close()
+        
+        self.db = Database(self.path)
+        stats = analyze_performance.recommendation_accuracy(self.path)
+        self.assertEqual((stats["total"], stats["executed"], stats["met_target"]), (4, 3, 1))
+        self.assertAccuracyMatches()
+        btc = analyze_performance.per_asset_performance(self.path)["BTC"]
+        self.assertEqual((btc["start_value"], btc["end_value"], btc["pct_return"]), (100, 120, 20.0))
+
+
+class TestAssetRollups(RollupTestCase):
+    def add_snapshot(self, timestamp, values):
+        with self.db.transaction():
+            snapshot_id = self.db.execute("""
+                INSERT INTO portfolio_snapshots (timestamp, total_value_usd, holdings_json)
+                VALUES (?, ?, '{}')
+            """, (to_epoch(timestamp), sum(values.values()))).lastrowid
+            self.db.executemany("""
+                INSERT INTO asset_holdings (snapshot_id, asset, amount, price_usd, value_usd, allocation_pct)
+                VALUES (?, ?, 1, ?, ?, 0)
+            """, [(snapshot_id, asset, value, value) for asset, value in values.items()])
+        return snapshot_id
+    
+    def assertAssetsMatch(self):
+        performance = analyze_performance.per_asset_performance(self.path)
+        actual = {asset: (data["start_value"], data["end_value"], data["snapshots"])
+                  for asset, data in performance.items()}
+        self.assertEqual(actual, scan_assets(self.db))
+    
+    def test_out_of_order_snapshots(self):
+        for day in self.random.sample(range(1, 29), 20):
+            self.add_snapshot(f"2024-02-{day:02d}T00:00:00",
+                              {asset: self.random.uniform(10, 100) for asset in self.random.sample(ASSETS, 3)})
+        self.assertAssetsMatch()
+        self.assertEqual(self.db.query_one("SELECT COUNT(*) FROM asset_performance_rollup WHERE stale"), (0,))
+    
+    def test_deletes_and_updates_recompute(self):
+        ids = [self.add_snapshot(f"2024-03-{day:02d}T00:00:00", {"BTC": 100.0 + day, "ETH": 50.0 - day})
+               for day in range(1, 11)]
+        with self.db.transaction():
+            self.db.execute("DELETE FROM asset_holdings WHERE snapshot_id = ?", (ids[0],))
+            self.db.execute("DELETE FROM portfolio_snapshots WHERE id = ?", (ids[-1],))
+            self.db.execute("UPDATE asset_holdings SET asset = 'SOL' WHERE snapshot_id = ? AND asset = 'ETH'",
+                            (ids[4],))
+        self.assertAssetsMatch()
+        self.assertEqual(analyze_performance.per_asset_performance(self.path)["BTC"]["start_value"], 102.0)
+        
+        with self.db.transaction():
+            self.db.execute("DELETE FROM asset_holdings WHERE asset = 'SOL'")
+        self.assertNotIn("SOL", analyze_performance.per_asset_performance(self.path))
+        self.assertAssetsMatch()
+    
+    
+    def test_reports_do_not_wait_for_writers(self):
+        for day in range(1, 6):
+            self.add_snapshot(f"2024-04-{day:02d}T00:00:00", {"BTC": 100.0 + day})
+        
+        # Another process is in the middle of a batch: nothing is stale, so
+        # the report reads without the write lock
+        writer = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(writer.close)
+        writer.execute("BEGIN IMMEDIATE")
+        self.assertEqual(analyze_performance.per_asset_performance(self.path)["BTC"]["end_value"], 105.0)
+        writer.rollback()
+        
+        # Stale rows are still recomputed first
+        with self.db.transaction():
+            self.db.execute("DELETE FROM portfolio_snapshots WHERE timestamp = ?", (to_epoch("2024-04-05T00:00:00"),))
+        self.assertEqual(analyze_performance.per_asset_performance(self.path)["BTC"]["end_value"], 104.0)
+        self.assertEqual(self.db.query_one("SELECT COUNT(*) FROM asset_performance_rollup WHERE stale"), (0,))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,16 +8,26 @@ Reads JSON from stdin (from fetch_data.py), outputs analysis JSON to stdout.
 Usage:
     python apply_rules.py < market_data.json
     python fetch_data.py --pair BTC/USD | python apply_rules.py
+    python apply_rules.py --batch --workers 0 < pairs.ndjson
+    python apply_rules.py --input-dir ./market_data
+    python apply_rules.py --pair BTC/USD --interval 240    # stored candles, resampled locally
 
 Outputs:
     JSON with analysis results, signal, and confidence score
+    (NDJSON, one result per line, in batch mode)
 """
 
 import json
+import os
 import sys
 import argparse
-from typing import Dict, List, Optional, Tuple
+import multiprocessing
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass, asdict
+from candle_store import load_pair
+from ohlc_series import OHLCSeries
+from streaming_indicators import RollingSMA, RollingRSI, StreamingIndicators
 
 
 @dataclass
@@ -41,7 +51,8 @@ class KrakenAnalyzer:
                  volatility_threshold: float = 2.5,
                  rsi_period: int = 14,
                  ma_fast: int = 12,
-                 ma_slow: int = 26):
+                 ma_slow: int = 26,
+                 rsi_smoothing: str = "simple"):
         """
         Initialize analyzer with configurable thresholds.
         
@@ -51,53 +62,38 @@ class KrakenAnalyzer:
             rsi_period: Period for RSI calculation
             ma_fast: Fast moving average period
             ma_slow: Slow moving average period
+            rsi_smoothing: "simple" rolling average or "wilder" smoothing
+        
+        Raises:
+            ValueError: Non-positive period or unknown RSI smoothing
         """
+        if min(rsi_period, ma_fast, ma_slow) < 1:
+            raise ValueError(f"Periods must be >= 1, got rsi_period={rsi_period}, "
+                             f"ma_fast={ma_fast}, ma_slow={ma_slow}")
+        if rsi_smoothing not in RollingRSI.SMOOTHING_MODES:
+            raise ValueError(f"Unknown RSI smoothing '{rsi_smoothing}'. Valid: {RollingRSI.SMOOTHING_MODES}")
         self.momentum_threshold = momentum_threshold
         self.volatility_threshold = volatility_threshold
         self.rsi_period = rsi_period
         self.ma_fast = ma_fast
         self.ma_slow = ma_slow
+        self.rsi_smoothing = rsi_smoothing
     
     def calculate_moving_average(self, prices: List[float], period: int) -> List[Optional[float]]:
-        """Calculate simple moving average"""
+        """Calculate simple moving average (rolling sum, O(n))"""
         if len(prices) < period:
             return [None] * len(prices)
         
-        ma = []
-        for i in range(len(prices)):
-            if i < period - 1:
-                ma.append(None)
-            else:
-                window = prices[i - period + 1:i + 1]
-                ma.append(sum(window) / period)
-        return ma
+        sma = RollingSMA(period)
+        return [sma.push(price) for price in prices]
     
     def calculate_rsi(self, prices: List[float], period: int = 14) -> List[Optional[float]]:
-        """Calculate Relative Strength Index"""
+        """Calculate Relative Strength Index (rolling gains/losses, O(n))"""
         if len(prices) < period + 1:
             return [None] * len(prices)
         
-        deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-        gains = [max(d, 0) for d in deltas]
-        losses = [-min(d, 0) for d in deltas]
-        
-        rsi = [None]  # First value has no delta
-        for i in range(len(prices) - 1):
-            if i < period - 1:
-                rsi.append(None)
-            else:
-                avg_gain = sum(gains[i-period+1:i+1]) / period
-                avg_loss = sum(losses[i-period+1:i+1]) / period
-                
-                if avg_loss == 0:
-                    rs = 100 if avg_gain > 0 else 50
-                else:
-                    rs = avg_gain / avg_loss
-                
-                rsi_value = 100 - (100 / (1 + rs))
-                rsi.append(rsi_value)
-        
-        return rsi
+        rsi = RollingRSI(period, self.rsi_smoothing)
+        return [rsi.push(price) for price in prices]
     
     def calculate_volatility(self, prices: List[float], period: int = 20) -> float:
         """Calculate annualized volatility"""
@@ -142,93 +138,72 @@ class KrakenAnalyzer:
         momentum = (current_price - ma) / std_dev
         return round(momentum, 2)
     
-    def analyze(self, ohlc_data: Dict) -> Optional[AnalysisResult]:
+    def create_stream(self, pair: str = "UNKNOWN", window: Optional[int] = None) -> StreamingIndicators:
+        """
+        Create an empty streaming indicator state using this analyzer's periods.
+        
+        Args:
+            pair: Trading pair the state belongs to
+            window: Candles of history to retain (None = size of the seed)
+        """
+        return StreamingIndicators(
+            pair=pair,
+            ma_fast=self.ma_fast,
+            ma_slow=self.ma_slow,
+            rsi_period=self.rsi_period,
+            rsi_smoothing=self.rsi_smoothing,
+            window=window
+        )
+    
+    def seed_stream(self, ohlc_data, window: Optional[int] = None) -> StreamingIndicators:
+        """
+        Build a streaming state from historical OHLC data.
+        
+        Args:
+            ohlc_data: OHLCSeries, or dict with pair, interval, data: [candles]
+            window: Candles of history to retain (None = all seeded candles)
+        
+        Returns:
+            StreamingIndicators ready for update() and analyze_stream()
+        """
+        series = OHLCSeries.from_document(ohlc_data)
+        stream = self.create_stream(series.pair, window)
+        return stream.seed_series(series)
+    
+    def update(self, stream: StreamingIndicators, candle: Dict) -> Optional[AnalysisResult]:
+        """
+        Fold one new candle into a seeded stream and re-analyze in O(1).
+        
+        Args:
+            stream: State from seed_stream()
+            candle: New candle dict {timestamp, open, high, low, close, volume}
+        
+        Returns:
+            AnalysisResult for the latest candle
+        """
+        stream.update(candle)
+        return self.analyze_stream(stream)
+    
+    def analyze(self, ohlc_data) -> Optional[AnalysisResult]:
         """
         Perform complete analysis on OHLC data.
         
         Args:
-            ohlc_data: Dict with pair, interval, data: [candles]
+            ohlc_data: OHLCSeries, or dict with pair, interval, data: [candles]
+                       (legacy candle dicts, Kraken rows, or columnar "columns")
         
         Returns:
             AnalysisResult with signal and confidence
         """
         try:
-            pair = ohlc_data.get('pair', 'UNKNOWN')
-            candles = ohlc_data.get('data', [])
+            series = OHLCSeries.from_document(ohlc_data)
             
-            if not candles or len(candles) < self.ma_slow + 20:
-                print(f"ERROR: Insufficient data. Need at least {self.ma_slow + 20} candles, got {len(candles)}", 
+            if len(series) < self.ma_slow + 20:
+                print(f"ERROR: Insufficient data. Need at least {self.ma_slow + 20} candles, got {len(series)}", 
                       file=sys.stderr)
                 return None
             
-            # Extract prices
-            closes = [c['close'] for c in candles]
-            opens = [c['open'] for c in candles]
-            highs = [c['high'] for c in candles]
-            lows = [c['low'] for c in candles]
-            volumes = [c['volume'] for c in candles]
-            
-            # Calculate indicators
-            ma_fast_vals = self.calculate_moving_average(closes, self.ma_fast)
-            ma_slow_vals = self.calculate_moving_average(closes, self.ma_slow)
-            rsi_vals = self.calculate_rsi(closes, self.rsi_period)
-            
-            # Current values (last candle)
-            current_close = closes[-1]
-            current_rsi = rsi_vals[-1] if rsi_vals[-1] is not None else 50
-            current_ma_fast = ma_fast_vals[-1] if ma_fast_vals[-1] is not None else current_close
-            current_ma_slow = ma_slow_vals[-1] if ma_slow_vals[-1] is not None else current_close
-            
-            momentum = self.calculate_momentum(closes)
-            volatility = self.calculate_volatility(closes)
-            
-            # Determine trend
-            if current_ma_fast > current_ma_slow:
-                ma_trend = "bullish"
-            elif current_ma_fast < current_ma_slow:
-                ma_trend = "bearish"
-            else:
-                ma_trend = "neutral"
-            
-            # Calculate price change
-            price_change = ((current_close - opens[0]) / opens[0]) * 100
-            
-            # Generate signal using rule-based logic
-            signal, base_confidence = self._generate_signal(
-                momentum, current_rsi, ma_trend, volatility
-            )
-            
-            # Adjust confidence based on factors
-            confidence = self._calculate_confidence(
-                momentum, current_rsi, volatility, volumes[-10:], base_confidence
-            )
-            
-            analysis = {
-                "momentum": momentum,
-                "momentum_threshold": self.momentum_threshold,
-                "volatility": round(volatility, 2),
-                "volatility_threshold": self.volatility_threshold,
-                "rsi": round(current_rsi, 1),
-                "rsi_period": self.rsi_period,
-                "ma_fast": round(current_ma_fast, 2),
-                "ma_slow": round(current_ma_slow, 2),
-                "ma_signal": ma_trend,
-                "price_change_pct": round(price_change, 2),
-                "recent_volume": round(volumes[-1], 2),
-                "avg_volume": round(sum(volumes[-10:]) / 10, 2),
-                "volume_ratio": round(volumes[-1] / (sum(volumes[-10:]) / 10), 2) if sum(volumes[-10:]) > 0 else 1.0
-            }
-            
-            result = AnalysisResult(
-                pair=pair,
-                timestamp=int(candles[-1]['timestamp']),
-                current_price=round(current_close, 2),
-                analysis=analysis,
-                signal=signal,
-                confidence=round(confidence, 3)
-            )
-            
-            return result
+            return self.analyze_stream(self.seed_stream(series))
         
         except Exception as e:
             print(f"ERROR: Analysis failed: {e}", file=sys.stderr)
@@ -236,6 +211,78 @@ class KrakenAnalyzer:
             traceback.print_exc(file=sys.stderr)
             return None
     
+    def analyze_stream(self, stream: StreamingIndicators) -> Optional[AnalysisResult]:
+        """
+        Generate signal and confidence from the current streaming state.
+        
+        Args:
+            stream: State from seed_stream(), optionally advanced with update()
+        
+        Returns:
+            AnalysisResult with signal and confidence
+        """
+        if stream.candles < self.ma_slow + 20:
+            print(f"ERROR: Insufficient data. Need at least {self.ma_slow + 20} candles, got {stream.candles}", 
+                  file=sys.stderr)
+            return None
+        
+        # Current values (last candle)
+        current_close = stream.last_close
+        current_rsi = stream.rsi if stream.rsi is not None else 50
+        current_ma_fast = stream.ma_fast if stream.ma_fast is not None else current_close
+        current_ma_slow = stream.ma_slow if stream.ma_slow is not None else current_close
+        
+        momentum = stream.momentum
+        volatility = stream.volatility
+        volumes = stream.recent_volumes()
+        
+        # Determine trend
+        if current_ma_fast > current_ma_slow:
+            ma_trend = "bullish"
+        elif current_ma_fast < current_ma_slow:
+            ma_trend = "bearish"
+        else:
+            ma_trend = "neutral"
+        
+        # Calculate price change
+        first_open = stream.first_open
+        price_change = ((current_close - first_open) / first_open) * 100
+        
+        # Generate signal using rule-based logic
+        signal, base_confidence = self._generate_signal(
+            momentum, current_rsi, ma_trend, volatility
+        )
+        
+        # Adjust confidence based on factors
+        confidence = self._calculate_confidence(
+            momentum, current_rsi, volatility, volumes, base_confidence
+        )
+        
+        analysis = {
+            "momentum": momentum,
+            "momentum_threshold": self.momentum_threshold,
+            "volatility": round(volatility, 2),
+            "volatility_threshold": self.volatility_threshold,
+            "rsi": round(current_rsi, 1),
+            "rsi_period": self.rsi_period,
+            "ma_fast": round(current_ma_fast, 2),
+            "ma_slow": round(current_ma_slow, 2),
+            "ma_signal": ma_trend,
+            "price_change_pct": round(price_change, 2),
+            "recent_volume": round(volumes[-1], 2),
+            "avg_volume": round(sum(volumes) / 10, 2),
+            "volume_ratio": round(volumes[-1] / (sum(volumes) / 10), 2) if sum(volumes) > 0 else 1.0
+        }
+        
+        return AnalysisResult(
+            pair=stream.pair,
+            timestamp=stream.last_timestamp,
+            current_price=round(current_close, 2),
+            analysis=analysis,
+            signal=signal,
+            confidence=round(confidence, 3)
+        )
+    
     def _generate_signal(self, momentum: float, rsi: float, 
                          ma_trend: str, volatility: float) -> Tuple[str, float]:
         """
@@ -299,6 +346,102 @@ class KrakenAnalyzer:
         return max(0.0, min(1.0, confidence))
 
 
+# Batch mode: one analyzer per worker process, reused for every document
+_worker_analyzer: Optional[KrakenAnalyzer] = None
+
+
+def _init_worker(analyzer_params: Dict):
+    """Process pool initializer: build the worker's KrakenAnalyzer once"""
+    global _worker_analyzer
+    _worker_analyzer = KrakenAnalyzer(**analyzer_params)
+
+
+def _analyze_document(item: Tuple[str, str, str]) -> Dict:
+    """
+    Analyze one batch item and return a JSON-serializable record.
+    
+    Args:
+        item: (kind, label, value) - ("text", "line N", ndjson_line) or ("path", path, path)
+    """
+    kind, label, value = item
+    
+    try:
+        if kind == "path":
+            with open(value, 'r') as f:
+                document = json.load(f)
+        else:
+            document = json.loads(value)
+    except (OSError, json.JSONDecodeError) as e:
+        return {"source": label, "error": f"Invalid JSON input: {e}"}
+    
+    if not isinstance(document, dict):
+        return {"source": label, "error": f"Invalid input: expected a JSON object, got {type(document).__name__}"}
+    
+    result = _worker_analyzer.analyze(document)
+    if result is None:
+        return {"source": label, "pair": document.get('pair', 'UNKNOWN'), "error": "Analysis failed"}
+    return result.to_dict()
+
+
+def iter_batch_items(input_dir: Optional[str] = None, stream=None) -> Iterator[Tuple[str, str, str]]:
+    """
+    Yield batch items from NDJSON lines or from *.json files in a directory.
+    
+    Files are passed by path so workers read and parse them in parallel.
+    """
+    if input_dir:
+        for path in sorted(Path(input_dir).glob('*.json')):
+            yield ("path", str(path), str(path))
+        return
+    
+    for line_number, line in enumerate(stream or sys.stdin, start=1):
+        line = line.strip()
+        if line:
+            yield ("text", f"line {line_number}", line)
+
+
+def run_batch(analyzer_params: Dict, items: Iterable[Tuple[str, str, str]],
+              workers: int = 1, out=None) -> int:
+    """
+    Analyze many OHLC documents and stream NDJSON results.
+    
+    Args:
+        analyzer_params: KrakenAnalyzer keyword arguments
+        items: Batch items from iter_batch_items()
+        workers: Worker processes (1 = in-process, 0 = one per CPU core)
+        out: Output stream (default: stdout)
+    
+    Returns:
+        Number of documents that failed
+    """
+    out = out or sys.stdout
+    failures = 0
+    
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    
+    def emit(record: Dict):
+        nonlocal failures
+        if "error" in record:
+            failures += 1
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+    
+    if workers == 1:
+        _init_worker(analyzer_params)
+        for item in items:
+            emit(_analyze_document(item))
+        return failures
+    
+    with multiprocessing.Pool(workers, initializer=_init_worker,
+                              initargs=(analyzer_params,)) as pool:
+        # imap keeps input order while still streaming results as they finish
+        for record in pool.imap(_analyze_document, items, chunksize=4):
+            emit(record)
+    
+    return failures
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Apply analysis rules to OHLC data",
@@ -308,6 +451,10 @@ Examples:
   python apply_rules.py < market_data.json
   python fetch_data.py --pair BTC/USD | python apply_rules.py
   python apply_rules.py --momentum-threshold 1.5 --volatility-threshold 3.0 < data.json
+  python apply_rules.py --batch < pairs.ndjson > results.ndjson
+  python apply_rules.py --input-dir ./market_data --workers 0 > results.ndjson
+  python apply_rules.py --pair BTC/USD --interval 240 --count 200
+  python apply_rules.py --pair BTC/USD --interval 120 --base-interval 15
         """
     )
     
@@ -341,24 +488,93 @@ Examples:
         default=26,
         help="Slow moving average period (default: 26)"
     )
+    parser.add_argument(
+        "--rsi-smoothing",
+        choices=["simple", "wilder"],
+        default="simple",
+        help="RSI averaging: simple rolling mean or Wilder smoothing (default: simple)"
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Read NDJSON from stdin (one OHLC document per line), write NDJSON results"
+    )
+    parser.add_argument(
+        "--input-dir",
+        type=str,
+        help="Batch-analyze every *.json file in a directory, write NDJSON results"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Batch worker processes (1 = in-process, 0 = one per CPU core, default: 1)"
+    )
+    parser.add_argument(
+        "--pair",
+        type=str,
+        help="Analyze stored candles for this pair instead of reading stdin (no network access)"
+    )
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=60,
+        help="With --pair: candle interval in minutes, resampled from a finer stored series if needed (default: 60)"
+    )
+    parser.add_argument(
+        "--count",
+        type=int,
+        help="With --pair: use only the newest COUNT candles"
+    )
+    parser.add_argument(
+        "--base-interval",
+        type=int,
+        metavar="MINUTES",
+        help="With --pair: stored interval to resample from (default: automatic)"
+    )
+    parser.add_argument(
+        "--store",
+        type=str,
+        help="With --pair: candle store path (default: candle_store.db)"
+    )
     
     args = parser.parse_args()
     
-    # Read JSON from stdin
-    try:
-        input_data = json.load(sys.stdin)
-    except json.JSONDecodeError as e:
-        print(f"ERROR: Invalid JSON input: {e}", file=sys.stderr)
-        return 1
+    analyzer_params = {
+        "momentum_threshold": args.momentum_threshold,
+        "volatility_threshold": args.volatility_threshold,
+        "rsi_period": args.rsi_period,
+        "ma_fast": args.ma_fast,
+        "ma_slow": args.ma_slow,
+        "rsi_smoothing": args.rsi_smoothing
+    }
+    
+    if args.batch or args.input_dir:
+        if args.input_dir and not Path(args.input_dir).is_dir():
+            print(f"ERROR: Not a directory: {args.input_dir}", file=sys.stderr)
+            return 1
+        if args.workers < 0:
+            print(f"ERROR: --workers must be >= 0, got {args.workers}", file=sys.stderr)
+            return 1
+        
+        failures = run_batch(analyzer_params, iter_batch_items(args.input_dir), args.workers)
+        return 1 if failures else 0
+    
+    if args.pair:
+        input_data = load_pair(args.pair, args.interval, count=args.count,
+                               base_interval=args.base_interval, path=args.store)
+        if input_data is None:
+            return 1
+    else:
+        # Read JSON from stdin
+        try:
+            input_data = json.load(sys.stdin)
+        except json.JSONDecodeError as e:
+            print(f"ERROR: Invalid JSON input: {e}", file=sys.stderr)
+            return 1
     
     # Run analysis
-    analyzer = KrakenAnalyzer(
-        momentum_threshold=args.momentum_threshold,
-        volatility_threshold=args.volatility_threshold,
-        rsi_period=args.rsi_period,
-        ma_fast=args.ma_fast,
-        ma_slow=args.ma_slow
-    )
+    analyzer = KrakenAnalyzer(**analyzer_params)
     
     result = analyzer.analyze(input_data)
     
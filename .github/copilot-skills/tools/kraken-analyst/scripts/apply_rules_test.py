@@ -0,0 +1,86 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from apply_rules import KrakenAnalyzer, iter_batch_items, run_batch
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python apply_rules_test.py
+
+def make_document(pair, count=120, start_price=100.0):
+    """OHLC document with a deterministic zig-zag uptrend"""
+    candles = []
+    for i in range(count):
+        price = start_price + 0.5 * i + 3 * ((i * 5) % 7)
+        candles.append({"timestamp": 1700000000 + 3600 * i, "open": price - 1, "high": price + 2,
+                        "low": price - 2, "close": price, "volume": 1 + i % 4})
+    return {"pair": pair, "interval": 60, "data": candles}
+
+
+class TestBatch(unittest.TestCase):
+    def run_lines(self, lines, workers=1):
+        out = io.StringIO()
+        with contextlib.redirect_stderr(io.StringIO()):
+            failures = run_batch({}, iter_batch_items(stream=io.StringIO("\n".join(lines) + "\n")), workers, out)
+        return failures, [json.loads(line) for line in out.getvalue().splitlines()]
+    
+    def test_results_in_input_order(self):
+        documents = [make_document(pair, start_price=price)
+                     for pair, price in (("BTC/USD", 30000.0), ("ETH/USD", 2000.0), ("SOL/USD", 40.0))]
+        failures, records = self.run_lines([json.dumps(d) for d in documents])
+        
+        self.assertEqual(failures, 0)
+        expected = [KrakenAnalyzer().analyze(d).to_dict() for d in documents]
+        self.assertEqual(records, json.loads(json.dumps(expected)))
+    
+    def test_bad_lines_are_reported_with_their_source(self):
+        lines = [
+            json.dumps(make_document("BTC/USD")),
+            '{"pair": "ETH/USD", "data": [',   # truncated
+            "[1, 2, 3]",
+            "42",
+            '"BTC/USD"',
+            "",                                 # skipped, but still counted
+            json.dumps(make_document("XRP/USD", count=10)),
+            json.dumps(make_document("SOL/USD"))
+        ]
+        failures, records = self.run_lines(lines)
+        
+        self.assertEqual(failures, 5)
+        self.assertEqual([r.get("pair") for r in records],
+                         ["BTC/USD", None, None, None, None, "XRP/USD", "SOL/USD"])
+        errors = [r for r in records if "error" in r]
+        self.assertEqual([r["source"] for r in errors], ["line 2", "line 3", "line 4", "line 5", "line 7"])
+        self.assertIn("Invalid JSON input", errors[0]["error"])
+        self.assertEqual([r["error"] for r in errors[1:4]],
+                         ["Invalid input: expected a JSON object, got list",
+                          "Invalid input: expected a JSON object, got int",
+                          "Invalid input: expected a JSON object, got str"])
+        self.assertEqual(errors[4]["error"], "Analysis failed")
+    
+    def test_workers_match_in_process(self):
+        lines = [json.dumps(make_document(f"P{i}/USD", start_price=50.0 + i)) for i in range(8)] + ["[]", "{"]
+        self.assertEqual(self.run_lines(lines, workers=2), self.run_lines(lines))
+    
+    def test_input_dir(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, text in (("a.json", json.dumps(make_document("BTC/USD"))), ("b.json", "not json"),
+                               ("c.json", "[]"), ("notes.txt", "ignored")):
+                with open(os.path.join(directory, name), "w") as f:
+                    f.write(text)
+            
+            out = io.StringIO()
+            failures = run_batch({}, iter_batch_items(directory), out=out)
+            records = [json.loads(line) for line in out.getvalue().splitlines()]
+        
+        self.assertEqual(failures, 2)
+        self.assertEqual(records[0]["pair"], "BTC/USD")
+        self.assertEqual([os.path.basename(r["source"]) for r in records[1:]], ["b.json", "c.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
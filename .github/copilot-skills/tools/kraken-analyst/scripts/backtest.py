@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+"""
+backtest.py - Kraken Analyst Skill: Walk-Forward Backtester
+
+Replays KrakenAnalyzer signals over a candle history. The indicator state is
+advanced one candle at a time (StreamingIndicators), so a backtest over n
+candles costs O(n) instead of re-analyzing the whole history at every bar.
+
+Usage:
+    python backtest.py --pair BTC/USD --interval 60              # from the local candle store
+    python fetch_data.py --pair BTC/USD --count 720 | python backtest.py
+    python backtest.py --pair BTC/USD --grid momentum_threshold=1,1.5,2 --grid ma_fast=8,12 --workers 0
+
+Execution model:
+    - A signal on candle t is filled at the open of candle t+1 (no look-ahead)
+    - Long-only by default: BUY opens a position, SELL closes it
+      (--allow-short turns SELL into a short position)
+    - Fees and slippage are charged on every fill, in basis points
+
+Outputs:
+    JSON with metrics, trades and the equity curve (or a ranked grid in grid mode)
+"""
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import sys
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from apply_rules import KrakenAnalyzer
+from candle_store import load_pair
+from ohlc_series import OHLCSeries
+
+# Kraken taker fee for the lowest volume tier
+DEFAULT_FEE_BPS = 26.0
+
+# Parameters that can be swept with --grid
+GRID_PARAMS = {
+    "momentum_threshold": float,
+    "volatility_threshold": float,
+    "ma_fast": int,
+    "ma_slow": int,
+    "rsi_period": int
+}
+
+RANK_METRICS = ("total_return_pct", "sharpe_ratio", "win_rate", "max_drawdown_pct")
+
+
+@dataclass
+class Trade:
+    """One round trip (entry fill to exit fill)"""
+    side: str
+    entry_time: int
+    entry_price: float
+    exit_time: int
+    exit_price: float
+    return_pct: float
+    fees: float
+    
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class BacktestResult:
+    """Backtest metrics, trades and equity curve"""
+    pair: str
+    interval: Optional[int]
+    params: Dict
+    metrics: Dict
+    trades: List[Dict] = field(default_factory=list)
+    equity_curve: List[List[float]] = field(default_factory=list)
+    
+    def to_dict(self):
+        return asdict(self)
+
+
+class Backtester:
+    """
+    Walk-forward simulation of KrakenAnalyzer signals.
+    
+    Every candle is pushed into one StreamingIndicators state, the analyzer
+    evaluates the state, and orders fill on the next candle's open.
+    """
+    
+    def __init__(self, analyzer: KrakenAnalyzer, initial_capital: float = 10000.0,
+                 fee_bps: float = DEFAULT_FEE_BPS, slippage_bps: float = 0.0,
+                 min_confidence: float = 0.0, allow_short: bool = False,
+                 hit_horizon: int = 1):
+        """
+        Args:
+            analyzer: Analyzer whose signals are replayed
+            initial_capital: Starting equity in quote currency
+            fee_bps: Fee per fill in basis points of traded notional
+            slippage_bps: Adverse price move per fill in basis points
+            min_confidence: Ignore BUY/SELL signals below this confidence
+            allow_short: SELL opens a short instead of only closing a long
+            hit_horizon: Candles after a signal used to score its direction
+        """
+        self.analyzer = analyzer
+        self.initial_capital = initial_capital
+        self.fee = fee_bps / 10000
+        self.slippage = slippage_bps / 10000
+        self.min_confidence = min_confidence
+        self.allow_short = allow_short
+        self.hit_horizon = max(hit_horizon, 1)
+    
+    @property
+    def warmup(self) -> int:
+        """Candles needed before the analyzer produces a signal"""
+        return self.analyzer.ma_slow + 20
+    
+    def signals(self, series: OHLCSeries) -> Iterator[Tuple[int, str, float]]:
+        """Yield (index, signal, confidence) for every candle after warm-up, in O(1) each"""
+        analyzer = self.analyzer
+        stream = analyzer.create_stream(series.pair)
+        warmup = self.warmup
+        
+        for index, values in enumerate(zip(series.timestamp, series.open, series.close, series.volume)):
+            stream.push(*values)
+            if stream.candles >= warmup:
+                result = analyzer.analyze_stream(stream)
+                yield index, result.signal, result.confidence
+    
+    def run(self, series: OHLCSeries, include_curve: bool = True) -> BacktestResult:
+        """Simulate the strategy over a series (oldest candle first)"""
+        opens, closes, timestamps = series.open, series.close, series.timestamp
+        n = len(series)
+        
+        cash = self.initial_capital
+        position = 0.0            # units held (negative when short)
+        entry = None              # (time, fill price, fees) of the open position
+        fees_paid = 0.0
+        trades: List[Trade] = []
+        curve: List[List[float]] = []
+        bar_returns: List[float] = []
+        pending: Optional[str] = None
+        exposed_bars = 0
+        
+        peak = self.initial_capital
+        max_drawdown = 0.0
+        previous_equity = self.initial_capital
+        
+        signal_hits = 0
+        signal_count = 0
+        horizon = self.hit_horizon
+        
+        signals = self.signals(series)
+        next_signal = next(signals, None)
+        
+        for i in range(n):
+            # 1. Fill the order decided on the previous candle at this open
+            if pending is not None:
+                cash, position, entry, fees_paid = self._fill(
+                    pending, opens[i], timestamps[i], cash, position, entry, fees_paid, trades
+                )
+                pending = None
+            
+            # 2. Mark to market at the close
+            equity = cash + position * closes[i]
+            if position:
+                exposed_bars += 1
+            if include_curve:
+                curve.append([timestamps[i], round(equity, 2)])
+            if previous_equity > 0:
+                bar_returns.append(equity / previous_equity - 1)
+            previous_equity = equity
+            if equity > peak:
+                peak = equity
+            elif peak > 0:
+                max_drawdown = max(max_drawdown, 1 - equity / peak)
+            
+            # 3. Evaluate the signal on this candle
+            if next_signal is not None and next_signal[0] == i:
+                _, signal, confidence = next_signal
+                next_signal = next(signals, None)
+                
+                if signal != "HOLD" and confidence >= self.min_confidence:
+                    # Directional hit rate: did price move the signal's way within the horizon?
+                    if i + horizon < n:
+                        signal_count += 1
+                        move = closes[i + horizon] - closes[i]
+                        if (move > 0 and signal == "BUY") or (move < 0 and signal == "SELL"):
+                            signal_hits += 1
+                    
+                    if i + 1 < n:
+                        pending = self._order(signal, position)
+        
+        # Close any open position at the last close for reporting
+        if position and n:
+            cash, position, entry, fees_paid = self._close(
+                closes[-1], timestamps[-1], cash, position, entry, fees_paid, trades
+            )
+            if include_curve:
+                curve[-1][1] = round(cash, 2)
+        
+        final_equity = cash
+        metrics = self._metrics(series, final_equity, trades, bar_returns, max_drawdown,
+                                fees_paid, exposed_bars, signal_hits, signal_count)
+        
+        return BacktestResult(
+            pair=series.pair,
+            interval=series.interval,
+            params=self.params(),
+            metrics=metrics,
+            trades=[t.to_dict() for t in trades],
+            equity_curve=curve
+        )
+    
+    def params(self) -> Dict:
+        analyzer = self.analyzer
+        return {
+            "momentum_threshold": analyzer.momentum_threshold,
+            "volatility_threshold": analyzer.volatility_threshold,
+            "rsi_period": analyzer.rsi_period,
+            "ma_fast": analyzer.ma_fast,
+            "ma_slow": analyzer.ma_slow,
+            "fee_bps": self.fee * 10000,
+            "slippage_bps": self.slippage * 10000,
+            "min_confidence": self.min_confidence,
+            "allow_short": self.allow_short
+        }
+    
+    def _order(self, signal: str, position: float) -> Optional[str]:
+        """Target side for a signal, or None if it does not change the position"""
+        if signal == "BUY" and position <= 0:
+            return "long"
+        if signal == "SELL":
+            if self.allow_short and position >= 0:
+                return "short"
+            if position > 0:
+                return "flat"
+        return None
+    
+    def _fill(self, target, price, timestamp, cash, position, entry, fees_paid, trades):
+        if position:
+            cash, position, entry, fees_paid = self._close(price, timestamp, cash, position, entry, fees_paid, trades)
+        if target == "flat":
+            return cash, position, entry, fees_paid
+        
+        # Open with all equity; the fee comes out of the notional
+        direction = 1 if target == "long" else -1
+        fill = price * (1 + direction * self.slippage)
+        notional = cash / (1 + self.fee)
+        fee = notional * self.fee
+        units = notional / fill
+        
+        if direction > 0:
+            cash -= notional + fee
+        else:
+            cash += notional - fee
+        position = direction * units
+        return cash, position, (timestamp, fill, fee), fees_paid + fee
+    
+    def _close(self, price, timestamp, cash, position, entry, fees_paid, trades):
+        direction = 1 if position > 0 else -1
+        fill = price * (1 - direction * self.slippage)
+        notional = abs(position) * fill
+        fee = notional * self.fee
+        
+        entry_time, entry_price, entry_fee = entry
+        cost = abs(position) * entry_price
+        pnl = direction * (notional - cost) - fee - entry_fee
+        trades.append(Trade(
+            side="long" if direction > 0 else "short",
+            entry_time=entry_time,
+            entry_price=round(entry_price, 8),
+            exit_time=timestamp,
+            exit_price=round(fill, 8),
+            return_pct=round(pnl / (cost + entry_fee) * 100, 3),
+            fees=round(fee + entry_fee, 2)
+        ))
+        
+        cash += direction * notional - fee
+        return cash, 0.0, None, fees_paid + fee
+    
+    def _metrics(self, series, final_equity, trades, bar_returns, max_drawdown,
+                 fees_paid, exposed_bars, signal_hits, signal_count) -> Dict:
+        n = len(series)
+        wins = sum(1 for t in trades if t.return_pct > 0)
+        
+        sharpe = None
+        if len(bar_returns) > 1 and series.interval:
+            mean = sum(bar_returns) / len(bar_returns)
+            variance = sum((r - mean) ** 2 for r in bar_returns) / len(bar_returns)
+            if variance > 0:
+                bars_per_year = 365 * 24 * 60 / series.interval
+                sharpe = round(mean / math.sqrt(variance) * math.sqrt(bars_per_year), 3)
+        
+        # Buy at the first open a signal could have been filled at
+        buy_and_hold = None
+        if n > self.warmup and series.open[self.warmup]:
+            buy_and_hold = round((series.close[-1] / series.open[self.warmup] - 1) * 100, 2)
+        
+        return {
+            "candles": n,
+            "initial_capital": self.initial_capital,
+            "final_equity": round(final_equity, 2),
+            "total_return_pct": round((final_equity / self.initial_capital - 1) * 100, 2),
+            "buy_and_hold_pct": buy_and_hold,
+            "max_drawdown_pct": round(max_drawdown * 100, 2),
+            "sharpe_ratio": sharpe,
+            "trades": len(trades),
+            "win_rate": round(wins / len(trades) * 100, 1) if trades else None,
+            "avg_trade_pct": round(sum(t.return_pct for t in trades) / len(trades), 3) if trades else None,
+            "signal_hit_rate": round(signal_hits / signal_count * 100, 1) if signal_count else None,
+            "signals_scored": signal_count,
+            "fees_paid": round(fees_paid, 2),
+            "exposure_pct": round(exposed_bars / n * 100, 1) if n else 0.0
+        }
+
+
+# Grid mode: the series is loaded once per worker process
+_worker_series: Optional[OHLCSeries] = None
+_worker_options: Dict = {}
+
+
+def _init_grid_worker(series: OHLCSeries, options: Dict):
+    """Process pool initializer: keep the candle history in the worker"""
+    global _worker_series, _worker_options
+    _worker_series = series
+    _worker_options = options
+
+
+def _run_grid_point(params: Dict) -> Dict:
+    """Backtest one parameter combination and return its params and metrics"""
+    options = dict(_worker_options)
+    analyzer_params = dict(options.pop("analyzer_params"))
+    analyzer_params.update(params)
+    
+    if analyzer_params["ma_fast"] >= analyzer_params["ma_slow"]:
+        return {"params": params, "error": "ma_fast must be below ma_slow"}
+    
+    backtester = Backtester(KrakenAnalyzer(**analyzer_params), **options)
+    result = backtester.run(_worker_series, include_curve=False)
+    return {"params": params, "metrics": result.metrics}
+
+
+def parse_grid(specs: Sequence[str]) -> List[Dict]:
+    """
+    Expand ["ma_fast=8,12", "momentum_threshold=1.5,2"] into every combination.
+    
+    Raises:
+        ValueError: Unknown parameter or malformed value list
+    """
+    axes = []
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        name = name.strip().replace("-", "_")
+        if name not in GRID_PARAMS:
+            raise ValueError(f"Unknown grid parameter '{name}'. Valid: {', '.join(GRID_PARAMS)}")
+        if not values:
+            raise ValueError(f"No values for grid parameter '{name}'")
+        cast = GRID_PARAMS[name]
+        axes.append([(name, cast(v)) for v in values.split(",") if v.strip()])
+    
+    return [dict(combo) for combo in itertools.product(*axes)]
+
+
+def grid_search(series: OHLCSeries, grid: List[Dict], analyzer_params: Dict, options: Dict,
+                workers: int = 1, rank_by: str = "total_return_pct") -> List[Dict]:
+    """
+    Backtest every parameter combination, in parallel across processes.
+    
+    Args:
+        series: Candle history
+        grid: Parameter dicts from parse_grid()
+        analyzer_params: Base KrakenAnalyzer arguments (grid values override them)
+        options: Backtester keyword arguments
+        workers: Worker processes (1 = in-process, 0 = one per CPU core)
+        rank_by: Metric to sort by (max_drawdown_pct ascending, others descending)
+    
+    Returns:
+        Results sorted best first; failed combinations last
+    """
+    worker_options = dict(options, analyzer_params=analyzer_params)
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    
+    if workers == 1 or len(grid) == 1:
+        _init_grid_worker(series, worker_options)
+        results = [_run_grid_point(params) for params in grid]
+    else:
+        with multiprocessing.Pool(min(workers, len(grid)), initializer=_init_grid_worker,
+                                  initargs=(series, worker_options)) as pool:
+            results = pool.map(_run_grid_point, grid)
+    
+    descending = rank_by != "max_drawdown_pct"
+    
+    def sort_key(record):
+        value = record.get("metrics", {}).get(rank_by)
+        if value is None:
+            return (1, 0)
+        return (0, -value if descending else value)
+    
+    return sorted(results, key=sort_key)
+
+
+def load_series(args) -> Optional[OHLCSeries]:
+    """Candles from the local store (--pair) or from an OHLC document on stdin"""
+    if args.pair:
+        return load_pair(args.pair, args.interval, count=args.count,
+                         base_interval=args.base_interval, path=args.store)
+    
+    try:
+        return OHLCSeries.from_document(json.load(sys.stdin))
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        print(f"ERROR: Invalid JSON input: {e}", file=sys.stderr)
+        return None
+
+
+def format_text(result: BacktestResult) -> str:
+    m = result.metrics
+    lines = [
+        f"\n{'='*60}",
+        f"BACKTEST: {result.pair} ({result.interval}m, {m['candles']:,} candles)",
+        f"{'='*60}\n",
+        f"Return: {m['total_return_pct']:+.2f}%  (buy & hold {m['buy_and_hold_pct'] if m['buy_and_hold_pct'] is not None else 'n/a'}%)",
+        f"Final equity: {m['final_equity']:,.2f}  Fees: {m['fees_paid']:,.2f}",
+        f"Max drawdown: -{m['max_drawdown_pct']:.2f}%  Sharpe: {m['sharpe_ratio'] if m['sharpe_ratio'] is not None else 'n/a'}",
+        f"Trades: {m['trades']}  Win rate: {m['win_rate'] if m['win_rate'] is not None else 'n/a'}%  "
+        f"Avg trade: {m['avg_trade_pct'] if m['avg_trade_pct'] is not None else 'n/a'}%",
+        f"Signal hit rate: {m['signal_hit_rate'] if m['signal_hit_rate'] is not None else 'n/a'}% "
+        f"({m['signals_scored']} signals)  Exposure: {m['exposure_pct']:.1f}%"
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Walk-forward backtest of apply_rules signals",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python backtest.py --pair BTC/USD --interval 60 --format text
+  python fetch_data.py --pair ETH/USD --count 720 | python backtest.py --fee-bps 16
+  python backtest.py --pair BTC/USD --grid momentum_threshold=1,1.5,2 \\
+      --grid volatility_threshold=2,2.5,3 --grid ma_fast=8,12 --grid ma_slow=21,26 --workers 0
+
+Grid parameters: momentum_threshold, volatility_threshold, ma_fast, ma_slow, rsi_period
+        """
+    )
+    parser.add_argument("--pair", help="Backtest stored candles for this pair (otherwise read JSON from stdin)")
+    parser.add_argument("--interval", type=int, default=60, help="Candle interval in minutes (default: 60)")
+    parser.add_argument("--count", type=int, help="Use only the newest COUNT stored candles")
+    parser.add_argument("--store", help="Candle store path (default: candle_store.db)")
+    parser.add_argument("--base-interval", type=int, metavar="MINUTES",
+                        help="Build --interval candles from this stored interval (default: automatic)")
+    parser.add_argument("--momentum-threshold", type=float, default=2.0, help="Momentum threshold (default: 2.0)")
+    parser.add_argument("--volatility-threshold", type=float, default=2.5, help="Volatility threshold (default: 2.5)")
+    parser.add_argument("--rsi-period", type=int, default=14, help="RSI period (default: 14)")
+    parser.add_argument("--ma-fast", type=int, default=12, help="Fast MA period (default: 12)")
+    parser.add_argument("--ma-slow", type=int, default=26, help="Slow MA period (default: 26)")
+    parser.add_argument("--rsi-smoothing", choices=["simple", "wilder"], default="simple",
+                        help="RSI averaging (default: simple)")
+    parser.add_argument("--capital", type=float, default=10000.0, help="Initial capital (default: 10000)")
+    parser.add_argument("--fee-bps", type=float, default=DEFAULT_FEE_BPS,
+                        help=f"Fee per fill in basis points (default: {DEFAULT_FEE_BPS:g})")
+    parser.add_argument("--slippage-bps", type=float, default=0.0, help="Slippage per fill in basis points (default: 0)")
+    parser.add_argument("--min-confidence", type=float, default=0.0, help="Ignore signals below this confidence")
+    parser.add_argument("--allow-short", action="store_true", help="SELL signals open short positions")
+    parser.add_argument("--hit-horizon", type=int, default=1, help="Candles used to score signal direction (default: 1)")
+    parser.add_argument("--grid", action="append", metavar="PARAM=V1,V2",
+                        help="Sweep a parameter (repeatable); prints ranked results")
+    parser.add_argument("--rank-by", choices=RANK_METRICS, default="total_return_pct",
+                        help="Grid ranking metric (default: total_return_pct)")
+    parser.add_argument("--top", type=int, default=10, help="Grid results to print (default: 10, 0 = all)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Grid worker processes (1 = in-process, 0 = one per CPU core, default: 1)")
+    parser.add_argument("--no-curve", action="store_true", help="Omit the equity curve and trade list from JSON")
+    parser.add_argument("--format", choices=["json", "text"], default="json", help="Output format")
+    args = parser.parse_args()
+    
+    if args.workers < 0:
+        print(f"ERROR: --workers must be >= 0, got {args.workers}", file=sys.stderr)
+        return 1
+    
+    series = load_series(args)
+    if series is None:
+        return 1
+    
+    analyzer_params = {
+        "momentum_threshold": args.momentum_threshold,
+        "volatility_threshold": args.volatility_threshold,
+        "rsi_period": args.rsi_period,
+        "ma_fast": args.ma_fast,
+        "ma_slow": args.ma_slow,
+        "rsi_smoothing": args.rsi_smoothing
+    }
+    options = {
+        "initial_capital": args.capital,
+        "fee_bps": args.fee_bps,
+        "slippage_bps": args.slippage_bps,
+        "min_confidence": args.min_confidence,
+        "allow_short": args.allow_short,
+        "hit_horizon": args.hit_horizon
+    }
+    
+    if args.grid:
+        try:
+            grid = parse_grid(args.grid)
+        except ValueError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            return 1
+        
+        print(f"🔍 Backtesting {len(grid)} combinations over {len(series):,} candles", file=sys.stderr)
+        ranked = grid_search(series, grid, analyzer_params, options, args.workers, args.rank_by)
+        top = ranked[:args.top] if args.top else ranked
+        
+        if args.format == "json":
+            print(json.dumps({"pair": series.pair, "interval": series.interval,
+                              "rank_by": args.rank_by, "results": top}, indent=2))
+        else:
+            for rank, record in enumerate(top, start=1):
+                params = ", ".join(f"{k}={v}" for k, v in record["params"].items())
+                if "error" in record:
+                    print(f"{rank:>3}. {params}: {record['error']}")
+                    continue
+                m = record["metrics"]
+                print(f"{rank:>3}. {params}: return {m['total_return_pct']:+.2f}%, "
+                      f"drawdown -{m['max_drawdown_pct']:.2f}%, trades {m['trades']}, "
+                      f"win rate {m['win_rate'] if m['win_rate'] is not None else 'n/a'}%")
+        return 0
+    
+    if len(series) < args.ma_slow + 21:
+        print(f"ERROR: Insufficient data. Need more than {args.ma_slow + 20} candles, got {len(series)}",
+              file=sys.stderr)
+        return 1
+    
+    result = Backtester(KrakenAnalyzer(**analyzer_params), **options).run(series, include_curve=not args.no_curve)
+    if args.no_curve:
+        result.trades = []
+    
+    if args.format == "json":
+        print(json.dumps(result.to_dict(), indent=2))
+    else:
+        print(format_text(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
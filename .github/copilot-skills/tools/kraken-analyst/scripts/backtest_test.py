@@ -0,0 +1,197 @@
+import math
+import random
+import unittest
+
+from apply_rules import KrakenAnalyzer
+from backtest import Backtester, grid_search, parse_grid
+from ohlc_series import OHLCSeries
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python backtest_test.py
+
+HOUR = 3600
+
+
+def make_series(opens, closes, interval=60):
+    """Hourly candles with the given opens and closes"""
+    return OHLCSeries("BTC/USD", interval, {
+        "timestamp": [i * HOUR for i in range(len(opens))],
+        "open": opens,
+        "high": [max(o, c) for o, c in zip(opens, closes)],
+        "low": [min(o, c) for o, c in zip(opens, closes)],
+        "close": closes,
+        "volume": [1.0] * len(opens)
+    })
+
+
+def random_walk(count, seed=0):
+    rng = random.Random(seed)
+    price = 100.0
+    opens, closes = [], []
+    for _ in range(count):
+        opens.append(price)
+        price *= math.exp(rng.gauss(0.0003, 0.012))
+        closes.append(price)
+    return make_series(opens, closes)
+
+
+class ScriptedBacktester(Backtester):
+    """Backtester replaying fixed signals ({index: "BUY" | "SELL"}) from the first candle"""
+    
+    def __init__(self, script, **options):
+        super().__init__(KrakenAnalyzer(), initial_capital=1000.0, **options)
+        self.script = script
+    
+    @property
+    def warmup(self):
+        return 1
+    
+    def signals(self, series):
+        for index in range(len(series)):
+            yield index, self.script.get(index, "HOLD"), 1.0
+
+
+class TestExecution(unittest.TestCase):
+    def test_fills_at_next_open(self):
+        series = make_series([100, 100, 100, 105, 110, 110], [100, 100, 105, 95, 110, 120])
+        result = ScriptedBacktester({1: "BUY", 4: "SELL", 5: "BUY"}, fee_bps=0).run(series)
+        
+        # BUY on candle 1 fills at open[2] = 100 (10 units), SELL on 4 at open[5] = 110;
+        # the BUY on the last candle has no next open and is dropped
+        self.assertEqual(result.trades, [{
+            "side": "long", "entry_time": 2 * HOUR, "entry_price": 100.0,
+            "exit_time": 5 * HOUR, "exit_price": 110.0, "return_pct": 10.0, "fees": 0.0
+        }])
+        self.assertEqual([equity for _, equity in result.equity_curve], [1000, 1000, 1050, 950, 1100, 1100])
+        self.assertEqual(result.metrics["final_equity"], 1100.0)
+        self.assertEqual(result.metrics["total_return_pct"], 10.0)
+    
+    def test_fees_on_both_fills(self):
+        series = make_series([100, 100, 100, 110], [100, 100, 100, 110])
+        result = ScriptedBacktester({1: "BUY", 2: "SELL"}, fee_bps=100).run(series)
+        
+        # Entry: notional 1000 / 1.01 = 990.099 (fee 9.901), 9.90099 units at 100
+        # Exit: 9.90099 * 110 = 1089.109 (fee 10.891) -> cash 1078.218
+        self.assertEqual(result.metrics["final_equity"], 1078.22)
+        self.assertEqual(result.metrics["fees_paid"], 20.79)
+        self.assertEqual(result.trades[0]["fees"], 20.79)
+        # pnl 1089.109 - 990.099 - 20.792 = 78.218 on 1000 committed
+        self.assertEqual(result.trades[0]["return_pct"], 7.822)
+    
+    def test_slippage_moves_fills_against_the_trade(self):
+        series = make_series([100, 100, 100, 110], [100, 100, 100, 110])
+        trade = ScriptedBacktester({1: "BUY", 2: "SELL"}, fee_bps=0, slippage_bps=50).run(series).trades[0]
+        self.assertEqual((trade["entry_price"], trade["exit_price"]), (100.5, 109.45))
+    
+    def test_sell_only_closes_without_shorts(self):
+        series = make_series([100] * 5, [100, 100, 90, 90, 90])
+        result = ScriptedBacktester({1: "SELL", 3: "SELL"}, fee_bps=0).run(series)
+        self.assertEqual(result.trades, [])
+        self.assertEqual(result.metrics["final_equity"], 1000.0)
+        self.assertEqual(result.metrics["exposure_pct"], 0.0)
+    
+    def test_shorts_and_reversal(self):
+        series = make_series([100, 100, 100, 95, 90, 95], [100, 100, 95, 92, 90, 99])
+        result = ScriptedBacktester({1: "SELL", 3: "BUY"}, fee_bps=0, allow_short=True).run(series)
+        
+        # Short 10 units at open[2] = 100, cover at open[4] = 90 (+100), then go long
+        # 1100 / 90 units, closed for reporting at the last close (99)
+        self.assertEqual([(t["side"], t["entry_price"], t["exit_price"], t["return_pct"]) for t in result.trades],
+                         [("short", 100.0, 90.0, 10.0), ("long", 90.0, 99.0, 10.0)])
+        self.assertEqual([equity for _, equity in result.equity_curve], [1000, 1000, 1050, 1080, 1100, 1210])
+        self.assertEqual(result.metrics["final_equity"], 1210.0)
+    
+    def test_short_round_trip_with_fees(self):
+        series = make_series([100, 100, 100, 95], [100, 100, 95, 90])
+        result = ScriptedBacktester({1: "SELL"}, fee_bps=100, allow_short=True).run(series)
+        
+        # Short: notional 990.099 (fee 9.901) -> cash 1980.198, 9.90099 units short
+        # Cover at the last close: 891.089 (fee 8.911) -> cash 1080.198
+        self.assertEqual(result.metrics["final_equity"], 1080.2)
+        self.assertEqual(result.metrics["fees_paid"], 18.81)
+        trade = result.trades[0]
+        self.assertEqual((trade["side"], trade["exit_time"], trade["fees"]), ("short", 3 * HOUR, 18.81))
+        # pnl 990.099 - 891.089 - 18.812 = 80.198 on 1000 committed
+        self.assertEqual(trade["return_pct"], 8.02)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_hand_computed_metrics(self):
+        series = make_series([100, 100, 100, 105, 110, 110], [100, 100, 105, 95, 110, 120])
+        metrics = ScriptedBacktester({1: "BUY", 4: "SELL"}, fee_bps=0).run(series).metrics
+        
+        equity = [1000, 1000, 1050, 950, 1100, 1100]
+        returns = [0.0] + [b / a - 1 for a, b in zip(equity, equity[1:])]
+        mean = sum(returns) / 6
+        std = math.sqrt(sum((r - mean) ** 2 for r in returns) / 6)
+        
+        self.assertEqual(metrics, {
+            "candles": 6,
+            "initial_capital": 1000.0,
+            "final_equity": 1100.0,
+            "total_return_pct": 10.0,
+            "buy_and_hold_pct": 20.0,          # open[warmup] = 100 to the last close 120
+            "max_drawdown_pct": 9.52,          # 1050 -> 950
+            "sharpe_ratio": round(mean / std * math.sqrt(365 * 24), 3),
+            "trades": 1,
+            "win_rate": 100.0,
+            "avg_trade_pct": 10.0,
+            "signal_hit_rate": 50.0,           # BUY then +5 (hit), SELL then +10 (miss)
+            "signals_scored": 2,
+            "fees_paid": 0.0,
+            "exposure_pct": 50.0               # held through the closes of candles 2-4
+        })
+    
+    def test_losing_trades_and_hit_horizon(self):
+        series = make_series([100, 100, 100, 90, 90, 95, 95], [100, 100, 95, 90, 92, 95, 97])
+        result = ScriptedBacktester({1: "BUY", 2: "SELL", 3: "BUY"}, fee_bps=0, hit_horizon=2).run(series)
+        
+        # Long 100 -> 90 (-10%), long 90 -> 97 at the last close (+7.778%)
+        self.assertEqual([t["return_pct"] for t in result.trades], [-10.0, 7.778])
+        self.assertEqual(result.metrics["win_rate"], 50.0)
+        self.assertEqual(result.metrics["avg_trade_pct"], -1.111)
+        # Two candles ahead: BUY 100 -> 90 miss, SELL 95 -> 92 hit, BUY 90 -> 95 hit
+        self.assertEqual((result.metrics["signal_hit_rate"], result.metrics["signals_scored"]), (66.7, 3))
+
+
+class TestWalkForward(unittest.TestCase):
+    def test_signals_match_full_analysis_of_each_prefix(self):
+        series = random_walk(200, seed=4)
+        analyzer = KrakenAnalyzer(ma_fast=5, ma_slow=20)
+        signals = list(Backtester(analyzer).signals(series))
+        
+        self.assertEqual(signals[0][0], analyzer.ma_slow + 20 - 1)
+        for index, signal, confidence in signals[::17]:
+            prefix = OHLCSeries("BTC/USD", 60, {name: getattr(series, name)[:index + 1]
+                                                for name in OHLCSeries.COLUMNS})
+            expected = analyzer.analyze(prefix)
+            self.assertEqual((signal, confidence), (expected.signal, expected.confidence), index)
+
+
+class TestGridSearch(unittest.TestCase):
+    def test_parallel_matches_serial(self):
+        series = random_walk(1500, seed=9)
+        grid = parse_grid(["momentum_threshold=0.5,1,2", "ma_fast=5,12", "ma_slow=10,26"])
+        options = {"fee_bps": 10, "allow_short": True}
+        
+        serial = grid_search(series, grid, {}, options, workers=1)
+        parallel = grid_search(series, grid, {}, options, workers=3)
+        
+        self.assertEqual(parallel, serial)
+        self.assertEqual(len(serial), 12)
+        self.assertGreater(max(r["metrics"]["trades"] for r in serial if "metrics" in r), 0)
+        # ma_fast=12, ma_slow=10 is rejected and ranked last
+        self.assertEqual([r["error"] for r in serial[-3:]], ["ma_fast must be below ma_slow"] * 3)
+        returns = [r["metrics"]["total_return_pct"] for r in serial[:-3]]
+        self.assertEqual(returns, sorted(returns, reverse=True))
+    
+    def test_parse_grid_rejects_unknown_parameters(self):
+        with self.assertRaises(ValueError):
+            parse_grid(["lookback=5"])
+        with self.assertRaises(ValueError):
+            parse_grid(["ma_fast="])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+candle_store.py - Kraken Analyst Skill: Local OHLC Candle Store
+
+Persists OHLC candles in SQLite, keyed by Kraken pair and interval, together
+with Kraken's `last` cursor so later syncs only request newer candles
+(OHLC `since` parameter). History accumulates across syncs, so stored series
+are not limited to the 720 candles a single API response returns.
+
+Usage:
+    python candle_store.py --stats
+    python candle_store.py --prune XXBTZUSD --interval 60 --keep 10000
+    
+    from candle_store import CandleStore
+    store = CandleStore()
+    series = store.load("XXBTZUSD", 60, count=2000)
+    hourly = store.load_resampled("XXBTZUSD", 60, count=500)   # built from stored 1m/15m candles
+
+Schema:
+    candles(pair, interval, timestamp, open, high, low, close, vwap, volume, count)
+    sync_state(pair, interval, last_cursor, synced_at)
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from db import connect
+from ohlc_series import OHLCSeries
+from resample import resample_series
+
+# Store location: next to the portfolio database, outside scripts/
+STORE_PATH = Path(__file__).parent.parent / 'candle_store.db'
+
+
+class CandleStore:
+    """SQLite-backed candle history with per-series sync cursors"""
+    
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else STORE_PATH
+        self.conn = connect(self.path)
+        self._create_tables()
+    
+    def _create_tables(self):
+        self.conn.executescript('''
+        CREATE TABLE IF NOT EXISTS candles (
+            pair TEXT NOT NULL,
+            interval INTEGER NOT NULL,
+            timestamp INTEGER NOT NULL,
+            open REAL NOT NULL,
+            high REAL NOT NULL,
+            low REAL NOT NULL,
+            close REAL NOT NULL,
+            vwap REAL,
+            volume REAL,
+            count INTEGER,
+            PRIMARY KEY (pair, interval, timestamp)
+        ) WITHOUT ROWID;
+        
+        CREATE TABLE IF NOT EXISTS sync_state (
+            pair TEXT NOT NULL,
+            interval INTEGER NOT NULL,
+            last_cursor INTEGER,
+            synced_at INTEGER,
+            PRIMARY KEY (pair, interval)
+        );
+        ''')
+        self.conn.commit()
+    
+    def close(self):
+        self.conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def last_timestamp(self, pair: str, interval: int) -> Optional[int]:
+        """Timestamp of the newest stored candle, or None if the series is empty"""
+        row = self.conn.execute(
+            'SELECT MAX(timestamp) FROM candles WHERE pair = ? AND interval = ?',
+            (pair, interval)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def cursor(self, pair: str, interval: int) -> Optional[int]:
+        """
+        Value to pass as `since` on the next sync.
+        
+        Uses Kraken's `last` cursor when known; otherwise falls back to the
+        newest stored candle. The newest candle may still have been forming
+        when stored, so it is re-requested and replaced.
+        """
+        row = self.conn.execute(
+            'SELECT last_cursor FROM sync_state WHERE pair = ? AND interval = ?',
+            (pair, interval)
+        ).fetchone()
+        if row and row[0] is not None:
+            return row[0]
+        
+        last = self.last_timestamp(pair, interval)
+        return last - 1 if last is not None else None
+    
+    def save(self, pair: str, interval: int, series: OHLCSeries,
+             last_cursor: Optional[int] = None) -> int:
+        """
+        Insert or replace candles and record the sync cursor in one transaction.
+        
+        Returns:
+            Number of candles written
+        """
+        rows = zip(
+            [pair] * len(series), [interval] * len(series),
+            series.timestamp, series.open, series.high, series.low,
+            series.close, series.vwap, series.volume, series.count
+        )
+        
+        with self.conn:
+            self.conn.executemany('''
+                INSERT OR REPLACE INTO candles
+                (pair, interval, timestamp, open, high, low, close, vwap, volume, count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            
+            if last_cursor is not None:
+                self.conn.execute('''
+                    INSERT OR REPLACE INTO sync_state (pair, interval, last_cursor, synced_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (pair, interval, last_cursor, int(time.time())))
+        
+        return len(series)
+    
+    def load(self, pair: str, interval: int, count: Optional[int] = None,
+             since: Optional[int] = None, until: Optional[int] = None,
+             display_pair: Optional[str] = None) -> OHLCSeries:
+        """
+        Load stored candles, oldest first.
+        
+        Args:
+            pair: Kraken pair key (e.g., "XXBTZUSD")
+            interval: Candle interval in minutes
+            count: Return only the newest `count` candles
+            since: Only candles with timestamp >= since
+            until: Only candles with timestamp <= until
+            display_pair: Pair name to put on the series (defaults to `pair`)
+        """
+        query = '''
+            SELECT timestamp, open, high, low, close, vwap, volume, count
+            FROM candles
+            WHERE pair = ? AND interval = ?
+        '''
+        params: List = [pair, interval]
+        
+        if since is not None:
+            query += ' AND timestamp >= ?'
+            params.append(since)
+        if until is not None:
+            query += ' AND timestamp <= ?'
+            params.append(until)
+        
+        if count is not None:
+            # Newest `count` rows via the primary key, then restore ascending order
+            query = f'SELECT * FROM ({query} ORDER BY timestamp DESC LIMIT ?) ORDER BY timestamp'
+            params.append(count)
+        else:
+            query += ' ORDER BY timestamp'
+        
+        series = OHLCSeries(display_pair or pair, interval, metadata={"pair_kraken": pair})
+        for row in self.conn.execute(query, params):
+            series.append(*row)
+        return series
+    
+    def intervals(self, pair: str) -> List[int]:
+        """Intervals stored for a pair, ascending"""
+        rows = self.conn.execute(
+            'SELECT DISTINCT interval FROM candles WHERE pair = ? ORDER BY interval', (pair,)
+        ).fetchall()
+        return [row[0] for row in rows]
+    
+    def load_resampled(self, pair: str, interval: int, count: Optional[int] = None,
+                       base_interval: Optional[int] = None,
+                       display_pair: Optional[str] = None) -> OHLCSeries:
+        """
+        Load candles at any interval, aggregating a finer stored series if needed.
+        
+        Without base_interval, the interval itself is used when stored,
+        otherwise the coarsest stored interval that divides it (fewest rows
+        to read). No network access is involved.
+        
+        Args:
+            pair: Kraken pair key (e.g., "XXBTZUSD")
+            interval: Target interval in minutes
+            count: Return only the newest `count` candles (the newest may be forming)
+            base_interval: Stored interval to aggregate from
+            display_pair: Pair name to put on the series (defaults to `pair`)
+        
+        Raises:
+            ValueError: No stored interval divides `interval`, or base_interval does not
+        """
+        if base_interval is None:
+            stored = self.intervals(pair)
+            divisors = [i for i in stored if interval % i == 0]
+            if stored and not divisors:
+                raise ValueError(f"No stored interval for {pair} divides {interval}m (stored: {stored})")
+            base_interval = divisors[-1] if divisors else interval
+        
+        if base_interval == interval:
+            return self.load(pair, interval, count=count, display_pair=display_pair)
+        if interval % base_interval:
+            raise ValueError(f"Interval {interval} is not a multiple of base interval {base_interval}")
+        
+        per_bucket = interval // base_interval
+        # One extra bucket absorbs a partial bucket at the start of the window
+        base_count = (count + 1) * per_bucket if count is not None else None
+        base = self.load(pair, base_interval, count=base_count, display_pair=display_pair)
+        if not len(base):
+            return OHLCSeries(display_pair or pair, interval, metadata={"pair_kraken": pair})
+        
+        series = resample_series(base, interval)
+        if count is not None:
+            series = series.tail(count)
+        return series
+    
+    def stats(self) -> List[Dict]:
+        """Per-series candle counts and time ranges"""
+        rows = self.conn.execute('''
+            SELECT c.pair, c.interval, COUNT(*), MIN(c.timestamp), MAX(c.timestamp), s.synced_at
+            FROM candles c
+            LEFT JOIN sync_state s ON s.pair = c.pair AND s.interval = c.interval
+            GROUP BY c.pair, c.interval
+            ORDER BY c.pair, c.interval
+        ''').fetchall()
+        
+        return [
+            {
+                "pair": pair,
+                "interval": interval,
+                "candles": count,
+                "first_timestamp": first,
+                "last_timestamp": last,
+                "synced_at": synced_at
+            }
+            for pair, interval, count, first, last, synced_at in rows
+        ]
+    
+    def prune(self, pair: str, interval: int, keep: int) -> int:
+        """
+        Delete all but the newest `keep` candles of a series
+        
+        Raises:
+            ValueError: keep is less than 1 (the series would be emptied)
+        """
+        if keep < 1:
+            raise ValueError(f"keep must be at least 1, got {keep}")
+        with self.conn:
+            cursor = self.conn.execute('''
+                DELETE FROM candles
+                WHERE pair = ? AND interval = ? AND timestamp < (
+                    SELECT MIN(timestamp) FROM (
+                        SELECT timestamp FROM candles
+                        WHERE pair = ? AND interval = ?
+                        ORDER BY timestamp DESC LIMIT ?
+                    )
+                )
+            ''', (pair, interval, pair, interval, keep))
+        return cursor.rowcount
+
+
+def read_pair(pair: str, interval: int, count: Optional[int] = None,
+              base_interval: Optional[int] = None, path: Optional[Path] = None) -> OHLCSeries:
+    """
+    Stored candles for a pair at any interval, without contacting Kraken.
+    
+    Args:
+        pair: Trading pair as given on the command line (e.g., "BTC/USD")
+        interval: Candle interval in minutes (resampled from a finer stored series if needed)
+        count: Newest `count` candles only
+        base_interval: Stored interval to resample from (default: picked automatically)
+        path: Store location (default: STORE_PATH)
+    
+    Raises:
+        ValueError: Nothing usable is stored (the message says how to fetch it)
+    """
+    from fetch_data import KrakenDataFetcher
+    fetcher = KrakenDataFetcher(rate_limit=0)
+    api_pair = fetcher._normalize_pair(pair)
+    
+    with CandleStore(path) as store:
+        series = store.load_resampled(api_pair, interval, count=count,
+                                      base_interval=base_interval, display_pair=pair)
+    
+    if not len(series):
+        raise ValueError(f"No stored candles for {api_pair} ({base_interval or interval}m). "
+                         f"Run: python fetch_data.py --pair {pair} --interval {base_interval or interval} --store")
+    
+    series.metadata["interval_name"] = fetcher.interval_name(interval)
+    return series
+
+
+def load_pair(pair: str, interval: int, count: Optional[int] = None,
+              base_interval: Optional[int] = None, path: Optional[Path] = None) -> Optional[OHLCSeries]:
+    """
+    read_pair() for the scripts' --pair flag.
+    
+    Returns:
+        OHLCSeries, or None (with an error printed) if nothing usable is stored
+    """
+    try:
+        return read_pair(pair, interval, count, base_interval, path)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Inspect and maintain the local OHLC candle store",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python candle_store.py --stats
+  python candle_store.py --prune XXBTZUSD --interval 60 --keep 10000
+
+Candles are added by fetch_data.py --store.
+        """
+    )
+    parser.add_argument("--path", type=str, help=f"Store location (default: {STORE_PATH})")
+    parser.add_argument("--stats", action="store_true", help="Show stored series")
+    parser.add_argument("--prune", type=str, metavar="PAIR", help="Trim a series to the newest --keep candles")
+    parser.add_argument("--interval", type=int, default=60, help="Interval for --prune (default: 60)")
+    parser.add_argument("--keep", type=int, default=10000, help="Candles to keep for --prune (default: 10000)")
+    args = parser.parse_args()
+    
+    if not (args.stats or args.prune):
+        parser.print_help()
+        return 1
+    if args.prune and args.keep < 1:
+        parser.error("--keep must be at least 1")
+    
+    with CandleStore(args.path) as store:
+        if args.prune:
+            removed = store.prune(args.prune, args.interval, args.keep)
+            print(f"✓ Removed {removed} candles from {args.prune} ({args.interval}m)")
+            return 0
+        
+        series_stats = store.stats()
+        print(f"\n🗄️  Candle Store: {store.path}")
+        print("=" * 80)
+        print(f"{'Pair':<12} {'Interval':>8} {'Candles':>10} {'First':<20} {'Last':<20}")
+        print("-" * 80)
+        for item in series_stats:
+            first = time.strftime('%Y-%m-%d %H:%M', time.gmtime(item['first_timestamp']))
+            last = time.strftime('%Y-%m-%d %H:%M', time.gmtime(item['last_timestamp']))
+            print(f"{item['pair']:<12} {item['interval']:>8} {item['candles']:>10} {first:<20} {last:<20}")
+        if not series_stats:
+            print("No candles stored yet. Use: python fetch_data.py --pair BTC/USD --store")
+    
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
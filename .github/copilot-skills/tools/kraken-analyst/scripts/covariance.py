@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+covariance.py - Kraken Analyst Skill: Covariance / Correlation Engine
+
+Builds the full covariance matrix of a returns matrix in one pass instead of
+correlating every ordered asset pair separately. Series are centered once,
+only the upper triangle is computed and the lower triangle mirrors it.
+
+Usage:
+    from covariance import sample_covariance, RollingCovariance, EWMACovariance
+    
+    cov = sample_covariance({"XBT": btc_returns, "ETH": eth_returns})
+    cov.correlation()                      # {"XBT": {"XBT": 1.0, "ETH": 0.83}, ...}
+    cov.portfolio_volatility([0.6, 0.4])   # sqrt(w' Σ w), per period
+    
+    rolling = RollingCovariance(["XBT", "ETH"], window=30)
+    for row in zip(btc_returns, eth_returns):
+        rolling.push(row)                  # O(k²) per period
+    
+    ewma = EWMACovariance(["XBT", "ETH"], decay=0.94)
+
+Variants:
+    - Sample (population) covariance, optional NumPy backend
+    - Rolling window covariance (windowed Welford co-moments)
+    - Exponentially weighted covariance (RiskMetrics-style decay)
+"""
+
+from collections import deque
+from operator import mul
+from typing import Deque, Dict, List, Optional, Sequence, Union
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Recompute rolling co-moments from the window every N pushes
+# so floating point drift cannot accumulate.
+RESYNC_INTERVAL = 4096
+
+Returns = Union[Dict[str, Sequence[float]], Sequence[Sequence[float]]]
+
+
+class CovarianceMatrix:
+    """
+    Covariance of k assets over n periods.
+    
+    Stores the scatter matrix (sum of centered cross-products); the
+    population covariance is scatter / n, matching the variance used by
+    PortfolioAnalyzer (divide by n, not n - 1).
+    """
+    
+    def __init__(self, assets: List[str], scatter: List[List[float]], periods: float):
+        self.assets = assets
+        self.scatter = scatter
+        self.periods = periods
+    
+    @property
+    def matrix(self) -> List[List[float]]:
+        """Population covariance as a list of rows"""
+        n = self.periods
+        if not n:
+            return [[0.0] * len(self.assets) for _ in self.assets]
+        return [[value / n for value in row] for row in self.scatter]
+    
+    def variances(self) -> List[float]:
+        n = self.periods
+        return [self.scatter[i][i] / n if n else 0.0 for i in range(len(self.assets))]
+    
+    def volatilities(self, periods_per_year: float = 1) -> List[float]:
+        """Per-asset standard deviation, annualized by sqrt(periods_per_year)"""
+        scale = periods_per_year ** 0.5
+        return [(v ** 0.5) * scale for v in self.variances()]
+    
+    def correlation(self) -> Dict[str, Dict[str, float]]:
+        """
+        Correlation matrix keyed by asset (4 decimals, 1.0 on the diagonal,
+        0.0 where either series has zero variance or fewer than 2 periods)
+        """
+        assets = self.assets
+        scatter = self.scatter
+        matrix = {asset: {} for asset in assets}
+        
+        for i, asset_a in enumerate(assets):
+            matrix[asset_a][asset_a] = 1.0
+            for j in range(i + 1, len(assets)):
+                asset_b = assets[j]
+                corr = 0.0
+                if self.periods >= 2:
+                    denominator = (scatter[i][i] * scatter[j][j]) ** 0.5
+                    if denominator != 0:
+                        corr = round(scatter[i][j] / denominator, 4)
+                matrix[asset_a][asset_b] = corr
+                matrix[asset_b][asset_a] = corr
+        
+        # Keep the row/column order of the input assets
+        return {a: {b: matrix[a][b] for b in assets} for a in assets}
+    
+    def correlation_rows(self) -> List[List[float]]:
+        """Correlation matrix as a list of rows (asset order)"""
+        correlation = self.correlation()
+        return [[correlation[a][b] for b in self.assets] for a in self.assets]
+    
+    def portfolio_variance(self, weights: Sequence[float]) -> float:
+        """w' Σ w (per period)"""
+        n = self.periods
+        if not n:
+            return 0.0
+        
+        total = 0.0
+        for i, w_i in enumerate(weights):
+            if w_i == 0:
+                continue
+            row = self.scatter[i]
+            # Diagonal once, off-diagonal terms twice (Σ is symmetric)
+            total += w_i * w_i * row[i]
+            total += 2 * w_i * sum(row[j] * weights[j] for j in range(i + 1, len(weights)))
+        return max(total / n, 0.0)
+    
+    def portfolio_volatility(self, weights: Sequence[float], periods_per_year: float = 1) -> float:
+        """sqrt(w' Σ w), annualized by sqrt(periods_per_year)"""
+        return (self.portfolio_variance(weights) * periods_per_year) ** 0.5
+    
+    def to_dict(self) -> Dict:
+        return {
+            "assets": self.assets,
+            "periods": self.periods,
+            "covariance": self.matrix
+        }
+
+
+def _as_rows(returns: Returns, assets: Optional[List[str]] = None):
+    if isinstance(returns, dict):
+        names = assets or list(returns.keys())
+        return names, [list(returns[name]) for name in names]
+    rows = [list(r) for r in returns]
+    return assets or [str(i) for i in range(len(rows))], rows
+
+
+def sample_covariance(returns: Returns, assets: Optional[List[str]] = None,
+                      backend: str = "auto") -> CovarianceMatrix:
+    """
+    Full-sample covariance of aligned return series.
+    
+    Args:
+        returns: {asset: [returns]} or list of per-asset return lists (same length)
+        assets: Asset names (defaults to dict keys or "0", "1", ...)
+        backend: "auto" (NumPy when importable), "numpy", or "python"
+    
+    Raises:
+        ValueError: Series lengths differ or backend is unavailable
+    """
+    names, rows = _as_rows(returns, assets)
+    if backend not in ("auto", "numpy", "python"):
+        raise ValueError(f"Unknown backend '{backend}'. Valid: auto, numpy, python")
+    if backend == "numpy" and not NUMPY_AVAILABLE:
+        raise ValueError("NumPy backend requested but numpy is not installed (pip install numpy)")
+    
+    lengths = {len(r) for r in rows}
+    if len(lengths) > 1:
+        raise ValueError(f"Return series must have equal length, got {sorted(lengths)}")
+    n = lengths.pop() if lengths else 0
+    
+    if NUMPY_AVAILABLE and backend != "python" and n:
+        data = np.asarray(rows, dtype=np.float64)
+        centered = data - data.mean(axis=1, keepdims=True)
+        return CovarianceMatrix(names, (centered @ centered.T).tolist(), n)
+    
+    # Center each series once, then fill the upper triangle and mirror it
+    centered = []
+    for r in rows:
+        mean = sum(r) / n if n else 0.0
+        centered.append([x - mean for x in r])
+    
+    k = len(rows)
+    scatter = [[0.0] * k for _ in range(k)]
+    for i in range(k):
+        a = centered[i]
+        scatter[i][i] = sum(x * x for x in a)
+        for j in range(i + 1, k):
+            value = sum(map(mul, a, centered[j]))
+            scatter[i][j] = value
+            scatter[j][i] = value
+    
+    return CovarianceMatrix(names, scatter, n)
+
+
+class RollingCovariance:
+    """
+    Covariance over the last `window` periods, updated in O(k²) per period.
+    
+    Uses windowed Welford co-moment updates (see RollingVariance in
+    streaming_indicators.py) so that adding and evicting a period never
+    re-walks the window.
+    """
+    
+    def __init__(self, assets: List[str], window: int):
+        if window < 2:
+            raise ValueError(f"Rolling window must be >= 2, got {window}")
+        self.assets = assets
+        self.window: Deque[List[float]] = deque(maxlen=window)
+        k = len(assets)
+        self.mean = [0.0] * k
+        self.comoment = [[0.0] * k for _ in range(k)]
+        self._pushes = 0
+    
+    @property
+    def ready(self) -> bool:
+        return len(self.window) == self.window.maxlen
+    
+    def push(self, values: Sequence[float]) -> "RollingCovariance":
+        """Add one period of returns (one value per asset, in asset order)"""
+        values = list(values)
+        if len(values) != len(self.assets):
+            raise ValueError(f"Expected {len(self.assets)} returns, got {len(values)}")
+        
+        if len(self.window) == self.window.maxlen:
+            self._update(self.window[0], len(self.window) - 1, sign=-1)
+        self.window.append(values)
+        self._update(values, len(self.window), sign=1)
+        
+        self._pushes += 1
+        if self._pushes % RESYNC_INTERVAL == 0:
+            self._resync()
+        return self
+    
+    def _update(self, values: List[float], count: int, sign: int):
+        k = len(values)
+        if count == 0:
+            self.mean = [0.0] * k
+            self.comoment = [[0.0] * k for _ in range(k)]
+            return
+        
+        delta = [v - m for v, m in zip(values, self.mean)]
+        self.mean = [m + sign * d / count for m, d in zip(self.mean, delta)]
+        after = [v - m for v, m in zip(values, self.mean)]
+        
+        for i in range(k):
+            row = self.comoment[i]
+            d_i = sign * delta[i]
+            for j in range(i, k):
+                row[j] += d_i * after[j]
+        for i in range(k):
+            for j in range(i):
+                self.comoment[i][j] = self.comoment[j][i]
+    
+    def _resync(self):
+        fresh = sample_covariance([list(col) for col in zip(*self.window)], self.assets, backend="python")
+        self.comoment = fresh.scatter
+        n = len(self.window)
+        self.mean = [sum(col) / n for col in zip(*self.window)]
+    
+    def covariance(self) -> CovarianceMatrix:
+        return CovarianceMatrix(self.assets, [row[:] for row in self.comoment], len(self.window))
+
+
+class EWMACovariance:
+    """
+    Exponentially weighted covariance, updated in O(k²) per period.
+    
+    Each new period gets weight (1 - decay) and older ones decay
+    geometrically (RiskMetrics uses decay=0.94 for daily returns).
+    """
+    
+    def __init__(self, assets: List[str], decay: float = 0.94, halflife: Optional[float] = None):
+        """
+        Args:
+            assets: Asset names, in the order values are pushed
+            decay: Weight retained by history each period (0 < decay < 1)
+            halflife: Periods for a weight to halve (overrides decay)
+        """
+        if halflife is not None:
+            decay = 0.5 ** (1 / halflife)
+        if not 0 < decay < 1:
+            raise ValueError(f"EWMA decay must be between 0 and 1, got {decay}")
+        self.assets = assets
+        self.decay = decay
+        k = len(assets)
+        self.mean: Optional[List[float]] = None
+        self.cov = [[0.0] * k for _ in range(k)]
+        self.count = 0
+    
+    def push(self, values: Sequence[float]) -> "EWMACovariance":
+        """Add one period of returns (one value per asset, in asset order)"""
+        values = list(values)
+        if len(values) != len(self.assets):
+            raise ValueError(f"Expected {len(self.assets)} returns, got {len(values)}")
+        self.count += 1
+        
+        if self.mean is None:
+            self.mean = values
+            return self
+        
+        alpha = 1 - self.decay
+        diff = [v - m for v, m in zip(values, self.mean)]
+        increment = [alpha * d for d in diff]
+        self.mean = [m + inc for m, inc in zip(self.mean, increment)]
+        
+        k = len(values)
+        for i in range(k):
+            row = self.cov[i]
+            for j in range(i, k):
+                row[j] = self.decay * (row[j] + diff[i] * increment[j])
+        for i in range(k):
+            for j in range(i):
+                self.cov[i][j] = self.cov[j][i]
+        return self
+    
+    def covariance(self) -> CovarianceMatrix:
+        # Stored as covariance already; express it as a scatter over `count` periods
+        return CovarianceMatrix(self.assets, [[v * self.count for v in row] for row in self.cov], self.count)
+
+
+def rolling_covariances(returns: Returns, window: int, assets: Optional[List[str]] = None):
+    """Yield (period_index, CovarianceMatrix) for every full rolling window"""
+    names, rows = _as_rows(returns, assets)
+    rolling = RollingCovariance(names, window)
+    for index, values in enumerate(zip(*rows)):
+        rolling.push(values)
+        if rolling.ready:
+            yield index, rolling.covariance()
+
+
+def ewma_covariance(returns: Returns, decay: float = 0.94, halflife: Optional[float] = None,
+                    assets: Optional[List[str]] = None) -> CovarianceMatrix:
+    """Exponentially weighted covariance at the last period"""
+    names, rows = _as_rows(returns, assets)
+    ewma = EWMACovariance(names, decay, halflife)
+    for values in zip(*rows):
+        ewma.push(values)
+    return ewma.covariance()
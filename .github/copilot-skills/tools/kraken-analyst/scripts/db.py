@@ -0,0 +1,920 @@
+#!/usr/bin/env python3
+"""
+db.py - Kraken Analyst Skill: SQLite Access Layer
+
+One place for how the scripts open SQLite databases:
+- connect(): PRAGMAs every database gets (WAL, synchronous=NORMAL, busy
+  timeout, statement cache); used for the candle store and trade exports too
+- Database: the portfolio tracker database, migrated to the current schema
+  on open, with one long-lived connection whose prepared statements are
+  reused across calls
+- get_database(): the shared Database per path (and thread), so a report
+  that calls several query functions opens one connection, closed at exit
+
+Usage:
+    from db import get_database
+    db = get_database()
+    rows = db.query('SELECT timestamp, total_value_usd FROM portfolio_snapshots')
+    with db.transaction():
+        db.execute('INSERT INTO recommendations (asset, action) VALUES (?, ?)', ('BTC', 'BUY'))
+
+Migrations:
+    Numbered steps in MIGRATIONS; the applied count is kept in PRAGMA
+    user_version. Databases created by earlier db_init.py versions
+    (user_version 0 with tables present) are upgraded in place.
+"""
+
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Portfolio tracker database: next to the scripts directory
+DB_PATH = Path(__file__).parent.parent / 'portfolio_tracker.db'
+
+# price_history interval of prices recorded for delta-encoded snapshots
+# (a literal in queries, so that the partial index on them applies)
+SNAPSHOT_PRICE_INTERVAL = 'snapshot'
+
+# Prepared statements kept per connection (sqlite3 caches them by SQL text)
+STATEMENT_CACHE = 256
+
+# Seconds to wait for another writer's lock before raising "database is locked"
+BUSY_TIMEOUT = 30.0
+
+
+def connect(path, isolation_level: Optional[str] = 'IMMEDIATE',
+            check_same_thread: bool = True) -> sqlite3.Connection:
+    """
+    Open a SQLite database with the shared settings.
+    
+    WAL lets readers run while another process writes, and
+    synchronous=NORMAL syncs once per checkpoint instead of per commit (a
+    power loss can drop the last commits, never corrupt the file).
+    Transactions start with BEGIN IMMEDIATE, so a writer waits for the lock
+    up front instead of failing when a read turns into a write.
+    """
+    conn = sqlite3.connect(str(path), timeout=BUSY_TIMEOUT, isolation_level=isolation_level,
+                           cached_statements=STATEMENT_CACHE, check_same_thread=check_same_thread)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+def to_epoch(value=None) -> int:
+    """
+    Epoch seconds for a tracker timestamp column. `value` is a datetime or
+    ISO string (naive means UTC, as datetime.utcnow() gives), a number of
+    seconds, or None for now.
+    """
+    if value is None:
+        return int(time.time())
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def from_epoch(seconds) -> datetime:
+    """Naive UTC datetime for a tracker timestamp column"""
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+
+# ---- schema ----------------------------------------------------------------
+
+def _initial_schema(conn):
+    """Tables and indexes formerly created by db_init.py"""
+    statements = [
+        # Portfolio snapshots - track holdings over time
+        '''CREATE TABLE IF NOT EXISTS portfolio_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            total_value_usd REAL NOT NULL,
+            spot_value_usd REAL,
+            earn_value_usd REAL,
+            holdings_json TEXT NOT NULL,
+            notes TEXT
+        )''',
+        # Asset holdings - detailed breakdown
+        '''CREATE TABLE IF NOT EXISTS asset_holdings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            snapshot_id INTEGER NOT NULL,
+            asset TEXT NOT NULL,
+            amount REAL NOT NULL,
+            price_usd REAL NOT NULL,
+            value_usd REAL NOT NULL,
+            allocation_pct REAL NOT NULL,
+            source TEXT,
+            FOREIGN KEY (snapshot_id) REFERENCES portfolio_snapshots(id)
+        )''',
+        # Recommendations log - track all recommendations
+        '''CREATE TABLE IF NOT EXISTS recommendations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            asset TEXT NOT NULL,
+            action TEXT NOT NULL,
+            reason TEXT,
+            current_price REAL,
+            target_price REAL,
+            target_allocation_pct REAL,
+            confidence_score REAL,
+            time_horizon TEXT,
+            notes TEXT
+        )''',
+        # Recommendation outcomes - track how recommendations performed
+        '''CREATE TABLE IF NOT EXISTS recommendation_outcomes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recommendation_id INTEGER NOT NULL,
+            execution_timestamp DATETIME,
+            execution_price REAL,
+            executed BOOLEAN DEFAULT 0,
+            actual_price_change_pct REAL,
+            notes TEXT,
+            FOREIGN KEY (recommendation_id) REFERENCES recommendations(id)
+        )''',
+        # Technical indicators history - track signals over time
+        '''CREATE TABLE IF NOT EXISTS technical_analysis (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            asset TEXT NOT NULL,
+            interval TEXT,
+            signal TEXT,
+            confidence REAL,
+            rsi REAL,
+            momentum_sigma REAL,
+            volatility_pct REAL,
+            ma_trend TEXT,
+            support_level REAL,
+            resistance_level REAL,
+            json_data TEXT
+        )''',
+        # Price snapshots - for historical reference
+        '''CREATE TABLE IF NOT EXISTS price_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            asset TEXT NOT NULL,
+            price_usd REAL NOT NULL,
+            interval TEXT DEFAULT '1440'
+        )''',
+        # Performance metrics - calculated quarterly/monthly
+        '''CREATE TABLE IF NOT EXISTS performance_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            period_start DATETIME NOT NULL,
+            period_end DATETIME NOT NULL,
+            total_return_pct REAL,
+            btc_return_pct REAL,
+            sol_return_pct REAL,
+            dot_return_pct REAL,
+            eth_return_pct REAL,
+            recommendation_accuracy REAL,
+            notes TEXT
+        )''',
+        # Analysis sessions - log each analysis run
+        '''CREATE TABLE IF NOT EXISTS analysis_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            portfolio_value_usd REAL,
+            market_condition TEXT,
+            overall_signal TEXT,
+            analysis_json TEXT,
+            notes TEXT
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_portfolio_timestamp ON portfolio_snapshots(timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_recommendations_asset ON recommendations(asset)',
+        'CREATE INDEX IF NOT EXISTS idx_recommendations_timestamp ON recommendations(timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_technical_asset_time ON technical_analysis(asset, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_price_asset_time ON price_history(asset, timestamp)',
+    ]
+    for statement in statements:
+        conn.execute(statement)
+
+
+def _snapshot_accounts(conn):
+    """Account label per snapshot; index holdings by snapshot"""
+    if 'account' not in table_columns(conn, 'portfolio_snapshots'):
+        conn.execute('ALTER TABLE portfolio_snapshots ADD COLUMN account TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_portfolio_account_time ON portfolio_snapshots(account, timestamp)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_holdings_snapshot ON asset_holdings(snapshot_id)')
+
+
+# Adds (sign=1) or removes (sign=-1) what the recommendations in `ids` contribute
+# to recommendation_daily: one row per recommendation joined with its outcomes,
+# the same rows analyze_performance.py used to aggregate from the LEFT JOIN.
+# `day` is the SQL for the day of recommendation r.
+_RECOMMENDATION_CONTRIBUTION = '''
+    INSERT INTO recommendation_daily
+        (day, asset, action, recommendations, executed, met_target, total_confidence)
+    SELECT COALESCE({day}, ''), r.asset, r.action,
+           {sign} * COUNT(*),
+           {sign} * COUNT(CASE WHEN o.executed THEN 1 END),
+           {sign} * COUNT(CASE WHEN o.executed AND (
+               (r.action = 'SELL' AND o.execution_price >= r.target_price) OR
+               (r.action = 'BUY' AND o.execution_price <= r.target_price)) THEN 1 END),
+           {sign} * COUNT(*) * COALESCE(r.confidence_score, 0)
+    FROM recommendations r
+    LEFT JOIN recommendation_outcomes o ON o.recommendation_id = r.id
+    WHERE r.id IN ({ids})
+    GROUP BY r.id
+    ON CONFLICT (day, asset, action) DO UPDATE SET
+        recommendations = recommendations + excluded.recommendations,
+        executed = executed + excluded.executed,
+        met_target = met_target + excluded.met_target,
+        total_confidence = total_confidence + excluded.total_confidence;
+'''
+
+# recommendation_daily changes carried into the all-time recommendation_rollup
+_RECOMMENDATION_TOTALS = '''
+    INSERT INTO recommendation_rollup
+        (asset, action, recommendations, executed, met_target, total_confidence)
+    VALUES (NEW.asset, NEW.action, {recommendations}, {executed}, {met_target}, {total_confidence})
+    ON CONFLICT (asset, action) DO UPDATE SET
+        recommendations = recommendations + excluded.recommendations,
+        executed = executed + excluded.executed,
+        met_target = met_target + excluded.met_target,
+        total_confidence = total_confidence + excluded.total_confidence;
+'''
+
+# One holding (asset, 1, timestamp, value, timestamp, value) extends the
+# asset's first/last values in place
+_ASSET_HOLDING = '''
+    INSERT INTO asset_performance_rollup
+        (asset, snapshots, first_timestamp, first_value, last_timestamp, last_value)
+    {holding}
+    ON CONFLICT (asset) DO UPDATE SET
+        snapshots = snapshots + 1,
+        first_timestamp = CASE WHEN excluded.first_timestamp < first_timestamp
+                               THEN excluded.first_timestamp ELSE first_timestamp END,
+        first_value = CASE WHEN excluded.first_timestamp < first_timestamp
+                           THEN excluded.first_value ELSE first_value END,
+        last_timestamp = CASE WHEN excluded.last_timestamp >= last_timestamp
+                              THEN excluded.last_timestamp ELSE last_timestamp END,
+        last_value = CASE WHEN excluded.last_timestamp >= last_timestamp
+                          THEN excluded.last_value ELSE last_value END;
+'''
+
+# Assets whose first/last holding can no longer be maintained row by row;
+# refresh_asset_rollups() recomputes them on the next read
+_ASSET_STALE = '''
+    INSERT INTO asset_performance_rollup (asset, stale) {assets}
+    ON CONFLICT (asset) DO UPDATE SET stale = 1;
+'''
+
+
+def _performance_rollups(conn):
+    """Rollup tables for analyze_performance.py, maintained by triggers"""
+    statements = [
+        # Recommendation counters per day, asset and action
+        '''CREATE TABLE IF NOT EXISTS recommendation_daily (
+            day TEXT NOT NULL,
+            asset TEXT NOT NULL,
+            action TEXT NOT NULL,
+            recommendations INTEGER NOT NULL DEFAULT 0,
+            executed INTEGER NOT NULL DEFAULT 0,
+            met_target INTEGER NOT NULL DEFAULT 0,
+            total_confidence REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, asset, action)
+        ) WITHOUT ROWID''',
+        # The same counters over all time, per asset and action
+        '''CREATE TABLE IF NOT EXISTS recommendation_rollup (
+            asset TEXT NOT NULL,
+            action TEXT NOT NULL,
+            recommendations INTEGER NOT NULL DEFAULT 0,
+            executed INTEGER NOT NULL DEFAULT 0,
+            met_target INTEGER NOT NULL DEFAULT 0,
+            total_confidence REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (asset, action)
+        ) WITHOUT ROWID''',
+        # First and last holding value per asset, ordered by snapshot time
+        '''CREATE TABLE IF NOT EXISTS asset_performance_rollup (
+            asset TEXT PRIMARY KEY,
+            snapshots INTEGER NOT NULL DEFAULT 0,
+            first_timestamp DATETIME,
+            first_value REAL,
+            last_timestamp DATETIME,
+            last_value REAL,
+            stale INTEGER NOT NULL DEFAULT 0
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_outcomes_recommendation ON recommendation_outcomes(recommendation_id)',
+        'CREATE INDEX IF NOT EXISTS idx_holdings_asset ON asset_holdings(asset)',
+    ]
+    for statement in statements + _rollup_triggers('date(r.timestamp)'):
+        conn.execute(statement)
+    _backfill_rollups(conn, 'date(r.timestamp)')
+
+
+def _rollup_triggers(day: str) -> List[str]:
+    """Triggers keeping the rollup tables current (`day`: see _RECOMMENDATION_CONTRIBUTION)"""
+    def contribution(sign, ids):
+        return _RECOMMENDATION_CONTRIBUTION.format(sign=sign, ids=ids, day=day)
+    
+    new_holding = '''
+        SELECT NEW.asset, 1, ps.timestamp, NEW.value_usd, ps.timestamp, NEW.value_usd
+        FROM portfolio_snapshots ps
+        WHERE ps.id = NEW.snapshot_id'''
+    
+    return [
+        # Totals follow the daily rows (an upsert fires INSERT or UPDATE triggers)
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_daily_insert AFTER INSERT ON recommendation_daily BEGIN
+            {_RECOMMENDATION_TOTALS.format(recommendations='NEW.recommendations', executed='NEW.executed',
+                                           met_target='NEW.met_target',
+                                           total_confidence='NEW.total_confidence')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_daily_update AFTER UPDATE ON recommendation_daily BEGIN
+            {_RECOMMENDATION_TOTALS.format(recommendations='NEW.recommendations - OLD.recommendations',
+                                           executed='NEW.executed - OLD.executed',
+                                           met_target='NEW.met_target - OLD.met_target',
+                                           total_confidence='NEW.total_confidence - OLD.total_confidence')}
+        END''',
+        
+        # A change to a recommendation or its outcomes: remove what it
+        # contributed before, add what it contributes after
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_recommendation_insert AFTER INSERT ON recommendations BEGIN
+            {contribution(1, ids='NEW.id')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_recommendation_delete BEFORE DELETE ON recommendations BEGIN
+            {contribution(-1, ids='OLD.id')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_recommendation_before_update
+            BEFORE UPDATE OF timestamp, asset, action, target_price, confidence_score ON recommendations BEGIN
+            {contribution(-1, ids='OLD.id')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_recommendation_after_update
+            AFTER UPDATE OF timestamp, asset, action, target_price, confidence_score ON recommendations BEGIN
+            {contribution(1, ids='NEW.id')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_outcome_before_insert BEFORE INSERT ON recommendation_outcomes BEGIN
+            {contribution(-1, ids='NEW.recommendation_id')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_outcome_after_insert AFTER INSERT ON recommendation_outcomes BEGIN
+            {contribution(1, ids='NEW.recommendation_id')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_outcome_before_delete BEFORE DELETE ON recommendation_outcomes BEGIN
+            {contribution(-1, ids='OLD.recommendation_id')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_outcome_after_delete AFTER DELETE ON recommendation_outcomes BEGIN
+            {contribution(1, ids='OLD.recommendation_id')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_outcome_before_update
+            BEFORE UPDATE OF recommendation_id, executed, execution_price ON recommendation_outcomes BEGIN
+            {contribution(-1, ids='OLD.recommendation_id, NEW.recommendation_id')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_outcome_after_update
+            AFTER UPDATE OF recommendation_id, executed, execution_price ON recommendation_outcomes BEGIN
+            {contribution(1, ids='OLD.recommendation_id, NEW.recommendation_id')}
+        END''',
+        
+        # New holdings extend the first/last values in place
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_holding_insert AFTER INSERT ON asset_holdings BEGIN
+            {_ASSET_HOLDING.format(holding=new_holding)}
+        END''',
+        # Anything else marks the affected assets for recomputation
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_holding_delete AFTER DELETE ON asset_holdings BEGIN
+            {_ASSET_STALE.format(assets='VALUES (OLD.asset, 1)')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_holding_update
+            AFTER UPDATE OF snapshot_id, asset, value_usd ON asset_holdings BEGIN
+            {_ASSET_STALE.format(assets='VALUES (OLD.asset, 1), (NEW.asset, 1)')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_snapshot_insert AFTER INSERT ON portfolio_snapshots BEGIN
+            {_ASSET_STALE.format(assets='SELECT asset, 1 FROM asset_holdings WHERE snapshot_id = NEW.id')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_snapshot_delete AFTER DELETE ON portfolio_snapshots BEGIN
+            {_ASSET_STALE.format(assets='SELECT asset, 1 FROM asset_holdings WHERE snapshot_id = OLD.id')}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_snapshot_update AFTER UPDATE OF id, timestamp ON portfolio_snapshots BEGIN
+            {_ASSET_STALE.format(assets='SELECT asset, 1 FROM asset_holdings WHERE snapshot_id IN (OLD.id, NEW.id)')}
+        END''',
+    ]
+
+
+def _backfill_rollups(conn, day: str):
+    """Recompute the rollup tables from the rows already logged"""
+    for table in ('recommendation_daily', 'recommendation_rollup', 'asset_performance_rollup'):
+        conn.execute(f'DELETE FROM {table}')
+    conn.execute(_RECOMMENDATION_CONTRIBUTION.format(sign=1, ids='SELECT id FROM recommendations', day=day))
+    # Holdings are computed on first read
+    conn.execute(_ASSET_STALE.format(assets='SELECT DISTINCT asset, 1 FROM asset_holdings WHERE true'))
+
+
+# Day of recommendation r once timestamps are epoch seconds
+_EPOCH_DAY = "date(r.timestamp, 'unixepoch')"
+
+_EPOCH_NOW = "(CAST(strftime('%s', 'now') AS INTEGER))"
+
+# Tables whose DATETIME DEFAULT CURRENT_TIMESTAMP column becomes epoch seconds
+_EPOCH_TABLES = {
+    'portfolio_snapshots': '''CREATE TABLE {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp INTEGER NOT NULL DEFAULT {now} CHECK (typeof(timestamp) = 'integer'),
+        total_value_usd REAL NOT NULL,
+        spot_value_usd REAL,
+        earn_value_usd REAL,
+        holdings_json TEXT NOT NULL,
+        notes TEXT,
+        account TEXT
+    )''',
+    'recommendations': '''CREATE TABLE {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp INTEGER NOT NULL DEFAULT {now} CHECK (typeof(timestamp) = 'integer'),
+        asset TEXT NOT NULL,
+        action TEXT NOT NULL,
+        reason TEXT,
+        current_price REAL,
+        target_price REAL,
+        target_allocation_pct REAL,
+        confidence_score REAL,
+        time_horizon TEXT,
+        notes TEXT
+    )''',
+    'technical_analysis': '''CREATE TABLE {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp INTEGER NOT NULL DEFAULT {now} CHECK (typeof(timestamp) = 'integer'),
+        asset TEXT NOT NULL,
+        interval TEXT,
+        signal TEXT,
+        confidence REAL,
+        rsi REAL,
+        momentum_sigma REAL,
+        volatility_pct REAL,
+        ma_trend TEXT,
+        support_level REAL,
+        resistance_level REAL,
+        json_data TEXT
+    )''',
+    'price_history': '''CREATE TABLE {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp INTEGER NOT NULL DEFAULT {now} CHECK (typeof(timestamp) = 'integer'),
+        asset TEXT NOT NULL,
+        price_usd REAL NOT NULL,
+        interval TEXT DEFAULT '1440'
+    )''',
+    'analysis_sessions': '''CREATE TABLE {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp INTEGER NOT NULL DEFAULT {now} CHECK (typeof(timestamp) = 'integer'),
+        portfolio_value_usd REAL,
+        market_condition TEXT,
+        overall_signal TEXT,
+        analysis_json TEXT,
+        notes TEXT
+    )''',
+}
+
+
+def _epoch_sql(column: str) -> str:
+    """SQL converting a DATETIME text (UTC) column to epoch seconds; numbers are kept"""
+    return (f"CASE WHEN typeof({column}) IN ('integer', 'real') THEN CAST({column} AS INTEGER) "
+            f"ELSE CAST(strftime('%s', {column}) AS INTEGER) END")
+
+
+def _rebuild_table(conn, table: str, create: str, expressions: Dict[str, str]):
+    """
+    Recreate `table` from `create` and copy its rows, with `expressions`
+    replacing columns (SQLite cannot change a column's type or default).
+    Indexes and triggers on the table are dropped with it.
+    """
+    columns = table_columns(conn, table)
+    conn.execute(create.format(name=f'new_{table}', now=_EPOCH_NOW))
+    conn.execute(f'''
+        INSERT INTO new_{table} ({', '.join(columns)})
+        SELECT {', '.join(expressions.get(column, column) for column in columns)} FROM {table}
+    ''')
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE new_{table} RENAME TO {table}')
+
+
+def _epoch_timestamps(conn):
+    """
+    Timestamps as epoch seconds (UTC): time windows compare the bare column,
+    so they are index range scans. Covering indexes for the report queries.
+    """
+    # Renaming a table fails while triggers on other tables name a missing one
+    triggers = conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'rollup%'")
+    for name, in triggers.fetchall():
+        conn.execute(f'DROP TRIGGER {name}')
+    
+    for table, create in _EPOCH_TABLES.items():
+        _rebuild_table(conn, table, create, {'timestamp': f"COALESCE({_epoch_sql('timestamp')}, 0)"})
+    conn.execute(f"UPDATE recommendation_outcomes SET execution_timestamp = {_epoch_sql('execution_timestamp')}")
+    conn.execute(f'''
+        UPDATE performance_metrics
+        SET period_start = {_epoch_sql('period_start')}, period_end = {_epoch_sql('period_end')}
+    ''')
+    
+    statements = [
+        # Time windows and latest-first listings, answered from the index alone.
+        # No asset-first index on recommendations: the planner would pick it
+        # for GROUP BY asset and scan the whole log instead of the window.
+        '''CREATE INDEX idx_portfolio_time
+           ON portfolio_snapshots(timestamp, total_value_usd, spot_value_usd, earn_value_usd)''',
+        'CREATE INDEX idx_portfolio_account_time ON portfolio_snapshots(account, timestamp)',
+        '''CREATE INDEX idx_recommendations_time
+           ON recommendations(timestamp, asset, action, current_price, target_price, confidence_score)''',
+        # Outcomes joined to recommendations (reports and rollup triggers)
+        'DROP INDEX IF EXISTS idx_outcomes_recommendation',
+        '''CREATE INDEX idx_outcomes_recommendation
+           ON recommendation_outcomes(recommendation_id, executed, execution_price)''',
+        'CREATE INDEX idx_technical_asset_time ON technical_analysis(asset, timestamp)',
+        'CREATE INDEX idx_price_asset_time ON price_history(asset, timestamp)',
+    ]
+    for statement in statements + _rollup_triggers(_EPOCH_DAY):
+        conn.execute(statement)
+    _backfill_rollups(conn, _EPOCH_DAY)
+
+
+def _price_time_index(conn):
+    """price_history in time order, for month-partitioned exports"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_price_time ON price_history(timestamp)')
+
+
+def _snapshot_deltas(conn):
+    """
+    Delta-encoded snapshot holdings. A snapshot with a keyframe_id stores no
+    asset_holdings rows: its holdings are the holding_deltas of its chain up
+    to its id, starting from the keyframe (which lists every holding), with
+    prices resolved from price_history. See track_portfolio.SnapshotWriter.
+    """
+    chain = 'SELECT DISTINCT asset, 1 FROM holding_deltas WHERE keyframe_id = OLD.keyframe_id'
+    chains = 'SELECT DISTINCT asset, 1 FROM holding_deltas WHERE keyframe_id IN (OLD.keyframe_id, NEW.keyframe_id)'
+    statements = [
+        'ALTER TABLE portfolio_snapshots ADD COLUMN keyframe_id INTEGER',
+        '''CREATE INDEX idx_portfolio_keyframe ON portfolio_snapshots(keyframe_id)
+            WHERE keyframe_id IS NOT NULL''',
+        # One row per holding that changed (amount or details) from the
+        # previous snapshot in the chain; amount NULL once no longer held.
+        # `slot` tells apart several holdings of one asset (earn strategies).
+        '''CREATE TABLE holding_deltas (
+            keyframe_id INTEGER NOT NULL,
+            snapshot_id INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            asset TEXT NOT NULL,
+            slot INTEGER NOT NULL DEFAULT 0,
+            amount REAL,
+            details TEXT,
+            PRIMARY KEY (keyframe_id, snapshot_id, source, asset, slot)
+        ) WITHOUT ROWID''',
+        'CREATE INDEX idx_deltas_asset ON holding_deltas(asset)',
+        # SnapshotWriter extends the asset rollups itself; changes to stored
+        # chains mark their assets for recomputation
+        f'''CREATE TRIGGER rollup_delta_delete AFTER DELETE ON holding_deltas BEGIN
+            {_ASSET_STALE.format(assets='VALUES (OLD.asset, 1)')}
+        END''',
+        f'''CREATE TRIGGER rollup_delta_update AFTER UPDATE ON holding_deltas BEGIN
+            {_ASSET_STALE.format(assets='VALUES (OLD.asset, 1), (NEW.asset, 1)')}
+        END''',
+        f'''CREATE TRIGGER rollup_chain_snapshot_delete AFTER DELETE ON portfolio_snapshots
+            WHEN OLD.keyframe_id IS NOT NULL BEGIN
+            {_ASSET_STALE.format(assets=chain)}
+        END''',
+        f'''CREATE TRIGGER rollup_chain_snapshot_update
+            AFTER UPDATE OF id, timestamp, keyframe_id ON portfolio_snapshots
+            WHEN OLD.keyframe_id IS NOT NULL OR NEW.keyframe_id IS NOT NULL BEGIN
+            {_ASSET_STALE.format(assets=chains)}
+        END''',
+    ]
+    for statement in statements:
+        conn.execute(statement)
+
+
+def _price_retention(conn):
+    """
+    Compacted price history and retention progress; see retention.py.
+    Snapshot prices get their own index, as delta-encoded snapshots only
+    resolve prices among them and other prices may be compacted away.
+    """
+    statements = [
+        # OHLC bar of one asset over [bucket, bucket + resolution); the first
+        # and last sample times let bars written in several batches merge
+        '''CREATE TABLE price_buckets (
+            asset TEXT NOT NULL,
+            resolution INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            open REAL NOT NULL,
+            high REAL NOT NULL,
+            low REAL NOT NULL,
+            close REAL NOT NULL,
+            samples INTEGER NOT NULL,
+            first_timestamp INTEGER NOT NULL,
+            last_timestamp INTEGER NOT NULL,
+            PRIMARY KEY (asset, resolution, bucket)
+        ) WITHOUT ROWID''',
+        'CREATE INDEX idx_buckets_time ON price_buckets(resolution, bucket)',
+        # Per retention stage: rows before this time have been compacted
+        '''CREATE TABLE retention_progress (
+            stage TEXT PRIMARY KEY,
+            compacted_until INTEGER NOT NULL
+        )''',
+        'CREATE INDEX idx_technical_time ON technical_analysis(timestamp)',
+        ('CREATE INDEX idx_price_snapshot ON price_history(asset, timestamp) '
+         f"WHERE interval = '{SNAPSHOT_PRICE_INTERVAL}'"),
+    ]
+    for statement in statements:
+        conn.execute(statement)
+
+
+# (description, step); step N brings user_version from N-1 to N.
+# Steps must tolerate objects that already exist (pre-migration databases).
+MIGRATIONS: List[Tuple[str, Callable[[sqlite3.Connection], None]]] = [
+    ("initial schema", _initial_schema),
+    ("snapshot accounts", _snapshot_accounts),
+    ("performance rollups", _performance_rollups),
+    ("epoch timestamps", _epoch_timestamps),
+    ("price history time index", _price_time_index),
+    ("snapshot deltas", _snapshot_deltas),
+    ("price retention", _price_retention),
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+TABLES = (
+    'portfolio_snapshots',
+    'asset_holdings',
+    'holding_deltas',
+    'recommendations',
+    'recommendation_outcomes',
+    'technical_analysis',
+    'price_history',
+    'price_buckets',
+    'performance_metrics',
+    'analysis_sessions'
+)
+
+
+def table_columns(conn, table: str) -> List[str]:
+    """Column names of a table (empty if it does not exist)"""
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def schema_version(conn) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, verbose: bool = False) -> int:
+    """
+    Apply pending migrations, each in its own transaction.
+    
+    Returns:
+        Number of migrations applied
+    
+    Raises:
+        RuntimeError: The database was written by a newer schema version
+    """
+    version = schema_version(conn)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {version} is newer than supported ({SCHEMA_VERSION})")
+    
+    applied = 0
+    for number, (description, step) in enumerate(MIGRATIONS[version:], version + 1):
+        with conn:
+            # sqlite3 does not open transactions for DDL by itself
+            conn.execute('BEGIN IMMEDIATE')
+            if schema_version(conn) >= number:
+                continue  # Applied by another process meanwhile
+            step(conn)
+            conn.execute(f'PRAGMA user_version = {number}')
+        applied += 1
+        if verbose:
+            print(f"✓ Migration {number}: {description}")
+    return applied
+
+
+def refresh_asset_rollups(conn) -> int:
+    """
+    Recompute the asset_performance_rollup rows marked stale (holdings or
+    snapshots deleted or changed since they were maintained). Call inside a
+    transaction.
+    
+    Returns:
+        Number of assets recomputed
+    """
+    stale = [row[0] for row in conn.execute('SELECT asset FROM asset_performance_rollup WHERE stale')]
+    for asset in stale:
+        history = '''
+            SELECT ps.timestamp, ah.value_usd
+            FROM asset_holdings ah
+            JOIN portfolio_snapshots ps ON ah.snapshot_id = ps.id
+            WHERE ah.asset = ?
+        '''
+        first = conn.execute(history + ' ORDER BY ps.timestamp, ah.id LIMIT 1', (asset,)).fetchone()
+        last = conn.execute(history + ' ORDER BY ps.timestamp DESC, ah.id DESC LIMIT 1', (asset,)).fetchone()
+        snapshots = conn.execute('''
+            SELECT COUNT(*) FROM asset_holdings ah
+            JOIN portfolio_snapshots ps ON ah.snapshot_id = ps.id
+            WHERE ah.asset = ?
+        ''', (asset,)).fetchone()[0]
+        
+        chained, chain_first, chain_last = _chain_asset_history(conn, asset)
+        if chained:
+            snapshots += chained
+            if first is None or chain_first[0] < first[0]:
+                first = chain_first
+            if last is None or chain_last[0] >= last[0]:
+                last = chain_last
+        
+        if first is None:
+            conn.execute('DELETE FROM asset_performance_rollup WHERE asset = ?', (asset,))
+            continue
+        conn.execute('''
+            UPDATE asset_performance_rollup
+            SET snapshots = ?, first_timestamp = ?, first_value = ?,
+                last_timestamp = ?, last_value = ?, stale = 0
+            WHERE asset = ?
+        ''', (snapshots, *first, *last, asset))
+    return len(stale)
+
+
+def extend_asset_rollups(conn, holdings: Iterable[Sequence]):
+    """
+    Add holdings stored outside asset_holdings (delta-encoded snapshots) to
+    asset_performance_rollup, as the asset_holdings insert trigger does.
+    
+    Args:
+        holdings: (asset, timestamp, value_usd) in snapshot order
+    """
+    conn.executemany(_ASSET_HOLDING.format(holding='VALUES (?, 1, ?, ?, ?, ?)'),
+                     ((asset, timestamp, value, timestamp, value) for asset, timestamp, value in holdings))
+
+
+# ---- snapshot deltas -------------------------------------------------------
+
+def price_at(conn, asset: str, timestamp: int) -> Optional[float]:
+    """Latest snapshot price of an asset at or before `timestamp`, or None"""
+    row = conn.execute(f'''
+        SELECT price_usd FROM price_history
+        WHERE asset = ? AND timestamp <= ? AND interval = '{SNAPSHOT_PRICE_INTERVAL}'
+        ORDER BY timestamp DESC, id DESC
+        LIMIT 1
+    ''', (asset, timestamp)).fetchone()
+    return row[0] if row else None
+
+
+def chain_state(conn, keyframe_id: int, snapshot_id: Optional[int] = None) -> Dict[tuple, tuple]:
+    """
+    Holdings of a delta chain: its keyframe with the deltas up to
+    snapshot_id applied (default: all of them).
+    
+    Returns:
+        {(source, asset, slot): (amount, details_json)}
+    """
+    state: Dict[tuple, tuple] = {}
+    for source, asset, slot, amount, details in conn.execute('''
+        SELECT source, asset, slot, amount, details FROM holding_deltas
+        WHERE keyframe_id = ? AND snapshot_id <= ?
+        ORDER BY snapshot_id
+    ''', (keyframe_id, snapshot_id if snapshot_id is not None else 2 ** 63 - 1)):
+        if amount is None:
+            state.pop((source, asset, slot), None)
+        else:
+            state[(source, asset, slot)] = (amount, details)
+    return state
+
+
+def holding_value(amount: float, details: Dict, price: Optional[float]) -> float:
+    """value_usd of a delta-encoded holding (details hold what amount x price does not give)"""
+    if 'value_usd' in details:
+        return details['value_usd']
+    price = details.get('price_usd', price)
+    return amount * price if price is not None else 0.0
+
+
+def _chain_asset_history(conn, asset: str):
+    """
+    Holdings of an asset in delta-encoded snapshots, in the order
+    extend_asset_rollups() saw them.
+    
+    Returns:
+        (count, (first_timestamp, first_value), (last_timestamp, last_value));
+        (0, None, None) if there are none
+    """
+    count = 0
+    first = last = None  # ((timestamp, snapshot_id, source, slot), amount, details)
+    chains = [row[0] for row in conn.execute('SELECT DISTINCT keyframe_id FROM holding_deltas WHERE asset = ?',
+                                             (asset,))]
+    for keyframe_id in chains:
+        deltas = conn.execute('''
+            SELECT snapshot_id, source, slot, amount, details FROM holding_deltas
+            WHERE keyframe_id = ? AND asset = ?
+            ORDER BY snapshot_id
+        ''', (keyframe_id, asset)).fetchall()
+        held: Dict[tuple, tuple] = {}
+        position = 0
+        for snapshot_id, timestamp in conn.execute(
+                'SELECT id, timestamp FROM portfolio_snapshots WHERE keyframe_id = ? ORDER BY id', (keyframe_id,)):
+            while position < len(deltas) and deltas[position][0] <= snapshot_id:
+                _, source, slot, amount, details = deltas[position]
+                if amount is None:
+                    held.pop((source, slot), None)
+                else:
+                    held[(source, slot)] = (amount, details)
+                position += 1
+            for key in sorted(held):
+                order = (timestamp, snapshot_id, *key)
+                count += 1
+                if first is None or order < first[0]:
+                    first = (order, *held[key])
+                if last is None or order >= last[0]:
+                    last = (order, *held[key])
+    
+    if not count:
+        return 0, None, None
+    
+    def value(entry):
+        (timestamp, *_), amount, details = entry
+        details = json.loads(details) if details else {}
+        return timestamp, holding_value(amount, details, price_at(conn, asset, timestamp))
+    
+    return count, value(first), value(last)
+
+
+# ---- access ----------------------------------------------------------------
+
+class Database:
+    """The portfolio tracker database over one long-lived connection"""
+    
+    def __init__(self, path=None, migrate_schema: bool = True):
+        """
+        Args:
+            path: Database file (default: DB_PATH)
+            migrate_schema: Bring the schema up to date on open
+        """
+        self.path = Path(path) if path else DB_PATH
+        # Used by one thread at a time; close_all() may close it from another at exit
+        self.conn = connect(self.path, check_same_thread=False)
+        self.closed = False
+        if migrate_schema:
+            migrate(self.conn)
+    
+    def execute(self, sql: str, params: Sequence = ()) -> sqlite3.Cursor:
+        return self.conn.execute(sql, params)
+    
+    def executemany(self, sql: str, rows: Iterable[Sequence]) -> sqlite3.Cursor:
+        return self.conn.executemany(sql, rows)
+    
+    def query(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        """All result rows"""
+        return self.conn.execute(sql, params).fetchall()
+    
+    def query_one(self, sql: str, params: Sequence = ()) -> Optional[tuple]:
+        """First result row, or None"""
+        return self.conn.execute(sql, params).fetchone()
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Commit the enclosed writes together, or roll all of them back. The
+        transaction (and with IMMEDIATE, the write lock) starts on entry, so
+        reads inside it see what the writes will be applied to.
+        """
+        with self.conn:
+            if not self.conn.in_transaction and self.conn.isolation_level is not None:
+                # sqlite3 would only begin before the first write
+                self.conn.execute(f'BEGIN {self.conn.isolation_level}')
+            yield self
+    
+    def close(self):
+        self.conn.close()
+        self.closed = True
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+_local = threading.local()
+_opened: List[Database] = []
+_opened_lock = threading.Lock()
+
+
+def get_database(path=None) -> Database:
+    """
+    Shared Database for `path` in the calling thread (sqlite3 connections
+    are bound to the thread that opened them). Connections are closed when
+    the process exits.
+    """
+    key = str(Path(path).resolve() if path else DB_PATH.resolve())
+    databases: Dict[str, Database] = _local.__dict__.setdefault('databases', {})
+    database = databases.get(key)
+    if database is None or database.closed:
+        database = databases[key] = Database(key)
+        with _opened_lock:
+            _opened.append(database)
+    return database
+
+
+@atexit.register
+def close_all():
+    """Close every shared connection (runs at exit; tests call it directly)"""
+    with _opened_lock:
+        for database in _opened:
+            database.close()
+        _opened.clear()
+    _local.__dict__.pop('databases', None)
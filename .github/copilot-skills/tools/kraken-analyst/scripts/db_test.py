@@ -0,0 +1,290 @@
+import io
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+
+import analyze_performance
+import db
+import log_recommendations
+import retention
+import track_portfolio
+from candle_store import CandleStore
+from db import (MIGRATIONS, SCHEMA_VERSION, TABLES, Database, close_all, connect, from_epoch,
+                get_database, migrate, schema_version, table_columns, to_epoch)
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python db_test.py
+
+def legacy_schema(conn):
+    """Tables as created by db_init.py before migrations (user_version 0)"""
+    MIGRATIONS[0][1](conn)
+    conn.commit()
+
+
+class DatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "tracker.db")
+    
+    def tearDown(self):
+        close_all()
+        self.directory.cleanup()
+
+
+class TestMigrations(DatabaseTestCase):
+    def test_new_database(self):
+        with Database(self.path) as db:
+            self.assertEqual(schema_version(db.conn), SCHEMA_VERSION)
+            tables = {row[0] for row in db.query("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            self.assertTrue(set(TABLES) <= tables)
+            self.assertIn("account", table_columns(db.conn, "portfolio_snapshots"))
+    
+    def test_upgrades_pre_migration_database(self):
+        conn = sqlite3.connect(self.path)
+        legacy_schema(conn)
+        conn.execute("INSERT INTO recommendations (asset, action) VALUES ('BTC', 'BUY')")
+        conn.commit()
+        conn.close()
+        
+        with Database(self.path) as db:
+            self.assertEqual(schema_version(db.conn), SCHEMA_VERSION)
+            self.assertEqual(db.query("SELECT asset, action FROM recommendations"), [("BTC", "BUY")])
+            self.assertIn("account", table_columns(db.conn, "portfolio_snapshots"))
+    
+    def test_idempotent(self):
+        conn = connect(self.path)
+        self.assertEqual(migrate(conn), SCHEMA_VERSION)
+        self.assertEqual(migrate(conn), 0)
+        conn.close()
+    
+    def test_rejects_newer_schema(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+        conn.close()
+        with self.assertRaises(RuntimeError):
+            Database(self.path)
+    
+    def test_failed_step_rolls_back(self):
+        def broken(conn):
+            conn.execute("CREATE TABLE half_done (id INTEGER)")
+            raise sqlite3.OperationalError("boom")
+        
+        MIGRATIONS.append(("broken", broken))
+        try:
+            conn = connect(self.path)
+            with self.assertRaises(sqlite3.OperationalError):
+                migrate(conn)
+            self.assertEqual(schema_version(conn), SCHEMA_VERSION)
+            self.assertEqual(table_columns(conn, "half_done"), [])
+            conn.close()
+        finally:
+            MIGRATIONS.pop()
+
+
+class TestConnections(DatabaseTestCase):
+    def test_pragmas(self):
+        conn = connect(self.path)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+        conn.close()
+    
+    def test_shared_per_thread(self):
+        first = get_database(self.path)
+        self.assertIs(get_database(self.path), first)
+        
+        other = []
+        thread = threading.Thread(target=lambda: other.append(get_database(self.path)))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], first)
+        
+        close_all()
+        self.assertTrue(first.closed)
+        self.assertIsNot(get_database(self.path), first)
+    
+    def test_transaction_rolls_back(self):
+        db = get_database(self.path)
+        with self.assertRaises(ZeroDivisionError):
+            with db.transaction():
+                db.execute("INSERT INTO recommendations (asset, action) VALUES ('ETH', 'SELL')")
+                1 / 0
+        self.assertEqual(db.query_one("SELECT COUNT(*) FROM recommendations"), (0,))
+    
+    def test_scripts_share_one_connection(self):
+        with mock.patch.object(db, "DB_PATH", Path(self.path)), \
+                mock.patch.object(sqlite3, "connect", wraps=sqlite3.connect) as opened:
+            rec_id = log_recommendations.log_recommendation("BTC", "BUY", 30000.0, 33000.0)
+            log_recommendations.mark_executed(rec_id, 32000.0)
+            analyze_performance.calculate_returns(90)
+            analyze_performance.per_asset_performance()
+            stats = analyze_performance.recommendation_accuracy()
+        
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual((stats["total"], stats["executed"], stats["met_target"]), (1, 1, 1))
+
+
+class TestEpochTimestamps(DatabaseTestCase):
+    def test_converts_text_timestamps(self):
+        conn = sqlite3.connect(self.path)
+        legacy_schema(conn)
+        conn.execute("INSERT INTO recommendations (timestamp, asset, action) VALUES ('2024-03-01 12:30:00', 'BTC', 'BUY')")
+        conn.execute("INSERT INTO recommendation_outcomes (recommendation_id, execution_timestamp, executed) "
+                     "VALUES (1, '2024-03-02T08:00:00.123456', 1)")
+        conn.execute("INSERT INTO portfolio_snapshots (timestamp, total_value_usd, holdings_json) "
+                     "VALUES ('2024-03-01T00:00:00', 100, '{}')")
+        conn.commit()
+        conn.close()
+        
+        with Database(self.path) as database:
+            self.assertEqual(database.query("SELECT timestamp FROM recommendations"),
+                             [(to_epoch("2024-03-01T12:30:00"),)])
+            self.assertEqual(database.query("SELECT execution_timestamp FROM recommendation_outcomes"),
+                             [(to_epoch("2024-03-02T08:00:00"),)])
+            self.assertEqual(database.query_one("SELECT day FROM recommendation_daily"), ("2024-03-01",))
+            
+            # New rows default to now, and text can no longer slip in
+            database.execute("INSERT INTO recommendations (asset, action) VALUES ('ETH', 'SELL')")
+            newest = database.query_one("SELECT timestamp FROM recommendations WHERE asset = 'ETH'")[0]
+            self.assertLessEqual(abs(newest - to_epoch()), 5)
+            with self.assertRaises(sqlite3.IntegrityError):
+                database.execute("INSERT INTO price_history (timestamp, asset, price_usd) "
+                                 "VALUES ('2024-03-01 00:00:00', 'BTC', 1)")
+    
+    def test_helpers(self):
+        self.assertEqual(to_epoch("1970-01-02T00:00:00"), 86400)
+        self.assertEqual(to_epoch("1970-01-02 00:00:00+01:00"), 82800)
+        self.assertEqual(from_epoch(86400).isoformat(), "1970-01-02T00:00:00")
+
+
+class TestQueryPlans(DatabaseTestCase):
+    """Time-window and report queries must not scan the logs they filter"""
+    
+    # Rollups: a row per asset (and action), scanned by design; a row per AUTOINCREMENT table
+    BOUNDED = {"recommendation_rollup", "asset_performance_rollup", "sqlite_sequence"}
+    
+    def populate(self, database):
+        now = to_epoch()
+        with database.transaction():
+            for days in range(60):
+                rec_id = database.execute("""
+                    INSERT INTO recommendations (timestamp, asset, action, current_price, target_price, confidence_score)
+                    VALUES (?, ?, 'BUY', 100, 95, 0.5)
+                """, (now - days * 86400, "BTC" if days % 2 else "ETH")).lastrowid
+                database.execute("""
+                    INSERT INTO recommendation_outcomes (recommendation_id, execution_timestamp, execution_price, executed)
+                    VALUES (?, ?, 94, 1)
+                """, (rec_id, now))
+                snapshot_id = database.execute("""
+                    INSERT INTO portfolio_snapshots (timestamp, total_value_usd, spot_value_usd, earn_value_usd, holdings_json)
+                    VALUES (?, 100, 100, 0, '{}')
+                """, (now - days * 86400,)).lastrowid
+                database.execute("""
+                    INSERT INTO asset_holdings (snapshot_id, asset, amount, price_usd, value_usd, allocation_pct)
+                    VALUES (?, 'BTC', 1, 100, 100, 100)
+                """, (snapshot_id,))
+            # Leaves BTC stale, so per_asset_performance() recomputes it
+            database.execute("DELETE FROM asset_holdings WHERE id = 1")
+    
+    def assertNoFullScans(self, conn, calls):
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            with redirect_stdout(io.StringIO()):
+                for call in calls:
+                    call()
+        finally:
+            conn.set_trace_callback(None)
+        
+        selects = [sql for sql in statements if sql.lstrip().upper().startswith(("SELECT", "DELETE"))]
+        self.assertTrue(selects)
+        for sql in selects:
+            for row in conn.execute("EXPLAIN QUERY PLAN " + sql):
+                scan = re.match(r"SCAN (?:TABLE )?(\w+)", row[3]) if row[3] != "SCAN CONSTANT ROW" else None
+                # Walking an index in order under LIMIT stops after a few rows
+                newest_first = " USING " in row[3] and re.search(r"\bLIMIT\b", sql)
+                if scan and scan.group(1) not in self.BOUNDED and not newest_first:
+                    self.fail(f"{row[3]} in:\n{sql}")
+    
+    def test_tracker_reports(self):
+        with mock.patch.object(db, "DB_PATH", Path(self.path)):
+            database = get_database()
+            self.populate(database)
+            self.assertNoFullScans(database.conn, [
+                lambda: log_recommendations.review_recommendations(30),
+                lambda: log_recommendations.review_recommendations(30, "BTC"),
+                lambda: log_recommendations.calculate_accuracy(30),
+                lambda: analyze_performance.calculate_returns(30),
+                analyze_performance.recommendation_accuracy,
+                lambda: analyze_performance.daily_accuracy(14),
+                analyze_performance.per_asset_performance,
+                lambda: track_portfolio.show_history(30),
+                track_portfolio.compare_to_previous,
+            ])
+    
+    def test_delta_snapshots(self):
+        with mock.patch.object(db, "DB_PATH", Path(self.path)):
+            database = get_database()
+            now = to_epoch()
+            snapshots = [(now - hours * 3600, {
+                "total_value_usd": 100.0 + hours, "spot_value_usd": 100.0 + hours, "earn_value_usd": 0,
+                "spot_portfolio": [{"asset": "BTC", "amount": 1.0 + hours // 10, "price_usd": 100.0 + hours,
+                                    "value_usd": (1.0 + hours // 10) * (100.0 + hours), "weight": 100.0}],
+                "earn_allocations": []
+            }) for hours in range(50, 0, -1)]
+            with track_portfolio.SnapshotWriter(database, delta=True, keyframe_interval=20) as writer:
+                for timestamp, portfolio in snapshots[:-1]:
+                    writer.add(portfolio, timestamp, "main")
+            database.execute("UPDATE asset_performance_rollup SET stale = 1")
+            database.conn.commit()
+            
+            def add_snapshot():
+                with track_portfolio.SnapshotWriter(database, delta=True) as writer:
+                    writer.add(snapshots[-1][1], snapshots[-1][0], "main")
+            
+            self.assertNoFullScans(database.conn, [
+                lambda: track_portfolio.load_snapshot(database, 30),
+                lambda: track_portfolio.snapshot_at(database, now - 7200, "main"),
+                analyze_performance.per_asset_performance,
+                add_snapshot,
+            ])
+    
+    def test_retention(self):
+        with mock.patch.object(db, "DB_PATH", Path(self.path)):
+            database = get_database()
+            now = to_epoch()
+            with database.transaction():
+                for minutes in range(0, 20 * 24 * 60, 10):
+                    timestamp = now - minutes * 60
+                    database.execute("INSERT INTO price_history (timestamp, asset, price_usd, interval) "
+                                     "VALUES (?, 'BTC', 100, ?)", (timestamp, "snapshot" if minutes % 60 else "1"))
+                    database.execute("INSERT INTO technical_analysis (timestamp, asset, interval) "
+                                     "VALUES (?, 'BTC', '60')", (timestamp,))
+            
+            self.assertNoFullScans(database.conn, [
+                lambda: retention.compact(raw_days=2, hourly_days=10, batch_rows=200),
+                lambda: retention.price_bars("BTC", now - 15 * 86400, now),
+                lambda: retention.price_bars("BTC", now - 86400, now),
+                lambda: db.price_at(database.conn, "BTC", now - 5 * 86400),
+            ])
+    
+    def test_candle_store(self):
+        with CandleStore(Path(self.directory.name) / "candles.db") as store:
+            store.conn.executemany("INSERT INTO candles VALUES ('XBTUSD', 60, ?, 1, 1, 1, 1, 1, 1, 1)",
+                                   [(t * 3600,) for t in range(500)])
+            self.assertNoFullScans(store.conn, [
+                lambda: store.load("XBTUSD", 60, since=3600 * 100, until=3600 * 200),
+                lambda: store.load("XBTUSD", 60, count=50),
+                lambda: store.last_timestamp("XBTUSD", 60),
+                lambda: store.prune("XBTUSD", 60, keep=400),
+            ])
+
+
+if __name__ == "__main__":
+    unittest.main()
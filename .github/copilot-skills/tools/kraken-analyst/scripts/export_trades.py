@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+export_trades.py - Export full Kraken trade history to disk
+
+Walks every TradesHistory page and writes each page to NDJSON or SQLite as
+soon as it arrives, so the full history is never held in memory. Re-running
+against the same file resumes after the newest stored trade.
+
+Usage:
+    python3 export_trades.py --output trades.ndjson
+    python3 export_trades.py --output trades.db          # SQLite (by extension)
+    python3 export_trades.py --output trades.db --full   # Ignore stored trades
+
+Outputs:
+    NDJSON: one trade per line, {"txid": ..., <Kraken trade fields>}, oldest first
+    SQLite: table trade_history (txid PRIMARY KEY, ..., raw_json)
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from db import connect
+from fetch_portfolio import PortfolioFetcher
+
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+
+class NDJSONTradeWriter:
+    """Append trades to a newline-delimited JSON file"""
+    
+    def __init__(self, path: Path, truncate: bool = False):
+        self.path = path
+        self.file = open(path, 'w' if truncate else 'a', encoding='utf-8')
+    
+    def newest_txid(self) -> Optional[str]:
+        """
+        Trade id on the last complete line (trades are appended oldest first)
+        
+        An export interrupted mid-write leaves a partial line without its
+        newline; it is truncated away so the resumed export appends cleanly.
+        Blank lines (e.g. from editing the file by hand) are skipped.
+        """
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return None
+        
+        # Read backwards from the end until the last complete non-blank line is found
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = position = f.tell()
+            tail = b''
+            while True:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                tail = f.read(step) + tail
+                # lines[-1] follows the last newline: empty, or a partial line.
+                # lines[0] may have started before `position`.
+                lines = tail.split(b'\n')
+                complete = [line for line in lines[1 if position else 0:-1] if line.strip()]
+                if complete or position == 0:
+                    break
+        
+        if lines[-1]:
+            print(f"⚠️  Dropping partial last line of {self.path}", file=sys.stderr)
+            self.file.truncate(size - len(lines[-1]))
+        if not complete:
+            return None
+        return json.loads(complete[-1]).get('txid')
+    
+    def write_page(self, trades: List[Tuple[str, Dict]]):
+        for txid, trade in trades:
+            self.file.write(json.dumps(dict(txid=txid, **trade)) + '\n')
+        self.file.flush()
+    
+    def close(self):
+        self.file.close()
+
+
+class SQLiteTradeWriter:
+    """Insert trades into a trade_history table, one transaction per page"""
+    
+    def __init__(self, path: Path):
+        self.conn = connect(path)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS trade_history (
+                txid TEXT PRIMARY KEY,
+                ordertxid TEXT,
+                pair TEXT,
+                time REAL NOT NULL,
+                type TEXT,
+                ordertype TEXT,
+                price REAL,
+                cost REAL,
+                fee REAL,
+                vol REAL,
+                margin REAL,
+                misc TEXT,
+                raw_json TEXT NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_trade_history_time ON trade_history(time)')
+        self.conn.commit()
+    
+    def newest_txid(self) -> Optional[str]:
+        row = self.conn.execute(
+            'SELECT txid FROM trade_history ORDER BY time DESC, rowid DESC LIMIT 1'
+        ).fetchone()
+        return row[0] if row else None
+    
+    def write_page(self, trades: List[Tuple[str, Dict]]):
+        with self.conn:
+            self.conn.executemany('''
+                INSERT OR IGNORE INTO trade_history
+                (txid, ordertxid, pair, time, type, ordertype, price, cost, fee, vol, margin, misc, raw_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (
+                    txid,
+                    trade.get('ordertxid'),
+                    trade.get('pair'),
+                    float(trade.get('time', 0)),
+                    trade.get('type'),
+                    trade.get('ordertype'),
+                    float(trade.get('price', 0)),
+                    float(trade.get('cost', 0)),
+                    float(trade.get('fee', 0)),
+                    float(trade.get('vol', 0)),
+                    float(trade.get('margin', 0)),
+                    trade.get('misc'),
+                    json.dumps(trade)
+                )
+                for txid, trade in trades
+            ])
+    
+    def close(self):
+        self.conn.close()
+
+
+def open_writer(path: Path, truncate: bool = False):
+    """Pick the writer from the file extension (SQLite ignores duplicate txids instead of truncating)"""
+    if path.suffix.lower() in SQLITE_SUFFIXES:
+        return SQLiteTradeWriter(path)
+    return NDJSONTradeWriter(path, truncate)
+
+
+def export_trades(fetcher: PortfolioFetcher, writer, resume: bool = True) -> int:
+    """
+    Stream the trade history into a writer.
+    
+    Args:
+        fetcher: Authenticated PortfolioFetcher
+        writer: NDJSONTradeWriter or SQLiteTradeWriter
+        resume: Start after the newest stored trade id
+    
+    Returns:
+        Number of trades written
+    """
+    start = writer.newest_txid() if resume else None
+    if start:
+        print(f"↻ Resuming after trade {start}", file=sys.stderr)
+    
+    written = 0
+    for page in fetcher.iter_trade_history(start=start):
+        writer.write_page(page)
+        written += len(page)
+        print(f"  … {written} trades written", file=sys.stderr)
+    
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Export complete Kraken trade history to NDJSON or SQLite',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 export_trades.py --output trades.ndjson
+  python3 export_trades.py --output trades.db
+  python3 export_trades.py --output trades.db --full
+
+Re-running resumes after the newest stored trade. Interrupted exports
+can be resumed the same way.
+        """
+    )
+    parser.add_argument('--output', required=True, help='Output file (.db/.sqlite = SQLite, otherwise NDJSON)')
+    parser.add_argument('--full', action='store_true', help='Fetch everything, ignoring stored trades')
+    args = parser.parse_args()
+    
+    path = Path(args.output)
+    fetcher = PortfolioFetcher()
+    writer = open_writer(path, truncate=args.full)
+    
+    try:
+        written = export_trades(fetcher, writer, resume=not args.full)
+    except RuntimeError as e:
+        print(f"ERROR: {e}. Re-run to resume.", file=sys.stderr)
+        return 1
+    finally:
+        writer.close()
+    
+    print(f"✅ Exported {written} new trades to {path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
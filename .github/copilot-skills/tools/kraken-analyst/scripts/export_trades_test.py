@@ -0,0 +1,96 @@
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from export_trades import NDJSONTradeWriter, export_trades
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python export_trades_test.py
+
+def make_trade(i, misc=""):
+    return f"T{i}", {"pair": "XXBTZUSD", "time": 1700000000.0 + i, "type": "buy", "price": "100.0",
+                     "vol": "0.1", "misc": misc}
+
+
+class FakeFetcher:
+    """iter_trade_history over a fixed history, two trades per page"""
+    
+    def __init__(self, count):
+        self.trades = [make_trade(i) for i in range(1, count + 1)]
+        self.starts = []
+    
+    def iter_trade_history(self, start=None):
+        self.starts.append(start)
+        txids = [txid for txid, _ in self.trades]
+        remaining = self.trades[txids.index(start) + 1:] if start else self.trades
+        for i in range(0, len(remaining), 2):
+            yield remaining[i:i + 2]
+
+
+class TestNDJSONResume(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "trades.ndjson"
+    
+    def write(self, trades, partial=""):
+        with open(self.path, "w", encoding="utf-8") as f:
+            for txid, trade in trades:
+                f.write(json.dumps(dict(txid=txid, **trade)) + "\n")
+            f.write(partial)
+    
+    def newest_txid(self):
+        writer = NDJSONTradeWriter(self.path)
+        try:
+            with contextlib.redirect_stderr(io.StringIO()):
+                return writer.newest_txid()
+        finally:
+            writer.close()
+    
+    def test_complete_file(self):
+        self.write([make_trade(1), make_trade(2)])
+        self.assertEqual(self.newest_txid(), "T2")
+    
+    def test_blank_lines_are_skipped(self):
+        # Blank lines longer than the 4096-byte read block, as left by hand edits
+        self.write([make_trade(1), make_trade(2)], partial="\n\n" + " " * 5000 + "\n\r\n")
+        self.assertEqual(self.newest_txid(), "T2")
+        
+        self.write([], partial="\n \n")
+        self.assertIsNone(self.newest_txid())
+    
+    def test_partial_last_line_is_truncated(self):
+        # Lines longer than the 4096-byte read block
+        trades = [make_trade(i, misc="x" * 5000) for i in (1, 2, 3)]
+        self.write(trades, partial='{"txid": "T4", "pair": "XXB')
+        
+        self.assertEqual(self.newest_txid(), "T3")
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual([json.loads(line)["txid"] for line in f], ["T1", "T2", "T3"])
+    
+    def test_only_a_partial_line(self):
+        self.write([], partial='{"txid": "T1", "pa')
+        self.assertIsNone(self.newest_txid())
+        self.assertEqual(self.path.stat().st_size, 0)
+    
+    def test_resume_after_truncated_final_line(self):
+        fetcher = FakeFetcher(5)
+        self.write(fetcher.trades[:2], partial=json.dumps(dict(txid="T3", **fetcher.trades[2][1]))[:30])
+        
+        writer = NDJSONTradeWriter(self.path)
+        with contextlib.redirect_stderr(io.StringIO()):
+            written = export_trades(fetcher, writer)
+        writer.close()
+        
+        self.assertEqual(fetcher.starts, ["T2"])
+        self.assertEqual(written, 3)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual([json.loads(line)["txid"] for line in f], ["T1", "T2", "T3", "T4", "T5"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,25 +10,37 @@ Outputs deterministic JSON to stdout for piping to next analysis stage.
 Usage:
     python fetch_data.py --pair XBTUSD --interval 60 --count 100
     python fetch_data.py --pair ETHUSD --interval 3600 --count 50
+    python fetch_data.py --pairs BTC/USD,ETH/USD,SOL/USD --interval 60 --count 100
     python fetch_data.py --list-pairs
 
 Outputs:
     JSON with structure: { pair, interval, data: [{ timestamp, open, high, low, close, volume }] }
+    or, with --columnar: { pair, interval, columns: { timestamp: [...], open: [...], ... } }
+    With --pairs: one compact JSON document per line (NDJSON), in completion order
 
 API Reference:
     - Endpoint: GET https://api.kraken.com/0/public/OHLC
     - Parameters: pair (required), interval (optional, default 1), since (optional)
-    - Returns: Up to 720 most recent OHLC entries
+    - Returns: Up to 720 most recent OHLC entries, plus a `last` cursor for `since`
+
+Local store (--store):
+    Candles are kept in SQLite (candle_store.py). Each run only downloads
+    candles newer than the stored cursor and serves --count from disk.
 """
 
 import json
 import sys
 import argparse
+import asyncio
 import time
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Dict, Optional, Tuple
 import urllib.parse
-import urllib.request
 from datetime import datetime
+from ohlc_series import OHLCSeries
+from candle_store import CandleStore
+from http_transport import HTTPStatusError, Transport, TransportError, default_transport
 
 
 class KrakenDataFetcher:
@@ -76,15 +88,17 @@ class KrakenDataFetcher:
         "MATIC/USD": "MATICUSD",
     }
     
-    def __init__(self, rate_limit: float = 0.5):
+    def __init__(self, rate_limit: float = 0.5, transport: Optional[Transport] = None):
         """
         Initialize fetcher.
         
         Args:
             rate_limit: Seconds to wait between requests (Kraken recommends 0.5+)
+            transport: HTTP transport (default: shared keep-alive transport)
         """
         self.rate_limit = rate_limit
         self.last_request_time = 0
+        self.transport = transport or default_transport()
     
     def _rate_limit_wait(self):
         """Enforce rate limiting between API calls"""
@@ -127,120 +141,376 @@ class KrakenDataFetcher:
         """Validate that interval is supported"""
         return interval in self.VALID_INTERVALS
     
-    def fetch_ohlc(self, pair: str, interval: int, count: int) -> Optional[Dict]:
+    def interval_name(self, interval: int) -> str:
+        """Short label for an interval, including resampled ones (e.g. "2h")"""
+        if interval in self.VALID_INTERVALS:
+            return self.VALID_INTERVALS[interval]
+        for minutes, unit in ((1440, "d"), (60, "h")):
+            if interval % minutes == 0:
+                return f"{interval // minutes}{unit}"
+        return f"{interval}m"
+    
+    def fetch_ohlc(self, pair: str, interval: int, count: int,
+                   store: Optional[CandleStore] = None, sync: bool = True,
+                   base_interval: Optional[int] = None) -> Optional[Dict]:
         """
         Fetch OHLC data from Kraken API.
         
         Args:
             pair: Trading pair (e.g., "BTC/USD" or "XXBTZUSD")
             interval: Candle interval in minutes
-            count: Number of candles to fetch (max 720)
+            count: Number of candles to fetch (max 720 without a store)
+            store: Serve candles from this local CandleStore (see fetch_series)
+            sync: With a store, fetch newer candles from Kraken first
+            base_interval: With a store, build `interval` from this stored interval
         
         Returns:
             Dict with { pair, interval, data: [candles] } or None on error
         """
-        # Validate interval
-        if not self.validate_interval(interval):
-            print(f"ERROR: Invalid interval {interval}. Valid: {list(self.VALID_INTERVALS.keys())}", 
-                  file=sys.stderr)
+        series = self.fetch_series(pair, interval, count, store=store, sync=sync,
+                                   base_interval=base_interval)
+        if series is None:
             return None
         
-        if not (1 <= count <= 720):
-            print(f"ERROR: Count must be 1-720, got {count}", file=sys.stderr)
+        return self._to_document(series)
+    
+    def _to_document(self, series: OHLCSeries) -> Dict:
+        """Legacy fetch_ohlc JSON shape for a fetched series"""
+        document = {
+            "pair": series.pair,
+            "pair_kraken": series.metadata["pair_kraken"],
+            "interval": series.interval,
+            "interval_name": self.interval_name(series.interval),
+            "data_points": len(series),
+            "timestamp": series.metadata["timestamp"],
+            "source": series.metadata["source"],
+            "data": series.to_candles()
+        }
+        if "resampled_from" in series.metadata:
+            document["resampled_from"] = series.metadata["resampled_from"]
+        return document
+    
+    def fetch_series(self, pair: str, interval: int, count: int,
+                     store: Optional[CandleStore] = None, sync: bool = True,
+                     base_interval: Optional[int] = None) -> Optional[OHLCSeries]:
+        """
+        Fetch OHLC data from Kraken API as a columnar OHLCSeries.
+        
+        With a store, only candles newer than the stored sync cursor are
+        downloaded and `count` is served from disk, so it is not capped at 720
+        once enough history has accumulated.
+        
+        If the sync fails, the stored candles are served anyway with a
+        warning on stderr; None is only returned when nothing is stored.
+        
+        With base_interval, only that interval is synced and `interval` is
+        aggregated from it locally (see resample.py), so any multiple of
+        the base interval is available without another request.
+        
+        Args:
+            pair: Trading pair (e.g., "BTC/USD" or "XXBTZUSD")
+            interval: Candle interval in minutes
+            count: Number of candles to fetch (max 720 without a store)
+            store: Local CandleStore to sync into and read from
+            sync: With a store, fetch newer candles from Kraken first
+            base_interval: With a store, build `interval` from this stored interval
+        
+        Returns:
+            OHLCSeries (no per-candle dicts are built) or None on error
+        """
+        if base_interval is not None:
+            if store is None:
+                print("ERROR: Resampling from a base interval requires a candle store", file=sys.stderr)
+                return None
+            if interval < 1 or interval % base_interval:
+                print(f"ERROR: Interval {interval} is not a multiple of base interval {base_interval}",
+                      file=sys.stderr)
+                return None
+        
+        if not self._validate_request(base_interval or interval, count, unlimited=store is not None):
             return None
         
         # Normalize pair format
         api_pair = self._normalize_pair(pair)
         
+        if store:
+            # A failed sync still leaves the stored history usable
+            synced = not sync or self.sync_store(pair, base_interval or interval, store) is not None
+            if not synced:
+                print(f"WARNING: Sync failed; serving stored {api_pair} candles, which may be stale",
+                      file=sys.stderr)
+            
+            if base_interval is not None:
+                series = store.load_resampled(api_pair, interval, count=count,
+                                              base_interval=base_interval, display_pair=pair)
+            else:
+                series = store.load(api_pair, interval, count=count, display_pair=pair)
+            if not len(series):
+                print(f"ERROR: No stored candles for {api_pair} ({base_interval or interval}m)",
+                      file=sys.stderr)
+                return None
+            
+            series.metadata.update({
+                "interval_name": self.interval_name(interval),
+                "timestamp": datetime.utcnow().isoformat(),
+                "source": "Local candle store (Kraken REST API v0)" if synced
+                          else "Local candle store (Kraken REST API v0, sync failed)"
+            })
+            return series
+        
+        response = self._request_ohlc(api_pair, interval)
+        if response is None:
+            return None
+        
+        return self._build_series(pair, api_pair, interval, count, response[0])
+    
+    def _validate_request(self, interval: int, count: int, unlimited: bool = False) -> bool:
+        """Check interval and count, printing an error if invalid"""
+        if not self.validate_interval(interval):
+            print(f"ERROR: Invalid interval {interval}. Valid: {list(self.VALID_INTERVALS.keys())}", 
+                  file=sys.stderr)
+            return False
+        
+        if count < 1 or (not unlimited and count > 720):
+            limit = "a positive number" if unlimited else "1-720"
+            print(f"ERROR: Count must be {limit}, got {count}", file=sys.stderr)
+            return False
+        
+        return True
+    
+    def _build_series(self, pair: str, api_pair: str, interval: int, count: int,
+                      candles_raw: List) -> OHLCSeries:
+        """Wrap the newest `count` raw Kraken rows in an OHLCSeries"""
+        # Limit to requested count (newest first)
+        candles_raw = candles_raw[-count:]
+        
+        # Kraken OHLC format: [time, open, high, low, close, vwap, volume, count]
+        return OHLCSeries.from_kraken_rows(
+            candles_raw,
+            pair=pair,
+            interval=interval,
+            metadata={
+                "pair_kraken": api_pair,
+                "interval_name": self.VALID_INTERVALS[interval],
+                "timestamp": datetime.utcnow().isoformat(),
+                "source": "Kraken REST API v0"
+            }
+        )
+    
+    def sync_store(self, pair: str, interval: int, store: CandleStore) -> Optional[int]:
+        """
+        Download candles newer than the store's cursor and persist them.
+        
+        Kraken's `last` cursor is saved for the next sync. The newest candle
+        in each response is still forming; it is stored and replaced when
+        the next sync returns its final values.
+        
+        Returns:
+            Number of candles written, or None on error
+        """
+        api_pair = self._normalize_pair(pair)
+        since = store.cursor(api_pair, interval)
+        
+        response = self._request_ohlc(api_pair, interval, since=since)
+        if response is None:
+            return None
+        candles_raw, last = response
+        
+        # Kraken only serves the most recent 720 candles, even with `since`
+        if since is not None and candles_raw and int(candles_raw[0][0]) > since + interval * 60:
+            print(f"WARNING: Store for {api_pair} ({interval}m) was too stale; "
+                  f"candles before {datetime.utcfromtimestamp(int(candles_raw[0][0])).isoformat()} are missing",
+                  file=sys.stderr)
+        
+        series = OHLCSeries.from_kraken_rows(candles_raw, pair=api_pair, interval=interval)
+        return store.save(api_pair, interval, series, last_cursor=last)
+    
+    def _request_ohlc(self, api_pair: str, interval: int, since: Optional[int] = None,
+                      rate_limit: bool = True) -> Optional[Tuple[List, Optional[int]]]:
+        """
+        Perform one OHLC request.
+        
+        Args:
+            rate_limit: Sleep to respect rate_limit first (fetch_many throttles itself)
+        
+        Returns:
+            (raw Kraken rows, `last` cursor) or None on error
+        """
         try:
             # Rate limit before request
-            self._rate_limit_wait()
+            if rate_limit:
+                self._rate_limit_wait()
             
             # Build request URL
             params = {
                 "pair": api_pair,
                 "interval": interval
             }
+            if since is not None:
+                params["since"] = since
             
             url = f"{self.BASE_URL}/OHLC?{urllib.parse.urlencode(params)}"
             
-            # Make API request (using urllib to avoid external dependencies)
-            req = urllib.request.Request(url)
-            req.add_header('User-Agent', 'Kraken-Analyst-Skill/1.0')
-            
-            with urllib.request.urlopen(req, timeout=10) as response:
-                data = json.loads(response.read().decode())
-            
-            # Check for API errors
-            if data.get('error') and len(data['error']) > 0:
-                print(f"ERROR: Kraken API error: {data['error']}", file=sys.stderr)
-                return None
-            
-            # Extract result
-            result = data.get('result', {})
-            
-            # Find the pair key (Kraken returns it with their naming)
-            pair_key = None
-            for key in result.keys():
-                if key != 'last':
-                    pair_key = key
-                    break
+            # Make API request over the shared keep-alive transport
+            data = self.transport.request("GET", url, timeout=10).json()
             
-            if not pair_key:
-                print(f"ERROR: No OHLC data found for pair {pair}", file=sys.stderr)
-                return None
-            
-            candles_raw = result[pair_key]
-            
-            # Limit to requested count (newest first)
-            candles_raw = candles_raw[-count:]
-            
-            # Format output
-            # Kraken OHLC format: [time, open, high, low, close, vwap, volume, count]
-            formatted_candles = []
-            for candle in candles_raw:
-                formatted_candles.append({
-                    "timestamp": int(candle[0]),
-                    "datetime": datetime.utcfromtimestamp(int(candle[0])).isoformat(),
-                    "open": float(candle[1]),
-                    "high": float(candle[2]),
-                    "low": float(candle[3]),
-                    "close": float(candle[4]),
-                    "vwap": float(candle[5]),
-                    "volume": float(candle[6]),
-                    "count": int(candle[7])
-                })
-            
-            return {
-                "pair": pair,
-                "pair_kraken": api_pair,
-                "interval": interval,
-                "interval_name": self.VALID_INTERVALS[interval],
-                "data_points": len(formatted_candles),
-                "timestamp": datetime.utcnow().isoformat(),
-                "source": "Kraken REST API v0",
-                "data": formatted_candles
-            }
+            return self._parse_ohlc(data, api_pair)
         
-        except urllib.error.HTTPError as e:
+        except HTTPStatusError as e:
             if e.code == 429:
                 print(f"ERROR: Rate limited by Kraken. Increase --rate-limit", file=sys.stderr)
             else:
                 print(f"ERROR: HTTP {e.code}: {e.reason}", file=sys.stderr)
             return None
-        except urllib.error.URLError as e:
+        except TransportError as e:
             print(f"ERROR: Failed to connect to Kraken API: {e.reason}", file=sys.stderr)
             return None
         except Exception as e:
             print(f"ERROR: Unexpected error: {e}", file=sys.stderr)
             return None
     
+    def _parse_ohlc(self, data: Dict, api_pair: str) -> Optional[Tuple[List, Optional[int]]]:
+        """Extract (raw rows, `last` cursor) from a decoded OHLC response"""
+        # Check for API errors
+        if data.get('error') and len(data['error']) > 0:
+            print(f"ERROR: Kraken API error: {data['error']}", file=sys.stderr)
+            return None
+        
+        # Extract result
+        result = data.get('result', {})
+        
+        # Find the pair key (Kraken returns it with their naming)
+        pair_key = None
+        for key in result.keys():
+            if key != 'last':
+                pair_key = key
+                break
+        
+        if not pair_key:
+            print(f"ERROR: No OHLC data found for pair {api_pair}", file=sys.stderr)
+            return None
+        
+        last = result.get('last')
+        return result[pair_key], int(last) if last is not None else None
+    
+    async def fetch_many(self, pairs: Iterable[str], interval: int, count: int,
+                         connections: int = 4, burst: int = 1) -> AsyncIterator[Tuple[str, Optional[OHLCSeries]]]:
+        """
+        Fetch several pairs concurrently, yielding results as they complete.
+        
+        Requests share a token bucket refilled at one token per `rate_limit`
+        seconds (Kraken public endpoints cost one token per call), so the
+        overall request rate matches the sequential fetcher while network
+        latency overlaps. Up to `connections` requests are in flight at once,
+        each on a reused keep-alive connection from the transport.
+        
+        Args:
+            pairs: Trading pairs (e.g., ["BTC/USD", "ETH/USD"])
+            interval: Candle interval in minutes
+            count: Number of candles per pair (max 720)
+            connections: Concurrent requests (keep-alive connections)
+            burst: Requests that may be sent back-to-back before throttling
+        
+        Yields:
+            (pair, OHLCSeries or None on error) in completion order
+        """
+        if not self._validate_request(interval, count):
+            for pair in pairs:
+                yield pair, None
+            return
+        
+        rate = 1 / self.rate_limit if self.rate_limit > 0 else None
+        bucket = TokenBucket(rate, burst) if rate else None
+        slots = asyncio.Semaphore(connections)
+        # Transport calls block, so they run on worker threads
+        executor = ThreadPoolExecutor(max_workers=connections)
+        
+        tasks = [
+            asyncio.ensure_future(self._fetch_limited(pair, interval, count, slots, bucket, executor))
+            for pair in pairs
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            executor.shutdown(wait=False)
+    
+    async def _fetch_limited(self, pair: str, interval: int, count: int, slots: asyncio.Semaphore,
+                             bucket: Optional["TokenBucket"],
+                             executor: ThreadPoolExecutor) -> Tuple[str, Optional[OHLCSeries]]:
+        """Fetch one pair once a connection slot and a rate-limit token are free"""
+        api_pair = self._normalize_pair(pair)
+        
+        async with slots:
+            if bucket:
+                await bucket.acquire()
+            
+            loop = asyncio.get_running_loop()
+            request = partial(self._request_ohlc, api_pair, interval, rate_limit=False)
+            response = await loop.run_in_executor(executor, request)
+        
+        if response is None:
+            return pair, None
+        
+        return pair, self._build_series(pair, api_pair, interval, count, response[0])
+    
     def list_supported_pairs(self) -> str:
         """Return formatted list of supported pairs"""
         pairs = sorted(self.COMMON_PAIRS.keys())
         return ", ".join(pairs)
 
 
+class TokenBucket:
+    """Asyncio token bucket: `rate` tokens per second, at most `capacity` banked"""
+    
+    def __init__(self, rate: float, capacity: float = 1, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable] = asyncio.sleep):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Tokens that may be banked (requests sent back-to-back)
+            clock: Monotonic time source in seconds
+            sleep: Coroutine function that waits for a number of seconds
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self, cost: float = 1):
+        """Wait until `cost` tokens are available and take them"""
+        async with self._lock:
+            while True:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                
+                await self.sleep((cost - self.tokens) / self.rate)
+
+
+async def _print_many(fetcher: KrakenDataFetcher, pairs: List[str], interval: int, count: int,
+                      columnar: bool, connections: int, burst: int) -> int:
+    """Print one NDJSON line per pair as it arrives; returns the failure count"""
+    failures = 0
+    async for pair, series in fetcher.fetch_many(pairs, interval, count, connections, burst):
+        if series is None:
+            failures += 1
+            continue
+        
+        document = series.to_columnar_dict() if columnar else fetcher._to_document(series)
+        print(json.dumps(document), flush=True)
+    return failures
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Fetch OHLC data from Kraken REST API",
@@ -249,6 +519,11 @@ def main():
 Examples:
   python fetch_data.py --pair BTC/USD --interval 60 --count 100
   python fetch_data.py --pair XXBTZUSD --interval 1440 --count 30
+  python fetch_data.py --pair BTC/USD --columnar | python apply_rules.py
+  python fetch_data.py --pair BTC/USD --store --count 2000
+  python fetch_data.py --pair BTC/USD --store --offline --count 500
+  python fetch_data.py --pair BTC/USD --store --base-interval 15 --interval 240 --count 300
+  python fetch_data.py --pairs BTC/USD,ETH/USD,SOL/USD --count 200 | python apply_rules.py --batch
   python fetch_data.py --list-pairs
   python fetch_data.py --list-intervals
         """
@@ -259,6 +534,11 @@ Examples:
         type=str,
         help="Trading pair (e.g., BTC/USD, ETH/EUR, or XXBTZUSD)"
     )
+    parser.add_argument(
+        "--pairs",
+        type=str,
+        help="Comma-separated pairs to fetch concurrently (NDJSON output, one line per pair)"
+    )
     parser.add_argument(
         "--interval",
         type=int,
@@ -269,7 +549,7 @@ Examples:
         "--count",
         type=int,
         default=100,
-        help="Number of candles to fetch (1-720, default: 100)"
+        help="Number of candles to fetch (1-720, or any amount stored with --store; default: 100)"
     )
     parser.add_argument(
         "--rate-limit",
@@ -277,6 +557,42 @@ Examples:
         default=0.5,
         help="Seconds between API requests (default: 0.5)"
     )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=4,
+        help="Keep-alive connections used with --pairs (default: 4)"
+    )
+    parser.add_argument(
+        "--burst",
+        type=int,
+        default=1,
+        help="Requests that may be sent back-to-back with --pairs before throttling (default: 1)"
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Output one array per column instead of one object per candle (faster to parse)"
+    )
+    parser.add_argument(
+        "--store",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Sync into a local candle store and serve --count from disk (default path: candle_store.db)"
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="With --store, read stored candles without contacting Kraken"
+    )
+    parser.add_argument(
+        "--base-interval",
+        type=int,
+        metavar="MINUTES",
+        help="With --store, sync only this interval and build --interval from it locally"
+    )
     parser.add_argument(
         "--list-pairs",
         action="store_true",
@@ -289,6 +605,10 @@ Examples:
     )
     
     args = parser.parse_args()
+    if args.offline and args.store is None:
+        parser.error("--offline requires --store")
+    if args.base_interval is not None and args.store is None:
+        parser.error("--base-interval requires --store")
     
     fetcher = KrakenDataFetcher(rate_limit=args.rate_limit)
     
@@ -305,13 +625,32 @@ Examples:
         print(intervals)
         return 0
     
+    if args.pairs:
+        pairs = [pair.strip() for pair in args.pairs.split(",") if pair.strip()]
+        failures = asyncio.run(_print_many(fetcher, pairs, args.interval, args.count,
+                                           args.columnar, args.connections, args.burst))
+        return 1 if failures else 0
+    
     # Require pair for normal operation
     if not args.pair:
         parser.print_help()
         return 1
     
+    store = CandleStore(args.store or None) if args.store is not None else None
+    sync = not args.offline
+    
     # Fetch data
-    result = fetcher.fetch_ohlc(args.pair, args.interval, args.count)
+    try:
+        if args.columnar:
+            series = fetcher.fetch_series(args.pair, args.interval, args.count, store=store, sync=sync,
+                                          base_interval=args.base_interval)
+            result = series.to_columnar_dict() if series is not None else None
+        else:
+            result = fetcher.fetch_ohlc(args.pair, args.interval, args.count, store=store, sync=sync,
+                                        base_interval=args.base_interval)
+    finally:
+        if store:
+            store.close()
     
     if result:
         # Output JSON to stdout for piping
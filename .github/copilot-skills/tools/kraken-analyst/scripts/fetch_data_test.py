@@ -0,0 +1,308 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from candle_store import CandleStore
+from fetch_data import KrakenDataFetcher, TokenBucket, main
+from http_transport import HTTPStatusError, Response, Transport, TransportError
+from http_transport_test import kraken_rows
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python fetch_data_test.py
+
+START = 1700000000
+HOUR = 3600
+
+
+class FakeTransport(Transport):
+    """Answers OHLC requests from a scripted list of (rows, last) or exceptions"""
+    
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.queries = []
+    
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        self.queries.append({k: v[0] for k, v in parse_qs(urlsplit(url).query).items()})
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        rows, last = response
+        body = {"error": [], "result": {"XXBTZUSD": rows, "last": last}}
+        return Response(200, "OK", body=json.dumps(body).encode())
+
+
+def rows(first, last):
+    """Hourly Kraken rows for candle indexes first..last"""
+    return kraken_rows(last - first + 1, start=START + first * HOUR)
+
+
+class StoreTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = CandleStore(os.path.join(directory.name, "candles.db"))
+        self.addCleanup(self.store.close)
+    
+    def fetch(self, responses, count, sync=True):
+        transport = FakeTransport(responses)
+        fetcher = KrakenDataFetcher(rate_limit=0, transport=transport)
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            series = fetcher.fetch_series("BTC/USD", 60, count, store=self.store, sync=sync)
+        return series, transport.queries, stderr.getvalue()
+
+
+class TestStoreSync(StoreTestCase):
+    def test_forming_candle_is_replaced(self):
+        first = rows(0, 4)
+        self.fetch([(first, START + 4 * HOUR)], 10)
+        
+        # The next sync returns the final values of candle 4 and two new candles
+        second = rows(4, 6)
+        second[0][4] = "12345.00"
+        series, queries, _ = self.fetch([(second, START + 6 * HOUR)], 10)
+        
+        self.assertEqual(queries, [{"pair": "XXBTZUSD", "interval": "60", "since": str(START + 4 * HOUR)}])
+        self.assertEqual(list(series.timestamp), [START + i * HOUR for i in range(7)])
+        self.assertEqual(series.close[4], 12345.0)
+        self.assertEqual(self.store.cursor("XXBTZUSD", 60), START + 6 * HOUR)
+    
+    def test_incremental_syncs_fill_without_gaps(self):
+        self.fetch([(rows(0, 9), START + 9 * HOUR)], 10)
+        series, _, errors = self.fetch([(rows(9, 19), START + 19 * HOUR)], 100)
+        
+        self.assertEqual(list(series.timestamp), [START + i * HOUR for i in range(20)])
+        self.assertNotIn("WARNING", errors)
+    
+    def test_stale_store_warns_about_the_gap(self):
+        self.fetch([(rows(0, 9), START + 9 * HOUR)], 10)
+        # Kraken only serves its newest 720 candles, so candles 10-14 never arrive
+        series, _, errors = self.fetch([(rows(15, 19), START + 19 * HOUR)], 100)
+        
+        self.assertEqual(len(series), 15)
+        self.assertIn("too stale", errors)
+    
+    def test_count_beyond_one_response(self):
+        self.fetch([(rows(0, 719), START + 719 * HOUR)], 10)
+        series, _, _ = self.fetch([(rows(719, 1000), START + 1000 * HOUR)], 900)
+        
+        self.assertEqual(len(series), 900)
+        self.assertEqual(series.timestamp[-1], START + 1000 * HOUR)
+
+
+class TestStoreReads(StoreTestCase):
+    def test_offline_reads_do_not_request(self):
+        self.fetch([(rows(0, 49), START + 49 * HOUR)], 10)
+        series, queries, _ = self.fetch([], 20, sync=False)
+        
+        self.assertEqual(queries, [])
+        self.assertEqual(list(series.timestamp), [START + i * HOUR for i in range(30, 50)])
+        self.assertEqual(series.metadata["source"], "Local candle store (Kraken REST API v0)")
+    
+    def test_failed_sync_serves_stored_candles(self):
+        self.fetch([(rows(0, 49), START + 49 * HOUR)], 10)
+        series, _, errors = self.fetch([TransportError("connection refused")], 20)
+        
+        self.assertEqual(len(series), 20)
+        self.assertIn("WARNING: Sync failed", errors)
+        self.assertIn("sync failed", series.metadata["source"])
+    
+    def test_failed_sync_with_empty_store(self):
+        series, _, errors = self.fetch([TransportError("connection refused")], 20)
+        self.assertIsNone(series)
+        self.assertIn("No stored candles", errors)
+    
+    def test_offline_requires_store(self):
+        for argv in (["--pair", "BTC/USD", "--offline"], ["--pair", "BTC/USD", "--base-interval", "15"]):
+            with self.subTest(argv=argv):
+                stderr = io.StringIO()
+                with mock.patch.object(sys, "argv", ["fetch_data.py"] + argv), \
+                        contextlib.redirect_stderr(stderr), self.assertRaises(SystemExit) as raised:
+                    main()
+                self.assertEqual(raised.exception.code, 2)
+                self.assertIn("requires --store", stderr.getvalue())
+    
+    
+    def test_prune_keeps_the_newest_candles(self):
+        self.fetch([(rows(0, 49), START + 49 * HOUR)], 10)
+        self.assertEqual(self.store.prune("XXBTZUSD", 60, keep=20), 30)
+        self.assertEqual(list(self.store.load("XXBTZUSD", 60).timestamp), [START + i * HOUR for i in range(30, 50)])
+        
+        for keep in (0, -5):
+            with self.subTest(keep=keep), self.assertRaises(ValueError):
+                self.store.prune("XXBTZUSD", 60, keep=keep)
+        self.assertEqual(len(self.store.load("XXBTZUSD", 60)), 20)
+
+
+class FakeClock:
+    """Manual monotonic time: sleeping advances the clock instead of waiting"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+    
+    async def sleep(self, seconds):
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+class RecordingBucket(TokenBucket):
+    """TokenBucket on a fake clock that records when each token was granted"""
+    
+    def __init__(self, rate, capacity=1, clock=None):
+        self.fake_clock = clock or FakeClock()
+        super().__init__(rate, capacity, clock=self.fake_clock, sleep=self.fake_clock.sleep)
+        self.granted = []
+    
+    async def acquire(self, cost=1):
+        await super().acquire(cost)
+        self.granted.append(self.fake_clock.now)
+
+
+class TestTokenBucket(unittest.IsolatedAsyncioTestCase):
+    async def grant_times(self, bucket, requests):
+        await asyncio.gather(*(bucket.acquire() for _ in range(requests)))
+        return bucket.granted
+    
+    async def test_steady_rate(self):
+        self.assertEqual(await self.grant_times(RecordingBucket(2), 5), [0.0, 0.5, 1.0, 1.5, 2.0])
+    
+    async def test_burst_then_rate(self):
+        self.assertEqual(await self.grant_times(RecordingBucket(2, capacity=3), 5), [0.0, 0.0, 0.0, 0.5, 1.0])
+    
+    async def test_idle_refill_is_capped_at_capacity(self):
+        bucket = RecordingBucket(2, capacity=3)
+        await self.grant_times(bucket, 3)
+        bucket.fake_clock.now = 10.0
+        bucket.granted = []
+        self.assertEqual(await self.grant_times(bucket, 4), [10.0, 10.0, 10.0, 10.5])
+    
+    async def test_cost(self):
+        bucket = RecordingBucket(1, capacity=2)
+        await bucket.acquire(2)
+        await bucket.acquire(2)
+        await bucket.acquire(1)
+        self.assertEqual(bucket.granted, [0.0, 2.0, 3.0])
+
+
+class PairTransport(Transport):
+    """
+    Thread-safe OHLC stand-in answering per Kraken pair: rows by default, or
+    the exception / Kraken error configured in `failures`.
+    """
+    
+    def __init__(self, failures=None, gate=None):
+        self.failures = failures or {}
+        self.gate = gate
+        self.lock = threading.Lock()
+        self.requested = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+    
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        api_pair = parse_qs(urlsplit(url).query)["pair"][0]
+        with self.lock:
+            self.requested.append(api_pair)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.gate is not None:
+                self.gate.wait(5)
+            failure = self.failures.get(api_pair)
+            if isinstance(failure, Exception):
+                raise failure
+            if failure is not None:
+                payload = {"error": [failure], "result": {}}
+            else:
+                payload = {"error": [], "result": {api_pair: kraken_rows(30), "last": START}}
+            return Response(200, "OK", body=json.dumps(payload).encode())
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class TestFetchMany(unittest.IsolatedAsyncioTestCase):
+    PAIRS = ["BTC/USD", "ETH/USD", "SOL/USD", "XRP/USD", "DOT/USD", "ADA/USD", "LTC/USD", "LINK/USD"]
+    
+    async def collect(self, fetcher, pairs, count=20, **options):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            results = [item async for item in fetcher.fetch_many(pairs, 60, count, **options)]
+        return dict(results), stderr.getvalue()
+    
+    async def test_failures_are_isolated_per_pair(self):
+        transport = PairTransport({
+            "XETHZUSD": TransportError("connection reset"),
+            "SOLUSD": HTTPStatusError(500, "Internal Server Error"),
+            "XXRPZUSD": "EQuery:Unknown asset pair"
+        })
+        fetcher = KrakenDataFetcher(rate_limit=0, transport=transport)
+        results, errors = await self.collect(fetcher, self.PAIRS[:5], connections=2)
+        
+        self.assertEqual(sorted(results), sorted(self.PAIRS[:5]))
+        self.assertEqual(sorted(pair for pair, series in results.items() if series is None),
+                         ["ETH/USD", "SOL/USD", "XRP/USD"])
+        for pair in ("BTC/USD", "DOT/USD"):
+            self.assertEqual(len(results[pair]), 20)
+            self.assertEqual(results[pair].pair, pair)
+        self.assertIn("connection reset", errors)
+        self.assertIn("HTTP 500", errors)
+        self.assertIn("Unknown asset pair", errors)
+    
+    async def test_connection_limit(self):
+        gate = threading.Event()
+        transport = PairTransport(gate=gate)
+        fetcher = KrakenDataFetcher(rate_limit=0, transport=transport)
+        task = asyncio.ensure_future(self.collect(fetcher, self.PAIRS, connections=3))
+        
+        for _ in range(500):
+            if transport.in_flight == 3:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        self.assertEqual((transport.in_flight, len(transport.requested)), (3, 3))
+        
+        gate.set()
+        results, _ = await asyncio.wait_for(task, 5)
+        self.assertEqual(transport.max_in_flight, 3)
+        self.assertEqual(sorted(results), sorted(self.PAIRS))
+        self.assertTrue(all(series is not None for series in results.values()))
+    
+    async def test_requests_follow_the_token_bucket(self):
+        buckets = []
+        
+        def make_bucket(rate, capacity):
+            buckets.append(RecordingBucket(rate, capacity))
+            return buckets[-1]
+        
+        fetcher = KrakenDataFetcher(rate_limit=0.5, transport=PairTransport())
+        with mock.patch("fetch_data.TokenBucket", make_bucket):
+            results, _ = await self.collect(fetcher, self.PAIRS[:6], connections=6, burst=2)
+        
+        self.assertEqual(len(results), 6)
+        self.assertEqual((buckets[0].rate, buckets[0].capacity), (2.0, 2))
+        self.assertEqual(buckets[0].granted, [0.0, 0.0, 0.5, 1.0, 1.5, 2.0])
+    
+    async def test_invalid_count_fails_every_pair_without_requests(self):
+        transport = PairTransport()
+        fetcher = KrakenDataFetcher(rate_limit=0, transport=transport)
+        results, errors = await self.collect(fetcher, self.PAIRS[:3], count=721)
+        
+        self.assertEqual(results, {pair: None for pair in self.PAIRS[:3]})
+        self.assertEqual(transport.requested, [])
+        self.assertIn("Count must be 1-720", errors)
+
+
+if __name__ == "__main__":
+    unittest.main()
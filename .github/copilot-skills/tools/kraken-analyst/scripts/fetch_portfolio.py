@@ -31,15 +31,75 @@ import json
 import sys
 import argparse
 import os
-from typing import Dict, Optional, List
+import re
+import time
+from typing import Dict, Iterator, Optional, List, Tuple
 from kraken_auth import KrakenAuth
+from http_transport import Transport
 
 
 class PortfolioFetcher:
     """Fetches portfolio data from Kraken private API"""
     
-    def __init__(self):
-        self.auth = KrakenAuth()
+    # Seconds a fetched ticker price is reused before querying again
+    PRICE_TTL = 10.0
+    
+    # Trades returned per TradesHistory page
+    TRADES_PAGE_SIZE = 50
+    
+    STABLECOINS = ["ZUSD", "USD", "USDC", "USDT", "DAI"]
+    
+    # Asset to trading pair mapping
+    ASSET_PAIR_MAP = {
+        "XXBT": "XXBTZUSD",
+        "XETH": "XETHZUSD",
+        "SOL": "SOLUSD",
+        "DOT": "DOTUSD",
+        "XXRP": "XXRPZUSD",
+        "ADA": "ADAUSD",
+        "AVAX": "AVAXUSD",
+        "MATIC": "MATICUSD",
+        "LINK": "LINKUSD",
+        "ATOM": "ATOMUSD",
+    }
+    
+    # Map common futures to spot pairs
+    FUTURES_MAP = {
+        "XBT": "XXBTZUSD",
+        "ETH": "XETHZUSD",
+        "SOL": "SOLUSD",
+        "DOT": "DOTUSD",
+    }
+    
+    # Asset mapping for Earn native_asset codes to trading pairs
+    EARN_ASSET_MAP = {
+        "BTC": "XXBTZUSD",
+        "ETH": "XETHZUSD",
+        "SOL": "SOLUSD",
+        "DOT": "DOTUSD",
+        "ADA": "ADAUSD",
+        "ATOM": "ATOMUSD",
+        "XTZ": "XTZUSD",
+        "KAVA": "KAVAUSD",
+        "KSM": "KSMUSD",
+        "FLOW": "FLOWUSD",
+        "GRT": "GRTUSD",
+        "MINA": "MINAUSD",
+        "SCRT": "SCRTUSD",
+        "TRX": "TRXUSD",
+        "DYM": "DYMUSD",
+        "SEI": "SEIUSD"
+    }
+    
+    def __init__(self, price_ttl: float = PRICE_TTL, transport: Optional[Transport] = None):
+        """
+        Args:
+            price_ttl: Seconds to reuse cached ticker prices
+            transport: HTTP transport for KrakenAuth (default: shared keep-alive transport)
+        """
+        self.auth = KrakenAuth(transport=transport)
+        self.price_ttl = price_ttl
+        self._price_cache: Dict[str, Tuple[Optional[float], float]] = {}
         
         if not self.auth.is_authenticated():
             print("ERROR: API credentials not configured", file=sys.stderr)
@@ -94,7 +154,7 @@ class PortfolioFetcher:
         Args:
             count: Number of trades to fetch (max 50)
             start: Start timestamp (optional)
-            
+        
         Returns:
             Dictionary of recent trades
         """
@@ -123,6 +183,50 @@ class PortfolioFetcher:
         
         return None
     
+    def iter_trade_history(self, start: Optional[str] = None,
+                           end: Optional[int] = None) -> Iterator[List[Tuple[str, Dict]]]:
+        """
+        Walk the complete trade history, one TradesHistory page at a time.
+        
+        Kraken pages newest-first by offset (`ofs`), so the first request
+        only learns the total and the remaining pages are requested from the
+        highest offset down. Pages therefore arrive oldest-first, and every
+        page written extends one contiguous, resumable range. `end` is pinned
+        so trades executed during the walk cannot shift the offsets.
+        
+        Args:
+            start: Only trades after this trade id or timestamp (exclusive)
+            end: Only trades up to this timestamp (default: now)
+        
+        Yields:
+            Lists of (txid, trade) sorted by time, oldest page first
+        
+        Raises:
+            RuntimeError: A page request failed (pages already yielded stay valid)
+        """
+        params = {"end": end or int(time.time())}
+        if start:
+            params["start"] = start
+        
+        first_page = self.auth.query_private("TradesHistory", dict(params, ofs=0))
+        if first_page is None:
+            raise RuntimeError("TradesHistory request failed at offset 0")
+        
+        total = int(first_page.get("count", 0))
+        newest = first_page.get("trades", {})
+        page_size = len(newest) or self.TRADES_PAGE_SIZE
+        
+        ofs = ((total - 1) // page_size) * page_size if total else 0
+        while ofs > 0:
+            page = self.auth.query_private("TradesHistory", dict(params, ofs=ofs))
+            if page is None:
+                raise RuntimeError(f"TradesHistory request failed at offset {ofs}")
+            yield sorted(page.get("trades", {}).items(), key=lambda x: x[1].get("time", 0))
+            ofs -= page_size
+        
+        if newest:
+            yield sorted(newest.items(), key=lambda x: x[1].get("time", 0))
+    
     def get_trade_volume(self) -> Optional[Dict]:
         """
         Get trade volume and fee info
@@ -161,10 +265,66 @@ class PortfolioFetcher:
         
         return None
     
+    def get_prices(self, pairs: List[str]) -> Dict[str, Optional[float]]:
+        """
+        Get last trade prices for several pairs with one Ticker request.
+        
+        Prices younger than `price_ttl` seconds are served from the cache.
+        If the batched request fails (Kraken rejects the whole list when one
+        pair is unknown), each remaining pair is requested on its own.
+        
+        Args:
+            pairs: Kraken pair names (e.g., ["XXBTZUSD", "SOLUSD"])
+        
+        Returns:
+            Dictionary of pair -> price in quote currency (None if unavailable)
+        """
+        now = time.time()
+        prices = {}
+        missing = []
+        
+        for pair in dict.fromkeys(pairs):
+            cached = self._price_cache.get(pair)
+            if cached and now - cached[1] < self.price_ttl:
+                prices[pair] = cached[0]
+            else:
+                missing.append(pair)
+        
+        if not missing:
+            return prices
+        
+        ticker_result = self.auth.query_public("Ticker", {"pair": ",".join(missing)})
+        
+        if ticker_result is None and len(missing) > 1:
+            ticker_result = {}
+            for pair in missing:
+                ticker_result.update(self.auth.query_public("Ticker", {"pair": pair}) or {})
+        
+        fetched_at = time.time()
+        for pair in missing:
+            ticker = (ticker_result or {}).get(pair)
+            price = float(ticker["c"][0]) if ticker else None  # Last trade price
+            self._price_cache[pair] = (price, fetched_at)
+            prices[pair] = price
+        
+        return prices
+    
+    def _futures_spot_pair(self, asset: str):
+        """Map a futures/spread asset to (underlying asset, spot pair or None)"""
+        # Remove .F/.S and any numeric date codes
+        base_asset = re.sub(r'\d+\.?[FS]$', '', asset).rstrip('.')
+        return base_asset, self.FUTURES_MAP.get(base_asset)
+    
+    def _earn_pair(self, asset: str) -> str:
+        return self.EARN_ASSET_MAP.get(asset, self.ASSET_PAIR_MAP.get(asset, f"{asset}USD"))
+    
     def get_portfolio_summary(self) -> Optional[Dict]:
         """
         Get complete portfolio summary with balances and current prices
         
+        All spot, futures and Earn holdings are priced with a single
+        batched Ticker request (see get_prices).
+        
         Returns:
             Dictionary with portfolio allocation and USD values
         """
@@ -177,24 +337,34 @@ class PortfolioFetcher:
         portfolio = []
         total_value_usd = 0.0
         
-        # Asset to trading pair mapping
-        asset_pair_map = {
-            "XXBT": "XXBTZUSD",
-            "XETH": "XETHZUSD",
-            "SOL": "SOLUSD",
-            "DOT": "DOTUSD",
-            "XXRP": "XXRPZUSD",
-            "ADA": "ADAUSD",
-            "AVAX": "AVAXUSD",
-            "MATIC": "MATICUSD",
-            "LINK": "LINKUSD",
-            "ATOM": "ATOMUSD",
-        }
+        # Get Earn (staking) allocations
+        earn_data = self.get_earn_allocations()
+        earn_allocations = earn_data.get("items", []) if earn_data else []
+        
+        # Collect every pair that needs a price, then fetch them in one round trip
+        pairs = []
+        for asset in balances:
+            if asset in self.STABLECOINS:
+                continue
+            if asset.endswith(".F") or asset.endswith(".S"):
+                spot_pair = self._futures_spot_pair(asset)[1]
+                if spot_pair:
+                    pairs.append(spot_pair)
+            else:
+                pairs.append(self.ASSET_PAIR_MAP.get(asset, f"{asset}USD"))
         
-        # Get current prices for each asset
+        for allocation in earn_allocations:
+            asset = allocation.get("native_asset", "")
+            amount = float(allocation.get("amount_allocated", {}).get("total", {}).get("native", 0))
+            if amount != 0 and asset not in ["USD", "USDC", "USDT"]:
+                pairs.append(self._earn_pair(asset))
+        
+        prices = self.get_prices(pairs) if pairs else {}
+        
+        # Value each asset
         for asset, amount in balances.items():
             # Skip if stablecoin
-            if asset in ["ZUSD", "USD", "USDC", "USDT", "DAI"]:
+            if asset in self.STABLECOINS:
                 portfolio.append({
                     "asset": asset,
                     "amount": amount,
@@ -207,36 +377,22 @@ class PortfolioFetcher:
             
             # Handle futures and spread contracts by mapping to spot equivalent prices
             if asset.endswith(".F") or asset.endswith(".S"):
-                # Map futures/spread to underlying asset (remove .F/.S and any numeric date codes)
-                import re
-                base_asset = re.sub(r'\d+\.?[FS]$', '', asset).rstrip('.')
-                
-                # Map common futures to spot pairs
-                futures_map = {
-                    "XBT": "XXBTZUSD",
-                    "ETH": "XETHZUSD",
-                    "SOL": "SOLUSD",
-                    "DOT": "DOTUSD",
-                }
+                base_asset, spot_pair = self._futures_spot_pair(asset)
                 
-                spot_pair = futures_map.get(base_asset)
-                if spot_pair:
-                    ticker_result = self.auth.query_public("Ticker", {"pair": spot_pair})
-                    if ticker_result and spot_pair in ticker_result:
-                        ticker = ticker_result[spot_pair]
-                        price_usd = float(ticker["c"][0])
-                        value_usd = amount * price_usd
-                        
-                        portfolio.append({
-                            "asset": asset,
-                            "amount": amount,
-                            "price_usd": price_usd,
-                            "value_usd": value_usd,
-                            "weight": 0.0,
-                            "note": f"Futures/spread (valued at {base_asset} spot price)"
-                        })
-                        total_value_usd += value_usd
-                        continue
+                price_usd = prices.get(spot_pair) if spot_pair else None
+                if price_usd is not None:
+                    value_usd = amount * price_usd
+                    
+                    portfolio.append({
+                        "asset": asset,
+                        "amount": amount,
+                        "price_usd": price_usd,
+                        "value_usd": value_usd,
+                        "weight": 0.0,
+                        "note": f"Futures/spread (valued at {base_asset} spot price)"
+                    })
+                    total_value_usd += value_usd
+                    continue
                 
                 # If we can't value it, skip
                 portfolio.append({
@@ -250,14 +406,10 @@ class PortfolioFetcher:
                 continue
             
             # Get trading pair
-            pair = asset_pair_map.get(asset, f"{asset}USD")
+            pair = self.ASSET_PAIR_MAP.get(asset, f"{asset}USD")
+            price_usd = prices.get(pair)
             
-            # Try to get ticker
-            ticker_result = self.auth.query_public("Ticker", {"pair": pair})
-            
-            if ticker_result and pair in ticker_result:
-                ticker = ticker_result[pair]
-                price_usd = float(ticker["c"][0])  # Last trade price
+            if price_usd is not None:
                 value_usd = amount * price_usd
                 
                 portfolio.append({
@@ -284,62 +436,34 @@ class PortfolioFetcher:
             if total_value_usd > 0:
                 item["weight"] = (item["value_usd"] / total_value_usd) * 100
         
-        # Get Earn (staking) allocations
-        earn_data = self.get_earn_allocations()
         earn_items = []
         earn_total_usd = 0.0
         
-        # Asset mapping for Earn native_asset codes to trading pairs
-        earn_asset_map = {
-            "BTC": "XXBTZUSD",
-            "ETH": "XETHZUSD",
-            "SOL": "SOLUSD",
-            "DOT": "DOTUSD",
-            "ADA": "ADAUSD",
-            "ATOM": "ATOMUSD",
-            "XTZ": "XTZUSD",
-            "KAVA": "KAVAUSD",
-            "KSM": "KSMUSD",
-            "FLOW": "FLOWUSD",
-            "GRT": "GRTUSD",
-            "MINA": "MINAUSD",
-            "SCRT": "SCRTUSD",
-            "TRX": "TRXUSD",
-            "DYM": "DYMUSD",
-            "SEI": "SEIUSD"
-        }
-        
-        if earn_data and earn_data.get("items"):
-            for allocation in earn_data["items"]:
-                asset = allocation.get("native_asset", "")
-                amount = float(allocation.get("amount_allocated", {}).get("total", {}).get("native", 0))
-                
-                # Skip zero allocations
-                if amount == 0:
-                    continue
-                
-                # Get price for staked asset
-                if asset in ["USD", "USDC", "USDT"]:
-                    price_usd = 1.0
-                else:
-                    pair = earn_asset_map.get(asset, asset_pair_map.get(asset, f"{asset}USD"))
-                    ticker_result = self.auth.query_public("Ticker", {"pair": pair})
-                    if ticker_result and pair in ticker_result:
-                        price_usd = float(ticker_result[pair]["c"][0])
-                    else:
-                        price_usd = None
-                
-                if price_usd:
-                    value_usd = amount * price_usd
-                    earn_items.append({
-                        "asset": asset,
-                        "amount": amount,
-                        "price_usd": price_usd,
-                        "value_usd": value_usd,
-                        "strategy": allocation.get("strategy_id", ""),
-                        "apr": allocation.get("apr_estimate", {}).get("low", 0)
-                    })
-                    earn_total_usd += value_usd
+        for allocation in earn_allocations:
+            asset = allocation.get("native_asset", "")
+            amount = float(allocation.get("amount_allocated", {}).get("total", {}).get("native", 0))
+            
+            # Skip zero allocations
+            if amount == 0:
+                continue
+            
+            # Get price for staked asset
+            if asset in ["USD", "USDC", "USDT"]:
+                price_usd = 1.0
+            else:
+                price_usd = prices.get(self._earn_pair(asset))
+            
+            if price_usd:
+                value_usd = amount * price_usd
+                earn_items.append({
+                    "asset": asset,
+                    "amount": amount,
+                    "price_usd": price_usd,
+                    "value_usd": value_usd,
+                    "strategy": allocation.get("strategy_id", ""),
+                    "apr": allocation.get("apr_estimate", {}).get("low", 0)
+                })
+                earn_total_usd += value_usd
         
         # Separate spot from futures/dust
         spot_portfolio = [p for p in portfolio if not p["asset"].endswith((".F", ".S"))]
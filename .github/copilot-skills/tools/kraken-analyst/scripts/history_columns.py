@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+"""
+history_columns.py - Kraken Analyst Skill: Columnar Portfolio History
+
+Exports asset_holdings (with snapshot time and account; delta-encoded
+snapshots are materialized into the same rows) and price_history from the
+tracker database into month partitions of column files, and reads
+them back memory-mapped, so multi-year history analysis neither walks
+portfolio_snapshots row by row nor deserializes JSON:
+
+    history/holdings/manifest.json
+    history/holdings/2024-01/timestamp.q  value_usd.d  account.i ...
+    history/prices/manifest.json
+    history/prices/2024-01/...
+
+Within a partition rows are sorted by asset, then time. The manifest keeps
+each partition's time range and every asset's row range, so a query for one
+asset and period opens only the overlapping partitions and reads only that
+asset's slice (binary search on the timestamp column). Columns are raw
+little-endian int64/float64/int32 ('q'/'d'/'i'), exposed as zero-copy
+memoryviews over mmap; text columns are dictionary-encoded per partition.
+
+With pyarrow installed, --format arrow writes each partition as an Arrow IPC
+file instead (one record batch per asset, readable by pyarrow/pandas/polars);
+the same manifest drives the pushdown.
+
+Usage:
+    python3 history_columns.py --export history/                 # New months only
+    python3 history_columns.py --export history/ --full          # Rewrite everything
+    python3 history_columns.py --query history/ --asset XXBT --since 2024-01-01 --until 2024-03-31
+    python3 history_columns.py --query history/ --table prices --asset BTC --csv
+    python3 history_columns.py --benchmark
+"""
+
+import argparse
+import heapq
+import json
+import mmap
+import os
+import shutil
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from db import chain_state, from_epoch, get_database, to_epoch
+from track_portfolio import HOLDING_LISTS, state_holdings
+
+try:
+    import numpy as np
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+FORMATS = ('columns', 'arrow')
+
+
+def _delta_holding_rows(db, start: int, last_id: int) -> Iterator[tuple]:
+    """
+    Holdings rows of delta-encoded snapshots (which have no asset_holdings
+    rows), as load_snapshot() rebuilds them, in timestamp order.
+    
+    Each chain is replayed from its keyframe once, then advanced by the
+    deltas of every following snapshot.
+    """
+    chains: Dict[int, tuple] = {}  # keyframe_id -> (state, last applied snapshot id)
+    open_chain: Dict[Optional[str], int] = {}
+    for snapshot_id, timestamp, account, keyframe_id in db.execute('''
+        SELECT id, timestamp, account, keyframe_id FROM portfolio_snapshots
+        WHERE keyframe_id IS NOT NULL AND timestamp >= ? AND id <= ?
+        ORDER BY timestamp, id
+    ''', (start, last_id)):
+        # An account continues only its latest chain
+        if open_chain.get(account, keyframe_id) != keyframe_id:
+            chains.pop(open_chain[account], None)
+        open_chain[account] = keyframe_id
+        
+        if keyframe_id in chains:
+            state, applied = chains[keyframe_id]
+            for source, asset, slot, amount, details in db.execute('''
+                SELECT source, asset, slot, amount, details FROM holding_deltas
+                WHERE keyframe_id = ? AND snapshot_id > ? AND snapshot_id <= ?
+                ORDER BY snapshot_id
+            ''', (keyframe_id, applied, snapshot_id)):
+                if amount is None:
+                    state.pop((source, asset, slot), None)
+                else:
+                    state[(source, asset, slot)] = (amount, details)
+        else:
+            state = chain_state(db.conn, keyframe_id, snapshot_id)
+        chains[keyframe_id] = (state, snapshot_id)
+        
+        holdings = state_holdings(db, state, timestamp)
+        for key, source in HOLDING_LISTS:
+            for holding in holdings[key]:
+                # The asset_holdings row a full snapshot would have
+                yield (timestamp, holding['asset'], snapshot_id, holding['amount'], holding.get('price_usd') or 0,
+                       holding['value_usd'], (holding.get('weight') or 0) if source == 'spot' else 0,
+                       source, account)
+
+
+# Exported tables. Each row read from the database is (timestamp, asset, *columns
+# after timestamp); asset is not stored per row but as the partition's row ranges.
+TABLES = {
+    'holdings': {
+        'columns': {
+            'timestamp': 'q', 'snapshot_id': 'q', 'amount': 'd', 'price_usd': 'd',
+            'value_usd': 'd', 'allocation_pct': 'd', 'source': 'i', 'account': 'i'
+        },
+        'rows': '''
+            SELECT ps.timestamp, ah.asset, ah.snapshot_id, ah.amount, ah.price_usd,
+                   ah.value_usd, ah.allocation_pct, ah.source, ps.account
+            FROM portfolio_snapshots ps
+            JOIN asset_holdings ah ON ah.snapshot_id = ps.id
+            WHERE ps.timestamp >= ? AND ps.id <= ?
+            ORDER BY ps.timestamp
+        ''',
+        'last_id': 'SELECT MAX(id) FROM portfolio_snapshots',
+        'changed_since': 'SELECT MIN(timestamp) FROM portfolio_snapshots WHERE id > ?',
+        'value': 'value_usd',
+        # Rows stored outside the table, merged in by timestamp
+        'extra_rows': _delta_holding_rows
+    },
+    'prices': {
+        'columns': {'timestamp': 'q', 'price_usd': 'd', 'interval': 'i'},
+        'rows': '''
+            SELECT timestamp, asset, price_usd, interval
+            FROM price_history
+            WHERE timestamp >= ? AND id <= ?
+            ORDER BY timestamp
+        ''',
+        'last_id': 'SELECT MAX(id) FROM price_history',
+        'changed_since': 'SELECT MIN(timestamp) FROM price_history WHERE id > ?',
+        'value': 'price_usd'
+    }
+}
+
+# int32 columns holding codes into the partition's dictionary of values
+DICTIONARY_COLUMNS = ('source', 'account', 'interval')
+
+ARROW_TYPES = {'q': 'int64', 'd': 'float64', 'i': 'int32'}
+
+
+def _month_start(timestamp: int) -> int:
+    """Epoch seconds of the first instant of the (UTC) month containing `timestamp`"""
+    dt = from_epoch(timestamp)
+    return to_epoch(datetime(dt.year, dt.month, 1))
+
+
+def _next_month(timestamp: int) -> int:
+    dt = from_epoch(_month_start(timestamp))
+    return to_epoch(datetime(dt.year + dt.month // 12, dt.month % 12 + 1, 1))
+
+
+def _month_key(timestamp: int) -> str:
+    return from_epoch(timestamp).strftime('%Y-%m')
+
+
+def _write_json(path: Path, document: Dict):
+    """Replace a JSON file atomically (readers never see a partial manifest)"""
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(json.dumps(document, indent=1))
+    os.replace(temporary, path)
+
+
+def _build_columns(spec: Dict[str, str], rows: List[tuple]):
+    """
+    Sort one month of rows by asset and time and split them into typed columns.
+    
+    Returns:
+        (columns, assets, dictionaries): name -> array, [[asset, start, stop]],
+        name -> list of values for the dictionary-encoded columns
+    """
+    rows.sort(key=lambda row: (row[1], row[0]))
+    assets = []
+    position = 0
+    for asset, group in groupby(rows, key=lambda row: row[1]):
+        size = sum(1 for _ in group)
+        assets.append([asset, position, position + size])
+        position += size
+    
+    values = list(zip(*rows))
+    del values[1]  # asset
+    columns = {}
+    dictionaries = {}
+    for (name, code), column in zip(spec.items(), values):
+        if name in DICTIONARY_COLUMNS:
+            codes: Dict = {}
+            column = [codes.setdefault(value, len(codes)) for value in column]
+            dictionaries[name] = list(codes)
+        columns[name] = array(code, column)
+    return columns, assets, dictionaries
+
+
+def _write_partition(directory: Path, columns: Dict[str, array], assets: List[list], fmt: str):
+    """Write one partition into a fresh directory"""
+    directory.mkdir(parents=True)
+    if fmt == 'arrow':
+        table = pa.table({name: pa.array(np.frombuffer(column, dtype=column.typecode), type=ARROW_TYPES[column.typecode])
+                          for name, column in columns.items()})
+        with pa.OSFile(str(directory / 'part.arrow'), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                for _, start, stop in assets:
+                    writer.write_table(table.slice(start, stop - start))
+        return
+    
+    for name, column in columns.items():
+        if sys.byteorder == 'big':
+            column.byteswap()
+        with open(directory / f'{name}.{column.typecode}', 'wb') as f:
+            column.tofile(f)
+
+
+def export_history(out_dir, table: str = 'holdings', full: bool = False, fmt: str = 'columns',
+                   db_path=None) -> Dict:
+    """
+    Export a tracker table into month partitions under out_dir/table.
+    
+    Incremental by default: months from the earliest row added since the
+    last export onwards are rewritten; earlier months are kept. Rows deleted
+    or edited in already exported months need full=True.
+    
+    Returns:
+        {'table', 'rows', 'partitions_written', 'partitions'}
+    """
+    if fmt == 'arrow' and not PYARROW_AVAILABLE:
+        raise RuntimeError("--format arrow needs pyarrow (pip install pyarrow)")
+    
+    spec = TABLES[table]
+    root = Path(out_dir) / table
+    manifest_path = root / 'manifest.json'
+    db = get_database(db_path)
+    
+    manifest = None
+    if not full and manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        if manifest.get('format') != fmt or manifest.get('columns') != spec['columns']:
+            manifest = None
+    
+    # Rows up to the current last id, even if writers keep adding
+    last_id = db.query_one(spec['last_id'])[0] or 0
+    if manifest is None:
+        if root.exists():
+            shutil.rmtree(root)
+        root.mkdir(parents=True)
+        manifest = {'table': table, 'format': fmt, 'columns': spec['columns'], 'last_id': 0, 'partitions': []}
+        start = None
+    else:
+        changed = db.query_one(spec['changed_since'], (manifest['last_id'],))[0]
+        if changed is None:
+            return {'table': table, 'rows': 0, 'partitions_written': 0, 'partitions': len(manifest['partitions'])}
+        start = _month_start(changed)
+    
+    kept = [p for p in manifest['partitions'] if start is not None and p['end'] <= start]
+    dropped = [p for p in manifest['partitions'] if p not in kept]
+    manifest['partitions'] = kept
+    _write_json(manifest_path, manifest)
+    for partition in dropped:
+        shutil.rmtree(root / partition['month'], ignore_errors=True)
+    
+    written = []
+    total = 0
+    month_end = None
+    pending: List[tuple] = []
+    
+    def flush():
+        columns, assets, dictionaries = _build_columns(spec['columns'], pending)
+        key = _month_key(pending[0][0])
+        directory = root / key
+        if directory.exists():
+            shutil.rmtree(directory)
+        _write_partition(directory, columns, assets, fmt)
+        timestamps = columns['timestamp']
+        written.append({
+            'month': key, 'start': _month_start(pending[0][0]), 'end': month_end, 'rows': len(pending),
+            'min_timestamp': min(timestamps), 'max_timestamp': max(timestamps),
+            'assets': assets, 'dictionaries': dictionaries
+        })
+    
+    bounds = (start if start is not None else -2 ** 63, last_id)
+    rows = db.execute(spec['rows'], bounds)
+    if 'extra_rows' in spec:
+        rows = heapq.merge(rows, spec['extra_rows'](db, *bounds), key=lambda row: row[0])
+    for row in rows:
+        if month_end is None or row[0] >= month_end:
+            if pending:
+                flush()
+                total += len(pending)
+                pending = []
+            month_end = _next_month(row[0])
+        pending.append(row)
+    if pending:
+        flush()
+        total += len(pending)
+    
+    manifest['partitions'] = kept + written
+    manifest['last_id'] = last_id
+    _write_json(manifest_path, manifest)
+    return {'table': table, 'rows': total, 'partitions_written': len(written),
+            'partitions': len(manifest['partitions'])}
+
+
+@dataclass
+class HistoryChunk:
+    """One asset's rows within one month partition (columns are zero-copy views)"""
+    asset: str
+    month: str
+    columns: Dict[str, Sequence]
+    dictionaries: Dict[str, list]
+    
+    def decode(self, name: str) -> list:
+        """Values of a dictionary-encoded column"""
+        values = self.dictionaries[name]
+        return [values[code] for code in self.columns[name]]
+
+
+class HistoryReader:
+    """Memory-mapped access to one exported table"""
+    
+    def __init__(self, root, table: str = 'holdings'):
+        self.root = Path(root) / table
+        self.manifest = json.loads((self.root / 'manifest.json').read_text())
+        self.table = table
+        self.format = self.manifest['format']
+        self.columns = self.manifest['columns']
+        if self.format == 'arrow' and not PYARROW_AVAILABLE:
+            raise RuntimeError("This export is Arrow IPC; reading it needs pyarrow (pip install pyarrow)")
+        # Opened files by partition month, mapped on first use
+        self._opened: Dict[str, object] = {}
+        self._maps: List[mmap.mmap] = []
+    
+    def assets(self) -> List[str]:
+        return sorted({asset for partition in self.manifest['partitions'] for asset, _, _ in partition['assets']})
+    
+    def _partition_columns(self, partition: Dict):
+        """name -> memoryview over the whole partition (columns), or the Arrow file reader"""
+        month = partition['month']
+        if month not in self._opened:
+            directory = self.root / month
+            if self.format == 'arrow':
+                self._opened[month] = pa.ipc.open_file(pa.memory_map(str(directory / 'part.arrow'), 'r'))
+            else:
+                views = {}
+                for name, code in self.columns.items():
+                    with open(directory / f'{name}.{code}', 'rb') as f:
+                        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._maps.append(mapped)
+                    view = memoryview(mapped)
+                    if sys.byteorder == 'big':
+                        view = array(code, view)
+                        view.byteswap()
+                    views[name] = view.cast(code) if isinstance(view, memoryview) else view
+                self._opened[month] = views
+        return self._opened[month]
+    
+    def chunks(self, assets: Optional[Iterable[str]] = None, since: Optional[int] = None,
+               until: Optional[int] = None) -> Iterator[HistoryChunk]:
+        """
+        Rows of the selected assets with since <= timestamp <= until, one
+        chunk per asset and month in time order per asset. Partitions outside
+        the time range and other assets' rows are never read.
+        """
+        wanted = set(assets) if assets is not None else None
+        for partition in sorted(self.manifest['partitions'], key=lambda p: p['start']):
+            if since is not None and partition['max_timestamp'] < since:
+                continue
+            if until is not None and partition['min_timestamp'] > until:
+                continue
+            for index, (asset, start, stop) in enumerate(partition['assets']):
+                if wanted is not None and asset not in wanted:
+                    continue
+                opened = self._partition_columns(partition)
+                if self.format == 'arrow':
+                    batch = opened.get_batch(index)
+                    columns = {name: batch.column(name).to_numpy() for name in self.columns}
+                    timestamps = columns['timestamp']
+                    low = int(np.searchsorted(timestamps, since, 'left')) if since is not None else 0
+                    high = int(np.searchsorted(timestamps, until, 'right')) if until is not None else len(timestamps)
+                else:
+                    columns = {name: view[start:stop] for name, view in opened.items()}
+                    timestamps = columns['timestamp']
+                    low = bisect_left(timestamps, since) if since is not None else 0
+                    high = bisect_right(timestamps, until) if until is not None else len(timestamps)
+                if low < high:
+                    yield HistoryChunk(asset, partition['month'],
+                                       {name: column[low:high] for name, column in columns.items()},
+                                       partition['dictionaries'])
+    
+    def read(self, asset: str, since: Optional[int] = None, until: Optional[int] = None) -> Dict[str, Sequence]:
+        """
+        One asset's rows as contiguous columns (arrays; dictionary columns
+        decoded to lists), copied out of the mapped partitions.
+        """
+        result: Dict[str, Sequence] = {name: ([] if name in DICTIONARY_COLUMNS else array(code))
+                                       for name, code in self.columns.items()}
+        for chunk in self.chunks([asset], since, until):
+            for name in self.columns:
+                if name in DICTIONARY_COLUMNS:
+                    result[name].extend(chunk.decode(name))
+                else:
+                    result[name].extend(chunk.columns[name])
+        return result
+    
+    def close(self):
+        self._opened.clear()
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # A caller still holds a view; unmapped when it is released
+        self._maps.clear()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def summarize(reader: HistoryReader, assets: Optional[List[str]] = None, since: Optional[int] = None,
+              until: Optional[int] = None) -> List[Dict]:
+    """Per asset: rows, first/last time and value, low/high value over the range"""
+    value_column = TABLES[reader.table]['value']
+    summary: Dict[str, Dict] = {}
+    for chunk in reader.chunks(assets, since, until):
+        timestamps = chunk.columns['timestamp']
+        values = chunk.columns[value_column]
+        entry = summary.get(chunk.asset)
+        if entry is None:
+            entry = summary[chunk.asset] = {
+                'asset': chunk.asset, 'rows': 0,
+                'first_timestamp': int(timestamps[0]), 'first_value': float(values[0]),
+                'low': float(values[0]), 'high': float(values[0])
+            }
+        entry['rows'] += len(timestamps)
+        entry['last_timestamp'] = int(timestamps[-1])
+        entry['last_value'] = float(values[-1])
+        entry['low'] = min(entry['low'], float(min(values)))
+        entry['high'] = max(entry['high'], float(max(values)))
+    return list(summary.values())
+
+
+def benchmark_history(months: int = 24, step_minutes: int = 15, holdings: int = 8) -> Dict:
+    """
+    Build a scratch tracker database with `months` of snapshots, export it,
+    and compare one asset's value history read through SQL with the mapped
+    columns (whole history, and a one-month range).
+    """
+    import random
+    import tempfile
+    import time
+    
+    import db as db_module
+    from track_portfolio import SnapshotWriter
+    
+    rng = random.Random(7)
+    assets = [f"A{i:02d}" for i in range(holdings)]
+    start_time = to_epoch(datetime(2023, 1, 1))
+    count = months * 30 * 24 * 60 // step_minutes
+    
+    def best_ms(function, repeats=3):
+        timings = []
+        for _ in range(repeats):
+            begin = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - begin) * 1000)
+        return round(min(timings), 2)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'bench.db')
+        db = db_module.Database(db_path)
+        prices = [rng.uniform(1, 50000) for _ in assets]
+        with SnapshotWriter(db) as writer:
+            for index in range(count):
+                prices = [p * (1 + rng.gauss(0, 0.002)) for p in prices]
+                spot = [{"asset": a, "amount": 1.5, "price_usd": p, "value_usd": 1.5 * p, "weight": 100 / holdings}
+                        for a, p in zip(assets, prices)]
+                value = sum(h["value_usd"] for h in spot)
+                writer.add({"total_value_usd": value, "spot_value_usd": value, "earn_value_usd": 0.0,
+                            "spot_portfolio": spot, "earn_allocations": [], "futures_dust": []},
+                           start_time + index * step_minutes * 60, "main")
+        
+        out_dir = os.path.join(directory, 'history')
+        begin = time.perf_counter()
+        exported = export_history(out_dir, db_path=db_path)
+        export_s = time.perf_counter() - begin
+        size_mb = sum(f.stat().st_size for f in Path(out_dir).rglob('*') if f.is_file()) / 1e6
+        
+        shared = get_database(db_path)
+        asset = assets[0]
+        month_from = start_time + 180 * 86400
+        month_to = month_from + 30 * 86400
+        sql = '''
+            SELECT ps.timestamp, ah.value_usd
+            FROM asset_holdings ah
+            JOIN portfolio_snapshots ps ON ah.snapshot_id = ps.id
+            WHERE ah.asset = ? AND ps.timestamp BETWEEN ? AND ?
+            ORDER BY ps.timestamp
+        '''
+        with HistoryReader(out_dir) as reader:
+            results = {
+                'snapshots': count,
+                'holding_rows': exported['rows'],
+                'partitions': exported['partitions'],
+                'export_seconds': round(export_s, 2),
+                'export_mb': round(size_mb, 1),
+                'database_mb': round(os.path.getsize(db_path) / 1e6, 1),
+                'asset_history': {
+                    'sql_ms': best_ms(lambda: shared.query(sql, (asset, -2 ** 63, 2 ** 63 - 1))),
+                    'columns_ms': best_ms(lambda: reader.read(asset))
+                },
+                'asset_month': {
+                    'sql_ms': best_ms(lambda: shared.query(sql, (asset, month_from, month_to))),
+                    'columns_ms': best_ms(lambda: reader.read(asset, month_from, month_to))
+                },
+                'all_assets_summary_ms': best_ms(lambda: summarize(reader))
+            }
+        shared.close()
+        db.close()
+    
+    return results
+
+
+def _parse_time(value: str) -> int:
+    """Epoch seconds from an ISO date/time (UTC) or a number of seconds"""
+    return int(value) if value.lstrip('-').isdigit() else to_epoch(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Columnar (month-partitioned, memory-mapped) export of portfolio history",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python history_columns.py --export history/
+  python history_columns.py --export history/ --table prices --format arrow
+  python history_columns.py --query history/ --asset XXBT --since 2024-01-01 --until 2024-03-31
+  python history_columns.py --query history/ --table prices --asset BTC --csv
+
+Exports are incremental: months from the earliest new row onwards are
+rewritten. Use --full after deleting or editing tracked rows.
+        """
+    )
+    parser.add_argument("--export", type=str, metavar="DIR", help="Export the tracker database into DIR")
+    parser.add_argument("--query", type=str, metavar="DIR", help="Read an export in DIR")
+    parser.add_argument("--table", choices=list(TABLES), default='holdings',
+                        help="holdings (asset_holdings) or prices (price_history); default: holdings")
+    parser.add_argument("--format", choices=FORMATS, default='columns',
+                        help="columns (mmap-able column files) or arrow (Arrow IPC, needs pyarrow)")
+    parser.add_argument("--full", action="store_true", help="Rewrite every partition")
+    parser.add_argument("--db", type=str, help="Tracker database (default: portfolio_tracker.db)")
+    parser.add_argument("--asset", action="append", help="Only this asset (repeatable)")
+    parser.add_argument("--since", type=str, help="From this ISO time (UTC) or epoch seconds")
+    parser.add_argument("--until", type=str, help="Up to this ISO time (UTC) or epoch seconds")
+    parser.add_argument("--csv", action="store_true", help="Print matching rows as CSV instead of a summary")
+    parser.add_argument("--benchmark", action="store_true", help="Compare SQL and columnar reads (scratch data)")
+    args = parser.parse_args()
+    
+    if args.benchmark:
+        print(json.dumps(benchmark_history(), indent=2))
+        return 0
+    
+    if args.export:
+        try:
+            result = export_history(args.export, args.table, args.full, args.format, args.db)
+        except RuntimeError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            return 1
+        print(f"✓ Exported {result['rows']} {args.table} rows into {result['partitions_written']} partition(s) "
+              f"({result['partitions']} total) under {Path(args.export) / args.table}")
+        return 0
+    
+    if args.query:
+        since = _parse_time(args.since) if args.since else None
+        until = _parse_time(args.until) if args.until else None
+        try:
+            reader = HistoryReader(args.query, args.table)
+        except (OSError, RuntimeError) as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            return 1
+        
+        with reader:
+            if args.csv:
+                names = list(reader.columns)
+                print(','.join(['timestamp', 'asset'] + names[1:]))
+                for chunk in reader.chunks(args.asset, since, until):
+                    values = [chunk.decode(name) if name in DICTIONARY_COLUMNS else chunk.columns[name]
+                              for name in names]
+                    for row in zip(*values):
+                        print(','.join([from_epoch(row[0]).isoformat(), chunk.asset] +
+                                       ['' if v is None else str(v) for v in row[1:]]))
+                return 0
+            
+            summary = summarize(reader, args.asset, since, until)
+            print(f"\n🗂️  {args.table} history ({reader.format}, {len(reader.manifest['partitions'])} partitions)")
+            print("=" * 96)
+            print(f"{'Asset':<10} {'Rows':>9} {'From':<20} {'To':<20} {'First':>12} {'Last':>12} {'Change':>8}")
+            print("-" * 96)
+            for entry in summary:
+                change = ((entry['last_value'] - entry['first_value']) / entry['first_value'] * 100) \
+                    if entry['first_value'] else 0
+                print(f"{entry['asset']:<10} {entry['rows']:>9} "
+                      f"{from_epoch(entry['first_timestamp']).isoformat():<20} "
+                      f"{from_epoch(entry['last_timestamp']).isoformat():<20} "
+                      f"{entry['first_value']:>12.2f} {entry['last_value']:>12.2f} {change:>+7.2f}%")
+            if not summary:
+                print("No rows match")
+        return 0
+    
+    parser.print_help()
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import history_columns
+from db import Database, close_all, to_epoch
+from history_columns import PYARROW_AVAILABLE, HistoryReader, export_history
+from track_portfolio import SnapshotWriter, load_snapshot
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python history_columns_test.py
+
+ASSETS = ["XXBT", "XETH", "SOL", "DOT"]
+START = to_epoch("2024-01-01T00:00:00")
+HOUR = 3600
+
+
+class HistoryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "tracker.db")
+        self.out = os.path.join(self.directory.name, "history")
+        self.db = Database(self.path)
+        self.random = random.Random(3)
+    
+    def tearDown(self):
+        self.db.close()
+        close_all()
+        self.directory.cleanup()
+    
+    def add_snapshots(self, first_hour, hours, step=7):
+        """One snapshot every `step` hours, in shuffled order, each holding a random subset of assets"""
+        offsets = list(range(first_hour, first_hour + hours, step))
+        self.random.shuffle(offsets)
+        with self.db.transaction():
+            for offset in offsets:
+                snapshot_id = self.db.execute("""
+                    INSERT INTO portfolio_snapshots (timestamp, account, total_value_usd, holdings_json)
+                    VALUES (?, ?, 0, '{}')
+                """, (START + offset * HOUR, self.random.choice(["main", "savings"]))).lastrowid
+                self.db.executemany("""
+                    INSERT INTO asset_holdings (snapshot_id, asset, amount, price_usd, value_usd, allocation_pct, source)
+                    VALUES (?, ?, 1, ?, ?, 25, ?)
+                """, [(snapshot_id, asset, value, value, self.random.choice(["spot", "earn", None]))
+                      for asset, value in ((a, self.random.uniform(1, 1000))
+                                           for a in self.random.sample(ASSETS, 3))])
+    
+    def expected(self, asset, since=-2 ** 63, until=2 ** 63 - 1):
+        return self.db.query("""
+            SELECT ps.timestamp, ah.snapshot_id, ah.value_usd, ah.source, ps.account
+            FROM asset_holdings ah JOIN portfolio_snapshots ps ON ah.snapshot_id = ps.id
+            WHERE ah.asset = ? AND ps.timestamp BETWEEN ? AND ?
+            ORDER BY ps.timestamp, ah.id
+        """, (asset, since, until))
+    
+    def assertMatchesDatabase(self, reader, since=None, until=None):
+        bounds = (since if since is not None else -2 ** 63, until if until is not None else 2 ** 63 - 1)
+        for asset in ASSETS:
+            columns = reader.read(asset, since, until)
+            actual = list(zip(columns["timestamp"], columns["snapshot_id"], columns["value_usd"],
+                              columns["source"], columns["account"]))
+            self.assertEqual(actual, self.expected(asset, *bounds), asset)
+
+
+class TestExport(HistoryTestCase):
+    def test_roundtrip_matches_database(self):
+        self.add_snapshots(0, 24 * 95)
+        result = export_history(self.out, db_path=self.path)
+        self.assertEqual(result["partitions"], 4)  # January to April 2024
+        self.assertEqual(result["rows"], self.db.query_one("SELECT COUNT(*) FROM asset_holdings")[0])
+        
+        with HistoryReader(self.out) as reader:
+            self.assertEqual(reader.assets(), sorted(ASSETS))
+            self.assertMatchesDatabase(reader)
+            self.assertMatchesDatabase(reader, to_epoch("2024-01-20T05:00:00"), to_epoch("2024-03-02T00:00:00"))
+            self.assertMatchesDatabase(reader, until=START)
+    
+    def test_prunes_partitions(self):
+        self.add_snapshots(0, 24 * 95)
+        export_history(self.out, db_path=self.path)
+        
+        with HistoryReader(self.out) as reader:
+            with mock.patch.object(reader, "_partition_columns", wraps=reader._partition_columns) as opened:
+                chunks = list(reader.chunks(["SOL"], to_epoch("2024-02-10T00:00:00"), to_epoch("2024-02-20T00:00:00")))
+            self.assertEqual({chunk.month for chunk in chunks}, {"2024-02"})
+            self.assertEqual({call.args[0]["month"] for call in opened.call_args_list}, {"2024-02"})
+            self.assertEqual({chunk.asset for chunk in chunks}, {"SOL"})
+    
+    def test_incremental_rewrites_touched_months(self):
+        self.add_snapshots(0, 24 * 40)
+        export_history(self.out, db_path=self.path)
+        january = Path(self.out, "holdings", "2024-01", "timestamp.q").stat().st_mtime_ns
+        
+        self.assertEqual(export_history(self.out, db_path=self.path)["partitions_written"], 0)
+        
+        # Late February snapshot (plus March): January is left alone
+        self.add_snapshots(24 * 55, 24 * 20)
+        result = export_history(self.out, db_path=self.path)
+        self.assertEqual(result["partitions_written"], 2)
+        self.assertEqual(result["partitions"], 3)
+        self.assertEqual(Path(self.out, "holdings", "2024-01", "timestamp.q").stat().st_mtime_ns, january)
+        with HistoryReader(self.out) as reader:
+            self.assertMatchesDatabase(reader)
+        
+        # --full picks up edits to exported months
+        with self.db.transaction():
+            self.db.execute("DELETE FROM asset_holdings WHERE snapshot_id = 1")
+        export_history(self.out, full=True, db_path=self.path)
+        with HistoryReader(self.out) as reader:
+            self.assertMatchesDatabase(reader)
+    
+    def test_prices(self):
+        with self.db.transaction():
+            self.db.executemany("INSERT INTO price_history (timestamp, asset, price_usd, interval) VALUES (?, ?, ?, ?)",
+                                [(START + hour * HOUR, asset, hour + 0.5, "60")
+                                 for hour in range(24 * 45) for asset in ("BTC", "ETH")])
+        export_history(self.out, table="prices", db_path=self.path)
+        manifest = json.loads(Path(self.out, "prices", "manifest.json").read_text())
+        self.assertEqual([p["month"] for p in manifest["partitions"]], ["2024-01", "2024-02"])
+        
+        with HistoryReader(self.out, "prices") as reader:
+            eth = reader.read("ETH", START + 24 * HOUR, START + 48 * HOUR - 1)
+            self.assertEqual(list(eth["price_usd"]), [hour + 0.5 for hour in range(24, 48)])
+            self.assertEqual(set(eth["interval"]), {"60"})
+    
+    @unittest.skipUnless(PYARROW_AVAILABLE, "pyarrow not installed")
+    def test_arrow_format(self):
+        self.add_snapshots(0, 24 * 70)
+        export_history(self.out, fmt="arrow", db_path=self.path)
+        self.assertTrue(Path(self.out, "holdings", "2024-02", "part.arrow").exists())
+        with HistoryReader(self.out) as reader:
+            self.assertMatchesDatabase(reader)
+            self.assertMatchesDatabase(reader, to_epoch("2024-01-20T05:00:00"), to_epoch("2024-02-02T00:00:00"))
+    
+    def test_arrow_needs_pyarrow(self):
+        with mock.patch.object(history_columns, "PYARROW_AVAILABLE", False):
+            with self.assertRaises(RuntimeError):
+                export_history(self.out, fmt="arrow", db_path=self.path)
+
+
+
+class TestDeltaSnapshots(HistoryTestCase):
+    def portfolio(self, held):
+        spot = [{"asset": asset, "amount": amount, "price_usd": price, "value_usd": amount * price, "weight": 0.0}
+                for asset, (amount, price) in held.items()]
+        total = sum(h["value_usd"] for h in spot)
+        for holding in spot:
+            holding["weight"] = holding["value_usd"] / total * 100
+        earn = [{"asset": "DOT", "amount": 3.0, "price_usd": 5.0, "value_usd": 15.0, "strategy": "flex"}]
+        return {"total_value_usd": total + 15, "spot_value_usd": total, "earn_value_usd": 15.0,
+                "spot_portfolio": spot, "earn_allocations": earn, "futures_dust": []}
+    
+    def write(self, hours, delta=True):
+        """Snapshots every 9 hours for two accounts; holdings come and go, prices drift"""
+        held = {}
+        with SnapshotWriter(self.db, delta=delta, keyframe_interval=6) as writer:
+            for offset in hours:
+                for asset in ASSETS[:3]:
+                    if self.random.random() < 0.15:
+                        held.pop(asset, None)
+                    elif asset not in held or self.random.random() < 0.3:
+                        held[asset] = (round(self.random.uniform(0.1, 5), 3), round(self.random.uniform(1, 1000), 2))
+                if held:
+                    for account in ("main", "savings"):
+                        writer.add(self.portfolio(held), START + offset * HOUR, account)
+    
+    def expected(self, asset, since=-2 ** 63, until=2 ** 63 - 1):
+        rows = []
+        for snapshot_id, in self.db.query("SELECT id FROM portfolio_snapshots ORDER BY timestamp, id"):
+            snapshot = load_snapshot(self.db, snapshot_id)
+            timestamp = to_epoch(snapshot["snapshot_timestamp"])
+            for key, source in (("spot_portfolio", "spot"), ("earn_allocations", "earn")):
+                rows += [(timestamp, snapshot_id, holding["value_usd"], source, snapshot["account"])
+                         for holding in snapshot[key] if holding["asset"] == asset and since <= timestamp <= until]
+        return rows
+    
+    def test_materializes_delta_chains(self):
+        self.write(range(0, 24 * 40, 9))
+        self.write(range(24 * 40, 24 * 45, 9), delta=False)
+        self.write(range(24 * 45, 24 * 70, 9))
+        full_rows = self.db.query_one("SELECT COUNT(*) FROM asset_holdings")[0]
+        self.assertGreater(full_rows, 0)
+        
+        result = export_history(self.out, db_path=self.path)
+        self.assertEqual(result["partitions"], 3)
+        self.assertGreater(result["rows"], 5 * full_rows)
+        with HistoryReader(self.out) as reader:
+            self.assertEqual(reader.assets(), ["DOT", "SOL", "XETH", "XXBT"])
+            self.assertMatchesDatabase(reader)
+            self.assertMatchesDatabase(reader, to_epoch("2024-01-20T05:00:00"), to_epoch("2024-03-02T00:00:00"))
+            columns = reader.read("XXBT")
+            self.assertTrue(any(columns["allocation_pct"]))
+    
+    def test_incremental_export_resumes_mid_chain(self):
+        self.write(range(0, 24 * 40, 9))
+        export_history(self.out, db_path=self.path)
+        # The open chains continue into February
+        self.write(range(24 * 40, 24 * 50, 9))
+        self.assertEqual(export_history(self.out, db_path=self.path)["partitions_written"], 1)
+        with HistoryReader(self.out) as reader:
+            self.assertMatchesDatabase(reader)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+http_transport.py - Kraken Analyst Skill: HTTP Transport Layer
+
+Pluggable HTTP transports shared by kraken_auth.py and fetch_data.py.
+The default KeepAliveTransport keeps HTTP/1.1 connections open between
+requests, so consecutive API calls skip the TCP and TLS handshakes.
+
+Usage:
+    from http_transport import default_transport
+    
+    transport = default_transport()
+    response = transport.request("GET", "https://api.kraken.com/0/public/Time")
+    print(response.status, response.json())
+
+Transports:
+    - KeepAliveTransport: pooled http.client connections, optional gzip (default)
+    - UrllibTransport: one urllib connection per request (previous behavior)
+
+Environment Variables:
+    KRAKEN_HTTP_TRANSPORT - "keepalive" (default) or "urllib"
+"""
+
+import gzip
+import http.client
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+USER_AGENT = "Kraken-Analyst-Skill/1.0"
+
+
+class TransportError(Exception):
+    """Request could not be completed (connection, TLS or protocol failure)"""
+    
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class HTTPStatusError(TransportError):
+    """Server answered with an HTTP error status (>= 400)"""
+    
+    def __init__(self, code: int, reason: str, body: bytes = b""):
+        super().__init__(reason)
+        self.code = code
+        self.body = body
+
+
+@dataclass
+class Response:
+    """Fully read HTTP response with a decoded body"""
+    status: int
+    reason: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+    
+    def json(self):
+        return json.loads(self.body.decode())
+
+
+def _decode_body(body: bytes, headers: Dict[str, str]) -> bytes:
+    if headers.get("content-encoding", "").lower() == "gzip":
+        return gzip.decompress(body)
+    return body
+
+
+class Transport:
+    """Base class: send one request and return the complete Response"""
+    
+    def request(self, method: str, url: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> Response:
+        """
+        Args:
+            method: HTTP method ("GET", "POST")
+            url: Absolute URL including query string
+            body: Request body bytes
+            headers: Extra request headers
+            timeout: Socket timeout in seconds
+        
+        Raises:
+            HTTPStatusError: Response status >= 400
+            TransportError: Connection or protocol failure
+        """
+        raise NotImplementedError
+    
+    def close(self):
+        """Release any pooled connections"""
+
+
+class UrllibTransport(Transport):
+    """urllib.request transport: a new connection for every request"""
+    
+    def __init__(self, timeout: float = 30):
+        self.timeout = timeout
+    
+    def request(self, method, url, body=None, headers=None, timeout=None) -> Response:
+        req = urllib.request.Request(url, data=body, method=method)
+        req.add_header("User-Agent", USER_AGENT)
+        for name, value in (headers or {}).items():
+            req.add_header(name, value)
+        
+        try:
+            with urllib.request.urlopen(req, timeout=timeout or self.timeout) as response:
+                response_headers = {k.lower(): v for k, v in response.getheaders()}
+                raw = response.read()
+                return Response(response.status, response.reason, response_headers,
+                                _decode_body(raw, response_headers))
+        except urllib.error.HTTPError as e:
+            raise HTTPStatusError(e.code, e.reason, e.read()) from e
+        except urllib.error.URLError as e:
+            raise TransportError(str(e.reason)) from e
+        except (OSError, http.client.HTTPException) as e:
+            raise TransportError(str(e)) from e
+
+
+class KeepAliveTransport(Transport):
+    """
+    Persistent HTTP/1.1 connections pooled per (scheme, host, port).
+    
+    Thread-safe: each request borrows an idle connection (or opens one) and
+    returns it afterwards, keeping at most `max_idle` open per host. A
+    request on a connection the server has silently closed is retried once
+    on a fresh connection.
+    """
+    
+    def __init__(self, timeout: float = 30, gzip: bool = True, max_idle: int = 8):
+        """
+        Args:
+            timeout: Default socket timeout in seconds
+            gzip: Ask for gzip-compressed responses and decode them
+            max_idle: Idle connections kept open per host
+        """
+        self.timeout = timeout
+        self.gzip = gzip
+        self.max_idle = max_idle
+        self._idle: Dict[Tuple[str, str, Optional[int]], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+    
+    def _acquire(self, key, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+            self.connections_opened += 1
+        
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return connection_class(host, port, timeout=timeout), False
+    
+    def _release(self, key, conn: http.client.HTTPConnection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if conn.sock is not None and len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+    
+    def request(self, method, url, body=None, headers=None, timeout=None) -> Response:
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        
+        request_headers = {"User-Agent": USER_AGENT, "Connection": "keep-alive"}
+        if self.gzip:
+            request_headers["Accept-Encoding"] = "gzip"
+        request_headers.update(headers or {})
+        
+        conn, reused = self._acquire(key, timeout or self.timeout)
+        try:
+            try:
+                response = self._send(conn, method, path, body, request_headers)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+                # Idle keep-alive connection was dropped by the server; reconnect once
+                with self._lock:
+                    self.connections_opened += 1
+                response = self._send(conn, method, path, body, request_headers)
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise TransportError(str(e)) from e
+        
+        self._release(key, conn)
+        
+        if response.status >= 400:
+            raise HTTPStatusError(response.status, response.reason, response.body)
+        return response
+    
+    def _send(self, conn, method, path, body, headers) -> Response:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        raw = response.read()
+        response_headers = {k.lower(): v for k, v in response.getheaders()}
+        try:
+            decoded = _decode_body(raw, response_headers)
+        except OSError as e:
+            raise http.client.HTTPException(f"Invalid gzip body: {e}") from e
+        return Response(response.status, response.reason, response_headers, decoded)
+    
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+
+_default_transport: Optional[Transport] = None
+_default_lock = threading.Lock()
+
+
+def default_transport() -> Transport:
+    """Process-wide transport shared by all Kraken clients"""
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None:
+            if os.getenv("KRAKEN_HTTP_TRANSPORT", "keepalive").lower() == "urllib":
+                _default_transport = UrllibTransport()
+            else:
+                _default_transport = KeepAliveTransport()
+        return _default_transport
+
+
+def set_default_transport(transport: Optional[Transport]):
+    """Replace the shared transport (None resets to the environment default)"""
+    global _default_transport
+    with _default_lock:
+        _default_transport = transport
@@ -0,0 +1,194 @@
+import gzip
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from http_transport import HTTPStatusError, KeepAliveTransport, TransportError, UrllibTransport
+from fetch_data import KrakenDataFetcher
+from kraken_auth import KrakenAuth
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python http_transport_test.py
+
+
+def kraken_rows(count, start=1700000000, step=3600):
+    rows = []
+    for i in range(count):
+        price = 30000.0 + i
+        rows.append([start + i * step, f"{price:.2f}", f"{price + 5:.2f}", f"{price - 5:.2f}",
+                     f"{price + 1:.2f}", f"{price:.2f}", "1.5", 10])
+    return rows
+
+
+class StubKrakenHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the Kraken REST API"""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, *args):
+        pass
+    
+    def do_GET(self):
+        self.server.record(self)
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        
+        if parts.path == "/0/public/OHLC":
+            self.send_json({"error": [], "result": {query["pair"]: kraken_rows(50), "last": 1700176400}})
+        elif parts.path == "/0/public/Ticker":
+            pairs = query["pair"].split(",")
+            self.send_json({"error": [], "result": {p: {"c": ["123.45", "1"]} for p in pairs}})
+        elif parts.path == "/status/503":
+            self.send_json({"error": ["unavailable"]}, status=503)
+        elif parts.path == "/drop":
+            # Answer, then close without announcing it (a stale keep-alive connection)
+            self.send_json({"ok": True})
+            self.close_connection = True
+        else:
+            self.send_json({"echo": parts.path})
+    
+    def do_POST(self):
+        self.server.record(self)
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        form = {k: v[0] for k, v in parse_qs(body).items()}
+        
+        if self.headers.get("API-Key") != "key" or "nonce" not in form:
+            self.send_json({"error": ["EAPI:Invalid key"], "result": {}})
+        else:
+            self.send_json({"error": [], "result": {"XXBT": "0.5", "ZUSD": "100.0"}})
+    
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            body = gzip.compress(body)
+        
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubKrakenServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubKrakenHandler)
+        self.connections = set()
+        self.encodings = []
+        self.lock = threading.Lock()
+    
+    def record(self, handler):
+        with self.lock:
+            self.connections.add(handler.client_address)
+            self.encodings.append(handler.headers.get("Accept-Encoding", ""))
+    
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class TransportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = self.start_server()
+        self.transport = KeepAliveTransport(timeout=5)
+    
+    def start_server(self):
+        server = StubKrakenServer()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestKeepAliveTransport(TransportTestCase):
+    def test_reuses_one_connection(self):
+        for i in range(5):
+            response = self.transport.request("GET", f"{self.server.url}/ping/{i}")
+            self.assertEqual(response.json(), {"echo": f"/ping/{i}"})
+        
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(self.transport.connections_opened, 1)
+    
+    def test_gzip_decoded(self):
+        response = self.transport.request("GET", f"{self.server.url}/ping")
+        self.assertEqual(response.headers.get("content-encoding"), "gzip")
+        self.assertEqual(response.json(), {"echo": "/ping"})
+    
+    def test_gzip_disabled(self):
+        transport = KeepAliveTransport(timeout=5, gzip=False)
+        response = transport.request("GET", f"{self.server.url}/ping")
+        transport.close()
+        
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.json(), {"echo": "/ping"})
+        self.assertNotIn("gzip", self.server.encodings[0])
+    
+    def test_reconnects_after_server_close(self):
+        self.transport.request("GET", f"{self.server.url}/drop")
+        response = self.transport.request("GET", f"{self.server.url}/after")
+        
+        self.assertEqual(response.json(), {"echo": "/after"})
+        self.assertEqual(len(self.server.connections), 2)
+    
+    def test_http_error_status(self):
+        with self.assertRaises(HTTPStatusError) as ctx:
+            self.transport.request("GET", f"{self.server.url}/status/503")
+        self.assertEqual(ctx.exception.code, 503)
+        
+        # The connection stays usable after an error response
+        self.transport.request("GET", f"{self.server.url}/ping")
+        self.assertEqual(len(self.server.connections), 1)
+    
+    def test_connection_refused(self):
+        port = self.server.server_address[1]
+        self.server.shutdown()
+        self.server.server_close()
+        
+        with self.assertRaises(TransportError):
+            self.transport.request("GET", f"http://127.0.0.1:{port}/ping")
+        
+        # Restart so tearDown has a server to stop
+        self.server = self.start_server()
+    
+    def test_urllib_transport(self):
+        transport = UrllibTransport(timeout=5)
+        self.assertEqual(transport.request("GET", f"{self.server.url}/ping").json(), {"echo": "/ping"})
+        with self.assertRaises(HTTPStatusError):
+            transport.request("GET", f"{self.server.url}/status/503")
+
+
+class TestClientsUseTransport(TransportTestCase):
+    def test_fetch_data(self):
+        fetcher = KrakenDataFetcher(rate_limit=0, transport=self.transport)
+        fetcher.BASE_URL = f"{self.server.url}/0/public"
+        
+        series = fetcher.fetch_series("BTC/USD", 60, 20)
+        self.assertEqual(len(series), 20)
+        self.assertEqual(series.metadata["pair_kraken"], "XXBTZUSD")
+        
+        fetcher.fetch_series("ETH/USD", 60, 20)
+        self.assertEqual(len(self.server.connections), 1)
+    
+    def test_kraken_auth(self):
+        auth = KrakenAuth(api_key="key", private_key="c2VjcmV0", transport=self.transport)
+        auth.BASE_URL = self.server.url
+        auth.rate_limit = 0
+        
+        self.assertEqual(auth.query_private("Balance"), {"XXBT": "0.5", "ZUSD": "100.0"})
+        ticker = auth.query_public("Ticker", {"pair": "XXBTZUSD,SOLUSD"})
+        self.assertEqual(sorted(ticker), ["SOLUSD", "XXBTZUSD"])
+        self.assertEqual(len(self.server.connections), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
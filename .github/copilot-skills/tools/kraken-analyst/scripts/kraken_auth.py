@@ -29,10 +29,10 @@ import hmac
 import hashlib
 import base64
 import urllib.parse
-import urllib.request
 import json
 from typing import Dict, Optional, Any
 from pathlib import Path
+from http_transport import HTTPStatusError, Transport, TransportError, default_transport
 
 # Load .env file manually if it exists (without requiring python-dotenv)
 def load_env_file():
@@ -58,18 +58,21 @@ class KrakenAuth:
     BASE_URL = "https://api.kraken.com"
     API_VERSION = "0"
     
-    def __init__(self, api_key: Optional[str] = None, private_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, private_key: Optional[str] = None,
+                 transport: Optional[Transport] = None):
         """
         Initialize authentication handler
         
         Args:
             api_key: Kraken API key (or read from KRAKEN_API_KEY env var)
             private_key: Kraken private key base64 (or read from KRAKEN_PRIVATE_KEY env var)
+            transport: HTTP transport (default: shared keep-alive transport)
         """
         self.api_key = api_key or os.getenv("KRAKEN_API_KEY", "")
         self.private_key = private_key or os.getenv("KRAKEN_PRIVATE_KEY", "")
         self.rate_limit = float(os.getenv("RATE_LIMIT", "0.5"))
         self.last_request_time = 0
+        self.transport = transport or default_transport()
     
     def is_authenticated(self) -> bool:
         """Check if API credentials are configured"""
@@ -148,22 +151,20 @@ class KrakenAuth:
         
         try:
             postdata = urllib.parse.urlencode(data).encode()
-            request = urllib.request.Request(url, data=postdata, headers=headers)
+            response_data = self.transport.request("POST", url, body=postdata, headers=headers,
+                                                   timeout=30).json()
             
-            with urllib.request.urlopen(request, timeout=30) as response:
-                response_data = json.loads(response.read().decode())
-                
-                # Check for API errors
-                if response_data.get("error") and len(response_data["error"]) > 0:
-                    print(f"ERROR: Kraken API error: {response_data['error']}", file=sys.stderr)
-                    return None
-                
-                return response_data.get("result")
-        
-        except urllib.error.HTTPError as e:
+            # Check for API errors
+            if response_data.get("error") and len(response_data["error"]) > 0:
+                print(f"ERROR: Kraken API error: {response_data['error']}", file=sys.stderr)
+                return None
+            
+            return response_data.get("result")
+        
+        except HTTPStatusError as e:
             print(f"ERROR: HTTP {e.code} - {e.reason}", file=sys.stderr)
             return None
-        except urllib.error.URLError as e:
+        except TransportError as e:
             print(f"ERROR: Connection failed - {e.reason}", file=sys.stderr)
             return None
         except Exception as e:
@@ -190,19 +191,18 @@ class KrakenAuth:
         self._rate_limit_wait()
         
         try:
-            with urllib.request.urlopen(url, timeout=30) as response:
-                response_data = json.loads(response.read().decode())
-                
-                if response_data.get("error") and len(response_data["error"]) > 0:
-                    print(f"ERROR: Kraken API error: {response_data['error']}", file=sys.stderr)
-                    return None
-                
-                return response_data.get("result")
-        
-        except urllib.error.HTTPError as e:
+            response_data = self.transport.request("GET", url, timeout=30).json()
+            
+            if response_data.get("error") and len(response_data["error"]) > 0:
+                print(f"ERROR: Kraken API error: {response_data['error']}", file=sys.stderr)
+                return None
+            
+            return response_data.get("result")
+        
+        except HTTPStatusError as e:
             print(f"ERROR: HTTP {e.code} - {e.reason}", file=sys.stderr)
             return None
-        except urllib.error.URLError as e:
+        except TransportError as e:
             print(f"ERROR: Connection failed - {e.reason}", file=sys.stderr)
             return None
         except Exception as e:
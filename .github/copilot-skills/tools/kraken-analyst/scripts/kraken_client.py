@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+kraken_client.py - Kraken Analyst Skill: Thin Client for analysis_server.py
+
+Same flags and output as the individual scripts, but the work is done by a
+running analysis_server.py (warm imports, cached candles and indicator
+states). Only the standard library's HTTP client is imported here, so a
+call costs little more than interpreter start-up and one local request.
+
+If the server is not reachable, or a flag is only supported by the script
+itself (e.g. apply_rules.py --batch), the script is run in-process instead,
+so commands always work. As in the scripts, analyze/advanced --pair read
+the candle store offline (every stored candle unless --count is given).
+
+Usage:
+    python kraken_client.py fetch --pair BTC/USD --interval 60 --count 100
+    python kraken_client.py analyze --pair BTC/USD --interval 240
+    python kraken_client.py fetch --pair ETH/USD | python kraken_client.py analyze | python kraken_client.py format
+    python kraken_client.py advanced --pair BTC/USD --format text
+    python kraken_client.py optimize --optimize risk-parity < portfolio.json
+    python kraken_client.py health
+
+Commands (script):
+    fetch (fetch_data.py), analyze (apply_rules.py), advanced (advanced_analysis.py),
+    optimize (portfolio_optimizer.py), format (format_output.py)
+
+Environment Variables:
+    KRAKEN_ANALYST_SERVER - Server URL (default: http://127.0.0.1:8765)
+"""
+
+import argparse
+import http.client
+import importlib
+import io
+import json
+import os
+import sys
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_SERVER = "http://127.0.0.1:8765"
+
+# command -> (script module, reads a JSON document from stdin without --pair)
+COMMANDS = {
+    "fetch": ("fetch_data", False),
+    "analyze": ("apply_rules", True),
+    "advanced": ("advanced_analysis", True),
+    "optimize": ("portfolio_optimizer", True),
+    "format": ("format_output", True)
+}
+
+
+class Unsupported(Exception):
+    """Flag combination the server does not handle; run the script instead"""
+
+
+class QuietParser(argparse.ArgumentParser):
+    """Raise instead of exiting so unknown flags fall back to the script"""
+    
+    def error(self, message):
+        raise Unsupported(message)
+
+
+def build_parser(command: str) -> argparse.ArgumentParser:
+    """Subset of the script's own flags that the server implements"""
+    parser = QuietParser(prog=f"kraken_client.py {command}", add_help=False)
+    
+    if command in ("fetch", "analyze", "advanced"):
+        parser.add_argument("--pair")
+        parser.add_argument("--interval", type=int, default=60)
+        parser.add_argument("--count", type=int)
+        parser.add_argument("--base-interval", type=int)
+    
+    if command in ("analyze", "advanced"):
+        parser.add_argument("--store")
+    
+    if command == "fetch":
+        parser.add_argument("--columnar", action="store_true")
+    elif command == "analyze":
+        parser.add_argument("--momentum-threshold", type=float)
+        parser.add_argument("--volatility-threshold", type=float)
+        parser.add_argument("--rsi-period", type=int)
+        parser.add_argument("--ma-fast", type=int)
+        parser.add_argument("--ma-slow", type=int)
+        parser.add_argument("--rsi-smoothing", choices=["simple", "wilder"])
+    elif command == "advanced":
+        parser.add_argument("--format", choices=["json", "text"], default="json")
+        parser.add_argument("--backend", choices=["auto", "fused", "numpy", "python"], default="auto")
+        parser.add_argument("--ichimoku-timeframes")
+    elif command == "optimize":
+        parser.add_argument("--format", choices=["json", "text"], default="json")
+        parser.add_argument("--risk-free-rate", type=float, default=0.02)
+        parser.add_argument("--optimize", choices=["min-variance", "max-sharpe", "risk-parity"])
+        parser.add_argument("--min-weight", type=float, default=0.0)
+        parser.add_argument("--max-weight", type=float, default=1.0)
+    elif command == "format":
+        parser.add_argument("--format", choices=["markdown", "text", "json"], default="markdown")
+        parser.add_argument("--include-charts", action="store_true")
+    return parser
+
+
+def build_request(command: str, argv) -> Tuple[str, Optional[str]]:
+    """
+    JSON request body for a command line.
+    
+    stdin is embedded as-is rather than parsed and re-serialized here; the
+    server validates it.
+    
+    Returns:
+        (request body, stdin text or None)
+    
+    Raises:
+        Unsupported: The server does not implement one of the flags
+    """
+    args = build_parser(command).parse_args(argv)
+    options = {k: v for k, v in vars(args).items() if v is not None}
+    
+    if command in ("analyze", "advanced") and "pair" in options:
+        # The scripts' --pair: stored candles only (all of them without --count)
+        options["stored"] = True
+        if "store" in options:
+            options["store"] = os.path.abspath(options["store"])
+    
+    reads_stdin = COMMANDS[command][1] and "pair" not in options
+    if command == "fetch" and "pair" not in options:
+        raise Unsupported("--pair is required")
+    
+    body = json.dumps(options)
+    document = None
+    if reads_stdin:
+        document = sys.stdin.read()
+        if not document.strip():
+            raise Unsupported("empty stdin")
+        body = body[:-1] + (", " if options else "") + '"document": ' + document + "}"
+    return body, document
+
+
+def post(server: str, path: str, body: str, timeout: float = 120.0):
+    """
+    Send one request.
+    
+    Returns:
+        (status, response text)
+    
+    Raises:
+        ConnectionError / OSError: Server not reachable
+    """
+    parts = urlsplit(server)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    try:
+        if body is None:
+            connection.request("GET", path)
+        else:
+            connection.request("POST", path, body=body.encode(),
+                               headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, response.read().decode()
+    finally:
+        connection.close()
+
+
+def run_locally(command: str, argv, stdin_text=None) -> int:
+    """Run the script's own main() in this process"""
+    module_name = COMMANDS[command][0]
+    if stdin_text is not None:
+        sys.stdin = io.StringIO(stdin_text)
+    sys.argv = [f"{module_name}.py"] + list(argv)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    result = importlib.import_module(module_name).main()
+    return result or 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run kraken-analyst commands on a resident analysis_server.py",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        usage="kraken_client.py [--server URL] [--local] {fetch,analyze,advanced,optimize,format,health} [script flags]",
+        epilog="""
+Examples:
+  python kraken_client.py fetch --pair BTC/USD --interval 60 --count 100
+  python kraken_client.py analyze --pair BTC/USD --interval 240 --count 200
+  python kraken_client.py fetch --pair ETH/USD | python kraken_client.py analyze | python kraken_client.py format
+  python kraken_client.py advanced --pair SOL/USD --count 300 --format text
+  python kraken_client.py health
+
+Script flags are the same as for fetch_data.py, apply_rules.py, advanced_analysis.py,
+portfolio_optimizer.py and format_output.py. Start the server with: python analysis_server.py
+        """
+    )
+    parser.add_argument("--server", default=os.environ.get("KRAKEN_ANALYST_SERVER", DEFAULT_SERVER),
+                        help=f"Server URL (default: $KRAKEN_ANALYST_SERVER or {DEFAULT_SERVER})")
+    parser.add_argument("--local", action="store_true", help="Run the script in-process, without the server")
+    parser.add_argument("command", choices=list(COMMANDS) + ["health"])
+    args, script_argv = parser.parse_known_args()
+    
+    if args.command == "health":
+        try:
+            status, text = post(args.server, "/health", None, timeout=5)
+        except OSError as e:
+            print(f"ERROR: Server not reachable at {args.server}: {e}", file=sys.stderr)
+            return 1
+        print(json.dumps(json.loads(text), indent=2))
+        return 0 if status == 200 else 1
+    
+    if args.local or "-h" in script_argv or "--help" in script_argv:
+        return run_locally(args.command, script_argv)
+    
+    try:
+        body, document = build_request(args.command, script_argv)
+    except Unsupported:
+        return run_locally(args.command, script_argv)
+    
+    try:
+        status, text = post(args.server, f"/{args.command}", body)
+    except OSError:
+        # No server: same result, just without the warm cache
+        return run_locally(args.command, script_argv, stdin_text=document)
+    
+    if status != 200:
+        try:
+            message = json.loads(text)["error"]
+        except (ValueError, KeyError, TypeError):
+            message = text
+        print(f"ERROR: {message}", file=sys.stderr)
+        return 1
+    
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,670 @@
+#!/usr/bin/env python3
+"""
+live_feed.py - Kraken Analyst Skill: Live WebSocket Candle Feed
+
+Subscribes to Kraken's WebSocket API (v2 `ohlc` channel, optionally
+`ticker`) for a set of pairs and keeps each pair's candles in memory.
+Every candle that closes is written to the local candle store and pushed
+into the pair's StreamingIndicators, so a fresh apply_rules.py signal is
+available as soon as the candle closes instead of at the next REST poll.
+
+With --base-interval, the feed subscribes to (and stores) the base interval
+and builds --interval candles from it incrementally with resample.Resampler;
+a bucket is analyzed as soon as its last base candle closes.
+
+Usage:
+    python live_feed.py --pairs BTC/USD,ETH/USD --interval 1
+    python live_feed.py --pairs BTC/USD --interval 5 --ticker --duration 3600 > signals.ndjson
+    python live_feed.py --pairs BTC/USD --base-interval 1 --interval 15
+    
+    from live_feed import LiveFeed
+    feed = LiveFeed(["BTC/USD"], interval=1, store=CandleStore())
+    asyncio.run(feed.run())
+
+Outputs:
+    NDJSON, one apply_rules.py analysis per pair each time candles close
+    (plus {"pair", "ticker"} lines with --ticker)
+
+The WebSocket client is a minimal RFC 6455 implementation on asyncio
+streams (text frames, fragmentation, ping/pong, close), so no third-party
+package is needed. Reconnects back off exponentially; the `ohlc` snapshot
+sent after each subscription fills candles missed while disconnected.
+"""
+
+import argparse
+import asyncio
+import base64
+import calendar
+import hashlib
+import json
+import os
+import signal
+import ssl
+import struct
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from apply_rules import AnalysisResult, KrakenAnalyzer
+from candle_store import CandleStore
+from fetch_data import KrakenDataFetcher
+from ohlc_series import OHLCSeries
+from resample import Resampler
+
+KRAKEN_WS_URL = "wss://ws.kraken.com/v2"
+
+# RFC 6455 constants
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+# Reconnect backoff bounds (seconds)
+RECONNECT_MIN = 1.0
+RECONNECT_MAX = 60.0
+
+Candle = Tuple[int, float, float, float, float, float, float, int]
+
+
+class WebSocketClosed(Exception):
+    """The peer closed the WebSocket (or the handshake failed)"""
+    
+    def __init__(self, reason: str, code: Optional[int] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.code = code
+
+
+def _apply_mask(data: bytes, key: bytes) -> bytes:
+    """XOR payload with the 4-byte masking key (as one big integer, not per byte)"""
+    n = len(data)
+    if not n:
+        return data
+    repeated = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(data, "big") ^ int.from_bytes(repeated, "big")).to_bytes(n, "big")
+
+
+def encode_frame(opcode: int, payload: bytes = b"", mask: bool = True, fin: bool = True) -> bytes:
+    """
+    Serialize one frame. Clients must mask (RFC 6455 5.3), servers must not.
+    """
+    header = bytearray([(0x80 if fin else 0) | opcode])
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 65536:
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", length)
+    
+    if mask:
+        key = os.urandom(4)
+        header += key
+        payload = _apply_mask(payload, key)
+    return bytes(header) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[bool, int, bytes]:
+    """
+    Read one frame.
+    
+    Returns:
+        (fin, opcode, unmasked payload)
+    
+    Raises:
+        asyncio.IncompleteReadError: Connection closed mid-frame
+        WebSocketClosed: Frame exceeds MAX_MESSAGE_SIZE
+    """
+    head = await reader.readexactly(2)
+    fin = bool(head[0] & 0x80)
+    opcode = head[0] & 0x0F
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if length > MAX_MESSAGE_SIZE:
+        raise WebSocketClosed(f"Frame of {length} bytes exceeds limit", 1009)
+    
+    key = await reader.readexactly(4) if head[1] & 0x80 else None
+    payload = await reader.readexactly(length)
+    if key:
+        payload = _apply_mask(payload, key)
+    return fin, opcode, payload
+
+
+def accept_key(key: str) -> str:
+    """Sec-WebSocket-Accept value for a Sec-WebSocket-Key"""
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+
+class WebSocketConnection:
+    """Client side of one WebSocket connection (text messages only)"""
+    
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.closed = False
+    
+    @classmethod
+    async def connect(cls, url: str, timeout: float = 10.0) -> "WebSocketConnection":
+        """
+        Open a ws:// or wss:// connection and complete the opening handshake.
+        
+        Raises:
+            WebSocketClosed: Server refused the upgrade
+            OSError / asyncio.TimeoutError: Connection failed
+        """
+        parts = urlsplit(url)
+        secure = parts.scheme == "wss"
+        port = parts.port or (443 if secure else 80)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, port, ssl=ssl.create_default_context() if secure else None),
+            timeout
+        )
+        
+        key = base64.b64encode(os.urandom(16)).decode()
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        writer.write((
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n"
+            "\r\n"
+        ).encode())
+        
+        try:
+            response = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            writer.close()
+            raise WebSocketClosed(f"Handshake failed: {e}")
+        
+        lines = response.decode("latin-1").split("\r\n")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        
+        status = lines[0].split(" ", 2)
+        if len(status) < 2 or status[1] != "101":
+            writer.close()
+            raise WebSocketClosed(f"Handshake refused: {lines[0]}")
+        if headers.get("sec-websocket-accept") != accept_key(key):
+            writer.close()
+            raise WebSocketClosed("Handshake failed: bad Sec-WebSocket-Accept")
+        
+        return cls(reader, writer)
+    
+    async def send(self, text: str):
+        self.writer.write(encode_frame(OP_TEXT, text.encode()))
+        await self.writer.drain()
+    
+    async def recv(self) -> str:
+        """
+        Next complete text message. Pings are answered and pongs skipped.
+        
+        Raises:
+            WebSocketClosed: Close frame received
+            asyncio.IncompleteReadError: Connection dropped
+        """
+        fragments: List[bytes] = []
+        size = 0
+        while True:
+            fin, opcode, payload = await read_frame(self.reader)
+            
+            if opcode == OP_PING:
+                self.writer.write(encode_frame(OP_PONG, payload))
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                code = struct.unpack("!H", payload[:2])[0] if len(payload) >= 2 else None
+                await self.close(code or 1000)
+                raise WebSocketClosed(payload[2:].decode(errors="replace") or "closed by server", code)
+            
+            size += len(payload)
+            if size > MAX_MESSAGE_SIZE:
+                raise WebSocketClosed(f"Message exceeds {MAX_MESSAGE_SIZE} bytes", 1009)
+            fragments.append(payload)
+            if fin:
+                return b"".join(fragments).decode()
+    
+    async def close(self, code: int = 1000):
+        """Send a close frame (once) and close the socket"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.writer.write(encode_frame(OP_CLOSE, struct.pack("!H", code)))
+            await self.writer.drain()
+        except (ConnectionError, RuntimeError):
+            pass
+        self.abort()
+    
+    def abort(self):
+        """Close the socket without a closing handshake (wakes up recv)"""
+        self.closed = True
+        self.writer.close()
+
+
+def parse_rfc3339(value: str) -> int:
+    """Unix seconds for an RFC 3339 UTC timestamp (sub-second digits ignored)"""
+    return calendar.timegm(time.strptime(value[:19], "%Y-%m-%dT%H:%M:%S"))
+
+
+class PairState:
+    """
+    In-memory candles and indicator state for one subscribed pair.
+    
+    `forming` and `pending` hold subscribed (base) candles; `series` and the
+    stream hold analysis candles, which are the base candles themselves or,
+    with a resampler, the buckets built from them.
+    """
+    
+    def __init__(self, symbol: str, api_pair: str, interval: int, stream, max_candles: int,
+                 resampler: Optional[Resampler] = None):
+        self.symbol = symbol
+        self.api_pair = api_pair
+        self.series = OHLCSeries(symbol, resampler.interval if resampler else interval,
+                                 metadata={"pair_kraken": api_pair})
+        self.forming: Optional[Candle] = None
+        self.stream = stream
+        self.max_candles = max_candles
+        self.pending: List[Candle] = []
+        self.resampler = resampler
+        self.base_width = interval * 60
+        self.advanced = False
+        self.last_closed: Optional[int] = None  # newest closed base candle
+    
+    def apply(self, candle: Candle) -> bool:
+        """
+        Fold one candle update in.
+        
+        Returns:
+            True if the previously forming candle closed
+        """
+        timestamp = candle[0]
+        forming = self.forming
+        
+        if forming is not None and timestamp == forming[0]:
+            self.forming = candle
+            return False
+        if (forming is not None and timestamp < forming[0]) or \
+                (self.last_closed is not None and timestamp <= self.last_closed):
+            return False  # Stale update for a candle that already closed
+        
+        self.forming = candle
+        if forming is None:
+            return False
+        
+        self._close(forming)
+        return True
+    
+    def _close(self, candle: Candle):
+        self.pending.append(candle)
+        self.last_closed = candle[0]
+        if self.resampler is None:
+            self._advance(candle)
+            return
+        bucket = self.bucket(candle)
+        if bucket is not None:
+            self._advance(bucket)
+    
+    def bucket(self, candle: Candle) -> Optional[Candle]:
+        """Push a closed base candle into the resampler; returns the bucket it completed, if any"""
+        resampler = self.resampler
+        closed = resampler.push(*candle)
+        # The base candle that ends a bucket completes it without waiting for the next one
+        if closed is None and candle[0] + self.base_width == resampler.current[0] + resampler.interval * 60:
+            closed = resampler.flush()
+        return closed
+    
+    def _advance(self, candle: Candle):
+        self.series.append(*candle)
+        self.advanced = True
+        
+        stream = self.stream
+        if stream.last_timestamp is None or candle[0] > stream.last_timestamp:
+            stream.push(candle[0], candle[1], candle[4], candle[6])
+        
+        # Trim in chunks so the arrays are not copied on every candle
+        if len(self.series) > 2 * self.max_candles:
+            self.series = self.series.tail(self.max_candles)
+
+
+class LiveFeed:
+    """
+    Kraken WebSocket ohlc subscriber feeding the candle store and KrakenAnalyzer.
+    
+    handle_message() does all the bookkeeping for one decoded message and
+    is independent of the connection, so recorded messages can be replayed
+    through it directly.
+    """
+    
+    def __init__(self, pairs: List[str], interval: int = 1, analyzer: Optional[KrakenAnalyzer] = None,
+                 store: Optional[CandleStore] = None, url: str = KRAKEN_WS_URL, window: int = 720,
+                 ticker: bool = False, timeout: float = 30.0, reconnect_delay: float = RECONNECT_MIN,
+                 on_result: Optional[Callable[[AnalysisResult], None]] = None,
+                 on_ticker: Optional[Callable[[str, Dict], None]] = None,
+                 base_interval: Optional[int] = None):
+        """
+        Args:
+            pairs: Pairs in WebSocket v2 form (e.g., "BTC/USD")
+            interval: Analyzed candle interval in minutes (a Kraken OHLC interval
+                      unless base_interval is given)
+            analyzer: KrakenAnalyzer whose periods the streams use (default settings if None)
+            store: CandleStore to seed from and persist closed candles to
+            url: WebSocket endpoint
+            window: Candles retained per pair (as with a 720-candle REST fetch)
+            ticker: Also subscribe to the ticker channel
+            timeout: Seconds without any message before reconnecting (Kraken sends heartbeats)
+            reconnect_delay: First reconnect delay; doubles up to RECONNECT_MAX
+            on_result: Called with each AnalysisResult
+            on_ticker: Called with (pair, ticker fields) for each ticker update
+            base_interval: Subscribe to and store this Kraken OHLC interval and
+                           build `interval` candles from it locally
+        
+        Raises:
+            ValueError: Unsupported interval, interval not a multiple of base_interval,
+                        or pair without a slash
+        """
+        fetcher = KrakenDataFetcher(rate_limit=0)
+        if base_interval == interval:
+            base_interval = None
+        subscribed = base_interval or interval
+        if not fetcher.validate_interval(subscribed):
+            raise ValueError(f"Invalid interval {subscribed}. Valid: {list(fetcher.VALID_INTERVALS.keys())}")
+        if base_interval is not None:
+            Resampler(interval, base_interval)  # validates the pair of intervals
+        
+        self.interval = interval
+        self.base_interval = subscribed
+        self.analyzer = analyzer or KrakenAnalyzer()
+        self.store = store
+        self.url = url
+        self.window = window
+        self.ticker = ticker
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.on_result = on_result
+        self.on_ticker = on_ticker
+        self.tickers: Dict[str, Dict] = {}
+        self.messages = 0
+        
+        self.pairs: Dict[str, PairState] = {}
+        for pair in pairs:
+            symbol = pair.upper()
+            if "/" not in symbol:
+                raise ValueError(f"WebSocket pairs use BASE/QUOTE form (e.g. BTC/USD), got {pair}")
+            api_pair = fetcher._normalize_pair(symbol)
+            stream = self.analyzer.create_stream(symbol, window)
+            resampler = Resampler(interval, base_interval) if base_interval else None
+            self.pairs[symbol] = PairState(symbol, api_pair, subscribed, stream, window, resampler)
+        
+        self._connection: Optional[WebSocketConnection] = None
+        self._stopping = False
+        self._stopped = asyncio.Event()
+        
+        if store is not None:
+            self._seed_from_store()
+    
+    def _seed_from_store(self):
+        """
+        Warm up each stream from stored history. The newest stored candle
+        may have been forming when saved, so it becomes the forming candle.
+        With a base interval, the stored base candles are replayed through
+        the resampler, which also rebuilds the bucket in progress.
+        """
+        per_bucket = self.interval // self.base_interval
+        for state in self.pairs.values():
+            # One extra bucket absorbs a partial bucket at the start of the window
+            stored = self.store.load(state.api_pair, self.base_interval, count=(self.window + 1) * per_bucket + 1,
+                                     display_pair=state.symbol)
+            if not len(stored):
+                continue
+            closed = stored[:-1]
+            state.last_closed = closed.timestamp[-1] if len(closed) else None
+            if state.resampler is not None:
+                for row in zip(*(getattr(closed, name) for name in OHLCSeries.COLUMNS)):
+                    bucket = state.bucket(row)
+                    if bucket is not None:
+                        state.series.append(*bucket)
+                closed = state.series
+            state.series = closed.tail(self.window)
+            state.stream.seed_series(state.series)
+            state.forming = tuple(getattr(stored, name)[-1] for name in OHLCSeries.COLUMNS)
+    
+    def subscriptions(self) -> List[Dict]:
+        """Subscribe requests sent after every (re)connect"""
+        symbols = list(self.pairs)
+        messages = [{
+            "method": "subscribe",
+            "params": {"channel": "ohlc", "symbol": symbols, "interval": self.base_interval, "snapshot": True}
+        }]
+        if self.ticker:
+            messages.append({"method": "subscribe", "params": {"channel": "ticker", "symbol": symbols}})
+        return messages
+    
+    def handle_message(self, message: Dict) -> List[AnalysisResult]:
+        """
+        Apply one decoded WebSocket message.
+        
+        Candles that closed are saved to the store in one transaction per
+        pair, then every pair with new closed analysis candles is re-analyzed
+        once.
+        
+        Returns:
+            AnalysisResults produced by this message (pairs with enough history only)
+        
+        Raises:
+            RuntimeError: The server rejected a subscription
+        """
+        self.messages += 1
+        
+        if message.get("method") == "subscribe" and not message.get("success", True):
+            raise RuntimeError(f"Subscription rejected: {message.get('error', 'unknown error')}")
+        
+        channel = message.get("channel")
+        if channel == "ticker":
+            for entry in message.get("data", []):
+                symbol = entry.get("symbol")
+                if symbol in self.pairs:
+                    self.tickers[symbol] = entry
+                    if self.on_ticker:
+                        self.on_ticker(symbol, entry)
+            return []
+        if channel != "ohlc":
+            return []  # heartbeat, status, pong and subscribe acknowledgements
+        
+        changed = []
+        for entry in message.get("data", []):
+            state = self.pairs.get(entry.get("symbol"))
+            if state is None or int(entry.get("interval", self.base_interval)) != self.base_interval:
+                continue
+            candle = (
+                parse_rfc3339(entry["interval_begin"]),
+                float(entry["open"]), float(entry["high"]), float(entry["low"]), float(entry["close"]),
+                float(entry.get("vwap", 0)), float(entry.get("volume", 0)), int(entry.get("trades", 0))
+            )
+            if state.apply(candle) and state not in changed:
+                changed.append(state)
+        
+        results = []
+        for state in changed:
+            self._persist(state)
+            if not state.advanced:
+                continue
+            state.advanced = False
+            if state.stream.candles >= self.analyzer.ma_slow + 20:
+                result = self.analyzer.analyze_stream(state.stream)
+                if result is not None:
+                    results.append(result)
+                    if self.on_result:
+                        self.on_result(result)
+        return results
+    
+    def _persist(self, state: PairState):
+        if self.store is not None and state.pending:
+            closed = OHLCSeries(state.symbol, self.base_interval,
+                                dict(zip(OHLCSeries.COLUMNS, zip(*state.pending))))
+            # REST syncs resume after the newest closed candle
+            self.store.save(state.api_pair, self.base_interval, closed, last_cursor=state.pending[-1][0])
+        state.pending = []
+    
+    def series(self, pair: str) -> OHLCSeries:
+        """Closed in-memory candles at `interval` for a pair (the forming candle is excluded)"""
+        return self.pairs[pair.upper()].series
+    
+    def stop(self):
+        """Ask run() to return; safe to call from signal handlers and callbacks"""
+        self._stopping = True
+        self._stopped.set()
+        if self._connection is not None:
+            self._connection.abort()
+    
+    async def run(self, reconnect: bool = True):
+        """
+        Connect, subscribe and process messages until stop() is called.
+        
+        Args:
+            reconnect: Reconnect after disconnects (False returns when the connection ends)
+        """
+        delay = self.reconnect_delay
+        while not self._stopping:
+            try:
+                self._connection = await WebSocketConnection.connect(self.url, timeout=self.timeout)
+                connection = self._connection
+                for request in self.subscriptions():
+                    await connection.send(json.dumps(request))
+                
+                while True:
+                    text = await asyncio.wait_for(connection.recv(), self.timeout)
+                    try:
+                        message = json.loads(text)
+                    except json.JSONDecodeError:
+                        print(f"WARNING: Ignoring non-JSON message: {text[:80]!r}", file=sys.stderr)
+                        continue
+                    self.handle_message(message)
+                    delay = self.reconnect_delay
+            except (WebSocketClosed, OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                if self._stopping:
+                    break
+                reason = getattr(e, "reason", None) or type(e).__name__
+                if not reconnect:
+                    print(f"WARNING: WebSocket connection ended ({reason})", file=sys.stderr)
+                    break
+                print(f"WARNING: WebSocket connection lost ({reason}); reconnecting in {delay:.0f}s",
+                      file=sys.stderr)
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, RECONNECT_MAX)
+            finally:
+                if self._connection is not None:
+                    await self._connection.close()
+                    self._connection = None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stream Kraken WebSocket candles into the candle store and analyzer",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python live_feed.py --pairs BTC/USD,ETH/USD --interval 1
+  python live_feed.py --pairs BTC/USD --interval 5 --ticker --duration 3600 > signals.ndjson
+  python live_feed.py --pairs SOL/USD --no-store --momentum-threshold 1.5
+  python live_feed.py --pairs BTC/USD --base-interval 1 --interval 15
+
+Seed the store first (python fetch_data.py --pair BTC/USD --interval 1 --store)
+so signals start immediately instead of after ma-slow + 20 live candles.
+        """
+    )
+    parser.add_argument("--pairs", required=True, help="Comma-separated pairs in BASE/QUOTE form")
+    parser.add_argument("--interval", type=int, default=1, help="Candle interval in minutes (default: 1)")
+    parser.add_argument("--base-interval", type=int, metavar="MINUTES",
+                        help="Subscribe to (and store) this interval and build --interval from it locally")
+    parser.add_argument("--store", type=str, help="Candle store path (default: candle_store.db)")
+    parser.add_argument("--no-store", action="store_true", help="Keep candles in memory only")
+    parser.add_argument("--window", type=int, default=720, help="Candles retained per pair (default: 720)")
+    parser.add_argument("--ticker", action="store_true", help="Also subscribe to ticker updates and print them")
+    parser.add_argument("--url", default=KRAKEN_WS_URL, help=f"WebSocket endpoint (default: {KRAKEN_WS_URL})")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--momentum-threshold", type=float, default=2.0, help="Momentum threshold (default: 2.0)")
+    parser.add_argument("--volatility-threshold", type=float, default=2.5, help="Volatility threshold (default: 2.5)")
+    parser.add_argument("--rsi-period", type=int, default=14, help="RSI period (default: 14)")
+    parser.add_argument("--ma-fast", type=int, default=12, help="Fast MA period (default: 12)")
+    parser.add_argument("--ma-slow", type=int, default=26, help="Slow MA period (default: 26)")
+    parser.add_argument("--rsi-smoothing", choices=["simple", "wilder"], default="simple",
+                        help="RSI averaging (default: simple)")
+    args = parser.parse_args()
+    
+    analyzer = KrakenAnalyzer(
+        momentum_threshold=args.momentum_threshold,
+        volatility_threshold=args.volatility_threshold,
+        rsi_period=args.rsi_period,
+        ma_fast=args.ma_fast,
+        ma_slow=args.ma_slow,
+        rsi_smoothing=args.rsi_smoothing
+    )
+    
+    def print_result(result: AnalysisResult):
+        print(json.dumps(result.to_dict()), flush=True)
+    
+    def print_ticker(pair: str, ticker: Dict):
+        print(json.dumps({"pair": pair, "ticker": ticker}), flush=True)
+    
+    pairs = [pair.strip() for pair in args.pairs.split(",") if pair.strip()]
+    store = None if args.no_store else CandleStore(args.store)
+    
+    try:
+        feed = LiveFeed(pairs, args.interval, analyzer=analyzer, store=store, url=args.url,
+                        window=args.window, ticker=args.ticker, on_result=print_result,
+                        on_ticker=print_ticker if args.ticker else None, base_interval=args.base_interval)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    
+    async def run_feed():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, feed.stop)
+            except NotImplementedError:
+                pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+        if args.duration:
+            loop.call_later(args.duration, feed.stop)
+        await feed.run()
+    
+    source = f" from {feed.base_interval}m candles" if feed.base_interval != feed.interval else ""
+    print(f"📡 Streaming {', '.join(feed.pairs)} ({args.interval}m{source}) from {args.url}", file=sys.stderr)
+    try:
+        asyncio.run(run_feed())
+    except RuntimeError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store:
+            store.close()
+    
+    print(f"✓ Processed {feed.messages} messages", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
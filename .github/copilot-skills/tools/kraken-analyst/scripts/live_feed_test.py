@@ -0,0 +1,298 @@
+import asyncio
+import json
+import os
+import struct
+import tempfile
+import time
+import unittest
+
+from apply_rules import KrakenAnalyzer
+from candle_store import CandleStore
+from resample import resample_series
+from live_feed import (OP_CLOSE, OP_CONTINUATION, OP_PING, OP_PONG, OP_TEXT, LiveFeed,
+                       accept_key, encode_frame, read_frame)
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python live_feed_test.py
+
+START = 1700000040  # A minute boundary
+
+
+def ohlc_entry(index, close=None, symbol="BTC/USD", interval=1):
+    """One Kraken WS v2 ohlc data entry for candle `index`"""
+    price = 30000.0 + 25 * ((index * 7) % 11) + index if close is None else close
+    begin = START + index * 60 * interval
+    return {
+        "symbol": symbol,
+        "open": price - 3,
+        "high": price + 10,
+        "low": price - 10,
+        "close": price,
+        "trades": 5 + index % 3,
+        "volume": 1.0 + (index % 5) / 4,
+        "vwap": price - 1,
+        "interval_begin": time.strftime("%Y-%m-%dT%H:%M:%S.000000000Z", time.gmtime(begin)),
+        "interval": interval,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S.000000Z", time.gmtime(begin + 30))
+    }
+
+
+def ohlc_message(entries, kind="update"):
+    return {"channel": "ohlc", "type": kind, "timestamp": "2023-11-14T22:14:00.000000Z", "data": entries}
+
+
+SUBSCRIBE_ACK = {"method": "subscribe", "success": True,
+                 "result": {"channel": "ohlc", "symbol": "BTC/USD", "interval": 1, "snapshot": True}}
+HEARTBEAT = {"channel": "heartbeat"}
+
+
+async def read_client_frame(reader):
+    """Parse one client frame by hand: (masked, unmasked payload)"""
+    head = await reader.readexactly(2)
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    masked = bool(head[1] & 0x80)
+    key = await reader.readexactly(4) if masked else b"\0\0\0\0"
+    data = await reader.readexactly(length)
+    return masked, bytes(b ^ key[i % 4] for i, b in enumerate(data))
+
+
+class ReplayServer:
+    """
+    Stand-in for Kraken's WebSocket API. Each connection answers the
+    handshake, reads the subscribe requests and replays one recorded session
+    (then sends a close frame, or drops the socket if the session ends with
+    "drop"). Messages can be split into fragments with a ping in between.
+    """
+    
+    def __init__(self, sessions, subscriptions=1, fragment=False):
+        self.sessions = list(sessions)
+        self.expected_subscriptions = subscriptions
+        self.fragment = fragment
+        self.subscriptions = []
+        self.pongs = 0
+        self.client_masked = True
+        self.connections = 0
+    
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self
+    
+    @property
+    def url(self):
+        return f"ws://127.0.0.1:{self.server.sockets[0].getsockname()[1]}/v2"
+    
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+    
+    async def handle(self, reader, writer):
+        self.connections += 1
+        request = (await reader.readuntil(b"\r\n\r\n")).decode()
+        headers = dict(line.split(": ", 1) for line in request.split("\r\n")[1:] if ": " in line)
+        writer.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept_key(headers['Sec-WebSocket-Key'])}\r\n\r\n"
+        ).encode())
+        
+        for _ in range(self.expected_subscriptions):
+            masked, payload = await read_client_frame(reader)
+            self.client_masked = self.client_masked and masked
+            self.subscriptions.append(json.loads(payload))
+        
+        session = self.sessions.pop(0) if self.sessions else []
+        for message in session:
+            if message == "drop":
+                writer.close()
+                return
+            await self.send(writer, reader, json.dumps(message).encode())
+        
+        writer.write(encode_frame(OP_CLOSE, struct.pack("!H", 1000), mask=False))
+        await writer.drain()
+        try:
+            while True:
+                _, opcode, _ = await read_frame(reader)
+                if opcode == OP_CLOSE:
+                    break
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()
+    
+    async def send(self, writer, reader, payload):
+        if not self.fragment:
+            writer.write(encode_frame(OP_TEXT, payload, mask=False))
+            await writer.drain()
+            return
+        
+        # First half, a ping (which must be answered), then the rest
+        half = len(payload) // 2
+        writer.write(encode_frame(OP_TEXT, payload[:half], mask=False, fin=False))
+        writer.write(encode_frame(OP_PING, b"hb", mask=False))
+        writer.write(encode_frame(OP_CONTINUATION, payload[half:], mask=False))
+        await writer.drain()
+        _, opcode, body = await read_frame(reader)
+        if opcode == OP_PONG and body == b"hb":
+            self.pongs += 1
+
+
+class LiveFeedTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        handle, self.store_path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.store = CandleStore(self.store_path)
+        self.results = []
+    
+    async def asyncTearDown(self):
+        self.store.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.store_path + suffix):
+                os.remove(self.store_path + suffix)
+    
+    async def replay(self, sessions, reconnect=False, stop_at=None, feed_options=None, **server_options):
+        server = await ReplayServer(sessions, **server_options).start()
+        
+        def on_result(result):
+            self.results.append(result)
+            if stop_at is not None and result.timestamp >= stop_at:
+                feed.stop()
+        
+        options = dict({"interval": 1}, **(feed_options or {}))
+        feed = LiveFeed(["BTC/USD"], store=self.store, url=server.url,
+                        timeout=5, reconnect_delay=0.01, on_result=on_result, **options)
+        await asyncio.wait_for(feed.run(reconnect=reconnect), 10)
+        await server.stop()
+        return feed, server
+
+
+class TestReplay(LiveFeedTestCase):
+    async def test_subscribes_with_masked_frames(self):
+        feed, server = await self.replay([[SUBSCRIBE_ACK, HEARTBEAT]])
+        
+        self.assertTrue(server.client_masked)
+        self.assertEqual(server.subscriptions, [{
+            "method": "subscribe",
+            "params": {"channel": "ohlc", "symbol": ["BTC/USD"], "interval": 1, "snapshot": True}
+        }])
+        self.assertEqual(feed.messages, 2)
+    
+    async def test_closed_candles_persisted_and_analyzed(self):
+        snapshot = ohlc_message([ohlc_entry(i) for i in range(60)], "snapshot")
+        updates = [ohlc_message([ohlc_entry(i)]) for i in range(60, 80)]
+        feed, _ = await self.replay([[SUBSCRIBE_ACK, snapshot, HEARTBEAT] + updates])
+        
+        # The newest candle is still forming: neither stored nor analyzed
+        stored = self.store.load("XXBTZUSD", 1)
+        self.assertEqual(len(stored), 79)
+        self.assertEqual(stored.timestamp[-1], START + 78 * 60)
+        self.assertEqual(list(feed.series("BTC/USD").close), list(stored.close))
+        self.assertEqual(self.store.cursor("XXBTZUSD", 1), START + 78 * 60)
+        
+        # One analysis for the snapshot, then one per closed candle
+        self.assertEqual(len(self.results), 21)
+        expected = KrakenAnalyzer().analyze(self.store.load("XXBTZUSD", 1, display_pair="BTC/USD"))
+        self.assertEqual(self.results[-1].to_dict(), expected.to_dict())
+    
+    async def test_forming_candle_replaced(self):
+        history = [ohlc_entry(i) for i in range(50)]
+        revised = ohlc_entry(50, close=31000.0)
+        session = [ohlc_message(history, "snapshot"), ohlc_message([ohlc_entry(50)]),
+                   ohlc_message([revised]), ohlc_message([ohlc_entry(49, close=1.0)]),
+                   ohlc_message([ohlc_entry(51)])]
+        await self.replay([session])
+        
+        stored = self.store.load("XXBTZUSD", 1)
+        self.assertEqual(len(stored), 51)
+        self.assertEqual(stored.close[-1], 31000.0)
+        # The stale update for an already closed candle was ignored
+        self.assertEqual(stored.close[-2], history[-1]["close"])
+    
+    async def test_fragmented_messages_and_ping(self):
+        session = [ohlc_message([ohlc_entry(i) for i in range(10)], "snapshot"), HEARTBEAT]
+        _, server = await self.replay([session], fragment=True)
+        
+        self.assertEqual(server.pongs, 2)
+        self.assertEqual(len(self.store.load("XXBTZUSD", 1)), 9)
+    
+    async def test_reconnects_and_resubscribes(self):
+        first = [ohlc_message([ohlc_entry(i) for i in range(70)], "snapshot"), "drop"]
+        # The snapshot after reconnecting overlaps what was already received
+        second = [ohlc_message([ohlc_entry(i) for i in range(60, 75)], "snapshot")]
+        feed, server = await self.replay([first, second], reconnect=True, stop_at=START + 73 * 60)
+        
+        self.assertEqual(server.connections, 2)
+        self.assertEqual(len(server.subscriptions), 2)
+        self.assertEqual(len(self.store.load("XXBTZUSD", 1)), 74)
+        self.assertEqual(feed.pairs["BTC/USD"].stream.count, 74)
+    
+    async def test_seeds_from_store(self):
+        await self.replay([[ohlc_message([ohlc_entry(i) for i in range(70)], "snapshot")]])
+        self.results.clear()
+        
+        # A later run resumes from the store; the newest stored candle is
+        # treated as forming and closes when the next one arrives
+        feed, _ = await self.replay([[ohlc_message([ohlc_entry(69), ohlc_entry(70)])]])
+        self.assertEqual(len(self.results), 1)
+        self.assertEqual(self.results[0].timestamp, START + 69 * 60)
+        self.assertEqual(feed.pairs["BTC/USD"].stream.count, 70)
+        self.assertEqual(len(self.store.load("XXBTZUSD", 1)), 70)
+    
+    def test_rejects_unknown_interval(self):
+        with self.assertRaises(ValueError):
+            LiveFeed(["BTC/USD"], interval=7)
+        with self.assertRaises(ValueError):
+            LiveFeed(["BTC/USD"], interval=7, base_interval=5)
+        with self.assertRaises(ValueError):
+            LiveFeed(["BTC/USD"], interval=60, base_interval=7)
+
+
+class TestBaseInterval(LiveFeedTestCase):
+    FIVE_MINUTES = {"interval": 5, "base_interval": 1}
+    
+    def expected_buckets(self):
+        """Complete 5m buckets of the stored 1m candles"""
+        stored = self.store.load("XXBTZUSD", 1, display_pair="BTC/USD")
+        return resample_series(stored, 5, include_partial=False)
+    
+    async def test_buckets_built_from_base_candles(self):
+        snapshot = ohlc_message([ohlc_entry(i) for i in range(300)], "snapshot")
+        updates = [ohlc_message([ohlc_entry(i)]) for i in range(300, 332)]
+        feed, server = await self.replay([[SUBSCRIBE_ACK, snapshot] + updates], feed_options=self.FIVE_MINUTES)
+        
+        # Subscribed and stored at the base interval
+        self.assertEqual(server.subscriptions[0]["params"]["interval"], 1)
+        self.assertEqual(len(self.store.load("XXBTZUSD", 1)), 331)
+        self.assertEqual(self.store.intervals("XXBTZUSD"), [1])
+        
+        # Buckets start on candles 1, 6, ...: candle 330 ends the bucket
+        # starting at 326, which is analyzed before the next bucket is complete
+        expected = self.expected_buckets()
+        series = feed.series("BTC/USD")
+        self.assertEqual(series.interval, 5)
+        self.assertEqual(series.timestamp[-1], START + 326 * 60)
+        for name in ("timestamp", "open", "high", "low", "close", "volume", "count"):
+            self.assertEqual(list(getattr(series, name)), list(getattr(expected, name)), name)
+        
+        # One analysis for the snapshot, then one per completed bucket
+        self.assertEqual([r.timestamp for r in self.results[1:]], [START + i * 60 for i in range(296, 327, 5)])
+        self.assertEqual(self.results[-1].to_dict(), KrakenAnalyzer().analyze(expected).to_dict())
+    
+    async def test_seeds_buckets_from_stored_base_candles(self):
+        await self.replay([[ohlc_message([ohlc_entry(i) for i in range(300)], "snapshot")]],
+                          feed_options=self.FIVE_MINUTES)
+        self.results.clear()
+        
+        # Candle 299 was forming; the bucket 296-300 resumes from the store
+        feed, _ = await self.replay([[ohlc_message([ohlc_entry(i)]) for i in range(299, 302)]],
+                                    feed_options=self.FIVE_MINUTES)
+        self.assertEqual([r.timestamp for r in self.results], [START + 296 * 60])
+        expected = self.expected_buckets()
+        self.assertEqual(list(feed.series("BTC/USD").close), list(expected.close))
+        self.assertEqual(feed.pairs["BTC/USD"].stream.count, len(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
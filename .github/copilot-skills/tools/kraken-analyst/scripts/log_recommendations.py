@@ -16,13 +16,11 @@ Usage:
     python3 log_recommendations.py --accuracy       # Calculate accuracy metrics
 """
 
-import sqlite3
 import sys
-from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 
-DB_PATH = Path(__file__).parent.parent / 'portfolio_tracker.db'
+from db import from_epoch, get_database, to_epoch
 
 
 def log_recommendation(
@@ -54,31 +52,26 @@ def log_recommendation(
         Recommendation ID if successful, None otherwise
     """
     try:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
+        db = get_database()
+        with db.transaction():
+            cursor = db.execute('''
+                INSERT INTO recommendations
+                (asset, action, reason, current_price, target_price,
+                 target_allocation_pct, confidence_score, time_horizon, notes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                asset.upper(),
+                action.upper(),
+                reason,
+                current_price,
+                target_price,
+                target_allocation_pct,
+                confidence,
+                time_horizon,
+                notes
+            ))
         
-        cursor.execute('''
-            INSERT INTO recommendations
-            (asset, action, reason, current_price, target_price, 
-             target_allocation_pct, confidence_score, time_horizon, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            asset.upper(),
-            action.upper(),
-            reason,
-            current_price,
-            target_price,
-            target_allocation_pct,
-            confidence,
-            time_horizon,
-            notes
-        ))
-        
-        rec_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        return rec_id
+        return cursor.lastrowid
         
     except Exception as e:
         print(f"✗ Error logging recommendation: {e}")
@@ -88,16 +81,13 @@ def log_recommendation(
 def review_recommendations(days: int = 30, asset: Optional[str] = None):
     """Review recent recommendations"""
     try:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        
         query = '''
             SELECT id, timestamp, asset, action, current_price, target_price,
                    confidence_score, time_horizon, reason
             FROM recommendations
-            WHERE datetime(timestamp) > datetime('now', '-' || ? || ' days')
+            WHERE timestamp > ?
         '''
-        params = [days]
+        params = [to_epoch(datetime.utcnow() - timedelta(days=days))]
         
         if asset:
             query += ' AND asset = ?'
@@ -105,8 +95,7 @@ def review_recommendations(days: int = 30, asset: Optional[str] = None):
         
         query += ' ORDER BY timestamp DESC'
         
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
+        rows = get_database().query(query, params)
         
         print(f"\n📋 Recommendations (Last {days} days)")
         print("=" * 110)
@@ -115,7 +104,7 @@ def review_recommendations(days: int = 30, asset: Optional[str] = None):
         
         for row in rows:
             rec_id, timestamp, asset_sym, action, curr, target, conf, horizon, reason = row
-            dt = datetime.fromisoformat(timestamp)
+            dt = from_epoch(timestamp)
             display_time = dt.strftime('%Y-%m-%d %H:%M')
             
             # Calculate expected move
@@ -129,11 +118,9 @@ def review_recommendations(days: int = 30, asset: Optional[str] = None):
             if reason:
                 print(f"      └─ {reason}")
         
-        conn.close()
-        
         if not rows:
             print(f"No recommendations found for the last {days} days")
-        
+            
     except Exception as e:
         print(f"✗ Error reviewing recommendations: {e}")
 
@@ -141,26 +128,23 @@ def review_recommendations(days: int = 30, asset: Optional[str] = None):
 def calculate_accuracy(days: int = 90):
     """Calculate recommendation accuracy"""
     try:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
+        db = get_database()
+        cutoff = to_epoch(datetime.utcnow() - timedelta(days=days))
         
         # Get recommendations with outcomes
-        cursor.execute('''
+        rows = db.query('''
             SELECT r.id, r.asset, r.action, r.current_price, r.target_price, 
                    r.confidence_score, o.executed, o.execution_price
             FROM recommendations r
             LEFT JOIN recommendation_outcomes o ON r.id = o.recommendation_id
-            WHERE datetime(r.timestamp) > datetime('now', '-' || ? || ' days')
-        ''', [days])
-        
-        rows = cursor.fetchall()
+            WHERE r.timestamp > ?
+        ''', [cutoff])
         
         print(f"\n📊 Recommendation Accuracy (Last {days} days)")
         print("=" * 80)
         
         if not rows:
             print("No recommendations to analyze")
-            conn.close()
             return
         
         total = len(rows)
@@ -187,20 +171,18 @@ def calculate_accuracy(days: int = 90):
         print(f"Accuracy: {accuracy_pct:.1f}%")
         
         # By asset
-        cursor.execute('''
+        by_asset = db.query('''
             SELECT asset, COUNT(*) as count, AVG(confidence_score) as avg_conf
             FROM recommendations
-            WHERE datetime(timestamp) > datetime('now', '-' || ? || ' days')
+            WHERE timestamp > ?
             GROUP BY asset
-        ''', [days])
+        ''', [cutoff])
         
         print("\nBy Asset:")
         print("-" * 40)
-        for asset, count, avg_conf in cursor.fetchall():
+        for asset, count, avg_conf in by_asset:
             print(f"  {asset:<6} {count:>3} recommendations, avg confidence {avg_conf:.2f}")
-        
-        conn.close()
-        
+            
     except Exception as e:
         print(f"✗ Error calculating accuracy: {e}")
 
@@ -208,17 +190,13 @@ def calculate_accuracy(days: int = 90):
 def mark_executed(rec_id: int, execution_price: float, notes: str = ""):
     """Mark a recommendation as executed"""
     try:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO recommendation_outcomes
-            (recommendation_id, execution_timestamp, execution_price, executed, notes)
-            VALUES (?, datetime('now'), ?, 1, ?)
-        ''', (rec_id, execution_price, notes))
-        
-        conn.commit()
-        conn.close()
+        db = get_database()
+        with db.transaction():
+            db.execute('''
+                INSERT INTO recommendation_outcomes
+                (recommendation_id, execution_timestamp, execution_price, executed, notes)
+                VALUES (?, ?, ?, 1, ?)
+            ''', (rec_id, to_epoch(), execution_price, notes))
         
         print(f"✓ Marked recommendation {rec_id} as executed at ${execution_price:.2f}")
         return True
@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+monte_carlo.py - Kraken Analyst Skill: Monte Carlo VaR / CVaR Simulator
+
+Simulates correlated return paths for a buy-and-hold portfolio and reports
+the distribution of horizon returns (VaR, CVaR) and of the worst drawdown
+along each path. Paths are split into fixed-size shards, each with its own
+seeded RNG stream, so a run is reproducible for a given seed no matter how
+many worker processes execute it. Estimates are refreshed as shards finish.
+
+Usage:
+    python fetch_portfolio.py --portfolio-summary | python monte_carlo.py --format text
+    python monte_carlo.py --paths 1000000 --horizon 30 --workers 8 < portfolio.json
+    python monte_carlo.py --method bootstrap --stream < portfolio.json
+
+Methods:
+    - cholesky: multivariate normal daily returns, correlated through the
+      Cholesky factor of the sample covariance
+    - bootstrap: resample whole historical days (keeps fat tails and the
+      cross-asset dependence of each day)
+
+Input:
+    Same JSON as portfolio_optimizer.py: {"balances": [...], "historical_prices": {...}}
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from covariance import sample_covariance
+from portfolio_optimizer import PortfolioAnalyzer, merge_balances
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+METHODS = ("cholesky", "bootstrap")
+DEFAULT_SHARD_SIZE = 10000
+
+# Daily asset returns the NumPy backend holds per block of days (float64,
+# so about 32 MB per array), whatever the horizon and number of assets
+NUMPY_BLOCK_VALUES = 4_000_000
+
+
+@dataclass
+class RiskModel:
+    """Inputs shared by every shard (picklable, sent to worker processes)"""
+    assets: List[str]
+    weights: List[float]
+    method: str
+    mean: List[float]
+    cholesky: Optional[List[List[float]]] = None
+    history: Optional[List[List[float]]] = None  # one row of asset returns per day
+
+
+@dataclass
+class ShardResult:
+    """Simulated outcomes of one shard, each list sorted ascending"""
+    shard: int
+    returns: List[float]
+    drawdowns: List[float]
+
+
+@dataclass
+class MonteCarloResult:
+    """Risk estimates over the paths simulated so far"""
+    method: str
+    horizon_days: int
+    paths: int
+    paths_total: int
+    complete: bool
+    expected_return_pct: float
+    var: Dict[str, float]
+    cvar: Dict[str, float]
+    drawdown: Dict[str, float]
+    elapsed_seconds: float
+    
+    def to_dict(self):
+        return asdict(self)
+
+
+def cholesky(matrix: Sequence[Sequence[float]]) -> List[List[float]]:
+    """
+    Lower-triangular L with L L' = matrix.
+    
+    Positive semi-definite input is accepted: a pivot that is zero (e.g. a
+    stablecoin with no variance) gets a zero column instead of failing.
+    """
+    k = len(matrix)
+    lower = [[0.0] * k for _ in range(k)]
+    
+    for i in range(k):
+        for j in range(i + 1):
+            partial = sum(lower[i][m] * lower[j][m] for m in range(j))
+            if i == j:
+                pivot = matrix[i][i] - partial
+                lower[i][i] = math.sqrt(pivot) if pivot > 1e-18 else 0.0
+            elif lower[j][j] > 0:
+                lower[i][j] = (matrix[i][j] - partial) / lower[j][j]
+    
+    return lower
+
+
+def build_risk_model(data: Dict, method: str = "cholesky") -> RiskModel:
+    """
+    Risk model for the holdings in a portfolio JSON document.
+    
+    Holdings with price history are simulated; others (cash, assets without
+    history) are held at a constant value. Series are aligned on their most
+    recent common days, and repeated asset symbols are merged into one holding.
+    
+    Raises:
+        ValueError: Unknown method or no holding has price history
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}'. Valid: {', '.join(METHODS)}")
+    
+    balances = merge_balances(data.get("balances", []))
+    historical_prices = data.get("historical_prices", {})
+    total_value = sum(b["value_usd"] for b in balances)
+    if total_value <= 0:
+        raise ValueError("No portfolio balances provided")
+    
+    returns = {}
+    weights = []
+    cash_weight = 0.0
+    for balance in balances:
+        symbol = balance["asset"]
+        weight = balance["value_usd"] / total_value
+        series = PortfolioAnalyzer.calculate_returns(historical_prices.get(symbol, []))
+        if series:
+            returns[symbol] = series
+            weights.append(weight)
+        else:
+            cash_weight += weight
+    
+    if not returns:
+        raise ValueError("No historical prices for any holding")
+    
+    # Constant-value holdings as one zero-return asset
+    if cash_weight > 0:
+        returns["(cash)"] = None
+        weights.append(cash_weight)
+    
+    days = min(len(r) for r in returns.values() if r is not None)
+    aligned = {a: (r[-days:] if r is not None else [0.0] * days) for a, r in returns.items()}
+    assets = list(aligned.keys())
+    mean = [sum(r) / days for r in aligned.values()]
+    
+    if method == "bootstrap":
+        history = [list(day) for day in zip(*aligned.values())]
+        return RiskModel(assets, weights, method, mean, history=history)
+    
+    covariance = sample_covariance(aligned, assets, backend="python")
+    return RiskModel(assets, weights, method, mean, cholesky=cholesky(covariance.matrix))
+
+
+def shard_rng_seed(seed: int, shard: int) -> str:
+    """Independent, reproducible stream per (seed, shard)"""
+    return f"monte-carlo:{seed}:{shard}"
+
+
+def simulate_shard(model: RiskModel, horizon: int, paths: int, seed: int, shard: int,
+                   backend: str = "auto") -> ShardResult:
+    """
+    Simulate `paths` buy-and-hold paths of `horizon` days.
+    
+    Returns:
+        ShardResult with sorted horizon returns and sorted max drawdowns (fractions)
+    """
+    if NUMPY_AVAILABLE and backend != "python":
+        return _simulate_shard_numpy(model, horizon, paths, seed, shard)
+    
+    rng = random.Random(shard_rng_seed(seed, shard))
+    k = len(model.assets)
+    weights = model.weights
+    lower = model.cholesky
+    history = model.history
+    mean = model.mean
+    
+    horizon_returns = []
+    drawdowns = []
+    for _ in range(paths):
+        growth = list(weights)
+        peak = 1.0
+        worst = 0.0
+        value = 1.0
+        for _ in range(horizon):
+            if history is not None:
+                day = history[rng.randrange(len(history))]
+            else:
+                z = [rng.gauss(0.0, 1.0) for _ in range(k)]
+                day = [mean[i] + sum(lower[i][j] * z[j] for j in range(i + 1)) for i in range(k)]
+            
+            # Each holding compounds on its own (no rebalancing)
+            value = 0.0
+            for i in range(k):
+                growth[i] = max(growth[i] * (1 + day[i]), 0.0)
+                value += growth[i]
+            if value > peak:
+                peak = value
+            elif peak > 0 and 1 - value / peak > worst:
+                worst = 1 - value / peak
+        
+        horizon_returns.append(value - 1)
+        drawdowns.append(worst)
+    
+    horizon_returns.sort()
+    drawdowns.sort()
+    return ShardResult(shard, horizon_returns, drawdowns)
+
+
+def _simulate_shard_numpy(model: RiskModel, horizon: int, paths: int, seed: int, shard: int) -> ShardResult:
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(shard,)))
+    k = len(model.assets)
+    history = np.asarray(model.history) if model.history is not None else None
+    if history is None:
+        lower = np.asarray(model.cholesky)
+        mean = np.asarray(model.mean)
+    
+    growth = np.tile(np.asarray(model.weights, dtype=float), (paths, 1))
+    value = np.ones(paths)
+    peak = np.ones(paths)
+    worst = np.zeros(paths)
+    
+    # Days are drawn day-major, so the paths do not depend on the block size
+    block = max(NUMPY_BLOCK_VALUES // (paths * k), 1)
+    for start in range(0, horizon, block):
+        days = min(block, horizon - start)
+        if history is not None:
+            daily = history[rng.integers(0, len(history), size=(days, paths))]
+        else:
+            daily = rng.standard_normal((days, paths, k)) @ lower.T + mean
+        
+        # Clamping each factor is the Python backend's per-day clamp: a
+        # holding that reaches zero stays there
+        path_growth = growth * np.cumprod(np.maximum(1 + daily, 0.0), axis=0)
+        values = path_growth.sum(axis=2)
+        running_peak = np.maximum(np.maximum.accumulate(values, axis=0), peak)
+        worst = np.maximum(worst, (1 - values / running_peak).max(axis=0))
+        growth, value, peak = path_growth[-1], values[-1], running_peak[-1]
+    
+    return ShardResult(shard, np.sort(value - 1).tolist(), np.sort(worst).tolist())
+
+
+class RiskAccumulator:
+    """Collects shard results and summarizes the paths seen so far"""
+    
+    def __init__(self, confidences: Sequence[float] = (0.95, 0.99)):
+        self.confidences = confidences
+        self.returns: List[float] = []
+        self.drawdowns: List[float] = []
+        self._sorted = True
+    
+    def add(self, result: ShardResult):
+        self.returns.extend(result.returns)
+        self.drawdowns.extend(result.drawdowns)
+        self._sorted = False
+    
+    def __len__(self):
+        return len(self.returns)
+    
+    def summary(self) -> Dict:
+        """Expected return, VaR/CVaR per confidence and drawdown percentiles (percent)"""
+        if not self._sorted:
+            # Shards arrive sorted, so this is a cheap run merge
+            self.returns.sort()
+            self.drawdowns.sort()
+            self._sorted = True
+        
+        returns = self.returns
+        n = len(returns)
+        if not n:
+            return {"expected_return_pct": 0.0, "var": {}, "cvar": {}, "drawdown": {}}
+        
+        var = {}
+        cvar = {}
+        for confidence in self.confidences:
+            # Same percentile convention as PortfolioAnalyzer.calculate_var
+            index = min(max(int((1 - confidence) * n), 0), n - 1)
+            label = f"{confidence * 100:g}"
+            var[label] = round(-returns[index] * 100, 2)
+            cvar[label] = round(-math.fsum(returns[:index + 1]) / (index + 1) * 100, 2)
+        
+        drawdowns = self.drawdowns
+        drawdown = {
+            "mean": round(math.fsum(drawdowns) / n * 100, 2),
+            "median": round(drawdowns[n // 2] * 100, 2),
+            "p95": round(drawdowns[min(int(0.95 * n), n - 1)] * 100, 2),
+            "p99": round(drawdowns[min(int(0.99 * n), n - 1)] * 100, 2),
+            "worst": round(drawdowns[-1] * 100, 2)
+        }
+        
+        return {
+            "expected_return_pct": round(math.fsum(returns) / n * 100, 3),
+            "var": var,
+            "cvar": cvar,
+            "drawdown": drawdown
+        }
+
+
+class MonteCarloSimulator:
+    """
+    Shards a simulation across a process pool and streams partial estimates.
+    
+    Shard i always simulates the same paths (its RNG stream depends only on
+    seed and i), so the final result is identical for any worker count.
+    """
+    
+    def __init__(self, model: RiskModel, horizon: int = 10, paths: int = 100000,
+                 seed: int = 42, workers: Optional[int] = None, shard_size: int = DEFAULT_SHARD_SIZE,
+                 confidences: Sequence[float] = (0.95, 0.99), backend: str = "auto"):
+        """
+        Args:
+            model: Risk model from build_risk_model()
+            horizon: Days per path
+            paths: Total number of paths
+            seed: Base seed for all shard RNG streams
+            workers: Worker processes (None = CPU count, 1 = run in this process)
+            shard_size: Paths per shard
+            confidences: VaR/CVaR confidence levels
+            backend: "auto" (NumPy when importable), "numpy", or "python"
+        
+        Raises:
+            ValueError: Invalid sizes, confidence levels or backend
+        """
+        if horizon < 1 or paths < 1 or shard_size < 1:
+            raise ValueError("horizon, paths and shard_size must be positive")
+        for confidence in confidences:
+            if not 0 < confidence < 1:
+                raise ValueError(f"Confidence level must be between 0 and 1 (exclusive), got {confidence}")
+        if backend not in ("auto", "numpy", "python"):
+            raise ValueError(f"Unknown backend '{backend}'. Valid: auto, numpy, python")
+        if backend == "numpy" and not NUMPY_AVAILABLE:
+            raise ValueError("NumPy backend requested but numpy is not installed (pip install numpy)")
+        
+        self.model = model
+        self.horizon = horizon
+        self.paths = paths
+        self.seed = seed
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self.confidences = confidences
+        self.backend = backend
+    
+    def _shards(self) -> List[tuple]:
+        shards = []
+        for shard, start in enumerate(range(0, self.paths, self.shard_size)):
+            shards.append((shard, min(self.shard_size, self.paths - start)))
+        return shards
+    
+    def _result(self, accumulator: RiskAccumulator, started: float) -> MonteCarloResult:
+        summary = accumulator.summary()
+        return MonteCarloResult(
+            method=self.model.method,
+            horizon_days=self.horizon,
+            paths=len(accumulator),
+            paths_total=self.paths,
+            complete=len(accumulator) == self.paths,
+            expected_return_pct=summary["expected_return_pct"],
+            var=summary["var"],
+            cvar=summary["cvar"],
+            drawdown=summary["drawdown"],
+            elapsed_seconds=round(time.perf_counter() - started, 3)
+        )
+    
+    def run_iter(self, report_every: float = 1.0) -> Iterator[MonteCarloResult]:
+        """
+        Yield partial results at most every `report_every` seconds while shards
+        complete, then the final result (complete=True).
+        """
+        started = time.perf_counter()
+        accumulator = RiskAccumulator(self.confidences)
+        shards = self._shards()
+        last_report = started
+        
+        if self.workers == 1 or len(shards) == 1:
+            for shard, count in shards:
+                accumulator.add(simulate_shard(self.model, self.horizon, count, self.seed, shard, self.backend))
+                if len(accumulator) < self.paths and time.perf_counter() - last_report >= report_every:
+                    last_report = time.perf_counter()
+                    yield self._result(accumulator, started)
+            yield self._result(accumulator, started)
+            return
+        
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(shards))) as pool:
+            pending = {
+                pool.submit(simulate_shard, self.model, self.horizon, count, self.seed, shard, self.backend)
+                for shard, count in shards
+            }
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    accumulator.add(future.result())
+                if pending and time.perf_counter() - last_report >= report_every:
+                    last_report = time.perf_counter()
+                    yield self._result(accumulator, started)
+        
+        yield self._result(accumulator, started)
+    
+    def run(self) -> MonteCarloResult:
+        """Simulate every path and return the final result"""
+        result = None
+        for result in self.run_iter(report_every=float("inf")):
+            pass
+        return result
+
+
+def format_text(result: MonteCarloResult) -> str:
+    lines = [
+        f"\n{'='*60}",
+        f"MONTE CARLO RISK ({result.method}, {result.horizon_days}-day horizon)",
+        f"{'='*60}\n",
+        f"Paths: {result.paths:,} ({result.elapsed_seconds:.1f}s)",
+        f"Expected return: {result.expected_return_pct:+.2f}%\n",
+        "📉 Value at Risk:"
+    ]
+    for label in result.var:
+        lines.append(f"  {label}%: VaR {result.var[label]:.2f}%  CVaR {result.cvar[label]:.2f}%")
+    
+    dd = result.drawdown
+    lines.append("")
+    lines.append("📊 Max Drawdown Distribution:")
+    lines.append(f"  Mean: {dd['mean']:.2f}%  Median: {dd['median']:.2f}%")
+    lines.append(f"  95th pct: {dd['p95']:.2f}%  99th pct: {dd['p99']:.2f}%  Worst: {dd['worst']:.2f}%")
+    return "\n".join(lines) + "\n"
+
+
+def confidence_level(value: str) -> float:
+    """argparse type for --confidence: a float strictly between 0 and 1"""
+    try:
+        confidence = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid float value: '{value}'")
+    if not 0 < confidence < 1:
+        raise argparse.ArgumentTypeError(f"must be between 0 and 1 (exclusive), got {value}")
+    return confidence
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Monte Carlo VaR / CVaR and drawdown simulation for a portfolio",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 fetch_portfolio.py --portfolio-summary | python3 monte_carlo.py --format text
+  python3 monte_carlo.py --paths 1000000 --horizon 30 --workers 8 < portfolio.json
+  python3 monte_carlo.py --method bootstrap --stream < portfolio.json
+
+Partial estimates are printed to stderr while shards finish (--stream
+writes each one to stdout as a JSON line instead).
+        """
+    )
+    parser.add_argument("--method", choices=METHODS, default="cholesky", help="Path generator (default: cholesky)")
+    parser.add_argument("--paths", type=int, default=100000, help="Number of simulated paths (default: 100000)")
+    parser.add_argument("--horizon", type=int, default=10, help="Days per path (default: 10)")
+    parser.add_argument("--seed", type=int, default=42, help="Base RNG seed (default: 42)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE,
+                        help=f"Paths per shard (default: {DEFAULT_SHARD_SIZE})")
+    parser.add_argument("--confidence", type=confidence_level, action="append",
+                        help="VaR confidence level, repeatable (default: 0.95 and 0.99)")
+    parser.add_argument("--backend", choices=["auto", "numpy", "python"], default="auto",
+                        help="Simulation backend (default: auto)")
+    parser.add_argument("--stream", action="store_true", help="Write partial results to stdout as JSON lines")
+    parser.add_argument("--format", choices=["json", "text"], default="json", help="Output format")
+    args = parser.parse_args()
+    
+    try:
+        data = json.load(sys.stdin)
+        model = build_risk_model(data, args.method)
+        simulator = MonteCarloSimulator(
+            model, horizon=args.horizon, paths=args.paths, seed=args.seed, workers=args.workers,
+            shard_size=args.shard_size, confidences=args.confidence or (0.95, 0.99), backend=args.backend
+        )
+    except json.JSONDecodeError:
+        print("ERROR: Invalid JSON input", file=sys.stderr)
+        return 1
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    
+    result = None
+    for result in simulator.run_iter():
+        if args.stream:
+            print(json.dumps(result.to_dict()), flush=True)
+        elif not result.complete:
+            var = ", ".join(f"VaR {k}% {v:.2f}%" for k, v in result.var.items())
+            print(f"  … {result.paths:,}/{result.paths_total:,} paths: {var}", file=sys.stderr)
+    
+    if not args.stream:
+        if args.format == "json":
+            print(json.dumps(result.to_dict(), indent=2))
+        else:
+            print(format_text(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
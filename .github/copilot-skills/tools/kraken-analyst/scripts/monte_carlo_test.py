@@ -0,0 +1,151 @@
+import contextlib
+import io
+import json
+import random
+import sys
+import unittest
+from unittest import mock
+
+import monte_carlo
+from monte_carlo import (NUMPY_AVAILABLE, MonteCarloSimulator, RiskAccumulator, RiskModel, ShardResult,
+                         build_risk_model, cholesky, main, simulate_shard)
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python monte_carlo_test.py
+
+def make_portfolio(days=120, seed=3):
+    """Three correlated assets with price history plus a cash holding"""
+    rng = random.Random(seed)
+    prices = {"BTC": [30000.0], "ETH": [2000.0], "SOL": [40.0]}
+    for _ in range(days - 1):
+        market = rng.gauss(0.001, 0.03)
+        for asset, beta in (("BTC", 0.8), ("ETH", 1.1), ("SOL", 1.5)):
+            prices[asset].append(prices[asset][-1] * (1 + beta * market + rng.gauss(0, 0.015)))
+    balances = [{"asset": asset, "balance": 1.0, "value_usd": value}
+                for asset, value in (("BTC", 5000.0), ("ETH", 3000.0), ("SOL", 1500.0), ("USD", 500.0))]
+    return {"balances": balances, "historical_prices": prices}
+
+
+def without_timing(result):
+    document = result.to_dict()
+    del document["elapsed_seconds"]
+    return document
+
+
+class TestReproducibility(unittest.TestCase):
+    def run_simulation(self, method, backend, workers, seed=7):
+        model = build_risk_model(make_portfolio(), method)
+        simulator = MonteCarloSimulator(model, horizon=10, paths=2500, seed=seed, workers=workers,
+                                        shard_size=400, backend=backend)
+        return without_timing(simulator.run())
+    
+    def assertSameForAnyWorkerCount(self, method, backend):
+        serial = self.run_simulation(method, backend, workers=1)
+        self.assertTrue(serial["complete"])
+        self.assertEqual(serial["paths"], 2500)
+        for workers in (2, 3, 7):
+            with self.subTest(method=method, backend=backend, workers=workers):
+                self.assertEqual(self.run_simulation(method, backend, workers), serial)
+        self.assertNotEqual(self.run_simulation(method, backend, workers=2, seed=8), serial)
+    
+    def test_python_backend(self):
+        for method in ("cholesky", "bootstrap"):
+            self.assertSameForAnyWorkerCount(method, "python")
+    
+    @unittest.skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+    def test_numpy_backend(self):
+        for method in ("cholesky", "bootstrap"):
+            self.assertSameForAnyWorkerCount(method, "numpy")
+    
+    def test_shards_depend_only_on_seed_and_index(self):
+        model = build_risk_model(make_portfolio())
+        first = simulate_shard(model, 5, 50, 7, shard=3, backend="python")
+        self.assertEqual(simulate_shard(model, 5, 50, 7, shard=3, backend="python"), first)
+        self.assertNotEqual(simulate_shard(model, 5, 50, 7, shard=4, backend="python").returns, first.returns)
+    
+    def test_partial_results_end_with_the_final_one(self):
+        model = build_risk_model(make_portfolio())
+        simulator = MonteCarloSimulator(model, horizon=5, paths=1000, seed=1, workers=1, shard_size=100,
+                                        backend="python")
+        results = list(simulator.run_iter(report_every=0))
+        
+        self.assertEqual([r.paths for r in results], list(range(100, 1001, 100)))
+        self.assertEqual([r.complete for r in results], [False] * 9 + [True])
+        self.assertEqual(without_timing(results[-1]), without_timing(simulator.run()))
+    
+    @unittest.skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+    def test_numpy_paths_do_not_depend_on_block_size(self):
+        for method in ("cholesky", "bootstrap"):
+            model = build_risk_model(make_portfolio(), method)
+            whole = simulate_shard(model, 30, 200, 7, shard=0, backend="numpy")
+            with self.subTest(method=method), mock.patch.object(monte_carlo, "NUMPY_BLOCK_VALUES", 200 * 4 * 7):
+                blocks = simulate_shard(model, 30, 200, 7, shard=0, backend="numpy")
+                for actual, expected in ((blocks.returns, whole.returns), (blocks.drawdowns, whole.drawdowns)):
+                    for a, e in zip(actual, expected):
+                        self.assertAlmostEqual(a, e, places=12)
+
+
+class TestBackends(unittest.TestCase):
+    @unittest.skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+    def test_loss_beyond_the_holding_wipes_it_out(self):
+        # Every bootstrapped day loses 150% on A: A is worth zero from the first
+        # day on and must not turn positive again, while B compounds 10% a day
+        model = RiskModel(["A", "B"], [0.5, 0.5], "bootstrap", [-1.5, 0.1], history=[[-1.5, 0.1]])
+        expected = 0.5 * 1.1 ** 4 - 1
+        for backend in ("python", "numpy"):
+            with self.subTest(backend=backend):
+                result = simulate_shard(model, 4, 3, 7, shard=0, backend=backend)
+                for value in result.returns:
+                    self.assertAlmostEqual(value, expected, places=12)
+                for drawdown in result.drawdowns:
+                    self.assertAlmostEqual(drawdown, 0.45, places=12)
+
+
+class TestRiskModel(unittest.TestCase):
+    def test_cholesky_reconstructs_matrix(self):
+        # The zero-variance asset (a stablecoin) gets a zero column
+        matrix = [[4.0, 2.0, 0.0], [2.0, 3.0, 0.0], [0.0, 0.0, 0.0]]
+        lower = cholesky(matrix)
+        for i in range(3):
+            for j in range(3):
+                self.assertAlmostEqual(sum(lower[i][m] * lower[j][m] for m in range(3)), matrix[i][j])
+        self.assertEqual([row[2] for row in lower], [0.0, 0.0, 0.0])
+    
+    def test_cash_is_one_constant_holding(self):
+        model = build_risk_model(make_portfolio())
+        self.assertEqual(model.assets, ["BTC", "ETH", "SOL", "(cash)"])
+        self.assertEqual(model.weights, [0.5, 0.3, 0.15, 0.05])
+        self.assertEqual(model.mean[-1], 0.0)
+
+
+
+class TestConfidence(unittest.TestCase):
+    def test_rejects_levels_outside_the_open_interval(self):
+        model = build_risk_model(make_portfolio())
+        for confidence in (0.0, 1.0, 1.5, -0.05):
+            with self.subTest(confidence=confidence):
+                with self.assertRaisesRegex(ValueError, "between 0 and 1"):
+                    MonteCarloSimulator(model, paths=10, confidences=(0.95, confidence))
+    
+    def test_command_line_rejects_levels_outside_the_open_interval(self):
+        for value in ("0", "1", "99", "abc"):
+            stderr = io.StringIO()
+            with self.subTest(value=value), \
+                    mock.patch.object(sys, "argv", ["monte_carlo.py", "--confidence", value]), \
+                    mock.patch.object(sys, "stdin", io.StringIO(json.dumps(make_portfolio()))), \
+                    contextlib.redirect_stderr(stderr), self.assertRaises(SystemExit) as raised:
+                main()
+            self.assertEqual(raised.exception.code, 2)
+            self.assertIn("--confidence", stderr.getvalue())
+    
+    def test_percentile_index_stays_in_range(self):
+        accumulator = RiskAccumulator(confidences=(0.0, 0.5, 1.0))
+        accumulator.add(ShardResult(0, [-0.3, -0.1, 0.2], [0.0, 0.1, 0.4]))
+        summary = accumulator.summary()
+        self.assertEqual(summary["var"], {"0": -20.0, "50": 10.0, "100": 30.0})
+        self.assertEqual(summary["cvar"]["100"], 30.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
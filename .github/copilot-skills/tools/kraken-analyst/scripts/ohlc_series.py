@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+ohlc_series.py - Kraken Analyst Skill: Columnar OHLC Container
+
+Compact column-oriented storage for OHLC candles. Each field lives in its
+own typed array ('d' for prices/volumes, 'q' for timestamps/trade counts),
+so a 720-candle series is eight flat buffers instead of 720 dicts.
+
+Usage:
+    from ohlc_series import OHLCSeries
+    
+    series = OHLCSeries.from_document(json.load(sys.stdin))
+    closes = series.close                 # array('d'), no per-candle objects
+    legacy = series.to_dict()             # fetch_data.py JSON shape, built on demand
+
+Accepted input shapes (OHLCSeries.from_document):
+    - Legacy:   { pair, interval, data: [{timestamp, open, high, low, close, vwap, volume, count}] }
+    - Kraken:   { pair, interval, data: [[time, open, high, low, close, vwap, volume, count]] }
+    - Columnar: { pair, interval, columns: {timestamp: [...], open: [...], ...} }
+"""
+
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+class OHLCSeries:
+    """Columnar OHLC candles for one pair and interval"""
+    
+    # Kraken OHLC row order: [time, open, high, low, close, vwap, volume, count]
+    COLUMNS = ("timestamp", "open", "high", "low", "close", "vwap", "volume", "count")
+    FLOAT_COLUMNS = ("open", "high", "low", "close", "vwap", "volume")
+    INT_COLUMNS = ("timestamp", "count")
+    
+    def __init__(self, pair: str = "UNKNOWN", interval: Optional[int] = None,
+                 columns: Optional[Dict[str, Iterable]] = None, metadata: Optional[Dict] = None):
+        """
+        Args:
+            pair: Trading pair (e.g., "BTC/USD")
+            interval: Candle interval in minutes
+            columns: Mapping of column name to values (missing columns are zero-filled)
+            metadata: Extra top-level fields preserved by to_dict()
+        """
+        self.pair = pair
+        self.interval = interval
+        self.metadata = dict(metadata or {})
+        
+        columns = columns or {}
+        for name in self.FLOAT_COLUMNS:
+            setattr(self, name, array('d', columns.get(name, ())))
+        for name in self.INT_COLUMNS:
+            setattr(self, name, array('q', (int(v) for v in columns.get(name, ()))))
+        
+        size = len(self.timestamp)
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            if name != "timestamp" and len(column) == 0 and size:
+                column.extend([0] * size)
+            elif len(column) != size:
+                raise ValueError(f"Column '{name}' has {len(column)} values, expected {size}")
+    
+    @classmethod
+    def from_kraken_rows(cls, rows: Sequence[Sequence], pair: str = "UNKNOWN",
+                         interval: Optional[int] = None, metadata: Optional[Dict] = None) -> "OHLCSeries":
+        """Build from Kraken API rows [time, open, high, low, close, vwap, volume, count]"""
+        series = cls(pair, interval, metadata=metadata)
+        for row in rows:
+            series.append(int(row[0]), float(row[1]), float(row[2]), float(row[3]),
+                          float(row[4]), float(row[5]), float(row[6]), int(row[7]) if len(row) > 7 else 0)
+        return series
+    
+    @classmethod
+    def from_candles(cls, candles: Iterable[Dict], pair: str = "UNKNOWN",
+                     interval: Optional[int] = None, metadata: Optional[Dict] = None) -> "OHLCSeries":
+        """Build from legacy candle dicts (fetch_data.py "data" entries)"""
+        series = cls(pair, interval, metadata=metadata)
+        for candle in candles:
+            series.append(
+                int(candle.get("timestamp", 0)),
+                float(candle.get("open", 0)),
+                float(candle.get("high", 0)),
+                float(candle.get("low", 0)),
+                float(candle.get("close", 0)),
+                float(candle.get("vwap", 0)),
+                float(candle.get("volume", 0)),
+                int(candle.get("count", 0))
+            )
+        return series
+    
+    @classmethod
+    def from_document(cls, document) -> "OHLCSeries":
+        """
+        Build from any supported JSON document shape (see module docstring).
+        An OHLCSeries is returned unchanged.
+        """
+        if isinstance(document, OHLCSeries):
+            return document
+        
+        pair = document.get("pair", "UNKNOWN")
+        interval = document.get("interval")
+        metadata = {k: v for k, v in document.items()
+                    if k not in ("pair", "interval", "data", "columns", "data_points")}
+        
+        if "columns" in document:
+            return cls(pair, interval, document["columns"], metadata)
+        
+        candles = document.get("data", [])
+        if candles and not isinstance(candles[0], dict):
+            return cls.from_kraken_rows(candles, pair, interval, metadata)
+        return cls.from_candles(candles, pair, interval, metadata)
+    
+    def append(self, timestamp: int, open_: float, high: float, low: float, close: float,
+               vwap: float = 0.0, volume: float = 0.0, count: int = 0):
+        """Append one candle"""
+        self.timestamp.append(timestamp)
+        self.open.append(open_)
+        self.high.append(high)
+        self.low.append(low)
+        self.close.append(close)
+        self.vwap.append(vwap)
+        self.volume.append(volume)
+        self.count.append(count)
+    
+    def __len__(self) -> int:
+        return len(self.timestamp)
+    
+    def __getitem__(self, index):
+        """Slice to a new series, or index to a single candle dict"""
+        if isinstance(index, slice):
+            columns = {name: getattr(self, name)[index] for name in self.COLUMNS}
+            return OHLCSeries(self.pair, self.interval, columns, self.metadata)
+        return self.candle(index)
+    
+    def tail(self, count: int) -> "OHLCSeries":
+        """Last `count` candles"""
+        return self[-count:] if count < len(self) else self
+    
+    def candle(self, index: int) -> Dict:
+        """Legacy candle dict for a single index"""
+        timestamp = self.timestamp[index]
+        return {
+            "timestamp": timestamp,
+            "datetime": datetime.utcfromtimestamp(timestamp).isoformat(),
+            "open": self.open[index],
+            "high": self.high[index],
+            "low": self.low[index],
+            "close": self.close[index],
+            "vwap": self.vwap[index],
+            "volume": self.volume[index],
+            "count": self.count[index]
+        }
+    
+    def iter_candles(self) -> Iterator[Dict]:
+        """Lazily yield legacy candle dicts"""
+        for i in range(len(self)):
+            yield self.candle(i)
+    
+    def to_candles(self) -> List[Dict]:
+        """Legacy list-of-dicts candles"""
+        return list(self.iter_candles())
+    
+    def to_dict(self) -> Dict:
+        """Legacy fetch_data.py JSON shape with per-candle dicts"""
+        document = {"pair": self.pair}
+        document.update(self.metadata)
+        document["interval"] = self.interval
+        document["data_points"] = len(self)
+        document["data"] = self.to_candles()
+        return document
+    
+    def to_columnar_dict(self) -> Dict:
+        """Columnar JSON shape: one list per column (much cheaper to parse)"""
+        document = {"pair": self.pair}
+        document.update(self.metadata)
+        document["interval"] = self.interval
+        document["data_points"] = len(self)
+        document["columns"] = {name: getattr(self, name).tolist() for name in self.COLUMNS}
+        return document
+    
+    def to_numpy(self, column: str):
+        """Zero-copy float64/int64 NumPy view of a column (requires numpy)"""
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy is not installed (pip install numpy)")
+        dtype = np.int64 if column in self.INT_COLUMNS else np.float64
+        return np.frombuffer(getattr(self, column), dtype=dtype)
@@ -0,0 +1,134 @@
+import json
+import unittest
+
+from ohlc_series import NUMPY_AVAILABLE, OHLCSeries
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python ohlc_series_test.py
+
+START = 1700000000
+
+# Kraken rows as the REST API returns them: prices and volumes as strings
+KRAKEN_ROWS = [
+    [START, "30000.0", "30050.5", "29990.0", "30020.25", "30010.1", "1.5", 12],
+    [START + 3600, "30020.25", "30100.0", "30000.0", "30080.0", "30060.0", "0.75", 7],
+    [START + 7200, "30080.0", "30080.0", "30080.0", "30080.0", "0.0", "0.0", 0]
+]
+
+EXPECTED = {
+    "timestamp": [START, START + 3600, START + 7200],
+    "open": [30000.0, 30020.25, 30080.0],
+    "high": [30050.5, 30100.0, 30080.0],
+    "low": [29990.0, 30000.0, 30080.0],
+    "close": [30020.25, 30080.0, 30080.0],
+    "vwap": [30010.1, 30060.0, 0.0],
+    "volume": [1.5, 0.75, 0.0],
+    "count": [12, 7, 0]
+}
+
+METADATA = {"pair_kraken": "XXBTZUSD", "source": "Kraken REST API v0", "fetched_at": "2023-11-14T22:13:20"}
+
+
+def legacy_candles():
+    return [{name: EXPECTED[name][i] for name in OHLCSeries.COLUMNS} for i in range(3)]
+
+
+def columns(series):
+    return {name: getattr(series, name).tolist() for name in OHLCSeries.COLUMNS}
+
+
+class TestFromDocument(unittest.TestCase):
+    def assertSeries(self, series, expected=EXPECTED, metadata=METADATA):
+        self.assertEqual((series.pair, series.interval), ("BTC/USD", 60))
+        self.assertEqual(columns(series), expected)
+        self.assertEqual(series.metadata, metadata)
+        self.assertEqual(series.timestamp.typecode, "q")
+        self.assertEqual(series.close.typecode, "d")
+    
+    def document(self, **fields):
+        return dict({"pair": "BTC/USD"}, **METADATA, interval=60, data_points=3, **fields)
+    
+    def test_legacy_candle_dicts(self):
+        self.assertSeries(OHLCSeries.from_document(self.document(data=legacy_candles())))
+    
+    def test_legacy_candles_with_string_values_and_missing_fields(self):
+        # Only the OHLC fields are required; datetime (from to_dict) is ignored
+        candles = [{"timestamp": str(c["timestamp"]), "datetime": "ignored", "open": str(c["open"]),
+                    "high": c["high"], "low": c["low"], "close": c["close"], "volume": c["volume"]}
+                   for c in legacy_candles()]
+        expected = dict(EXPECTED, vwap=[0.0] * 3, count=[0] * 3)
+        self.assertSeries(OHLCSeries.from_document(self.document(data=candles)), expected)
+    
+    def test_kraken_rows(self):
+        self.assertSeries(OHLCSeries.from_document(self.document(data=KRAKEN_ROWS)))
+    
+    def test_kraken_rows_without_count(self):
+        rows = [row[:7] for row in KRAKEN_ROWS]
+        self.assertSeries(OHLCSeries.from_document(self.document(data=rows)), dict(EXPECTED, count=[0] * 3))
+    
+    def test_columnar(self):
+        self.assertSeries(OHLCSeries.from_document(self.document(columns=EXPECTED)))
+    
+    def test_columnar_missing_columns_are_zero_filled(self):
+        partial = {name: EXPECTED[name] for name in ("timestamp", "open", "high", "low", "close")}
+        expected = dict(EXPECTED, vwap=[0.0] * 3, volume=[0.0] * 3, count=[0] * 3)
+        self.assertSeries(OHLCSeries.from_document(self.document(columns=partial)), expected)
+    
+    def test_columnar_length_mismatch(self):
+        with self.assertRaisesRegex(ValueError, "Column 'close' has 2 values, expected 3"):
+            OHLCSeries.from_document(self.document(columns=dict(EXPECTED, close=[1.0, 2.0])))
+    
+    def test_columns_take_precedence_over_data(self):
+        series = OHLCSeries.from_document(self.document(columns=EXPECTED, data=[[0, 1, 1, 1, 1, 1, 1, 1]]))
+        self.assertSeries(series)
+    
+    def test_empty_and_minimal_documents(self):
+        for document in ({"pair": "BTC/USD", "interval": 60, "data": []}, {"pair": "BTC/USD", "interval": 60}):
+            with self.subTest(document=document):
+                self.assertSeries(OHLCSeries.from_document(document), {name: [] for name in EXPECTED}, {})
+        
+        series = OHLCSeries.from_document({"data": KRAKEN_ROWS})
+        self.assertEqual((series.pair, series.interval, len(series)), ("UNKNOWN", None, 3))
+    
+    def test_series_is_returned_unchanged(self):
+        series = OHLCSeries.from_kraken_rows(KRAKEN_ROWS, "BTC/USD", 60)
+        self.assertIs(OHLCSeries.from_document(series), series)
+
+
+class TestRoundTrip(unittest.TestCase):
+    def setUp(self):
+        self.series = OHLCSeries.from_kraken_rows(KRAKEN_ROWS, "BTC/USD", 60, METADATA)
+    
+    def test_to_dict(self):
+        document = json.loads(json.dumps(self.series.to_dict()))
+        self.assertEqual(list(document), ["pair", *METADATA, "interval", "data_points", "data"])
+        self.assertEqual(document["data_points"], 3)
+        self.assertEqual(document["data"][0]["datetime"], "2023-11-14T22:13:20")
+        self.assertEqual(columns(OHLCSeries.from_document(document)), EXPECTED)
+        self.assertEqual(OHLCSeries.from_document(document).to_dict(), document)
+    
+    def test_to_columnar_dict(self):
+        document = json.loads(json.dumps(self.series.to_columnar_dict()))
+        self.assertEqual(document["columns"], EXPECTED)
+        self.assertEqual(OHLCSeries.from_document(document).to_columnar_dict(), document)
+        self.assertEqual(OHLCSeries.from_document(document).to_dict(), self.series.to_dict())
+    
+    def test_slices_keep_pair_and_metadata(self):
+        tail = self.series.tail(2)
+        self.assertEqual((tail.pair, tail.interval, tail.metadata), ("BTC/USD", 60, METADATA))
+        self.assertEqual(list(tail.timestamp), EXPECTED["timestamp"][1:])
+        self.assertIs(self.series.tail(5), self.series)
+        self.assertEqual(self.series[-1]["close"], 30080.0)
+    
+    @unittest.skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+    def test_to_numpy_shares_memory(self):
+        closes = self.series.to_numpy("close")
+        self.assertEqual(closes.tolist(), EXPECTED["close"])
+        self.assertEqual(str(self.series.to_numpy("count").dtype), "int64")
+        self.series.close[0] = 1.0
+        self.assertEqual(closes[0], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
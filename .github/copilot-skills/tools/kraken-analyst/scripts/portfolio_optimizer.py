@@ -11,7 +11,7 @@ Usage:
     python fetch_portfolio.py | python portfolio_optimizer.py
 
 Features:
-    - Correlation matrix for holdings
+    - Correlation matrix for holdings (single-pass covariance engine, see covariance.py)
     - Sharpe ratio optimization
     - Maximum drawdown analysis
     - Risk contribution by asset
@@ -25,6 +25,11 @@ import argparse
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 import math
+from covariance import CovarianceMatrix, sample_covariance
+
+# --optimize solves from the sample covariance, so it needs aligned return series
+OPTIMIZE_HISTORY_ERROR = ("Cannot solve {} weights: needs historical_prices of equal length "
+                          "for at least two holdings")
 
 
 @dataclass
@@ -38,6 +43,23 @@ class PortfolioMetrics:
     diversification_ratio: Optional[float]
     risk_metrics: Dict
     rebalancing_recommendations: Optional[List[Dict]]
+    optimization: Optional[Dict] = None
+    
+    def to_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class OptimizationResult:
+    """Solved portfolio weights for one objective"""
+    objective: str
+    weights: Dict[str, float]
+    expected_return: float
+    volatility: float
+    sharpe_ratio: Optional[float]
+    risk_contributions: Dict[str, float]
+    iterations: int
+    converged: bool
     
     def to_dict(self):
         return asdict(self)
@@ -90,24 +112,40 @@ class PortfolioAnalyzer:
         return round(correlation, 4)
     
     @staticmethod
-    def calculate_correlation_matrix(asset_returns: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
-        """Calculate correlation matrix for all asset pairs"""
-        assets = list(asset_returns.keys())
-        matrix = {}
+    def calculate_covariance(asset_returns: Dict[str, List[float]],
+                             backend: str = "auto") -> Optional[CovarianceMatrix]:
+        """
+        Covariance matrix of all assets in one pass
         
-        for asset_a in assets:
-            matrix[asset_a] = {}
-            for asset_b in assets:
-                if asset_a == asset_b:
-                    matrix[asset_a][asset_b] = 1.0
-                else:
-                    corr = PortfolioAnalyzer.calculate_correlation(
-                        asset_returns[asset_a],
-                        asset_returns[asset_b]
-                    )
-                    matrix[asset_a][asset_b] = corr if corr is not None else 0.0
+        Returns None if the return series are not aligned (different lengths)
+        """
+        lengths = {len(r) for r in asset_returns.values()}
+        if len(lengths) != 1:
+            return None
+        return sample_covariance(asset_returns, backend=backend)
+    
+    @staticmethod
+    def calculate_correlation_matrix(asset_returns: Dict[str, List[float]],
+                                     backend: str = "auto") -> Dict[str, Dict[str, float]]:
+        """Calculate correlation matrix for all asset pairs"""
+        covariance = PortfolioAnalyzer.calculate_covariance(asset_returns, backend)
+        if covariance is not None:
+            return covariance.correlation()
         
-        return matrix
+        # Unaligned series: correlate pairwise, computing each unordered pair once
+        assets = list(asset_returns.keys())
+        matrix = {asset: {} for asset in assets}
+        
+        for i, asset_a in enumerate(assets):
+            matrix[asset_a][asset_a] = 1.0
+            for asset_b in assets[i + 1:]:
+                corr = PortfolioAnalyzer.calculate_correlation(
+                    asset_returns[asset_a],
+                    asset_returns[asset_b]
+                )
+                matrix[asset_a][asset_b] = matrix[asset_b][asset_a] = corr if corr is not None else 0.0
+        
+        return {a: {b: matrix[a][b] for b in assets} for a in assets}
     
     @staticmethod
     def calculate_portfolio_return(weights: List[float], returns: List[List[float]]) -> float:
@@ -123,22 +161,23 @@ class PortfolioAnalyzer:
         return sum(portfolio_returns) / len(portfolio_returns)
     
     @staticmethod
-    def calculate_portfolio_volatility(weights: List[float], returns: List[List[float]]) -> float:
-        """Calculate portfolio volatility (standard deviation of returns)"""
-        if not weights or not returns:
-            return 0.0
+    def calculate_portfolio_volatility(weights: List[float], returns: List[List[float]],
+                                       covariance: Optional[CovarianceMatrix] = None) -> float:
+        """
+        Calculate portfolio volatility (standard deviation of returns)
         
-        portfolio_returns = []
-        for i in range(len(returns[0])):
-            period_return = sum(weights[j] * returns[j][i] for j in range(len(weights)))
-            portfolio_returns.append(period_return)
+        Computed as sqrt(w' Σ w) from the covariance matrix, which equals the
+        standard deviation of the weighted per-period portfolio returns.
+        Pass a precomputed `covariance` to skip rebuilding it.
+        """
+        if not weights or (not returns and covariance is None):
+            return 0.0
         
-        mean_return = sum(portfolio_returns) / len(portfolio_returns)
-        variance = sum((r - mean_return) ** 2 for r in portfolio_returns) / len(portfolio_returns)
+        if covariance is None:
+            covariance = sample_covariance(returns)
         
         # Annualize for crypto (365 days)
-        volatility = (variance ** 0.5) * (365 ** 0.5)
-        return volatility
+        return covariance.portfolio_volatility(weights, periods_per_year=365)
     
     @staticmethod
     def calculate_sharpe_ratio(returns: List[float], risk_free_rate: float = 0.02) -> Optional[float]:
@@ -258,24 +297,334 @@ class PortfolioAnalyzer:
         return round(var * 100, 2)  # Return as percentage
 
 
-def analyze_portfolio(data: Dict) -> PortfolioMetrics:
+class WeightOptimizer:
+    """
+    Long-only / box-constrained weight optimization on a covariance matrix
+    
+    All weights sum to 1 and stay within [min_weight, max_weight]. Inputs are
+    annualized: expected_returns per asset and covariance as a list of rows.
+    
+    Objectives:
+        - min_variance: accelerated projected gradient (FISTA) on w' Σ w
+        - max_sharpe: projected gradient ascent with backtracking on the Sharpe ratio
+        - risk_parity: cyclical coordinate descent on the convex risk-budgeting
+          problem, then projected onto the box (contributions stay near-equal
+          unless a bound binds)
+    """
+    
+    OBJECTIVES = ("min_variance", "max_sharpe", "risk_parity")
+    
+    def __init__(self, covariance: List[List[float]], expected_returns: Optional[List[float]] = None,
+                 min_weight: float = 0.0, max_weight: float = 1.0, risk_free_rate: float = 0.02,
+                 tolerance: float = 1e-8, max_iterations: int = 10000):
+        """
+        Args:
+            covariance: Annualized covariance matrix (k x k)
+            expected_returns: Annualized expected return per asset (needed for max_sharpe)
+            min_weight: Lower bound per asset (0 = long-only)
+            max_weight: Upper bound per asset
+            risk_free_rate: Annual risk-free rate for the Sharpe ratio
+            tolerance: Stop when no weight moves more than this
+            max_iterations: Iteration cap per solve
+        """
+        self.cov = covariance
+        self.k = len(covariance)
+        self.mu = expected_returns or [0.0] * self.k
+        self.lower = [min_weight] * self.k
+        self.upper = [max_weight] * self.k
+        self.risk_free_rate = risk_free_rate
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        
+        if self.k == 0:
+            raise ValueError("Covariance matrix is empty")
+        if sum(self.lower) > 1 + 1e-12 or sum(self.upper) < 1 - 1e-12:
+            raise ValueError(f"Infeasible bounds: {self.k} assets cannot sum to 1 within "
+                             f"[{min_weight}, {max_weight}]")
+    
+    def _matvec(self, w: List[float]) -> List[float]:
+        return [sum(c * x for c, x in zip(row, w)) for row in self.cov]
+    
+    def _variance(self, w: List[float]) -> float:
+        return max(sum(a * b for a, b in zip(w, self._matvec(w))), 0.0)
+    
+    def project(self, v: List[float]) -> List[float]:
+        """Euclidean projection onto {sum(w) = 1, lower <= w <= upper}"""
+        lower, upper = self.lower, self.upper
+        
+        def total(tau):
+            return sum(min(max(x - tau, l), u) for x, l, u in zip(v, lower, upper))
+        
+        # sum(clip(v - tau)) is piecewise linear and non-increasing in tau, with
+        # kinks at v - upper and v - lower; bracket 1 between adjacent kinks,
+        # then solve the linear piece exactly
+        kinks = sorted([x - u for x, u in zip(v, upper)] + [x - l for x, l in zip(v, lower)])
+        lo, hi = 0, len(kinks) - 1
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if total(kinks[mid]) > 1:
+                lo = mid
+            else:
+                hi = mid
+        
+        tau_lo, tau_hi = kinks[lo], kinks[hi]
+        f_lo, f_hi = total(tau_lo), total(tau_hi)
+        tau = tau_lo if f_lo == f_hi else tau_lo + (f_lo - 1) * (tau_hi - tau_lo) / (f_lo - f_hi)
+        return [min(max(x - tau, l), u) for x, l, u in zip(v, lower, upper)]
+    
+    def _largest_eigenvalue(self) -> float:
+        """Power iteration estimate of the largest eigenvalue of Σ"""
+        v = [1.0] * self.k
+        eigenvalue = 0.0
+        for _ in range(200):
+            mv = self._matvec(v)
+            norm = sum(x * x for x in mv) ** 0.5
+            if norm == 0:
+                return 0.0
+            v = [x / norm for x in mv]
+            if abs(norm - eigenvalue) <= 1e-10 * norm:
+                break
+            eigenvalue = norm
+        return norm
+    
+    def min_variance(self):
+        """Minimize w' Σ w with FISTA; returns (weights, iterations, converged)"""
+        lipschitz = 2 * self._largest_eigenvalue()
+        x = self.project([1.0 / self.k] * self.k)
+        if lipschitz == 0:
+            return x, 0, True
+        
+        step = 1 / lipschitz
+        y = x
+        t = 1.0
+        for iteration in range(1, self.max_iterations + 1):
+            grad = self._matvec(y)
+            x_new = self.project([yi - 2 * step * g for yi, g in zip(y, grad)])
+            t_new = (1 + (1 + 4 * t * t) ** 0.5) / 2
+            
+            if max(abs(a - b) for a, b in zip(x_new, x)) < self.tolerance:
+                return x_new, iteration, True
+            
+            # Adaptive restart: drop momentum once it points uphill
+            if sum(g * (a - b) for g, a, b in zip(grad, x_new, x)) > 0:
+                t_new = 1.0
+            y = [a + ((t - 1) / t_new) * (a - b) for a, b in zip(x_new, x)]
+            x, t = x_new, t_new
+        
+        return x, self.max_iterations, False
+    
+    def sharpe(self, w: List[float]) -> Optional[float]:
+        volatility = self._variance(w) ** 0.5
+        if volatility == 0:
+            return None
+        return (sum(m * x for m, x in zip(self.mu, w)) - self.risk_free_rate) / volatility
+    
+    def max_sharpe(self):
+        """
+        Maximize (mu' w - rf) / sqrt(w' Σ w); returns (weights, iterations, converged)
+        
+        converged is False if the line search stalls (no step, however small,
+        improves the ratio) before the weights settle.
+        """
+        w = self.project([1.0 / self.k] * self.k)
+        current = self.sharpe(w)
+        if current is None:
+            return w, 0, True
+        
+        step = 1.0
+        for iteration in range(1, self.max_iterations + 1):
+            sigma_w = self._matvec(w)
+            variance = max(sum(a * b for a, b in zip(w, sigma_w)), 1e-300)
+            volatility = variance ** 0.5
+            excess = sum(m * x for m, x in zip(self.mu, w)) - self.risk_free_rate
+            grad = [(m - excess * sw / variance) / volatility for m, sw in zip(self.mu, sigma_w)]
+            
+            # Backtracking: shrink the step until the Sharpe ratio improves enough
+            while True:
+                candidate = self.project([x + step * g for x, g in zip(w, grad)])
+                value = self.sharpe(candidate)
+                gain = sum(g * (c - x) for g, c, x in zip(grad, candidate, w))
+                if value is not None and value >= current + 1e-4 * gain:
+                    break
+                step /= 2
+                if step < 1e-14:
+                    return w, iteration, False
+            
+            moved = max(abs(c - x) for c, x in zip(candidate, w))
+            w, current = candidate, value
+            if moved < self.tolerance:
+                return w, iteration, True
+            step *= 2
+        
+        return w, self.max_iterations, False
+    
+    def risk_parity(self):
+        """Equal risk contributions; returns (weights, iterations, converged)"""
+        budget = 1.0 / self.k
+        diagonal = [self.cov[i][i] for i in range(self.k)]
+        if any(d <= 0 for d in diagonal):
+            return self.project([budget] * self.k), 0, False
+        
+        # Minimize 1/2 y' Σ y - budget * sum(log y) one coordinate at a time;
+        # at the optimum y_i (Σ y)_i = budget for every asset
+        y = [1.0 / d ** 0.5 for d in diagonal]
+        converged = False
+        iteration = 0
+        for iteration in range(1, self.max_iterations + 1):
+            largest_change = 0.0
+            for i in range(self.k):
+                row = self.cov[i]
+                cross = sum(row[j] * y[j] for j in range(self.k)) - row[i] * y[i]
+                updated = (-cross + (cross * cross + 4 * diagonal[i] * budget) ** 0.5) / (2 * diagonal[i])
+                largest_change = max(largest_change, abs(updated - y[i]) / updated)
+                y[i] = updated
+            if largest_change < self.tolerance:
+                converged = True
+                break
+        
+        total = sum(y)
+        return self.project([v / total for v in y]), iteration, converged
+    
+    def risk_contributions(self, w: List[float]) -> List[float]:
+        """Share of portfolio variance from each asset (sums to 1)"""
+        sigma_w = self._matvec(w)
+        variance = sum(a * b for a, b in zip(w, sigma_w))
+        if variance <= 0:
+            return [0.0] * self.k
+        return [a * b / variance for a, b in zip(w, sigma_w)]
+    
+    def solve(self, objective: str, assets: List[str]) -> OptimizationResult:
+        """Solve one objective and summarize the weights"""
+        if objective not in self.OBJECTIVES:
+            raise ValueError(f"Unknown objective '{objective}'. Valid: {', '.join(self.OBJECTIVES)}")
+        
+        weights, iterations, converged = getattr(self, objective)()
+        sharpe = self.sharpe(weights)
+        
+        return OptimizationResult(
+            objective=objective,
+            weights={a: round(w * 100, 2) for a, w in zip(assets, weights)},
+            expected_return=round(sum(m * w for m, w in zip(self.mu, weights)) * 100, 2),
+            volatility=round(self._variance(weights) ** 0.5 * 100, 2),
+            sharpe_ratio=round(sharpe, 3) if sharpe is not None else None,
+            risk_contributions={a: round(rc * 100, 2) for a, rc in zip(assets, self.risk_contributions(weights))},
+            iterations=iterations,
+            converged=converged
+        )
+
+
+def merge_balances(balances: List[Dict]) -> List[Dict]:
+    """
+    One entry per asset symbol, summing balance and value_usd of repeated symbols
+    
+    Weights, return series and the covariance are all keyed by symbol, so a
+    symbol listed twice (e.g. spot and staked holdings) is held as one asset.
+    First-seen order is kept.
+    """
+    merged = {}
+    for entry in balances:
+        symbol = entry.get("asset", "")
+        holding = merged.setdefault(symbol, {"asset": symbol, "balance": 0.0, "value_usd": 0.0})
+        holding["balance"] += float(entry.get("balance", 0))
+        holding["value_usd"] += float(entry.get("value_usd", 0))
+    return list(merged.values())
+
+
+def rebalance_to_target(assets: List[Dict], target_weights: Dict[str, float], total_value: float,
+                        objective: str, threshold: float = 2.0) -> List[Dict]:
+    """
+    Rebalancing trades that move current weights to solved target weights
+    
+    Args:
+        assets: Current allocation entries (asset, weight_pct, value_usd)
+        target_weights: Target weight per asset in percent
+        total_value: Portfolio value in USD
+        objective: Objective the targets were solved for (used in the reason)
+        threshold: Ignore differences smaller than this many percentage points
+    """
+    recommendations = []
+    current = {a["asset"]: a["weight_pct"] for a in assets}
+    
+    for asset, target in target_weights.items():
+        weight = current.get(asset, 0.0)
+        delta = target - weight
+        if abs(delta) < threshold:
+            continue
+        
+        recommendations.append({
+            "asset": asset,
+            "current_weight": weight,
+            "target_weight": target,
+            "trade_usd": round(delta / 100 * total_value, 2),
+            "recommendation": "Increase allocation" if delta > 0 else "Reduce allocation",
+            "reason": f"{objective.replace('_', '-')} target {target:.1f}% vs current {weight:.1f}%"
+        })
+    
+    recommendations.sort(key=lambda r: abs(r["trade_usd"]), reverse=True)
+    return recommendations
+
+
+def optimize_weights(asset_returns: Dict[str, List[float]], objective: str,
+                     min_weight: float = 0.0, max_weight: float = 1.0,
+                     risk_free_rate: float = 0.02, covariance: Optional[CovarianceMatrix] = None,
+                     periods_per_year: int = 365) -> OptimizationResult:
+    """
+    Solve target weights from daily return series
+    
+    Args:
+        asset_returns: {asset: [daily returns]} (equal lengths)
+        objective: "min_variance", "max_sharpe" or "risk_parity"
+        min_weight: Lower bound per asset (fraction)
+        max_weight: Upper bound per asset (fraction)
+        risk_free_rate: Annual risk-free rate
+        covariance: Precomputed covariance of asset_returns
+        periods_per_year: Annualization factor
+    
+    Raises:
+        ValueError: Unknown objective, unaligned series or infeasible bounds
+    """
+    assets = list(asset_returns.keys())
+    if covariance is None:
+        covariance = sample_covariance(asset_returns, assets)
+    
+    annual_cov = [[v * periods_per_year for v in row] for row in covariance.matrix]
+    expected = [sum(r) / len(r) * periods_per_year if r else 0.0 for r in asset_returns.values()]
+    
+    optimizer = WeightOptimizer(annual_cov, expected, min_weight, max_weight, risk_free_rate)
+    return optimizer.solve(objective, assets)
+
+
+def analyze_portfolio(data: Dict, optimize: Optional[str] = None, min_weight: float = 0.0,
+                      max_weight: float = 1.0, risk_free_rate: float = 0.02) -> PortfolioMetrics:
     """
     Analyze portfolio with optimization metrics
+    
+    With `optimize` set ("min_variance", "max_sharpe", "risk_parity"), target
+    weights are solved for the assets that have price history and the
+    rebalancing recommendations are the trades that reach them.
+    
+    Balances listed more than once under the same asset symbol are merged.
+    
+    Raises:
+        ValueError: No balances, or `optimize` set without aligned price history
     """
     balances = data.get("balances", [])
     historical_prices = data.get("historical_prices", {})
     
     if not balances:
         raise ValueError("No portfolio balances provided")
+    if optimize and len(historical_prices) < 2:
+        raise ValueError(OPTIMIZE_HISTORY_ERROR.format(optimize.replace("_", "-")))
     
-    total_value = sum(float(asset.get("value_usd", 0)) for asset in balances)
+    balances = merge_balances(balances)
+    total_value = sum(asset["value_usd"] for asset in balances)
     
     # Calculate current weights
     assets = []
     for asset in balances:
-        symbol = asset.get("asset", "")
-        balance = float(asset.get("balance", 0))
-        value = float(asset.get("value_usd", 0))
+        symbol = asset["asset"]
+        balance = asset["balance"]
+        value = asset["value_usd"]
         weight = (value / total_value * 100) if total_value > 0 else 0
         
         assets.append({
@@ -292,6 +641,7 @@ def analyze_portfolio(data: Dict) -> PortfolioMetrics:
     diversification_ratio = None
     risk_metrics = {}
     rebalancing_recs = None
+    optimization = None
     
     if historical_prices and len(historical_prices) >= 2:
         # Calculate returns for each asset
@@ -312,9 +662,18 @@ def analyze_portfolio(data: Dict) -> PortfolioMetrics:
                     vol = (variance ** 0.5) * (365 ** 0.5)
                     asset_volatilities.append(vol)
         
+        # Covariance once for correlation and portfolio volatility (None if series are unaligned)
+        covariance = PortfolioAnalyzer.calculate_covariance(asset_returns) if asset_returns else None
+        # Only held assets with returns count: price history of other symbols does not
+        if optimize and (covariance is None or len(asset_returns) < 2):
+            raise ValueError(OPTIMIZE_HISTORY_ERROR.format(optimize.replace("_", "-")))
+        
         # Correlation matrix
         if len(asset_returns) >= 2:
-            correlation_matrix = PortfolioAnalyzer.calculate_correlation_matrix(asset_returns)
+            if covariance is not None:
+                correlation_matrix = covariance.correlation()
+            else:
+                correlation_matrix = PortfolioAnalyzer.calculate_correlation_matrix(asset_returns)
         
         # Portfolio metrics
         if asset_returns:
@@ -355,6 +714,12 @@ def analyze_portfolio(data: Dict) -> PortfolioMetrics:
                     "max_drawdown_pct": max_drawdown_value
                 }
                 
+                # Annualized portfolio volatility as sqrt(w' Σ w)
+                if covariance is not None:
+                    risk_metrics["portfolio_volatility_pct"] = round(
+                        PortfolioAnalyzer.calculate_portfolio_volatility(weights, all_returns, covariance) * 100, 2
+                    )
+                
                 # Diversification ratio
                 if len(asset_volatilities) == len(weights) and correlation_matrix:
                     # Build correlation matrix as list of lists
@@ -389,6 +754,19 @@ def analyze_portfolio(data: Dict) -> PortfolioMetrics:
                             "recommendation": "Consider increasing or removing",
                             "reason": "Small allocation (<5%) may not impact returns"
                         })
+                
+                # Solved target weights replace the heuristics above
+                if optimize:
+                    solved = optimize_weights(asset_returns, optimize, min_weight, max_weight,
+                                              risk_free_rate, covariance)
+                    optimization = solved.to_dict()
+                    
+                    # Assets without history keep their weight; solve within the rest
+                    covered_pct = sum(weights) * 100
+                    targets = {a: round(w * covered_pct / 100, 2) for a, w in solved.weights.items()}
+                    rebalancing_recs = rebalance_to_target(
+                        [a for a in assets if a["asset"] in targets], targets, total_value, optimize
+                    )
     
     return PortfolioMetrics(
         total_value=total_value,
@@ -398,10 +776,124 @@ def analyze_portfolio(data: Dict) -> PortfolioMetrics:
         max_drawdown=max_drawdown_value,
         diversification_ratio=diversification_ratio,
         risk_metrics=risk_metrics,
-        rebalancing_recommendations=rebalancing_recs
+        rebalancing_recommendations=rebalancing_recs,
+        optimization=optimization
     )
 
 
+def benchmark_optimizer(asset_count: int = 50, periods: int = 365, seed: int = 7) -> Dict:
+    """Time each objective on synthetic correlated daily returns"""
+    import random
+    import time
+    
+    rng = random.Random(seed)
+    market = [rng.gauss(0.0005, 0.03) for _ in range(periods)]
+    returns = {}
+    for i in range(asset_count):
+        beta = rng.uniform(0.5, 1.5)
+        drift = rng.uniform(-0.0005, 0.0015)
+        noise = rng.uniform(0.01, 0.04)
+        returns[f"A{i:03d}"] = [beta * m + drift + rng.gauss(0, noise) for m in market]
+    
+    start = time.perf_counter()
+    covariance = sample_covariance(returns)
+    timings = {"covariance_ms": round((time.perf_counter() - start) * 1000, 2)}
+    
+    for objective in WeightOptimizer.OBJECTIVES:
+        start = time.perf_counter()
+        result = optimize_weights(returns, objective, max_weight=0.2, covariance=covariance)
+        timings[objective] = {
+            "ms": round((time.perf_counter() - start) * 1000, 2),
+            "iterations": result.iterations,
+            "converged": result.converged,
+            "volatility_pct": result.volatility,
+            "sharpe_ratio": result.sharpe_ratio,
+            "holdings": sum(1 for w in result.weights.values() if w > 0)
+        }
+    
+    return {"assets": asset_count, "periods": periods, "timings": timings}
+
+
+def format_text(result: PortfolioMetrics) -> str:
+    """Human-readable report (--format text)"""
+    lines = []
+    
+    lines.append(f"\n{'='*60}")
+    lines.append(f"PORTFOLIO OPTIMIZATION ANALYSIS")
+    lines.append(f"{'='*60}\n")
+    
+    lines.append(f"Total Portfolio Value: ${result.total_value:,.2f}\n")
+    
+    # Asset allocation
+    lines.append("📊 Current Allocation:")
+    for asset in result.assets:
+        lines.append(f"  {asset['asset']}: {asset['weight_pct']:.2f}% (${asset['value_usd']:,.2f})")
+    lines.append("")
+    
+    # Correlation matrix
+    if result.correlation_matrix:
+        lines.append("🔗 Correlation Matrix:")
+        assets = list(result.correlation_matrix.keys())
+        lines.append(f"     {' '.join(f'{a:>7}' for a in assets)}")
+        for asset_a in assets:
+            row = [result.correlation_matrix[asset_a][asset_b] for asset_b in assets]
+            lines.append(f"{asset_a:>4} {' '.join(f'{v:>7.2f}' for v in row)}")
+        lines.append("")
+    
+    # Risk metrics
+    if result.risk_metrics:
+        lines.append("📈 Risk-Adjusted Performance:")
+        metrics = result.risk_metrics
+        if metrics.get("sharpe_ratio"):
+            sharpe = metrics["sharpe_ratio"]
+            rating = "Excellent" if sharpe > 2 else "Good" if sharpe > 1 else "Fair" if sharpe > 0 else "Poor"
+            lines.append(f"  Sharpe Ratio: {sharpe:.3f} ({rating})")
+        
+        if metrics.get("sortino_ratio"):
+            lines.append(f"  Sortino Ratio: {metrics['sortino_ratio']:.3f}")
+        
+        if metrics.get("max_drawdown_pct"):
+            lines.append(f"  Max Drawdown: -{metrics['max_drawdown_pct']:.2f}%")
+        
+        if metrics.get("portfolio_volatility_pct"):
+            lines.append(f"  Volatility (annual): {metrics['portfolio_volatility_pct']:.2f}%")
+        
+        if metrics.get("var_95"):
+            lines.append(f"  VaR (95%): {metrics['var_95']:.2f}%")
+            lines.append(f"  VaR (99%): {metrics['var_99']:.2f}%")
+        
+        lines.append("")
+    
+    # Diversification
+    if result.diversification_ratio:
+        div = result.diversification_ratio
+        rating = "Well-diversified" if div > 1.5 else "Moderately diversified" if div > 1.2 else "Concentrated"
+        lines.append(f"🎯 Diversification Ratio: {div:.3f} ({rating})\n")
+    
+    # Optimized weights
+    if result.optimization:
+        opt = result.optimization
+        lines.append(f"⚖️  Optimized Weights ({opt['objective'].replace('_', '-')}):")
+        for asset, weight in opt["weights"].items():
+            lines.append(f"  {asset}: {weight:.2f}% (risk share {opt['risk_contributions'][asset]:.1f}%)")
+        sharpe = f"{opt['sharpe_ratio']:.3f}" if opt["sharpe_ratio"] is not None else "n/a"
+        lines.append(f"  Expected return: {opt['expected_return']:.2f}%  "
+                     f"Volatility: {opt['volatility']:.2f}%  Sharpe: {sharpe}")
+        lines.append("")
+    
+    # Rebalancing recommendations
+    if result.rebalancing_recommendations:
+        lines.append("💡 Rebalancing Recommendations:")
+        for rec in result.rebalancing_recommendations:
+            lines.append(f"  {rec['asset']} ({rec['current_weight']:.1f}%): {rec['recommendation']}")
+            if "trade_usd" in rec:
+                lines.append(f"    Target: {rec['target_weight']:.1f}% ({rec['trade_usd']:+,.2f} USD)")
+            lines.append(f"    Reason: {rec['reason']}")
+        lines.append("")
+    
+    return "\n".join(lines)
+
+
 def main():
     """Main entry point for portfolio optimization"""
     parser = argparse.ArgumentParser(description="Portfolio optimization and risk analysis")
@@ -409,75 +901,37 @@ def main():
                        help="Output format")
     parser.add_argument("--risk-free-rate", type=float, default=0.02,
                        help="Risk-free rate for Sharpe ratio (default: 0.02)")
+    parser.add_argument("--optimize", choices=["min-variance", "max-sharpe", "risk-parity"],
+                       help="Solve target weights and rebalance toward them")
+    parser.add_argument("--min-weight", type=float, default=0.0,
+                       help="Minimum weight per asset, 0-1 (default: 0, long-only)")
+    parser.add_argument("--max-weight", type=float, default=1.0,
+                       help="Maximum weight per asset, 0-1 (default: 1)")
+    parser.add_argument("--benchmark", type=int, metavar="ASSETS",
+                       help="Time the optimizers on synthetic returns for ASSETS assets and exit")
     args = parser.parse_args()
     
+    if args.benchmark:
+        print(json.dumps(benchmark_optimizer(args.benchmark), indent=2))
+        return
+    
     try:
         # Read portfolio data from stdin
         input_data = json.load(sys.stdin)
         
         # Perform portfolio analysis
-        result = analyze_portfolio(input_data)
+        result = analyze_portfolio(
+            input_data,
+            optimize=args.optimize.replace("-", "_") if args.optimize else None,
+            min_weight=args.min_weight,
+            max_weight=args.max_weight,
+            risk_free_rate=args.risk_free_rate
+        )
         
         if args.format == "json":
             print(json.dumps(result.to_dict(), indent=2))
         else:
-            # Text format
-            print(f"\n{'='*60}")
-            print(f"PORTFOLIO OPTIMIZATION ANALYSIS")
-            print(f"{'='*60}\n")
-            
-            print(f"Total Portfolio Value: ${result.total_value:,.2f}\n")
-            
-            # Asset allocation
-            print("📊 Current Allocation:")
-            for asset in result.assets:
-                print(f"  {asset['asset']}: {asset['weight_pct']:.2f}% (${asset['value_usd']:,.2f})")
-            print()
-            
-            # Correlation matrix
-            if result.correlation_matrix:
-                print("🔗 Correlation Matrix:")
-                assets = list(result.correlation_matrix.keys())
-                print(f"     {' '.join(f'{a:>7}' for a in assets)}")
-                for asset_a in assets:
-                    row = [result.correlation_matrix[asset_a][asset_b] for asset_b in assets]
-                    print(f"{asset_a:>4} {' '.join(f'{v:>7.2f}' for v in row)}")
-                print()
-            
-            # Risk metrics
-            if result.risk_metrics:
-                print("📈 Risk-Adjusted Performance:")
-                metrics = result.risk_metrics
-                if metrics.get("sharpe_ratio"):
-                    sharpe = metrics["sharpe_ratio"]
-                    rating = "Excellent" if sharpe > 2 else "Good" if sharpe > 1 else "Fair" if sharpe > 0 else "Poor"
-                    print(f"  Sharpe Ratio: {sharpe:.3f} ({rating})")
-                
-                if metrics.get("sortino_ratio"):
-                    print(f"  Sortino Ratio: {metrics['sortino_ratio']:.3f}")
-                
-                if metrics.get("max_drawdown_pct"):
-                    print(f"  Max Drawdown: -{metrics['max_drawdown_pct']:.2f}%")
-                
-                if metrics.get("var_95"):
-                    print(f"  VaR (95%): {metrics['var_95']:.2f}%")
-                    print(f"  VaR (99%): {metrics['var_99']:.2f}%")
-                
-                print()
-            
-            # Diversification
-            if result.diversification_ratio:
-                div = result.diversification_ratio
-                rating = "Well-diversified" if div > 1.5 else "Moderately diversified" if div > 1.2 else "Concentrated"
-                print(f"🎯 Diversification Ratio: {div:.3f} ({rating})\n")
-            
-            # Rebalancing recommendations
-            if result.rebalancing_recommendations:
-                print("💡 Rebalancing Recommendations:")
-                for rec in result.rebalancing_recommendations:
-                    print(f"  {rec['asset']} ({rec['current_weight']:.1f}%): {rec['recommendation']}")
-                    print(f"    Reason: {rec['reason']}")
-                print()
+            print(format_text(result))
     
     except json.JSONDecodeError:
         print("Error: Invalid JSON input", file=sys.stderr)
@@ -0,0 +1,180 @@
+import random
+import unittest
+from unittest import mock
+
+from covariance import sample_covariance
+from monte_carlo import build_risk_model
+from portfolio_optimizer import WeightOptimizer, analyze_portfolio, merge_balances
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python portfolio_optimizer_test.py
+
+BOUND = 1e-9
+
+
+def make_problem(seed, assets):
+    """Annualized covariance and expected returns of correlated synthetic daily returns"""
+    rng = random.Random(seed)
+    market = [rng.gauss(0.0005, 0.03) for _ in range(250)]
+    returns = {f"A{i}": [rng.uniform(0.5, 1.5) * m + rng.uniform(-0.0005, 0.002) + rng.gauss(0, rng.uniform(0.01, 0.04))
+                         for m in market]
+               for i in range(assets)}
+    covariance = [[v * 365 for v in row] for row in sample_covariance(returns).matrix]
+    expected = [sum(r) / len(r) * 365 for r in returns.values()]
+    return covariance, expected
+
+
+class KKTTestCase(unittest.TestCase):
+    """
+    First-order optimality on {sum(w) = 1, lower <= w <= upper}: for some
+    multiplier λ, the gradient of the minimized objective is λ on free
+    weights, >= λ on weights at their lower bound and <= λ at the upper.
+    """
+    
+    def assertKKT(self, optimizer, w, gradient, tolerance=1e-5):
+        self.assertAlmostEqual(sum(w), 1.0, places=9)
+        lower, upper = optimizer.lower[0], optimizer.upper[0]
+        scale = max(abs(g) for g in gradient) or 1.0
+        at_lower = [g for x, g in zip(w, gradient) if x <= lower + BOUND]
+        at_upper = [g for x, g in zip(w, gradient) if x >= upper - BOUND]
+        free = [g for x, g in zip(w, gradient) if lower + BOUND < x < upper - BOUND]
+        for x in w:
+            self.assertTrue(lower - BOUND <= x <= upper + BOUND, w)
+        
+        # Interval of multipliers every group allows
+        low = max(at_upper + free, default=-float("inf"))
+        high = min(at_lower + free, default=float("inf"))
+        self.assertLessEqual(low - high, tolerance * scale, (w, gradient))
+
+
+class TestMinVariance(KKTTestCase):
+    def test_kkt(self):
+        for seed, assets, max_weight in ((1, 5, 1.0), (2, 12, 0.2), (3, 8, 0.3), (4, 3, 0.5), (5, 20, 0.1)):
+            covariance, _ = make_problem(seed, assets)
+            optimizer = WeightOptimizer(covariance, max_weight=max_weight)
+            w, _, converged = optimizer.min_variance()
+            with self.subTest(seed=seed):
+                self.assertTrue(converged)
+                self.assertKKT(optimizer, w, [2 * v for v in optimizer._matvec(w)])
+    
+    def test_two_assets_closed_form(self):
+        # Uncorrelated: w1 = s2^2 / (s1^2 + s2^2)
+        optimizer = WeightOptimizer([[0.04, 0.0], [0.0, 0.01]])
+        w, _, _ = optimizer.min_variance()
+        self.assertAlmostEqual(w[0], 0.2, places=6)
+        self.assertAlmostEqual(w[1], 0.8, places=6)
+
+
+class TestMaxSharpe(KKTTestCase):
+    def gradient(self, optimizer, w):
+        """Gradient of -Sharpe"""
+        sigma_w = optimizer._matvec(w)
+        variance = sum(a * b for a, b in zip(w, sigma_w))
+        excess = sum(m * x for m, x in zip(optimizer.mu, w)) - optimizer.risk_free_rate
+        return [-(m - excess * sw / variance) / variance ** 0.5 for m, sw in zip(optimizer.mu, sigma_w)]
+    
+    def test_kkt(self):
+        for seed, assets, max_weight in ((1, 5, 1.0), (2, 12, 0.3), (3, 8, 0.5), (6, 4, 1.0), (7, 15, 0.2)):
+            covariance, expected = make_problem(seed, assets)
+            optimizer = WeightOptimizer(covariance, expected, max_weight=max_weight)
+            w, _, converged = optimizer.max_sharpe()
+            with self.subTest(seed=seed):
+                self.assertTrue(converged)
+                self.assertKKT(optimizer, w, self.gradient(optimizer, w), tolerance=1e-4)
+    
+    def test_two_assets_closed_form(self):
+        # Uncorrelated: w is proportional to Σ^-1 (mu - rf) = (0.08 / 0.04, 0.03 / 0.01) = (2, 3)
+        optimizer = WeightOptimizer([[0.04, 0.0], [0.0, 0.01]], [0.10, 0.05], risk_free_rate=0.02)
+        w, _, converged = optimizer.max_sharpe()
+        self.assertTrue(converged)
+        self.assertAlmostEqual(w[0], 0.4, places=5)
+        self.assertAlmostEqual(w[1], 0.6, places=5)
+    
+    def test_stalled_line_search_is_not_converged(self):
+        covariance, expected = make_problem(1, 4)
+        optimizer = WeightOptimizer(covariance, expected)
+        values = iter([0.5] + [0.0] * 100)
+        with mock.patch.object(optimizer, "sharpe", lambda w: next(values)):
+            w, iterations, converged = optimizer.max_sharpe()
+        self.assertEqual((iterations, converged), (1, False))
+        self.assertEqual(w, optimizer.project([0.25] * 4))
+
+
+class TestRiskParity(unittest.TestCase):
+    def test_equal_risk_contributions(self):
+        for seed, assets in ((1, 3), (2, 8), (3, 20)):
+            covariance, _ = make_problem(seed, assets)
+            optimizer = WeightOptimizer(covariance)
+            w, _, converged = optimizer.risk_parity()
+            with self.subTest(seed=seed):
+                self.assertTrue(converged)
+                self.assertAlmostEqual(sum(w), 1.0, places=9)
+                # Stationarity of 1/2 y' Σ y - b sum(log y): y_i (Σ y)_i = b for every asset
+                for contribution in optimizer.risk_contributions(w):
+                    self.assertAlmostEqual(contribution, 1 / assets, places=6)
+    
+    def test_inverse_volatility_when_uncorrelated(self):
+        optimizer = WeightOptimizer([[0.04, 0.0], [0.0, 0.01]])
+        w, _, _ = optimizer.risk_parity()
+        self.assertAlmostEqual(w[0], 1 / 3, places=6)
+        self.assertAlmostEqual(w[1], 2 / 3, places=6)
+
+
+class TestAnalyzePortfolio(unittest.TestCase):
+    def portfolio(self, history_lengths):
+        rng = random.Random(2)
+        prices = {}
+        for asset, length in history_lengths.items():
+            series = [100.0]
+            for _ in range(length - 1):
+                series.append(series[-1] * (1 + rng.gauss(0.001, 0.02)))
+            prices[asset] = series
+        balances = [{"asset": asset, "balance": 1.0, "value_usd": 1000.0} for asset in ("BTC", "ETH", "SOL")]
+        return {"balances": balances, "historical_prices": prices}
+    
+    def test_optimize(self):
+        result = analyze_portfolio(self.portfolio({"BTC": 90, "ETH": 90, "SOL": 90}), optimize="min_variance")
+        self.assertEqual(result.optimization["objective"], "min_variance")
+        self.assertAlmostEqual(sum(result.optimization["weights"].values()), 100.0, delta=0.05)
+    
+    def test_optimize_needs_aligned_history(self):
+        for lengths in ({"BTC": 60, "ETH": 90}, {"BTC": 90, "ETH": 60}, {"BTC": 90}, {"DOGE": 90, "XRP": 90}, {},
+                        {"BTC": 90, "DOGE": 90}, {"BTC": 90, "ETH": 1}):
+            with self.subTest(lengths=lengths):
+                with self.assertRaisesRegex(ValueError, "Cannot solve max-sharpe weights"):
+                    analyze_portfolio(self.portfolio(lengths), optimize="max_sharpe")
+        
+        # Without --optimize the other metrics are still reported
+        result = analyze_portfolio(self.portfolio({"BTC": 60, "ETH": 90}))
+        self.assertIsNone(result.optimization)
+        self.assertIsNotNone(result.sharpe_ratio)
+    
+    def test_optimize_skips_holdings_without_history(self):
+        # SOL is held without price history; DOGE has history but is not held
+        result = analyze_portfolio(self.portfolio({"BTC": 90, "ETH": 90, "DOGE": 90}), optimize="risk_parity")
+        self.assertEqual(sorted(result.optimization["weights"]), ["BTC", "ETH"])
+        self.assertAlmostEqual(sum(result.optimization["weights"].values()), 100.0, delta=0.05)
+    
+    def test_repeated_symbols_are_merged(self):
+        merged = self.portfolio({"BTC": 90, "ETH": 90, "SOL": 90})
+        split = dict(merged, balances=[
+            {"asset": "BTC", "balance": 0.25, "value_usd": 250.0},
+            {"asset": "ETH", "balance": 1.0, "value_usd": 1000.0},
+            {"asset": "BTC", "balance": 0.75, "value_usd": 750.0},
+            {"asset": "SOL", "balance": 1.0, "value_usd": 1000.0}
+        ])
+        
+        for optimize in (None, "max_sharpe"):
+            with self.subTest(optimize=optimize):
+                expected = analyze_portfolio(merged, optimize=optimize).to_dict()
+                self.assertEqual(analyze_portfolio(split, optimize=optimize).to_dict(), expected)
+        self.assertEqual(merge_balances(split["balances"]), merged["balances"])
+        
+        # Monte Carlo reads the same document
+        self.assertEqual(build_risk_model(split).weights, build_risk_model(merged).weights)
+        self.assertEqual(build_risk_model(split).assets, ["BTC", "ETH", "SOL"])
+
+
+if __name__ == "__main__":
+    unittest.main()
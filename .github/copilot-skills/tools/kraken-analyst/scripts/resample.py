@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+resample.py - Kraken Analyst Skill: Multi-Timeframe Resampling
+
+Builds higher-interval candles locally from one base series (typically 1m or
+15m), so a 5m, 1h, 4h and 1d view of a pair costs one API request and one
+stored series instead of one request per interval.
+
+Usage:
+    python fetch_data.py --pair BTC/USD --interval 1 --count 720 | python resample.py --interval 15
+    
+    from resample import Resampler, resample_series
+    
+    hourly = resample_series(minute_series, 60)      # OHLCSeries, interval=60
+    
+    resampler = Resampler(240, base_interval=15)
+    for row in new_base_candles:
+        closed = resampler.push(*row)                # finished 4h candle or None
+    resampler.current                                # forming 4h candle so far
+
+Aggregation (per bucket of base candles):
+    open = first open, high = max high, low = min low, close = last close,
+    volume = sum, count = sum, vwap = volume-weighted mean of base vwaps
+
+Buckets start on multiples of the interval since the Unix epoch (UTC), so
+hourly and daily candles line up with Kraken's own boundaries.
+
+live_feed.py --base-interval keeps one Resampler per pair and pushes each
+base candle into it as the WebSocket closes it.
+"""
+
+import json
+import sys
+import argparse
+from typing import Optional, Tuple
+
+from ohlc_series import OHLCSeries
+
+# (timestamp, open, high, low, close, vwap, volume, count), OHLCSeries.COLUMNS order
+Candle = Tuple[int, float, float, float, float, float, float, int]
+
+
+def bucket_start(timestamp: int, interval: int) -> int:
+    """Open time of the `interval`-minute bucket containing `timestamp`"""
+    width = interval * 60
+    return timestamp - timestamp % width
+
+
+class Resampler:
+    """
+    Incrementally aggregates base candles into `interval`-minute candles.
+    
+    A bucket is reported as closed when the first base candle of the next
+    bucket arrives; until then it is exposed as `current`. Pushing a candle
+    with the same timestamp as the previous one replaces it, which matches
+    how a still-forming Kraken candle is re-sent with its final values.
+    """
+    
+    def __init__(self, interval: int, base_interval: Optional[int] = None):
+        """
+        Args:
+            interval: Target interval in minutes
+            base_interval: Interval of the pushed candles (validated when given)
+        
+        Raises:
+            ValueError: interval is not a positive multiple of base_interval
+        """
+        if interval < 1:
+            raise ValueError(f"Interval must be positive, got {interval}")
+        if base_interval is not None and (base_interval < 1 or interval % base_interval):
+            raise ValueError(f"Interval {interval} is not a multiple of base interval {base_interval}")
+        self.interval = interval
+        self.base_interval = base_interval
+        self._start: Optional[int] = None
+        self._rows = []
+        self._reset()
+    
+    def _reset(self):
+        self._high = float("-inf")
+        self._low = float("inf")
+        self._volume = 0.0
+        self._value = 0.0
+        self._count = 0
+    
+    def _add(self, row: Candle):
+        self._high = max(self._high, row[2])
+        self._low = min(self._low, row[3])
+        self._volume += row[6]
+        self._value += row[5] * row[6]
+        self._count += row[7]
+    
+    def push(self, timestamp: int, open_: float, high: float, low: float, close: float,
+             vwap: float = 0.0, volume: float = 0.0, count: int = 0) -> Optional[Candle]:
+        """
+        Add one base candle.
+        
+        Returns:
+            The bucket this candle closed (a Candle tuple), or None
+        
+        Raises:
+            ValueError: timestamp is older than the previous candle
+        """
+        row = (int(timestamp), float(open_), float(high), float(low), float(close),
+               float(vwap), float(volume), int(count))
+        
+        if self._rows and row[0] <= self._rows[-1][0]:
+            if row[0] < self._rows[-1][0]:
+                raise ValueError(f"Candle {row[0]} is older than the previous candle {self._rows[-1][0]}")
+            # Replacement of the forming candle: re-aggregate the bucket
+            self._rows[-1] = row
+            self._reset()
+            for stored in self._rows:
+                self._add(stored)
+            return None
+        
+        start = bucket_start(row[0], self.interval)
+        closed = None
+        if start != self._start:
+            closed = self.current
+            self._start = start
+            self._rows = []
+            self._reset()
+        
+        self._rows.append(row)
+        self._add(row)
+        return closed
+    
+    @property
+    def current(self) -> Optional[Candle]:
+        """The bucket being built (None before the first push)"""
+        if not self._rows:
+            return None
+        rows = self._rows
+        vwap = self._value / self._volume if self._volume > 0 else rows[-1][5]
+        return (self._start, rows[0][1], self._high, self._low, rows[-1][4],
+                vwap, self._volume, self._count)
+    
+    def flush(self) -> Optional[Candle]:
+        """Return the forming bucket and start over"""
+        candle = self.current
+        self._start = None
+        self._rows = []
+        self._reset()
+        return candle
+
+
+def resample_series(series: OHLCSeries, interval: int, base_interval: Optional[int] = None,
+                    include_partial: bool = True) -> OHLCSeries:
+    """
+    Aggregate a base series to a higher interval.
+    
+    Args:
+        series: Base candles, oldest first
+        interval: Target interval in minutes
+        base_interval: Interval of `series` (defaults to series.interval)
+        include_partial: Keep the newest bucket even if it is still forming,
+                         as Kraken does for its own newest candle
+    
+    Returns:
+        New OHLCSeries (the input is returned unchanged if the intervals match)
+    
+    Raises:
+        ValueError: Unknown base interval, or interval is not a multiple of it
+    """
+    base = base_interval or series.interval
+    if not base:
+        raise ValueError("Base interval unknown: pass base_interval or set series.interval")
+    if interval == base:
+        return series
+    
+    resampler = Resampler(interval, base)
+    metadata = {k: v for k, v in series.metadata.items() if k != "interval_name"}
+    metadata["resampled_from"] = base
+    result = OHLCSeries(series.pair, interval, metadata=metadata)
+    
+    for row in zip(series.timestamp, series.open, series.high, series.low,
+                   series.close, series.vwap, series.volume, series.count):
+        closed = resampler.push(*row)
+        if closed:
+            result.append(*closed)
+    
+    last = resampler.flush()
+    if last and (include_partial or last[0] + interval * 60 <= series.timestamp[-1] + base * 60):
+        result.append(*last)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Resample OHLC candles to a higher interval",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python fetch_data.py --pair BTC/USD --interval 1 --count 720 | python resample.py --interval 15
+  python fetch_data.py --pair BTC/USD --interval 15 --store --offline --count 5000 | \\
+      python resample.py --interval 240 | python apply_rules.py
+  python resample.py --interval 1440 --complete-only < minutes.json
+
+Stored series can be resampled directly with --base-interval in
+fetch_data.py, apply_rules.py and advanced_analysis.py.
+        """
+    )
+    parser.add_argument("--interval", type=int, required=True, help="Target interval in minutes")
+    parser.add_argument("--base-interval", type=int,
+                        help="Interval of the input candles (default: the document's interval)")
+    parser.add_argument("--complete-only", action="store_true",
+                        help="Drop the newest bucket if it is still forming")
+    parser.add_argument("--columnar", action="store_true",
+                        help="Output one array per column instead of one object per candle")
+    args = parser.parse_args()
+    
+    try:
+        series = OHLCSeries.from_document(json.load(sys.stdin))
+    except (json.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
+        print(f"ERROR: Invalid JSON input: {e}", file=sys.stderr)
+        return 1
+    
+    try:
+        result = resample_series(series, args.interval, args.base_interval,
+                                 include_partial=not args.complete_only)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    
+    document = result.to_columnar_dict() if args.columnar else result.to_dict()
+    print(json.dumps(document, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
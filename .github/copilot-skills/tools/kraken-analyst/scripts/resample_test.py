@@ -0,0 +1,175 @@
+import os
+import random
+import tempfile
+import unittest
+
+from candle_store import CandleStore
+from ohlc_series import OHLCSeries
+from resample import Resampler, resample_series
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python resample_test.py
+
+START = 1700000000 - 1700000000 % 86400   # midnight UTC
+
+
+def base_series(count, interval=1, seed=0, gaps=0.0, offset=0):
+    """Random-walk base candles; `gaps` is the fraction of candles left out (no trades)"""
+    rng = random.Random(seed)
+    series = OHLCSeries("BTC/USD", interval, metadata={"pair_kraken": "XXBTZUSD"})
+    price = 30000.0
+    for i in range(count):
+        open_ = price
+        price *= 1 + rng.gauss(0, 0.002)
+        if rng.random() < gaps:
+            continue
+        high = max(open_, price) * (1 + rng.random() * 0.001)
+        low = min(open_, price) * (1 - rng.random() * 0.001)
+        volume = rng.choice([0.0, rng.uniform(0.1, 5)])
+        vwap = rng.uniform(low, high) if volume else 0.0
+        series.append(START + (offset + i) * interval * 60, open_, high, low, price, vwap, volume,
+                      rng.randint(1, 50) if volume else 0)
+    return series
+
+
+def naive_resample(series, interval):
+    """Group base candles by bucket and aggregate each group from scratch"""
+    groups = {}
+    for row in zip(*(getattr(series, name) for name in OHLCSeries.COLUMNS)):
+        groups.setdefault(row[0] - row[0] % (interval * 60), []).append(row)
+    
+    candles = []
+    for start, rows in sorted(groups.items()):
+        volume = sum(r[6] for r in rows)
+        vwap = sum(r[5] * r[6] for r in rows) / volume if volume > 0 else rows[-1][5]
+        candles.append((start, rows[0][1], max(r[2] for r in rows), min(r[3] for r in rows), rows[-1][4],
+                        vwap, volume, sum(r[7] for r in rows)))
+    return candles
+
+
+def rows(series):
+    return list(zip(*(getattr(series, name) for name in OHLCSeries.COLUMNS)))
+
+
+def from_rows(candles, interval=1):
+    return OHLCSeries("BTC/USD", interval, dict(zip(OHLCSeries.COLUMNS, zip(*candles))))
+
+
+class ResampleTestCase(unittest.TestCase):
+    def assertCandlesEqual(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        for a, e in zip(actual, expected):
+            self.assertEqual(a[0], e[0])
+            self.assertEqual(a[1:5], e[1:5])
+            self.assertAlmostEqual(a[5], e[5], places=6)
+            self.assertAlmostEqual(a[6], e[6], places=9)
+            self.assertEqual(a[7], e[7])
+
+
+class TestResampleSeries(ResampleTestCase):
+    def test_matches_naive_aggregation(self):
+        for base, interval, count, gaps in ((1, 5, 1000, 0.0), (1, 60, 3000, 0.1), (15, 240, 500, 0.05),
+                                            (15, 1440, 700, 0.0), (5, 35, 400, 0.2), (60, 10080, 900, 0.0)):
+            with self.subTest(base=base, interval=interval):
+                series = base_series(count, base, seed=interval, gaps=gaps)
+                result = resample_series(series, interval)
+                
+                self.assertEqual((result.interval, result.metadata["resampled_from"]), (interval, base))
+                self.assertCandlesEqual(rows(result), naive_resample(series, interval))
+    
+    def test_partial_last_bucket(self):
+        # 0:00 to 2:44 in 15m candles: the 2h bucket starting at 2:00 is still forming
+        series = base_series(11, 15)
+        naive = naive_resample(series, 120)
+        
+        self.assertCandlesEqual(rows(resample_series(series, 120)), naive)
+        self.assertEqual(naive[-1][0], START + 7200)
+        self.assertCandlesEqual(rows(resample_series(series, 120, include_partial=False)), naive[:-1])
+        
+        # Once its last base candle is in, the bucket is complete
+        complete = base_series(16, 15)
+        self.assertCandlesEqual(rows(resample_series(complete, 120, include_partial=False)),
+                                naive_resample(complete, 120))
+    
+    def test_same_interval_is_unchanged(self):
+        series = base_series(10, 60)
+        self.assertIs(resample_series(series, 60), series)
+    
+    def test_rejects_non_multiples(self):
+        with self.assertRaises(ValueError):
+            resample_series(base_series(10, 15), 50)
+        with self.assertRaises(ValueError):
+            Resampler(0)
+
+
+class TestResampler(ResampleTestCase):
+    def test_incremental_matches_naive(self):
+        series = base_series(500, 1, seed=3, gaps=0.1)
+        resampler = Resampler(15, base_interval=1)
+        closed = []
+        for row in rows(series):
+            candle = resampler.push(*row)
+            if candle:
+                closed.append(candle)
+            # The forming bucket always equals the naive aggregate of what arrived so far
+            self.assertCandlesEqual([resampler.current], naive_resample(
+                from_rows([r for r in rows(series) if r[0] <= row[0]]), 15)[-1:])
+        
+        naive = naive_resample(series, 15)
+        self.assertCandlesEqual(closed, naive[:-1])
+        self.assertCandlesEqual([resampler.flush()], naive[-1:])
+        self.assertIsNone(resampler.current)
+    
+    def test_forming_candle_replaced(self):
+        series = base_series(8, 1)
+        revised = list(rows(series)[-1])
+        revised[2], revised[4], revised[6] = revised[2] * 1.01, revised[2] * 1.01, revised[6] + 2.0
+        
+        resampler = Resampler(5, base_interval=1)
+        for row in rows(series):
+            resampler.push(*row)
+        resampler.push(*revised)
+        
+        final = from_rows(rows(series)[:-1] + [tuple(revised)])
+        self.assertCandlesEqual([resampler.current], naive_resample(final, 5)[-1:])
+        with self.assertRaises(ValueError):
+            resampler.push(*rows(series)[0])
+
+
+class TestLoadResampled(ResampleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = CandleStore(os.path.join(directory.name, "candles.db"))
+        self.addCleanup(self.store.close)
+    
+    def test_matches_naive_aggregation_of_stored_candles(self):
+        # Starts mid-bucket and ends with a forming 4h bucket
+        series = base_series(1000, 15, seed=5, gaps=0.05, offset=3)
+        self.store.save("XXBTZUSD", 15, series)
+        naive = naive_resample(series, 240)
+        
+        self.assertCandlesEqual(rows(self.store.load_resampled("XXBTZUSD", 240)), naive)
+        for count in (1, 10, 61):
+            with self.subTest(count=count):
+                loaded = self.store.load_resampled("XXBTZUSD", 240, count=count, display_pair="BTC/USD")
+                self.assertEqual(loaded.pair, "BTC/USD")
+                self.assertCandlesEqual(rows(loaded), naive[-count:])
+    
+    def test_picks_coarsest_stored_divisor(self):
+        minutes = base_series(600, 1, seed=1)
+        quarters = resample_series(minutes, 15)
+        self.store.save("XXBTZUSD", 1, minutes)
+        self.store.save("XXBTZUSD", 15, quarters)
+        
+        hourly = self.store.load_resampled("XXBTZUSD", 60)
+        self.assertEqual(hourly.metadata["resampled_from"], 15)
+        self.assertCandlesEqual(rows(hourly), naive_resample(minutes, 60))
+        self.assertEqual(self.store.load_resampled("XXBTZUSD", 5).metadata["resampled_from"], 1)
+        with self.assertRaises(ValueError):
+            self.store.load_resampled("XXBTZUSD", 50, base_interval=15)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+retention.py - Kraken Analyst Skill: Price and Analysis Retention
+
+price_history and technical_analysis otherwise grow forever. Retention
+compacts what is older than a few days into coarser buckets:
+
+- price_history rows become hourly OHLC bars in price_buckets after
+  RAW_DAYS, and hourly bars become daily bars after HOURLY_DAYS. Prices of
+  delta-encoded snapshots (interval 'snapshot') are counted into the bars
+  but kept, since snapshots are rebuilt from them.
+- technical_analysis keeps the last row per asset and interval of every
+  hour after RAW_DAYS, and of every day after HOURLY_DAYS.
+
+Each stage runs in batches of about BATCH_ROWS rows (never splitting a
+bucket), one transaction each, and records how far it got in
+retention_progress, so a run only looks at rows that became old since the
+previous one and other writers are never blocked for long.
+
+price_bars() reads prices at the finest resolution still stored for the
+whole requested range: raw prices for recent ranges, hourly or daily bars
+further back, with finer rows aggregated on the fly to match.
+
+Usage:
+    python3 retention.py --run                                   # Compact what is due
+    python3 retention.py --run --raw-days 3 --hourly-days 30
+    python3 retention.py --status
+    python3 retention.py --bars BTC --since 2024-01-01 --until 2024-06-30
+    python3 retention.py --benchmark
+"""
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from db import SNAPSHOT_PRICE_INTERVAL, from_epoch, get_database, to_epoch
+
+HOUR = 3600
+DAY = 86400
+
+# Raw rows are kept this many days, hourly buckets this many
+RAW_DAYS = 7
+HOURLY_DAYS = 90
+
+# Rows read per compaction transaction (a bucket with more is read whole)
+BATCH_ROWS = 5000
+
+# price_bars() resolutions by name
+RESOLUTIONS = {'raw': 0, 'hour': HOUR, 'day': DAY}
+
+# Per compacted table: (time column, condition selecting the stage's input)
+SOURCES = {
+    'price_history': ('timestamp', ''),
+    'price_buckets': ('bucket', f'resolution = {HOUR} AND '),
+    'technical_analysis': ('timestamp', ''),
+}
+
+
+@dataclass(frozen=True)
+class Stage:
+    """Rows of `table` older than `keep_days` are compacted into `resolution` buckets"""
+    name: str
+    table: str
+    resolution: int
+    keep_days: float
+
+
+def retention_stages(raw_days: float = RAW_DAYS, hourly_days: float = HOURLY_DAYS) -> List[Stage]:
+    """Compaction stages in the order they run (hourly bars before daily ones)"""
+    if not 0 <= raw_days <= hourly_days:
+        raise ValueError(f"Need 0 <= raw days ({raw_days}) <= hourly days ({hourly_days})")
+    return [
+        Stage('prices:hour', 'price_history', HOUR, raw_days),
+        Stage('prices:day', 'price_buckets', DAY, hourly_days),
+        Stage('analysis:hour', 'technical_analysis', HOUR, raw_days),
+        Stage('analysis:day', 'technical_analysis', DAY, hourly_days),
+    ]
+
+
+def _merge(bars: Dict, key, bar):
+    """Fold an (open, high, low, close, samples, first_timestamp, last_timestamp) bar into bars[key]"""
+    current = bars.get(key)
+    if current is None:
+        bars[key] = list(bar)
+        return
+    if bar[5] < current[5]:
+        current[0], current[5] = bar[0], bar[5]
+    if bar[6] >= current[6]:
+        current[3], current[6] = bar[3], bar[6]
+    current[1] = max(current[1], bar[1])
+    current[2] = min(current[2], bar[2])
+    current[4] += bar[4]
+
+
+def _write_bars(conn, resolution: int, bars: Dict):
+    """Upsert (asset, bucket) bars, merging with bars an earlier batch wrote"""
+    conn.executemany('''
+        INSERT INTO price_buckets
+        (asset, resolution, bucket, open, high, low, close, samples, first_timestamp, last_timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (asset, resolution, bucket) DO UPDATE SET
+            open = CASE WHEN excluded.first_timestamp < first_timestamp THEN excluded.open ELSE open END,
+            close = CASE WHEN excluded.last_timestamp >= last_timestamp THEN excluded.close ELSE close END,
+            high = MAX(high, excluded.high),
+            low = MIN(low, excluded.low),
+            samples = samples + excluded.samples,
+            first_timestamp = MIN(first_timestamp, excluded.first_timestamp),
+            last_timestamp = MAX(last_timestamp, excluded.last_timestamp)
+    ''', ((asset, resolution, bucket, *bar) for (asset, bucket), bar in bars.items()))
+
+
+def _compact_prices(conn, stage: Stage, start: int, end: int):
+    """Raw prices into bars; all but snapshot prices are deleted"""
+    rows = conn.execute('''
+        SELECT id, asset, timestamp, price_usd, interval FROM price_history
+        WHERE timestamp >= ? AND timestamp < ?
+        ORDER BY timestamp, id
+    ''', (start, end)).fetchall()
+    bars = {}
+    for _, asset, timestamp, price, _ in rows:
+        _merge(bars, (asset, timestamp // stage.resolution * stage.resolution),
+               (price, price, price, price, 1, timestamp, timestamp))
+    _write_bars(conn, stage.resolution, bars)
+    compacted = [(row[0],) for row in rows if row[4] != SNAPSHOT_PRICE_INTERVAL]
+    conn.executemany('DELETE FROM price_history WHERE id = ?', compacted)
+    return len(rows), len(compacted)
+
+
+def _compact_buckets(conn, stage: Stage, start: int, end: int):
+    """Hourly bars into daily ones"""
+    rows = conn.execute(f'''
+        SELECT asset, bucket, open, high, low, close, samples, first_timestamp, last_timestamp
+        FROM price_buckets
+        WHERE resolution = {HOUR} AND bucket >= ? AND bucket < ?
+        ORDER BY bucket
+    ''', (start, end)).fetchall()
+    bars = {}
+    for asset, bucket, *bar in rows:
+        _merge(bars, (asset, bucket // stage.resolution * stage.resolution), bar)
+    _write_bars(conn, stage.resolution, bars)
+    conn.execute(f'DELETE FROM price_buckets WHERE resolution = {HOUR} AND bucket >= ? AND bucket < ?',
+                 (start, end))
+    return len(rows), len(rows)
+
+
+def _compact_analysis(conn, stage: Stage, start: int, end: int):
+    """Keep the last technical_analysis row per asset, interval and bucket"""
+    rows = conn.execute('''
+        SELECT id, asset, interval, timestamp FROM technical_analysis
+        WHERE timestamp >= ? AND timestamp < ?
+        ORDER BY timestamp, id
+    ''', (start, end)).fetchall()
+    last = {}
+    for row_id, asset, interval, timestamp in rows:
+        last[(asset, interval, timestamp // stage.resolution)] = row_id
+    kept = set(last.values())
+    compacted = [(row[0],) for row in rows if row[0] not in kept]
+    conn.executemany('DELETE FROM technical_analysis WHERE id = ?', compacted)
+    return len(rows), len(compacted)
+
+
+COMPACTORS = {
+    'price_history': _compact_prices,
+    'price_buckets': _compact_buckets,
+    'technical_analysis': _compact_analysis,
+}
+
+
+def _progress(db, stage: Stage) -> Optional[int]:
+    """Start of the stage's next batch: where it stopped, else its oldest input row"""
+    row = db.query_one('SELECT compacted_until FROM retention_progress WHERE stage = ?', (stage.name,))
+    if row is not None:
+        return row[0]
+    column, condition = SOURCES[stage.table]
+    first = db.query_one(f'SELECT MIN({column}) FROM {stage.table} WHERE {condition}1')[0]
+    return None if first is None else first // stage.resolution * stage.resolution
+
+
+def _batch_end(db, stage: Stage, start: int, cutoff: int, batch_rows: int) -> int:
+    """End of a batch from `start`: the bucket holding its (batch_rows + 1)th row, or cutoff"""
+    column, condition = SOURCES[stage.table]
+    row = db.query_one(f'''
+        SELECT {column} FROM {stage.table}
+        WHERE {condition}{column} >= ? AND {column} < ?
+        ORDER BY {column}
+        LIMIT 1 OFFSET ?
+    ''', (start, cutoff, batch_rows))
+    if row is None:
+        return cutoff
+    end = row[0] // stage.resolution * stage.resolution
+    return end if end > start else start + stage.resolution
+
+
+def compact_stage(db, stage: Stage, now: int, batch_rows: int = BATCH_ROWS) -> Dict:
+    """
+    Run one stage up to `keep_days` before `now`, a transaction per batch.
+    
+    Returns:
+        {'batches', 'rows', 'deleted', 'longest_batch_ms', 'compacted_until'}
+    """
+    cutoff = int(now - stage.keep_days * DAY) // stage.resolution * stage.resolution
+    result = {'batches': 0, 'rows': 0, 'deleted': 0, 'longest_batch_ms': 0.0, 'compacted_until': None}
+    while True:
+        begin = time.perf_counter()
+        with db.transaction():
+            # Read under the write lock, so concurrent runs do not compact a batch twice
+            start = _progress(db, stage)
+            if start is None or start >= cutoff:
+                result['compacted_until'] = start
+                break
+            end = _batch_end(db, stage, start, cutoff, batch_rows)
+            rows, deleted = COMPACTORS[stage.table](db.conn, stage, start, end)
+            db.execute('''
+                INSERT INTO retention_progress (stage, compacted_until) VALUES (?, ?)
+                ON CONFLICT (stage) DO UPDATE SET compacted_until = excluded.compacted_until
+            ''', (stage.name, end))
+        result['batches'] += 1
+        result['rows'] += rows
+        result['deleted'] += deleted
+        result['longest_batch_ms'] = max(result['longest_batch_ms'],
+                                         round((time.perf_counter() - begin) * 1000, 2))
+    return result
+
+
+def compact(raw_days: float = RAW_DAYS, hourly_days: float = HOURLY_DAYS, batch_rows: int = BATCH_ROWS,
+            now=None, db_path=None) -> Dict[str, Dict]:
+    """
+    Compact everything due in the tracker database.
+    
+    Args:
+        raw_days: Days raw prices and analysis rows are kept
+        hourly_days: Days hourly price bars and analysis rows are kept
+        batch_rows: Rows read per transaction
+        now: Reference time (see db.to_epoch, default now)
+    
+    Returns:
+        compact_stage() result per stage name
+    """
+    db = get_database(db_path)
+    now = to_epoch(now)
+    return {stage.name: compact_stage(db, stage, now, batch_rows)
+            for stage in retention_stages(raw_days, hourly_days)}
+
+
+def _compacted_until(db, stage_name: str) -> Optional[int]:
+    row = db.query_one('SELECT compacted_until FROM retention_progress WHERE stage = ?', (stage_name,))
+    return row[0] if row else None
+
+
+def price_bars(asset: str, since: Optional[int] = None, until: Optional[int] = None,
+               resolution: Optional[int] = None, db_path=None) -> Dict:
+    """
+    OHLC bars of an asset over [since, until] (epoch seconds), from raw
+    prices where they are still kept and from hourly and daily bars before.
+    Prices inserted after their range was compacted are not included.
+    
+    Args:
+        resolution: Bar width in seconds, 0 for a bar per raw price; ranges
+            only stored coarser keep their stored bars. Default: the finest
+            resolution stored for the whole range.
+    
+    Returns:
+        {'asset', 'resolution', 'bars': [{'timestamp', 'open', 'high', 'low', 'close', 'samples'}]}
+    """
+    db = get_database(db_path)
+    since = -2 ** 63 if since is None else since
+    until = 2 ** 63 - 1 if until is None else until
+    raw_from = _compacted_until(db, 'prices:hour')
+    hourly_from = _compacted_until(db, 'prices:day')
+    if resolution is None:
+        resolution = 0
+        for width, kept_from in ((HOUR, raw_from), (DAY, hourly_from)):
+            if kept_from is not None and since < kept_from:
+                resolution = width
+    
+    bars = {}
+    for width in (DAY, HOUR):
+        size = max(width, resolution)
+        for bucket, *bar in db.query('''
+            SELECT bucket, open, high, low, close, samples, first_timestamp, last_timestamp
+            FROM price_buckets
+            WHERE asset = ? AND resolution = ? AND bucket BETWEEN ? AND ?
+            ORDER BY bucket
+        ''', (asset, width, max(since // width * width, -2 ** 63), until)):
+            _merge(bars, bucket // size * size, bar)
+    
+    raw_since = since if raw_from is None else max(since, raw_from)
+    for timestamp, price in db.query('''
+        SELECT timestamp, price_usd FROM price_history
+        WHERE asset = ? AND timestamp BETWEEN ? AND ?
+        ORDER BY timestamp, id
+    ''', (asset, raw_since, until)):
+        key = timestamp // resolution * resolution if resolution else timestamp
+        _merge(bars, key, (price, price, price, price, 1, timestamp, timestamp))
+    
+    return {
+        'asset': asset,
+        'resolution': resolution,
+        'bars': [{'timestamp': key, 'open': bar[0], 'high': bar[1], 'low': bar[2], 'close': bar[3],
+                  'samples': bar[4]} for key, bar in sorted(bars.items())]
+    }
+
+
+def retention_status(db_path=None) -> Dict:
+    """Row counts of the compacted tables and each stage's progress"""
+    db = get_database(db_path)
+    return {
+        'price_history': db.query_one('SELECT COUNT(*) FROM price_history')[0],
+        'snapshot_prices': db.query_one(
+            f"SELECT COUNT(*) FROM price_history WHERE interval = '{SNAPSHOT_PRICE_INTERVAL}'")[0],
+        'hourly_bars': db.query_one(f'SELECT COUNT(*) FROM price_buckets WHERE resolution = {HOUR}')[0],
+        'daily_bars': db.query_one(f'SELECT COUNT(*) FROM price_buckets WHERE resolution = {DAY}')[0],
+        'technical_analysis': db.query_one('SELECT COUNT(*) FROM technical_analysis')[0],
+        'compacted_until': dict(db.query('SELECT stage, compacted_until FROM retention_progress ORDER BY stage'))
+    }
+
+
+def benchmark_retention(days: int = 90, assets: int = 4, raw_days: float = 7, hourly_days: float = 30) -> Dict:
+    """
+    Build a scratch tracker database with `days` of minute prices (every
+    15th one a snapshot price) and 15-minute technical analysis rows, then
+    compare size and a whole-range daily price query before and after
+    compaction.
+    """
+    import os
+    import random
+    import tempfile
+    
+    import db as db_module
+    
+    rng = random.Random(11)
+    names = [f"A{i:02d}" for i in range(assets)]
+    end = to_epoch('2024-06-01T00:00:00')
+    start = end - days * DAY
+    
+    def best_ms(function, repeats=3):
+        timings = []
+        for _ in range(repeats):
+            begin = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - begin) * 1000)
+        return round(min(timings), 2)
+    
+    def size_mb(db):
+        db.conn.execute('VACUUM')
+        return round(os.path.getsize(db.path) / 1e6, 1)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'bench.db')
+        db = db_module.Database(db_path)
+        with db.transaction():
+            prices = [rng.uniform(1, 50000) for _ in names]
+            for minute in range(days * 24 * 60):
+                prices = [p * (1 + rng.gauss(0, 0.0005)) for p in prices]
+                interval = SNAPSHOT_PRICE_INTERVAL if minute % 15 == 0 else '1'
+                db.executemany('INSERT INTO price_history (timestamp, asset, price_usd, interval) VALUES (?, ?, ?, ?)',
+                               [(start + minute * 60, name, price, interval) for name, price in zip(names, prices)])
+                if minute % 15 == 0:
+                    db.executemany('''
+                        INSERT INTO technical_analysis (timestamp, asset, interval, signal, rsi, json_data)
+                        VALUES (?, ?, '60', 'HOLD', ?, '{}')
+                    ''', [(start + minute * 60, name, rng.uniform(0, 100)) for name in names])
+        
+        shared = get_database(db_path)
+        asset = names[0]
+        before = {
+            'database_mb': size_mb(db),
+            'price_rows': shared.query_one('SELECT COUNT(*) FROM price_history')[0],
+            'analysis_rows': shared.query_one('SELECT COUNT(*) FROM technical_analysis')[0],
+            'daily_bars_ms': best_ms(lambda: price_bars(asset, start, end, DAY, db_path)),
+            'last_day_ms': best_ms(lambda: price_bars(asset, end - DAY, end, None, db_path)),
+        }
+        begin = time.perf_counter()
+        stages = compact(raw_days, hourly_days, now=end, db_path=db_path)
+        compact_s = time.perf_counter() - begin
+        status = retention_status(db_path)
+        results = {
+            'days': days,
+            'assets': assets,
+            'before': before,
+            'after': {
+                'database_mb': size_mb(db),
+                'price_rows': status['price_history'],
+                'snapshot_prices': status['snapshot_prices'],
+                'hourly_bars': status['hourly_bars'],
+                'daily_bars': status['daily_bars'],
+                'analysis_rows': status['technical_analysis'],
+                'auto_resolution': price_bars(asset, start, end, None, db_path)['resolution'],
+                'daily_bars_ms': best_ms(lambda: price_bars(asset, start, end, None, db_path)),
+                'last_day_ms': best_ms(lambda: price_bars(asset, end - DAY, end, None, db_path)),
+            },
+            'compact_seconds': round(compact_s, 2),
+            'batches': sum(stage['batches'] for stage in stages.values()),
+            'longest_batch_ms': max(stage['longest_batch_ms'] for stage in stages.values()),
+            'incremental_rerun_ms': best_ms(lambda: compact(raw_days, hourly_days, now=end, db_path=db_path)),
+        }
+        shared.close()
+        db.close()
+    
+    return results
+
+
+def _parse_time(value: str) -> int:
+    """Epoch seconds from an ISO date/time (UTC) or a number of seconds"""
+    return int(value) if value.lstrip('-').isdigit() else to_epoch(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compact old price_history and technical_analysis rows into coarser buckets",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python retention.py --run
+  python retention.py --run --raw-days 3 --hourly-days 30 --batch-rows 2000
+  python retention.py --status
+  python retention.py --bars BTC --since 2024-01-01 --until 2024-06-30
+  python retention.py --bars BTC --since 2024-06-01 --resolution hour
+
+Raw rows older than --raw-days become hourly buckets, hourly buckets older
+than --hourly-days become daily ones. Runs are incremental; schedule --run
+from cron next to track_portfolio.py.
+        """
+    )
+    parser.add_argument("--run", action="store_true", help="Compact everything due")
+    parser.add_argument("--raw-days", type=float, default=RAW_DAYS,
+                        help=f"Days raw rows are kept (default: {RAW_DAYS})")
+    parser.add_argument("--hourly-days", type=float, default=HOURLY_DAYS,
+                        help=f"Days hourly buckets are kept (default: {HOURLY_DAYS})")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS,
+                        help=f"Rows per transaction (default: {BATCH_ROWS})")
+    parser.add_argument("--status", action="store_true", help="Show row counts and compaction progress")
+    parser.add_argument("--bars", type=str, metavar="ASSET", help="Print an asset's price bars")
+    parser.add_argument("--since", type=str, help="From this ISO time (UTC) or epoch seconds")
+    parser.add_argument("--until", type=str, help="Up to this ISO time (UTC) or epoch seconds")
+    parser.add_argument("--resolution", choices=list(RESOLUTIONS),
+                        help="Bar width (default: the finest stored for the whole range)")
+    parser.add_argument("--db", type=str, help="Tracker database (default: portfolio_tracker.db)")
+    parser.add_argument("--benchmark", action="store_true", help="Compare before and after compaction (scratch data)")
+    args = parser.parse_args()
+    
+    if args.benchmark:
+        print(json.dumps(benchmark_retention(), indent=2))
+        return 0
+    
+    if args.run:
+        try:
+            results = compact(args.raw_days, args.hourly_days, args.batch_rows, db_path=args.db)
+        except ValueError as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            return 1
+        for name, result in results.items():
+            until = from_epoch(result['compacted_until']).isoformat() if result['compacted_until'] else '-'
+            print(f"✓ {name:<14} {result['rows']:>9} rows read, {result['deleted']:>9} removed "
+                  f"in {result['batches']} batch(es); compacted until {until}")
+        return 0
+    
+    if args.status:
+        print(json.dumps(retention_status(args.db), indent=2))
+        return 0
+    
+    if args.bars:
+        result = price_bars(args.bars, _parse_time(args.since) if args.since else None,
+                            _parse_time(args.until) if args.until else None,
+                            RESOLUTIONS[args.resolution] if args.resolution else None, args.db)
+        width = {value: name for name, value in RESOLUTIONS.items()}.get(result['resolution'],
+                                                                         f"{result['resolution']}s")
+        print(f"\n📈 {args.bars} price bars ({width}, {len(result['bars'])})")
+        print("=" * 90)
+        print(f"{'Time':<20} {'Open':>14} {'High':>14} {'Low':>14} {'Close':>14} {'Samples':>8}")
+        print("-" * 90)
+        for bar in result['bars']:
+            print(f"{from_epoch(bar['timestamp']).isoformat():<20} {bar['open']:>14.4f} {bar['high']:>14.4f} "
+                  f"{bar['low']:>14.4f} {bar['close']:>14.4f} {bar['samples']:>8}")
+        if not result['bars']:
+            print("No prices in range")
+        return 0
+    
+    parser.print_help()
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
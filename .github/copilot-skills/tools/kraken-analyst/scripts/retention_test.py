@@ -0,0 +1,129 @@
+import os
+import random
+import tempfile
+import unittest
+
+from db import Database, close_all, to_epoch
+from retention import DAY, HOUR, compact, price_bars
+from track_portfolio import SnapshotWriter, load_snapshot
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python retention_test.py
+
+END = to_epoch("2024-03-01T00:00:00")
+
+
+class RetentionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "tracker.db")
+        self.db = Database(self.path)
+        self.random = random.Random(5)
+    
+    def tearDown(self):
+        self.db.close()
+        close_all()
+        self.directory.cleanup()
+    
+    def add_prices(self, days, step=600, assets=("BTC", "ETH")):
+        """Prices every `step` seconds (with a few repeated timestamps) over the `days` before END"""
+        rows = []
+        for timestamp in range(END - days * DAY, END, step):
+            for asset in assets:
+                rows.append((timestamp, asset, self.random.uniform(1, 100), "5"))
+                if self.random.random() < 0.05:
+                    rows.append((timestamp, asset, self.random.uniform(1, 100), "1"))
+        with self.db.transaction():
+            self.db.executemany("INSERT INTO price_history (timestamp, asset, price_usd, interval) VALUES (?, ?, ?, ?)",
+                                rows)
+    
+    def bars(self, asset, since, resolution=None):
+        return price_bars(asset, since, END, resolution, self.path)
+
+
+class TestPrices(RetentionTestCase):
+    def test_bars_survive_compaction(self):
+        self.add_prices(40)
+        daily = {asset: self.bars(asset, END - 40 * DAY, DAY) for asset in ("BTC", "ETH")}
+        hourly = self.bars("ETH", END - 9 * DAY, HOUR)
+        raw = self.bars("BTC", END - 2 * DAY)
+        self.assertEqual(raw["resolution"], 0)
+        
+        results = compact(raw_days=3, hourly_days=10, batch_rows=500, now=END, db_path=self.path)
+        self.assertGreater(results["prices:hour"]["batches"], 10)
+        self.assertEqual(results["prices:day"]["compacted_until"], END - 10 * DAY)
+        self.assertEqual(self.db.query_one("SELECT MIN(timestamp) FROM price_history"), (END - 3 * DAY,))
+        
+        for asset, expected in daily.items():
+            self.assertEqual(self.bars(asset, END - 40 * DAY, DAY), expected)
+            self.assertEqual(self.bars(asset, END - 40 * DAY), expected)
+        self.assertEqual(self.bars("ETH", END - 9 * DAY, HOUR), hourly)
+        self.assertEqual(self.bars("ETH", END - 9 * DAY)["resolution"], HOUR)
+        self.assertEqual(self.bars("BTC", END - 2 * DAY), raw)
+    
+    def test_incremental(self):
+        self.add_prices(20)
+        expected = self.bars("BTC", END - 20 * DAY, DAY)
+        for days in (15, 12, 12, 0):
+            compact(raw_days=1, hourly_days=5, batch_rows=100, now=END - days * DAY, db_path=self.path)
+        self.assertEqual(compact(raw_days=1, hourly_days=5, now=END, db_path=self.path)["prices:hour"]["rows"], 0)
+        self.assertEqual(self.bars("BTC", END - 20 * DAY, DAY), expected)
+    
+    def test_rejects_inverted_policy(self):
+        with self.assertRaises(ValueError):
+            compact(raw_days=10, hourly_days=5, db_path=self.path)
+
+
+class TestSnapshotPrices(RetentionTestCase):
+    def test_delta_snapshots_still_load(self):
+        # A price collector runs alongside; every other snapshot has its latest price
+        ids = []
+        for index, timestamp in enumerate(range(END - 2 * DAY, END, 1800)):
+            with self.db.transaction():
+                self.db.executemany("INSERT INTO price_history (timestamp, asset, price_usd, interval) "
+                                    "VALUES (?, 'XXBT', ?, '5')",
+                                    [(t, self.random.uniform(1, 100))
+                                     for t in range(timestamp - 1500, timestamp + 1, 300)])
+            price = self.db.query_one("SELECT price_usd FROM price_history ORDER BY timestamp DESC, id DESC")[0] \
+                if index % 2 else round(self.random.uniform(1, 100), 1)
+            portfolio = {
+                "total_value_usd": price, "spot_value_usd": price, "earn_value_usd": 0.0,
+                "spot_portfolio": [{"asset": "XXBT", "amount": 1.0, "price_usd": price, "value_usd": price,
+                                    "weight": 100.0}],
+                "earn_allocations": [], "futures_dust": []
+            }
+            with SnapshotWriter(self.db, delta=True, keyframe_interval=10) as writer:
+                writer.add(portfolio, timestamp, "main")
+            ids += writer.snapshot_ids
+        expected = [load_snapshot(self.db, snapshot_id) for snapshot_id in ids]
+        snapshot_prices = self.db.query_one("SELECT COUNT(*) FROM price_history WHERE interval = 'snapshot'")
+        
+        compact(raw_days=0, hourly_days=0, now=END + DAY, db_path=self.path)
+        self.assertEqual(self.db.query_one("SELECT COUNT(*) FROM price_history"), snapshot_prices)
+        self.assertEqual([load_snapshot(self.db, snapshot_id) for snapshot_id in ids], expected)
+
+
+class TestTechnicalAnalysis(RetentionTestCase):
+    def test_keeps_last_row_per_bucket(self):
+        rows = [(timestamp, asset, interval, f"{asset}/{interval}/{timestamp}")
+                for timestamp in range(END - 12 * DAY, END, 900)
+                for asset in ("BTC", "ETH") for interval in ("60", "240")
+                if self.random.random() < 0.8]
+        with self.db.transaction():
+            self.db.executemany("INSERT INTO technical_analysis (timestamp, asset, interval, json_data) "
+                                "VALUES (?, ?, ?, ?)", rows)
+        
+        compact(raw_days=2, hourly_days=6, batch_rows=50, now=END, db_path=self.path)
+        
+        expected = {}
+        for timestamp, asset, interval, data in rows:
+            width = DAY if timestamp < END - 6 * DAY else HOUR if timestamp < END - 2 * DAY else 1
+            expected[(asset, interval, timestamp // width)] = data
+        kept = set(expected.values())
+        actual = [row[0] for row in self.db.query("SELECT json_data FROM technical_analysis ORDER BY id")]
+        self.assertEqual(actual, [row[3] for row in rows if row[3] in kept])
+
+
+if __name__ == "__main__":
+    unittest.main()
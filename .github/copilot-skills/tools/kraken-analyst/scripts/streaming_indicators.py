@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+streaming_indicators.py - Kraken Analyst Skill: Streaming Indicator Engine
+
+Stateful, incrementally updated indicators for apply_rules.py.
+Each indicator keeps running sums over a fixed window, so pushing a new
+candle costs O(1) instead of re-summing the whole window.
+
+Usage:
+    from streaming_indicators import StreamingIndicators
+    
+    stream = StreamingIndicators(ma_fast=12, ma_slow=26, rsi_period=14)
+    stream.seed(candles)          # Warm up from history (or seed_series(OHLCSeries))
+    stream.update(new_candle)     # O(1) per new candle
+    print(stream.rsi, stream.ma_fast, stream.volatility)
+
+Indicators:
+    - Rolling-sum SMA
+    - Rolling max/min (monotonic deque)
+    - RSI (simple rolling average, or Wilder smoothing)
+    - Rolling mean/variance via windowed Welford updates
+    - Momentum and annualized volatility as used by KrakenAnalyzer
+"""
+
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional
+
+# Recompute running sums from the window every N pushes so that
+# floating point drift cannot accumulate over very long streams.
+RESYNC_INTERVAL = 4096
+
+
+class RollingSMA:
+    """Simple moving average maintained with a rolling sum"""
+    
+    def __init__(self, period: int):
+        if period < 1:
+            raise ValueError(f"SMA period must be >= 1, got {period}")
+        self.period = period
+        self.window: Deque[float] = deque(maxlen=period)
+        self.total = 0.0
+        self._pushes = 0
+    
+    def push(self, value: float) -> Optional[float]:
+        """Add a value and return the current average (None until full)"""
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(value)
+        self.total += value
+        
+        self._pushes += 1
+        if self._pushes % RESYNC_INTERVAL == 0:
+            self.total = sum(self.window)
+        
+        return self.value
+    
+    @property
+    def ready(self) -> bool:
+        return len(self.window) == self.period
+    
+    @property
+    def value(self) -> Optional[float]:
+        if not self.ready:
+            return None
+        return self.total / self.period
+
+
+class RollingVariance:
+    """
+    Windowed mean and population variance using Welford's algorithm.
+    
+    Adding and removing a sample both update the mean and the sum of
+    squared deviations (M2) in O(1) without the cancellation problems of
+    a naive sum-of-squares approach.
+    """
+    
+    def __init__(self, period: int):
+        if period < 1:
+            raise ValueError(f"Variance period must be >= 1, got {period}")
+        self.period = period
+        self.window: Deque[float] = deque(maxlen=period)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._pushes = 0
+    
+    def push(self, value: float):
+        """Add a value, evicting the oldest one once the window is full"""
+        if len(self.window) == self.period:
+            self._remove(self.window[0])
+        self.window.append(value)
+        self._add(value)
+        
+        self._pushes += 1
+        if self._pushes % RESYNC_INTERVAL == 0:
+            self._resync()
+    
+    def _add(self, value: float):
+        n = len(self.window)
+        delta = value - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (value - self.mean)
+    
+    def _remove(self, value: float):
+        n = len(self.window) - 1
+        if n == 0:
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / n
+        self.m2 -= delta * (value - self.mean)
+    
+    def _resync(self):
+        n = len(self.window)
+        self.mean = sum(self.window) / n
+        self.m2 = sum((v - self.mean) ** 2 for v in self.window)
+    
+    @property
+    def count(self) -> int:
+        return len(self.window)
+    
+    @property
+    def ready(self) -> bool:
+        return len(self.window) == self.period
+    
+    @property
+    def variance(self) -> float:
+        """Population variance of the current window"""
+        if not self.window:
+            return 0.0
+        return max(self.m2, 0.0) / len(self.window)
+    
+    @property
+    def std_dev(self) -> float:
+        return self.variance ** 0.5
+
+
+class RollingExtremum:
+    """
+    Rolling maximum (or minimum) over the last `period` values.
+    
+    Keeps a monotonic deque of (index, value) candidates: a new value evicts
+    every older candidate it dominates, so each value enters and leaves the
+    deque once and the current extreme is always at the front (amortized O(1)).
+    """
+    
+    def __init__(self, period: int, mode: str = "max"):
+        if period < 1:
+            raise ValueError(f"Extremum period must be >= 1, got {period}")
+        if mode not in ("max", "min"):
+            raise ValueError(f"Unknown extremum mode '{mode}'. Valid: max, min")
+        self.period = period
+        self.is_max = mode == "max"
+        self.candidates: Deque = deque()
+        self.count = 0
+    
+    def push(self, value: float) -> Optional[float]:
+        """Add a value and return the current extreme (None until full)"""
+        candidates = self.candidates
+        if self.is_max:
+            while candidates and candidates[-1][1] <= value:
+                candidates.pop()
+        else:
+            while candidates and candidates[-1][1] >= value:
+                candidates.pop()
+        candidates.append((self.count, value))
+        
+        self.count += 1
+        if candidates[0][0] <= self.count - 1 - self.period:
+            candidates.popleft()
+        
+        return self.value
+    
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.period
+    
+    @property
+    def value(self) -> Optional[float]:
+        if not self.ready:
+            return None
+        return self.candidates[0][1]
+
+
+def rolling_extrema(values: Iterable[float], period: int, mode: str = "max") -> List[Optional[float]]:
+    """
+    Rolling max (or min) of every window in one O(n) pass.
+    
+    Batch counterpart of RollingExtremum: the deque holds indices of the
+    remaining candidates. Returns one value per input with None during the
+    first period - 1 values.
+    """
+    if period < 1:
+        raise ValueError(f"Extremum period must be >= 1, got {period}")
+    if mode not in ("max", "min"):
+        raise ValueError(f"Unknown extremum mode '{mode}'. Valid: max, min")
+    
+    values = values if isinstance(values, list) else list(values)
+    out: List[Optional[float]] = [None] * len(values)
+    candidates: Deque[int] = deque()
+    is_max = mode == "max"
+    
+    for i, value in enumerate(values):
+        if is_max:
+            while candidates and values[candidates[-1]] <= value:
+                candidates.pop()
+        else:
+            while candidates and values[candidates[-1]] >= value:
+                candidates.pop()
+        candidates.append(i)
+        if candidates[0] <= i - period:
+            candidates.popleft()
+        if i >= period - 1:
+            out[i] = values[candidates[0]]
+    
+    return out
+
+
+class RollingRSI:
+    """
+    Relative Strength Index updated one price at a time.
+    
+    smoothing="simple" averages gains/losses over the last `period` deltas,
+    matching KrakenAnalyzer.calculate_rsi. smoothing="wilder" uses Wilder's
+    recursive smoothing, seeded with the simple average of the first window.
+    """
+    
+    SMOOTHING_MODES = ("simple", "wilder")
+    
+    def __init__(self, period: int = 14, smoothing: str = "simple"):
+        if smoothing not in self.SMOOTHING_MODES:
+            raise ValueError(f"Unknown RSI smoothing '{smoothing}'. Valid: {self.SMOOTHING_MODES}")
+        self.period = period
+        self.smoothing = smoothing
+        self.prev_price: Optional[float] = None
+        self.gains = RollingSMA(period)
+        self.losses = RollingSMA(period)
+        self.avg_gain: Optional[float] = None
+        self.avg_loss: Optional[float] = None
+    
+    def push(self, price: float) -> Optional[float]:
+        """Add a price and return the current RSI (None during warm-up)"""
+        if self.prev_price is None:
+            self.prev_price = price
+            return None
+        
+        delta = price - self.prev_price
+        self.prev_price = price
+        gain = max(delta, 0)
+        loss = -min(delta, 0)
+        
+        if self.smoothing == "wilder" and self.avg_gain is not None:
+            self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+            self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+        else:
+            self.avg_gain = self.gains.push(gain)
+            self.avg_loss = self.losses.push(loss)
+        
+        return self.value
+    
+    @property
+    def value(self) -> Optional[float]:
+        if self.avg_gain is None or self.avg_loss is None:
+            return None
+        
+        if self.avg_loss == 0:
+            rs = 100 if self.avg_gain > 0 else 50
+        else:
+            rs = self.avg_gain / self.avg_loss
+        
+        return 100 - (100 / (1 + rs))
+
+
+class StreamingIndicators:
+    """
+    Incremental indicator state for a single trading pair.
+    
+    Holds everything KrakenAnalyzer.analyze() needs so that a new candle can
+    be folded in without revisiting history. The state only remembers the
+    last `window` candles, so results match a full re-analysis of that window
+    (except a Wilder-smoothed RSI, which is recursive over the whole stream).
+    """
+    
+    def __init__(self, pair: str = "UNKNOWN", ma_fast: int = 12, ma_slow: int = 26,
+                 rsi_period: int = 14, rsi_smoothing: str = "simple", momentum_ma_period: int = 50,
+                 momentum_window: int = 20, volatility_period: int = 20,
+                 volume_window: int = 10, window: Optional[int] = None):
+        """
+        Args:
+            pair: Trading pair this state belongs to
+            ma_fast: Fast moving average period
+            ma_slow: Slow moving average period
+            rsi_period: RSI period
+            rsi_smoothing: "simple" (default, matches calculate_rsi) or "wilder"
+            momentum_ma_period: MA period used by the momentum indicator
+            momentum_window: Recent periods used for momentum deviation
+            volatility_period: Prices used for annualized volatility
+            volume_window: Candles used for the volume average
+            window: Candles of history to retain (None = grow with seed size)
+        """
+        self.pair = pair
+        self.window = window
+        self.momentum_ma_period = momentum_ma_period
+        self.momentum_window = momentum_window
+        
+        self.sma_fast = RollingSMA(ma_fast)
+        self.sma_slow = RollingSMA(ma_slow)
+        self.rsi_calc = RollingRSI(rsi_period, rsi_smoothing)
+        
+        # Momentum: MA over the older `momentum_ma_period` prices of the
+        # trailing (ma_period + window) prices, deviation over the newest ones.
+        self._momentum_prices: Deque[float] = deque(maxlen=momentum_ma_period + momentum_window)
+        self._momentum_ma_sum = 0.0
+        self._momentum_recent = RollingVariance(momentum_window)
+        
+        # Volatility: returns between the last `volatility_period` prices
+        self._returns = RollingVariance(max(volatility_period - 1, 1))
+        self.volatility_period = volatility_period
+        
+        self.volumes: Deque[float] = deque(maxlen=volume_window)
+        self._opens: Deque[float] = deque(maxlen=window) if window else deque(maxlen=1)
+        
+        self.count = 0
+        self.last_close: Optional[float] = None
+        self.last_timestamp: Optional[int] = None
+        self.rsi: Optional[float] = None
+        self._pushes = 0
+    
+    def seed(self, candles: Iterable[Dict]) -> "StreamingIndicators":
+        """
+        Warm up the state from historical candle dicts.
+        
+        If no window was configured, the retained history is sized to the
+        seed so that price change stays relative to the first seeded candle.
+        """
+        candles = list(candles)
+        self._size_window(len(candles))
+        for candle in candles:
+            self.update(candle)
+        return self
+    
+    def seed_series(self, series) -> "StreamingIndicators":
+        """Warm up the state from an OHLCSeries without building candle dicts"""
+        self._size_window(len(series))
+        for values in zip(series.timestamp, series.open, series.close, series.volume):
+            self.push(*values)
+        return self
+    
+    def _size_window(self, seed_size: int):
+        if self.window is None:
+            self.window = max(seed_size, 1)
+            self._opens = deque(self._opens, maxlen=self.window)
+    
+    def update(self, candle: Dict) -> "StreamingIndicators":
+        """Fold a single new candle dict into the state in O(1)"""
+        return self.push(int(candle['timestamp']), float(candle['open']),
+                         float(candle['close']), float(candle['volume']))
+    
+    def push(self, timestamp: int, open_: float, close: float, volume: float) -> "StreamingIndicators":
+        """Fold a single new candle (column values) into the state in O(1)"""
+        if self.window is None:
+            # Unbounded stream without a seed: keep the very first open
+            if not self._opens:
+                self._opens.append(open_)
+        else:
+            self._opens.append(open_)
+        
+        self.volumes.append(volume)
+        
+        self.sma_fast.push(close)
+        self.sma_slow.push(close)
+        self.rsi = self.rsi_calc.push(close)
+        
+        self._push_momentum(close)
+        
+        if self.last_close is not None:
+            ret = (close - self.last_close) / self.last_close if self.last_close != 0 else 0.0
+            self._returns.push(ret)
+        
+        self.last_close = close
+        self.last_timestamp = timestamp
+        self.count += 1
+        return self
+    
+    def _push_momentum(self, close: float):
+        prices = self._momentum_prices
+        
+        if len(prices) == prices.maxlen:
+            self._momentum_ma_sum -= prices[0]
+        if len(prices) >= self.momentum_window:
+            # The price leaving the recent window joins the MA window
+            self._momentum_ma_sum += prices[-self.momentum_window]
+        prices.append(close)
+        self._momentum_recent.push(close)
+        
+        self._pushes += 1
+        if self._pushes % RESYNC_INTERVAL == 0:
+            older = list(prices)[:-self.momentum_window]
+            self._momentum_ma_sum = sum(older)
+    
+    @property
+    def candles(self) -> int:
+        """Number of candles currently covered by the state"""
+        if self.window is None:
+            return self.count
+        return min(self.count, self.window)
+    
+    @property
+    def ma_fast(self) -> Optional[float]:
+        return self.sma_fast.value
+    
+    @property
+    def ma_slow(self) -> Optional[float]:
+        return self.sma_slow.value
+    
+    @property
+    def first_open(self) -> Optional[float]:
+        """Open of the oldest retained candle"""
+        return self._opens[0] if self._opens else None
+    
+    @property
+    def momentum(self) -> float:
+        """Price deviation from MA in std devs (see KrakenAnalyzer.calculate_momentum)"""
+        prices = self._momentum_prices
+        if len(prices) < prices.maxlen:
+            return 0.0
+        
+        ma = self._momentum_ma_sum / self.momentum_ma_period
+        recent = self._momentum_recent
+        # mean((p - ma)^2) == variance + (mean - ma)^2
+        std_dev = (recent.variance + (recent.mean - ma) ** 2) ** 0.5
+        
+        if std_dev == 0:
+            return 0.0
+        
+        return round((prices[-1] - ma) / std_dev, 2)
+    
+    @property
+    def volatility(self) -> float:
+        """Annualized volatility (see KrakenAnalyzer.calculate_volatility)"""
+        if self.candles < self.volatility_period or self._returns.count == 0:
+            return 0.0
+        return self._returns.std_dev * (252 ** 0.5) * 100
+    
+    def recent_volumes(self) -> List[float]:
+        return list(self.volumes)
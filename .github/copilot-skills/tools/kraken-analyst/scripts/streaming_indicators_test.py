@@ -0,0 +1,159 @@
+import contextlib
+import io
+import random
+import unittest
+
+from apply_rules import KrakenAnalyzer
+from ohlc_series import OHLCSeries
+from streaming_indicators import RESYNC_INTERVAL, StreamingIndicators
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python streaming_indicators_test.py
+
+def make_candles(count, seed=0, start_price=30000.0):
+    """Random-walk candles with flat stretches and zero-volume candles"""
+    rng = random.Random(seed)
+    candles = []
+    price = start_price
+    for i in range(count):
+        open_ = price
+        if rng.random() > 0.1:
+            price *= 1 + rng.gauss(0, 0.01)
+        candles.append({"timestamp": 1700000000 + 3600 * i, "open": open_, "high": max(open_, price) * 1.002,
+                        "low": min(open_, price) * 0.998, "close": price,
+                        "volume": rng.choice([0.0, rng.uniform(0.5, 20)])})
+    return candles
+
+
+def document(candles, pair="BTC/USD"):
+    return {"pair": pair, "interval": 60, "data": candles}
+
+
+def naive_rsi(prices, period, smoothing):
+    """RSI of the last price, recomputed from every price"""
+    deltas = [b - a for a, b in zip(prices, prices[1:])]
+    if len(deltas) < period:
+        return None
+    gains = [max(d, 0) for d in deltas]
+    losses = [-min(d, 0) for d in deltas]
+    if smoothing == "simple":
+        avg_gain, avg_loss = sum(gains[-period:]) / period, sum(losses[-period:]) / period
+    else:
+        avg_gain, avg_loss = sum(gains[:period]) / period, sum(losses[:period]) / period
+        for gain, loss in zip(gains[period:], losses[period:]):
+            avg_gain = (avg_gain * (period - 1) + gain) / period
+            avg_loss = (avg_loss * (period - 1) + loss) / period
+    if avg_loss == 0:
+        rs = 100 if avg_gain > 0 else 50
+    else:
+        rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+
+class TestStreamingIndicators(unittest.TestCase):
+    """Every incremental value against a from-scratch computation over the same prices"""
+    
+    def test_each_update_matches_recomputation(self):
+        analyzer = KrakenAnalyzer()
+        candles = make_candles(400, seed=1)
+        for smoothing in ("simple", "wilder"):
+            stream = StreamingIndicators(rsi_smoothing=smoothing, window=100)
+            for i, candle in enumerate(candles):
+                stream.update(candle)
+                closes = [c["close"] for c in candles[:i + 1]]
+                window = candles[max(0, i - 99):i + 1]
+                with self.subTest(smoothing=smoothing, candle=i):
+                    for attribute, period in (("ma_fast", 12), ("ma_slow", 26)):
+                        expected = sum(closes[-period:]) / period if len(closes) >= period else None
+                        self.assertAlmostEqualOrNone(getattr(stream, attribute), expected)
+                    self.assertAlmostEqualOrNone(stream.rsi, naive_rsi(closes, 14, smoothing))
+                    self.assertAlmostEqual(stream.volatility, analyzer.calculate_volatility(
+                        [c["close"] for c in window]), places=9)
+                    self.assertEqual(stream.momentum, analyzer.calculate_momentum(closes))
+                    self.assertEqual(stream.first_open, window[0]["open"])
+                    self.assertEqual(stream.recent_volumes(), [c["volume"] for c in candles[max(0, i - 9):i + 1]])
+    
+    def assertAlmostEqualOrNone(self, actual, expected):
+        if expected is None:
+            self.assertIsNone(actual)
+        else:
+            self.assertAlmostEqual(actual, expected, places=9)
+    
+    def test_long_stream_resyncs_without_drift(self):
+        candles = make_candles(RESYNC_INTERVAL * 2 + 100, seed=2)
+        stream = StreamingIndicators(window=100)
+        for candle in candles:
+            stream.update(candle)
+        closes = [c["close"] for c in candles]
+        
+        self.assertAlmostEqual(stream.ma_slow, sum(closes[-26:]) / 26, places=9)
+        self.assertEqual(stream.momentum, KrakenAnalyzer().calculate_momentum(closes))
+    
+    def test_seed_series_matches_seed(self):
+        candles = make_candles(150, seed=3)
+        from_dicts = StreamingIndicators().seed(candles)
+        from_series = StreamingIndicators().seed_series(OHLCSeries.from_candles(candles))
+        for attribute in ("ma_fast", "ma_slow", "rsi", "momentum", "volatility", "first_open", "candles"):
+            self.assertEqual(getattr(from_series, attribute), getattr(from_dicts, attribute), attribute)
+    
+    def test_rejects_unknown_smoothing(self):
+        with self.assertRaises(ValueError):
+            StreamingIndicators(rsi_smoothing="ema")
+
+
+class TestAnalyzerStream(unittest.TestCase):
+    """analyze_stream() after each update() against analyze() of the same window"""
+    
+    def batch(self, analyzer, candles):
+        with contextlib.redirect_stderr(io.StringIO()):
+            result = analyzer.analyze(document(candles))
+        return result.to_dict() if result else None
+    
+    def test_updates_match_batch_analysis_of_the_window(self):
+        candles = make_candles(500, seed=4)
+        for window in (120, 200):
+            analyzer = KrakenAnalyzer()
+            stream = analyzer.seed_stream(document(candles[:window]))
+            for i in range(window, len(candles)):
+                result = analyzer.update(stream, candles[i])
+                with self.subTest(window=window, candle=i):
+                    self.assertEqual(result.to_dict(), self.batch(analyzer, candles[i + 1 - window:i + 1]))
+    
+    def test_wilder_rsi_keeps_history_beyond_the_window(self):
+        # Wilder smoothing is recursive, so the RSI still reflects candles that left the
+        # window; the other indicators match the batch analysis of the window
+        candles = make_candles(400, seed=5)
+        analyzer = KrakenAnalyzer(rsi_smoothing="wilder")
+        stream = analyzer.seed_stream(document(candles[:120]))
+        for i in range(120, len(candles)):
+            result = analyzer.update(stream, candles[i]).analysis
+            expected = self.batch(analyzer, candles[i - 119:i + 1])["analysis"]
+            closes = [c["close"] for c in candles[:i + 1]]
+            with self.subTest(candle=i):
+                self.assertEqual(result.pop("rsi"), round(naive_rsi(closes, 14, "wilder"), 1))
+                expected.pop("rsi")
+                self.assertEqual(result, expected)
+    
+    def test_window_covering_all_candles_matches_batch(self):
+        # Nothing leaves the window, so Wilder smoothing matches too
+        candles = make_candles(300, seed=6)
+        for smoothing in ("simple", "wilder"):
+            analyzer = KrakenAnalyzer(rsi_smoothing=smoothing)
+            stream = analyzer.seed_stream(document(candles[:100]), window=len(candles))
+            for candle in candles[100:]:
+                result = analyzer.update(stream, candle)
+            with self.subTest(smoothing=smoothing):
+                self.assertEqual(result.to_dict(), self.batch(analyzer, candles))
+    
+    def test_short_window_is_insufficient(self):
+        analyzer = KrakenAnalyzer()
+        stream = analyzer.seed_stream(document(make_candles(30)))
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertIsNone(analyzer.analyze_stream(stream))
+            self.assertIsNone(analyzer.update(stream, make_candles(31)[-1]))
+        self.assertIsNone(self.batch(analyzer, make_candles(45)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,6 +10,12 @@ Usage:
     python3 track_portfolio.py --history 30       # Show last 30 snapshots
     python3 track_portfolio.py --compare          # Compare to previous snapshot
     python3 track_portfolio.py --csv              # Export to CSV
+    python3 track_portfolio.py --account main     # Save, labelled with an account name
+    python3 track_portfolio.py --import snapshots.ndjson   # Batch-ingest snapshots (many accounts)
+    python3 track_portfolio.py --delta            # Save as a delta against the previous snapshot
+    python3 track_portfolio.py --at 2024-06-01T12:00:00 --account main   # Rebuild a past snapshot
+    python3 track_portfolio.py --benchmark 525600 # Ingest a year of minute snapshots (scratch db)
+    python3 track_portfolio.py --benchmark-storage 100000  # Full vs delta storage (scratch dbs)
 """
 
 import sqlite3
@@ -18,94 +24,626 @@ import sys
 from pathlib import Path
 from datetime import datetime, timedelta
 from fetch_portfolio import PortfolioFetcher
+from db import (SNAPSHOT_PRICE_INTERVAL, Database, chain_state, extend_asset_rollups, from_epoch, get_database,
+                holding_value, price_at, to_epoch)
 
-DB_PATH = Path(__file__).parent.parent / 'portfolio_tracker.db'
+# Portfolio keys stored as asset_holdings rows (key, source)
+HOLDING_LISTS = (('spot_portfolio', 'spot'), ('earn_allocations', 'earn'))
 
+# Holding fields that have their own asset_holdings column
+HOLDING_FIELDS = ('asset', 'amount', 'price_usd', 'value_usd', 'weight')
 
-def save_portfolio_snapshot(portfolio_data):
-    """Save portfolio snapshot to database"""
-    try:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        
-        timestamp = datetime.utcnow().isoformat()
-        total_value = portfolio_data.get('total_value_usd', 0)
-        spot_value = portfolio_data.get('spot_value_usd', 0)
-        earn_value = portfolio_data.get('earn_value_usd', 0)
-        holdings_json = json.dumps(portfolio_data)
-        
-        # Insert portfolio snapshot
-        cursor.execute('''
-            INSERT INTO portfolio_snapshots 
-            (timestamp, total_value_usd, spot_value_usd, earn_value_usd, holdings_json)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (timestamp, total_value, spot_value, earn_value, holdings_json))
-        
-        snapshot_id = cursor.lastrowid
-        
-        # Insert spot portfolio holdings
-        for holding in portfolio_data.get('spot_portfolio', []):
-            cursor.execute('''
-                INSERT INTO asset_holdings
-                (snapshot_id, asset, amount, price_usd, value_usd, allocation_pct, source)
+# Summary fields stored as portfolio_snapshots columns
+SUMMARY_FIELDS = ('total_value_usd', 'spot_value_usd', 'earn_value_usd')
+
+# Delta-encoded snapshots per chain: the keyframe lists every holding, the
+# others only what changed, so rebuilding one replays at most this many
+KEYFRAME_INTERVAL = 96
+
+# Spot weights of delta-encoded snapshots are recomputed from the values on
+# load; a weight is stored only if it differs from that by more than this
+WEIGHT_TOLERANCE = 1e-9
+
+
+def _holding_details(holding):
+    """Fields of a holding that its asset_holdings row cannot represent"""
+    return {k: v for k, v in holding.items() if k not in HOLDING_FIELDS or v is None}
+
+
+def _snapshot_extras(portfolio_data, details=True):
+    """
+    holdings_json payload: everything not already stored in columns or
+    asset_holdings rows (notes, earn strategy/APR, futures dust, ...),
+    instead of a second copy of the whole portfolio. Delta-encoded
+    snapshots keep holding details in holding_deltas (details=False).
+    """
+    listed = dict(HOLDING_LISTS)
+    extras = {k: v for k, v in portfolio_data.items() if k not in SUMMARY_FIELDS and k not in listed}
+    if not details:
+        return json.dumps(extras, separators=(',', ':'))
+    for key, source in HOLDING_LISTS:
+        details = {}
+        for position, holding in enumerate(portfolio_data.get(key, [])):
+            fields = _holding_details(holding)
+            if fields:
+                details[str(position)] = fields
+        if details:
+            extras[f'{source}_details'] = details
+    return json.dumps(extras, separators=(',', ':'))
+
+
+class SnapshotWriter:
+    """
+    Buffers portfolio snapshots and writes each batch with executemany in
+    a single transaction.
+    
+    With delta=True, holdings are not written as asset_holdings rows.
+    Per account, snapshots form chains: a keyframe stores every holding in
+    holding_deltas, and each following snapshot stores only the holdings
+    whose amount or details changed. Prices are referenced from the
+    snapshot prices in price_history (interval 'snapshot', which retention
+    leaves in place), where a price is added only when it moved.
+    load_snapshot() rebuilds any of them from its chain.
+    
+    Usage:
+        with SnapshotWriter(get_database()) as writer:
+            for account, portfolio in portfolios:
+                writer.add(portfolio, account=account)
+        print(writer.snapshot_ids)
+    """
+    
+    def __init__(self, db, batch_size=1000, delta=False, keyframe_interval=KEYFRAME_INTERVAL):
+        """
+        Args:
+            db: Tracker Database (see db.py)
+            batch_size: Snapshots buffered before an automatic flush
+            delta: Store holdings as deltas against the account's previous snapshot
+            keyframe_interval: Snapshots per delta chain
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self.snapshot_ids = []
+        self._pending = []
+        # Delta state within one flush: open chain per account, latest
+        # snapshot price per asset
+        self._chains = {}
+        self._prices = {}
+    
+    def add(self, portfolio_data, timestamp=None, account=None):
+        """Queue one get_portfolio_summary() result (timestamp: see db.to_epoch, default now)"""
+        self._pending.append((to_epoch(timestamp), account, portfolio_data))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        """
+        Write all queued snapshots in one transaction.
+        
+        Returns:
+            Snapshot ids of the batch, in the order they were added
+        """
+        if not self._pending:
+            return []
+        
+        with self.db.transaction():
+            # The write lock is held since BEGIN IMMEDIATE, so AUTOINCREMENT
+            # assigns consecutive ids following the last one handed out
+            sequence = self.db.query_one("SELECT seq FROM sqlite_sequence WHERE name = 'portfolio_snapshots'")
+            first_id = (sequence[0] if sequence else 0) + 1
+            ids = list(range(first_id, first_id + len(self._pending)))
+            
+            # Encode against the chain tails and price heads as committed:
+            # another writer may have extended them since the last flush
+            self._chains = {}
+            self._prices = {}
+            pending = [(timestamp, account, portfolio,
+                        self._encode(portfolio, timestamp, account) if self.delta else None)
+                       for timestamp, account, portfolio in self._pending]
+            
+            snapshots = []
+            for snapshot_id, (timestamp, account, portfolio, encoded) in zip(ids, pending):
+                keyframe_id = None
+                if encoded is not None:
+                    chain, keyframe = encoded[:2]
+                    if keyframe:
+                        chain['keyframe_id'] = snapshot_id
+                    keyframe_id = chain['keyframe_id']
+                snapshots.append((timestamp, portfolio.get('total_value_usd', 0), portfolio.get('spot_value_usd', 0),
+                                  portfolio.get('earn_value_usd', 0), _snapshot_extras(portfolio, encoded is None),
+                                  account, keyframe_id))
+            
+            self.db.executemany('''
+                INSERT INTO portfolio_snapshots
+                (timestamp, total_value_usd, spot_value_usd, earn_value_usd, holdings_json, account, keyframe_id)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                snapshot_id,
-                holding['asset'],
-                holding['amount'],
-                holding.get('price_usd', 0),
-                holding['value_usd'],
-                holding.get('weight', 0),
-                'spot'
-            ))
-        
-        # Insert earn allocations
-        for allocation in portfolio_data.get('earn_allocations', []):
-            cursor.execute('''
+            ''', snapshots)
+            if self.db.query_one('SELECT last_insert_rowid()')[0] != ids[-1]:
+                raise RuntimeError("Snapshot ids were not assigned consecutively")
+            
+            self.db.executemany('''
                 INSERT INTO asset_holdings
                 (snapshot_id, asset, amount, price_usd, value_usd, allocation_pct, source)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                snapshot_id,
-                allocation['asset'],
-                allocation['amount'],
-                allocation.get('price_usd', 0),
-                allocation['value_usd'],
-                0,  # Will calculate from value
-                'earn'
-            ))
-        
-        conn.commit()
-        conn.close()
+            ''', self._holding_rows(ids, pending))
+            
+            if self.delta:
+                delta_batch = [(snapshot_id, timestamp, encoded)
+                               for snapshot_id, (timestamp, _, _, encoded) in zip(ids, pending)]
+                self.db.executemany('''
+                    INSERT INTO holding_deltas (keyframe_id, snapshot_id, source, asset, slot, amount, details)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', ((encoded[0]['keyframe_id'], snapshot_id, *key, *change)
+                      for snapshot_id, _, encoded in delta_batch for key, change in encoded[2]))
+                self.db.executemany(f'''
+                    INSERT INTO price_history (timestamp, asset, price_usd, interval)
+                    VALUES (?, ?, ?, '{SNAPSHOT_PRICE_INTERVAL}')
+                ''', ((timestamp, asset, price)
+                      for _, timestamp, encoded in delta_batch for asset, price in encoded[3]))
+                extend_asset_rollups(self.db.conn, ((asset, timestamp, value)
+                                                    for _, timestamp, encoded in delta_batch
+                                                    for asset, value in encoded[4]))
+        
+        self._pending = []
+        self.snapshot_ids.extend(ids)
+        return ids
+    
+    def _holding_rows(self, ids, pending):
+        for snapshot_id, (_, _, portfolio, encoded) in zip(ids, pending):
+            if encoded is not None:
+                continue
+            for key, source in HOLDING_LISTS:
+                for holding in portfolio.get(key, []):
+                    yield (
+                        snapshot_id,
+                        holding['asset'],
+                        holding['amount'],
+                        holding.get('price_usd') or 0,
+                        holding['value_usd'],
+                        # Earn allocations are not weighted; calculate from value
+                        (holding.get('weight') or 0) if source == 'spot' else 0,
+                        source
+                    )
+    
+    def _encode(self, portfolio, timestamp, account):
+        """
+        Delta-encode one snapshot against its account's open chain.
+        
+        Returns:
+            (chain, keyframe, changes, prices, rollup): changes are
+            ((source, asset, slot), (amount, details_json)) rows for
+            holding_deltas, amount None for holdings no longer held; prices
+            (asset, price) rows for price_history; rollup (asset, value_usd)
+            per holding for extend_asset_rollups()
+        """
+        if account not in self._chains:
+            self._chains[account] = self._load_chain(account)
+        chain = self._chains[account]
+        keyframe = (chain is None or chain['length'] >= self.keyframe_interval
+                    or timestamp < chain['timestamp'])
+        
+        # The first priced holding of an asset sets the price it is stored
+        # with: the latest snapshot price, unless it moved. Prices that
+        # would have to go before the latest row are kept with the holdings.
+        references = {}
+        prices = []
+        for key, _ in HOLDING_LISTS:
+            for holding in portfolio.get(key, []):
+                asset, price = holding['asset'], holding.get('price_usd')
+                if price is None or asset in references:
+                    continue
+                head = self._price_head(asset)
+                if head is not None and timestamp >= head[0] and price == head[1]:
+                    references[asset] = price
+                elif head is None or timestamp > head[0]:
+                    references[asset] = price
+                    prices.append((asset, price))
+                    self._prices[asset] = (timestamp, price)
+                else:
+                    references[asset] = None
+        
+        spot_total = sum(sorted((h['value_usd'] for h in portfolio.get('spot_portfolio', [])), reverse=True))
+        current = {}
+        rollup = []
+        for key, source in HOLDING_LISTS:
+            slots = {}
+            for holding in portfolio.get(key, []):
+                asset = holding['asset']
+                slot = slots[asset] = slots.get(asset, -1) + 1
+                details = _holding_details(holding)
+                if source != 'spot':
+                    details.pop('weight', None)
+                reference = references.get(asset)
+                if holding.get('price_usd') != reference:
+                    details['price_usd'] = holding.get('price_usd')
+                if holding_value(holding['amount'], details, reference) != holding['value_usd']:
+                    details['value_usd'] = holding['value_usd']
+                weight = holding.get('weight')
+                if source == 'spot' and weight is not None:
+                    computed = holding['value_usd'] / spot_total * 100 if spot_total > 0 else 0.0
+                    if abs(computed - weight) > WEIGHT_TOLERANCE:
+                        details['weight'] = weight
+                current[(source, asset, slot)] = (
+                    holding['amount'], json.dumps(details, sort_keys=True, separators=(',', ':')) if details else None
+                )
+                rollup.append(((source, slot), asset, holding['value_usd']))
+        # In the order db._chain_asset_history() recomputes them
+        rollup = [(asset, value) for _, asset, value in sorted(rollup, key=lambda item: item[0])]
+        
+        if keyframe:
+            chain = {'keyframe_id': None, 'length': 0}
+            changes = list(current.items())
+        else:
+            previous = chain['holdings']
+            changes = [(key, state) for key, state in current.items() if previous.get(key) != state]
+            changes += [(key, (None, None)) for key in previous if key not in current]
+        chain.update(holdings=current, length=chain['length'] + 1, timestamp=timestamp)
+        self._chains[account] = chain
+        return chain, keyframe, changes, prices, rollup
+    
+    def _load_chain(self, account):
+        """The account's chain to continue, if its latest snapshot ends one"""
+        latest = self.db.query_one('''
+            SELECT id, timestamp, keyframe_id FROM portfolio_snapshots
+            WHERE account IS ?
+            ORDER BY timestamp DESC, id DESC
+            LIMIT 1
+        ''', (account,))
+        if latest is None or latest[2] is None:
+            return None
+        length, last_id = self.db.query_one('''
+            SELECT COUNT(*), MAX(id) FROM portfolio_snapshots WHERE keyframe_id = ?
+        ''', (latest[2],))
+        if last_id != latest[0]:
+            return None
+        # Every delta of the chain, including those of deleted snapshots
+        return {'keyframe_id': latest[2], 'holdings': chain_state(self.db.conn, latest[2]),
+                'length': length, 'timestamp': latest[1]}
+    
+    def _price_head(self, asset):
+        """(timestamp, price) of the asset's latest snapshot price, or None"""
+        if asset not in self._prices:
+            self._prices[asset] = self.db.query_one(f'''
+                SELECT timestamp, price_usd FROM price_history
+                WHERE asset = ? AND interval = '{SNAPSHOT_PRICE_INTERVAL}'
+                ORDER BY timestamp DESC, id DESC
+                LIMIT 1
+            ''', (asset,))
+        return self._prices[asset]
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.flush()
+
+
+def load_snapshot(db, snapshot_id):
+    """
+    Rebuild the portfolio dict saved as a snapshot.
+    
+    Returns:
+        get_portfolio_summary()-shaped dict plus 'snapshot_timestamp' and
+        'account', or None if the snapshot does not exist
+    """
+    row = db.query_one('''
+        SELECT timestamp, total_value_usd, spot_value_usd, earn_value_usd, holdings_json, account, keyframe_id
+        FROM portfolio_snapshots WHERE id = ?
+    ''', (snapshot_id,))
+    if row is None:
+        return None
+    
+    timestamp, total, spot, earn, extras_json, account, keyframe_id = row
+    extras = json.loads(extras_json)
+    if keyframe_id is not None:
+        portfolio = {'total_value_usd': total, 'spot_value_usd': spot, 'earn_value_usd': earn}
+        portfolio.update(_chain_holdings(db, keyframe_id, snapshot_id, timestamp))
+        portfolio.update(extras)
+    elif 'spot_portfolio' in extras:
+        # Written before holdings_json was reduced: already complete
+        portfolio = extras
+    else:
+        portfolio = {'total_value_usd': total, 'spot_value_usd': spot, 'earn_value_usd': earn}
+        for key, source in HOLDING_LISTS:
+            details = extras.pop(f'{source}_details', {})
+            holdings = []
+            for position, (asset, amount, price, value, allocation) in enumerate(db.query('''
+                SELECT asset, amount, price_usd, value_usd, allocation_pct
+                FROM asset_holdings WHERE snapshot_id = ? AND source = ?
+                ORDER BY id
+            ''', (snapshot_id, source))):
+                holding = {'asset': asset, 'amount': amount, 'price_usd': price, 'value_usd': value}
+                if source == 'spot':
+                    holding['weight'] = allocation
+                holding.update(details.get(str(position), {}))
+                holdings.append(holding)
+            portfolio[key] = holdings
+        portfolio.update(extras)
+    
+    portfolio['snapshot_timestamp'] = from_epoch(timestamp).isoformat()
+    portfolio['account'] = account
+    return portfolio
+
+
+def _chain_holdings(db, keyframe_id, snapshot_id, timestamp):
+    """Holding lists of a delta-encoded snapshot (see state_holdings)"""
+    return state_holdings(db, chain_state(db.conn, keyframe_id, snapshot_id), timestamp)
+
+
+def state_holdings(db, state, timestamp):
+    """
+    Holding lists of a chain_state() at a snapshot, in value order. Values
+    and spot weights not stored with the holdings are recomputed from amount
+    and price (weights to within WEIGHT_TOLERANCE).
+    """
+    prices = {}
+    lists = {source: [] for _, source in HOLDING_LISTS}
+    for (source, asset, _), (amount, details) in state.items():
+        details = json.loads(details) if details else {}
+        if asset not in prices:
+            prices[asset] = price_at(db.conn, asset, timestamp)
+        lists[source].append((
+            {'asset': asset, 'amount': amount, 'price_usd': details.get('price_usd', prices[asset]),
+             'value_usd': holding_value(amount, details, prices[asset])},
+            details
+        ))
+    
+    holdings = {}
+    for key, source in HOLDING_LISTS:
+        entries = sorted(lists[source], key=lambda entry: entry[0]['value_usd'], reverse=True)
+        if source == 'spot':
+            total = sum(holding['value_usd'] for holding, _ in entries)
+            for holding, _ in entries:
+                holding['weight'] = holding['value_usd'] / total * 100 if total > 0 else 0.0
+        for holding, details in entries:
+            holding.update(details)
+        holdings[key] = [holding for holding, _ in entries]
+    return holdings
+
+
+def snapshot_at(db, timestamp=None, account=None):
+    """
+    The account's portfolio as of `timestamp` (see db.to_epoch; default
+    now): its latest snapshot at or before then, rebuilt by load_snapshot().
+    """
+    row = db.query_one('''
+        SELECT id FROM portfolio_snapshots
+        WHERE account IS ? AND timestamp <= ?
+        ORDER BY timestamp DESC, id DESC
+        LIMIT 1
+    ''', (account, to_epoch(timestamp)))
+    return load_snapshot(db, row[0]) if row else None
+
+
+def save_portfolio_snapshot(portfolio_data, account=None, db_path=None, delta=False):
+    """Save portfolio snapshot to database"""
+    try:
+        timestamp = datetime.utcnow().isoformat()
+        writer = SnapshotWriter(get_database(db_path), delta=delta)
+        writer.add(portfolio_data, timestamp=timestamp, account=account)
+        snapshot_id = writer.flush()[0]
         
+        total_value = portfolio_data.get('total_value_usd', 0)
         print(f"✓ Portfolio snapshot saved")
         print(f"  Timestamp: {timestamp}")
         print(f"  Total Value: ${total_value:.2f}")
         print(f"  Holdings: {len(portfolio_data.get('spot_portfolio', []))} spot + {len(portfolio_data.get('earn_allocations', []))} earn")
         
         return snapshot_id
-        
+    
     except Exception as e:
         print(f"✗ Error saving portfolio: {e}")
         return None
 
 
+def import_snapshots(lines, batch_size=1000, db_path=None, delta=False):
+    """
+    Ingest NDJSON snapshots, e.g. collected for many accounts.
+    
+    Each line is a get_portfolio_summary() result, or
+    {"account": ..., "timestamp": ISO, "portfolio": {...}}.
+    
+    Returns:
+        Number of snapshots written
+    """
+    with SnapshotWriter(get_database(db_path), batch_size, delta) as writer:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError(f"Line {number}: expected a JSON object")
+            if 'portfolio' in record:
+                writer.add(record['portfolio'], record.get('timestamp'), record.get('account'))
+            else:
+                writer.add(record)
+    return len(writer.snapshot_ids)
+
+
+def benchmark_ingest(minutes=525600, accounts=1, holdings=8, batch_size=1000, legacy_sample=2000):
+    """
+    Ingest `minutes` of minute-level snapshots per account into a scratch
+    database while another connection keeps reading, and compare with the
+    former one-connection, one-row-per-execute() path on a sample.
+    """
+    import os
+    import random
+    import tempfile
+    import threading
+    import time
+    
+    rng = random.Random(7)
+    assets = [f"A{i:02d}" for i in range(holdings)]
+    start_time = to_epoch(datetime(2024, 1, 1))
+    
+    def snapshots():
+        prices = [rng.uniform(1, 50000) for _ in assets]
+        for minute in range(minutes):
+            timestamp = start_time + 60 * minute
+            prices = [p * (1 + rng.gauss(0, 0.0005)) for p in prices]
+            for account in range(accounts):
+                spot = [{"asset": a, "amount": 1.5, "price_usd": p, "value_usd": 1.5 * p,
+                         "weight": 100 / holdings} for a, p in zip(assets, prices)]
+                value = sum(h["value_usd"] for h in spot)
+                yield timestamp, f"acct{account}", {
+                    "total_value_usd": value, "spot_value_usd": value, "earn_value_usd": 0.0,
+                    "spot_portfolio": spot, "earn_allocations": [], "futures_dust": []
+                }
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        db = Database(path)
+        
+        # Concurrent reader, as show_history / reports would be
+        stop = threading.Event()
+        reads = {"queries": 0, "locked": 0}
+        
+        def reader():
+            reader_conn = sqlite3.connect(path, timeout=0)
+            while not stop.is_set():
+                try:
+                    reader_conn.execute('SELECT MAX(id), COUNT(*) FROM portfolio_snapshots '
+                                        'WHERE id > (SELECT MAX(id) FROM portfolio_snapshots) - 60').fetchone()
+                    reads["queries"] += 1
+                except sqlite3.OperationalError:
+                    reads["locked"] += 1
+                time.sleep(0.001)
+            reader_conn.close()
+        
+        thread = threading.Thread(target=reader)
+        thread.start()
+        begin = time.perf_counter()
+        with SnapshotWriter(db, batch_size) as writer:
+            for timestamp, account, portfolio in snapshots():
+                writer.add(portfolio, timestamp, account)
+        elapsed = time.perf_counter() - begin
+        stop.set()
+        thread.join()
+        db.close()
+        size_mb = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 1e6
+        count = len(writer.snapshot_ids)
+        
+        # Former write path: new connection, rollback journal, one execute per row
+        legacy_path = os.path.join(directory, "legacy.db")
+        Database(legacy_path).close()
+        legacy = sqlite3.connect(legacy_path)
+        legacy.execute('PRAGMA journal_mode=DELETE')
+        legacy.close()
+        sample = min(legacy_sample, count)
+        begin = time.perf_counter()
+        for _, (timestamp, _, portfolio) in zip(range(sample), snapshots()):
+            legacy = sqlite3.connect(legacy_path)
+            cursor = legacy.cursor()
+            cursor.execute('INSERT INTO portfolio_snapshots (timestamp, total_value_usd, spot_value_usd, '
+                           'earn_value_usd, holdings_json) VALUES (?, ?, ?, ?, ?)',
+                           (timestamp, portfolio['total_value_usd'], portfolio['spot_value_usd'],
+                            portfolio['earn_value_usd'], json.dumps(portfolio)))
+            snapshot_id = cursor.lastrowid
+            for holding in portfolio['spot_portfolio']:
+                cursor.execute('INSERT INTO asset_holdings (snapshot_id, asset, amount, price_usd, value_usd, '
+                               'allocation_pct, source) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                               (snapshot_id, holding['asset'], holding['amount'], holding['price_usd'],
+                                holding['value_usd'], holding['weight'], 'spot'))
+            legacy.commit()
+            legacy.close()
+        legacy_elapsed = time.perf_counter() - begin
+    
+    batched_rate = count / elapsed
+    legacy_rate = sample / legacy_elapsed if legacy_elapsed else 0
+    return {
+        "snapshots": count,
+        "holding_rows": count * holdings,
+        "batch_size": batch_size,
+        "batched": {"seconds": round(elapsed, 2), "snapshots_per_second": round(batched_rate),
+                    "database_mb": round(size_mb, 1)},
+        "legacy": {"sample": sample, "snapshots_per_second": round(legacy_rate),
+                   "projected_seconds": round(count / legacy_rate, 1) if legacy_rate else None},
+        "speedup": round(batched_rate / legacy_rate, 1) if legacy_rate else None,
+        "concurrent_reads": reads["queries"],
+        "reads_blocked": reads["locked"]
+    }
+
+
+def benchmark_storage(snapshots=100000, holdings=8, trade_rate=0.002, samples=200):
+    """
+    Write the same 15-minute snapshots in full and delta-encoded form into
+    two scratch databases and compare their size, write rate and the time
+    to rebuild a snapshot. Amounts change with probability `trade_rate` per
+    holding and snapshot; two holdings are stablecoins (price 1.0).
+    """
+    import os
+    import random
+    import tempfile
+    import time
+    
+    rng = random.Random(7)
+    assets = [f"A{i:02d}" for i in range(holdings - 2)] + ["USDC", "USDT"]
+    start_time = to_epoch(datetime(2024, 1, 1))
+    
+    def portfolios():
+        prices = [rng.uniform(1, 50000) for _ in assets[:-2]] + [1.0, 1.0]
+        amounts = [rng.uniform(0.1, 10) for _ in assets]
+        for index in range(snapshots):
+            prices[:-2] = [p * (1 + rng.gauss(0, 0.002)) for p in prices[:-2]]
+            amounts = [a * rng.uniform(0.5, 1.5) if rng.random() < trade_rate else a for a in amounts]
+            spot = [{"asset": a, "amount": n, "price_usd": p, "value_usd": n * p, "weight": 0.0}
+                    for a, n, p in zip(assets[:-1], amounts[:-1], prices[:-1])]
+            spot_total = sum(h["value_usd"] for h in spot)
+            for h in spot:
+                h["weight"] = h["value_usd"] / spot_total * 100
+            spot.sort(key=lambda h: h["value_usd"], reverse=True)
+            earn = [{"asset": assets[-1], "amount": amounts[-1], "price_usd": 1.0, "value_usd": amounts[-1],
+                     "strategy": "flex", "apr": 4.5}]
+            yield start_time + index * 900, {
+                "total_value_usd": spot_total + amounts[-1], "spot_value_usd": spot_total,
+                "earn_value_usd": amounts[-1], "spot_portfolio": spot, "earn_allocations": earn,
+                "futures_dust": []
+            }
+    
+    results = {"snapshots": snapshots, "holdings": holdings}
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ("full", "delta"):
+            path = os.path.join(directory, f"{mode}.db")
+            db = Database(path)
+            begin = time.perf_counter()
+            with SnapshotWriter(db, delta=mode == "delta") as writer:
+                for timestamp, portfolio in portfolios():
+                    writer.add(portfolio, timestamp, "main")
+            elapsed = time.perf_counter() - begin
+            db.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            
+            picks = random.Random(11).sample(writer.snapshot_ids, min(samples, snapshots))
+            begin = time.perf_counter()
+            for snapshot_id in picks:
+                load_snapshot(db, snapshot_id)
+            load_ms = (time.perf_counter() - begin) * 1000 / len(picks)
+            table = 'holding_deltas' if mode == 'delta' else 'asset_holdings'
+            holding_rows = db.query_one(f'SELECT COUNT(*) FROM {table}')
+            price_rows = db.query_one('SELECT COUNT(*) FROM price_history')
+            db.close()
+            
+            results[mode] = {"database_mb": round(os.path.getsize(path) / 1e6, 1),
+                             "holding_rows": holding_rows[0], "price_rows": price_rows[0],
+                             "snapshots_per_second": round(snapshots / elapsed),
+                             "load_snapshot_ms": round(load_ms, 3)}
+    
+    results["size_ratio"] = round(results["delta"]["database_mb"] / results["full"]["database_mb"], 2)
+    return results
+
+
 def show_history(days=30):
     """Show portfolio history"""
     try:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        
-        cutoff_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
+        cutoff = to_epoch(datetime.utcnow() - timedelta(days=days))
         
-        cursor.execute('''
+        rows = get_database().query('''
             SELECT timestamp, total_value_usd, spot_value_usd, earn_value_usd
             FROM portfolio_snapshots
             WHERE timestamp > ?
             ORDER BY timestamp DESC
-        ''', (cutoff_date,))
-        
-        rows = cursor.fetchall()
+        ''', (cutoff,))
         
         print(f"\n📊 Portfolio History (Last {days} days)")
         print("=" * 80)
@@ -114,8 +652,7 @@ def show_history(days=30):
         
         for row in rows:
             timestamp, total, spot, earn = row
-            # Parse ISO format timestamp
-            dt = datetime.fromisoformat(timestamp)
+            dt = from_epoch(timestamp)
             display_time = dt.strftime('%Y-%m-%d %H:%M:%S')
             print(f"{display_time:<25} ${total:>12.2f}  ${spot:>12.2f}  ${earn:>12.2f}")
         
@@ -128,9 +665,7 @@ def show_history(days=30):
             
             print("-" * 80)
             print(f"Change: ${change:+.2f} ({change_pct:+.2f}%)")
-        
-        conn.close()
-        
+    
     except Exception as e:
         print(f"✗ Error fetching history: {e}")
 
@@ -138,21 +673,15 @@ def show_history(days=30):
 def compare_to_previous():
     """Compare current portfolio to previous snapshot"""
     try:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, timestamp, total_value_usd, holdings_json
+        rows = get_database().query('''
+            SELECT id, timestamp, total_value_usd
             FROM portfolio_snapshots
             ORDER BY timestamp DESC
             LIMIT 2
         ''')
         
-        rows = cursor.fetchall()
-        
         if len(rows) < 2:
             print("⚠️  Not enough historical data for comparison")
-            conn.close()
             return
         
         current = rows[0]
@@ -168,10 +697,8 @@ def compare_to_previous():
         print(f"Current:  ${current_value:.2f}")
         print(f"Previous: ${previous_value:.2f}")
         print(f"Change:   ${change:+.2f} ({change_pct:+.2f}%)")
-        print(f"Time:     {previous[1]} → {current[1]}")
-        
-        conn.close()
-        
+        print(f"Time:     {from_epoch(previous[1])} → {from_epoch(current[1])}")
+    
     except Exception as e:
         print(f"✗ Error comparing: {e}")
 
@@ -184,26 +711,19 @@ def export_csv(output_file=None):
         if not output_file:
             output_file = Path.cwd() / 'portfolio_history.csv'
         
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        rows = get_database().query('''
             SELECT timestamp, total_value_usd, spot_value_usd, earn_value_usd
             FROM portfolio_snapshots
             ORDER BY timestamp
         ''')
         
-        rows = cursor.fetchall()
-        
         with open(output_file, 'w', newline='') as f:
             writer = csv.writer(f)
             writer.writerow(['Timestamp', 'Total Value (USD)', 'Spot Value (USD)', 'Earn Value (USD)'])
-            writer.writerows(rows)
+            writer.writerows((from_epoch(timestamp).isoformat(), *values) for timestamp, *values in rows)
         
         print(f"✓ Portfolio history exported to {output_file}")
-        
-        conn.close()
-        
+    
     except Exception as e:
         print(f"✗ Error exporting: {e}")
 
@@ -226,14 +746,68 @@ def main():
         export_csv()
         return 0
     
+    elif '--import' in sys.argv:
+        # Batch-ingest NDJSON snapshots ("-" reads stdin)
+        idx = sys.argv.index('--import')
+        source = sys.argv[idx + 1] if idx + 1 < len(sys.argv) else '-'
+        try:
+            if source == '-':
+                count = import_snapshots(sys.stdin, delta='--delta' in sys.argv)
+            else:
+                with open(source) as f:
+                    count = import_snapshots(f, delta='--delta' in sys.argv)
+        except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+            print(f"✗ Error importing snapshots: {e}")
+            return 1
+        print(f"✓ Imported {count} portfolio snapshots")
+        return 0
+    
+    elif '--at' in sys.argv:
+        # Rebuild the portfolio as of a past time (full or delta-encoded)
+        idx = sys.argv.index('--at')
+        when = sys.argv[idx + 1] if idx + 1 < len(sys.argv) else None
+        account = None
+        if '--account' in sys.argv:
+            idx = sys.argv.index('--account')
+            account = sys.argv[idx + 1] if idx + 1 < len(sys.argv) else None
+        try:
+            portfolio = snapshot_at(get_database(), when, account)
+        except (ValueError, sqlite3.Error) as e:
+            print(f"✗ Error loading snapshot: {e}")
+            return 1
+        if portfolio is None:
+            print(f"⚠️  No snapshot at or before {when}")
+            return 1
+        print(json.dumps(portfolio, indent=2))
+        return 0
+    
+    elif '--benchmark-storage' in sys.argv:
+        # Scratch databases only; the tracker database is not touched
+        idx = sys.argv.index('--benchmark-storage')
+        count = int(sys.argv[idx + 1]) if idx + 1 < len(sys.argv) else 100000
+        print(json.dumps(benchmark_storage(count), indent=2))
+        return 0
+    
+    elif '--benchmark' in sys.argv:
+        # Scratch database only; the tracker database is not touched
+        idx = sys.argv.index('--benchmark')
+        minutes = int(sys.argv[idx + 1]) if idx + 1 < len(sys.argv) else 525600
+        print(json.dumps(benchmark_ingest(minutes), indent=2))
+        return 0
+    
     else:
         # Fetch and save current portfolio
         print("🔄 Fetching current portfolio from Kraken...")
         fetcher = PortfolioFetcher()
         portfolio = fetcher.get_portfolio_summary()
         
+        account = None
+        if '--account' in sys.argv:
+            idx = sys.argv.index('--account')
+            account = sys.argv[idx + 1] if idx + 1 < len(sys.argv) else None
+        
         if portfolio:
-            snapshot_id = save_portfolio_snapshot(portfolio)
+            snapshot_id = save_portfolio_snapshot(portfolio, account=account, delta='--delta' in sys.argv)
             if snapshot_id:
                 print(f"\n✅ Portfolio tracking updated (ID: {snapshot_id})")
                 return 0
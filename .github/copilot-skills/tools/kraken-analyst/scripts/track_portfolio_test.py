@@ -0,0 +1,232 @@
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import analyze_performance
+from db import Database, close_all
+from track_portfolio import SnapshotWriter, import_snapshots, load_snapshot, snapshot_at
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+# Run from the scripts directory: python track_portfolio_test.py
+
+def portfolio(scale=1.0):
+    """get_portfolio_summary()-shaped sample, including fields without a column"""
+    return {
+        "timestamp": 1700000000.5,
+        "total_value_usd": 1500.0 * scale,
+        "spot_value_usd": 1200.0 * scale,
+        "earn_value_usd": 300.0 * scale,
+        "spot_portfolio": [
+            {"asset": "XXBT", "amount": 0.02, "price_usd": 50000.0 * scale, "value_usd": 1000.0 * scale,
+             "weight": 83.3},
+            {"asset": "ZUSD", "amount": 200.0, "price_usd": 1.0, "value_usd": 200.0, "weight": 16.7},
+            {"asset": "NEW", "amount": 5.0, "price_usd": None, "value_usd": 0.0, "weight": 0.0}
+        ],
+        "earn_allocations": [
+            {"asset": "DOT", "amount": 50.0, "price_usd": 6.0 * scale, "value_usd": 300.0 * scale,
+             "strategy": "ESDQ", "apr": "0.12"}
+        ],
+        "futures_dust": [
+            {"asset": "ETH.F", "amount": 0.001, "price_usd": None, "value_usd": 0.0, "weight": 0.0,
+             "note": "Futures/spread contract (no spot price mapping)"}
+        ]
+    }
+
+
+class SnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.db = Database(self.path)
+    
+    def tearDown(self):
+        self.db.close()
+        close_all()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+
+class TestSnapshotWriter(SnapshotTestCase):
+    def test_wal_mode(self):
+        self.assertEqual(self.db.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(self.db.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+    
+    def test_round_trip(self):
+        with SnapshotWriter(self.db) as writer:
+            writer.add(portfolio(), timestamp="2024-01-01T00:00:00", account="main")
+        snapshot_id, = writer.snapshot_ids
+        
+        expected = portfolio()
+        expected.update({"snapshot_timestamp": "2024-01-01T00:00:00", "account": "main"})
+        self.assertEqual(load_snapshot(self.db, snapshot_id), expected)
+        
+        # holdings_json no longer repeats what asset_holdings stores
+        extras = json.loads(self.db.execute("SELECT holdings_json FROM portfolio_snapshots").fetchone()[0])
+        self.assertNotIn("spot_portfolio", extras)
+        self.assertEqual(extras["earn_details"], {"0": {"strategy": "ESDQ", "apr": "0.12"}})
+    
+    def test_batches_keep_order(self):
+        with SnapshotWriter(self.db, batch_size=7) as writer:
+            for i in range(30):
+                writer.add(portfolio(1 + i / 100), timestamp=f"2024-01-01T00:{i:02d}:00", account=f"a{i % 3}")
+        
+        self.assertEqual(writer.snapshot_ids, list(range(1, 31)))
+        for i, snapshot_id in enumerate(writer.snapshot_ids):
+            loaded = load_snapshot(self.db, snapshot_id)
+            self.assertEqual(loaded["account"], f"a{i % 3}")
+            self.assertAlmostEqual(loaded["total_value_usd"], 1500.0 * (1 + i / 100))
+        self.assertEqual(self.db.execute("SELECT COUNT(*) FROM asset_holdings").fetchone()[0], 30 * 4)
+    
+    def test_failed_batch_rolls_back(self):
+        broken = portfolio()
+        del broken["spot_portfolio"][0]["amount"]
+        writer = SnapshotWriter(self.db)
+        writer.add(portfolio())
+        writer.add(broken)
+        with self.assertRaises(KeyError):
+            writer.flush()
+        self.assertEqual(self.db.execute("SELECT COUNT(*) FROM portfolio_snapshots").fetchone()[0], 0)
+    
+    def test_import_ndjson(self):
+        lines = [json.dumps({"account": f"acct{i}", "timestamp": "2024-01-01T00:00:00",
+                             "portfolio": portfolio()}) for i in range(5)]
+        lines += ["", json.dumps(portfolio())]
+        self.assertEqual(import_snapshots(io.StringIO("\n".join(lines)), batch_size=2, db_path=self.path), 6)
+        
+        accounts = [row[0] for row in self.db.execute("SELECT account FROM portfolio_snapshots ORDER BY id")]
+        self.assertEqual(accounts, [f"acct{i}" for i in range(5)] + [None])
+
+
+class TestDeltaSnapshots(SnapshotTestCase):
+    def write(self, db, snapshots, **options):
+        with SnapshotWriter(db, delta=True, **options) as writer:
+            for timestamp, data in snapshots:
+                writer.add(data, timestamp=timestamp, account="main")
+        return writer.snapshot_ids
+    
+    def expected(self, timestamp, data):
+        expected = json.loads(json.dumps(data))
+        expected.update({"snapshot_timestamp": timestamp, "account": "main"})
+        return expected
+    
+    def snapshots(self, count, start=0):
+        """Prices move every snapshot; amounts change and NEW is sold once in a while"""
+        for i in range(start, start + count):
+            data = portfolio(1 + i / 100)
+            data["spot_portfolio"][0]["amount"] = 0.02 + (i // 7) / 1000
+            for holding in data["spot_portfolio"] + data["earn_allocations"]:
+                if holding["price_usd"] is not None:
+                    holding["value_usd"] = holding["amount"] * holding["price_usd"]
+            if i % 9 == 4:
+                del data["spot_portfolio"][2]
+            yield f"2024-01-01T{i // 60:02d}:{i % 60:02d}:00", data
+    
+    def test_round_trip(self):
+        snapshots = list(self.snapshots(40))
+        ids = self.write(self.db, snapshots, keyframe_interval=10, batch_size=7)
+        for snapshot_id, (timestamp, data) in zip(ids, snapshots):
+            self.assertEqual(load_snapshot(self.db, snapshot_id), self.expected(timestamp, data))
+        
+        self.assertEqual(self.db.query_one("SELECT COUNT(*) FROM asset_holdings"), (0,))
+        keyframes = self.db.query("SELECT id FROM portfolio_snapshots WHERE keyframe_id = id")
+        self.assertEqual(len(keyframes), 4)
+        # Unchanged holdings are not written again, unchanged prices (ZUSD) not even by keyframes
+        self.assertLess(self.db.query_one("SELECT COUNT(*) FROM holding_deltas")[0], 40)
+        self.assertEqual(self.db.query_one("SELECT COUNT(*) FROM price_history WHERE asset = 'ZUSD'"), (1,))
+    
+    def test_continues_chain_across_writers(self):
+        snapshots = list(self.snapshots(12))
+        ids = self.write(self.db, snapshots[:6]) + self.write(self.db, snapshots[6:])
+        self.assertEqual(len(self.db.query("SELECT DISTINCT keyframe_id FROM portfolio_snapshots")), 1)
+        for snapshot_id, (timestamp, data) in zip(ids, snapshots):
+            self.assertEqual(load_snapshot(self.db, snapshot_id), self.expected(timestamp, data))
+        
+        # Deleting the newest snapshot keeps its deltas in the chain
+        self.db.execute("DELETE FROM portfolio_snapshots WHERE id = ?", (ids[-1],))
+        self.db.conn.commit()
+        timestamp, data = next(self.snapshots(1, start=20))
+        snapshot_id, = self.write(self.db, [(timestamp, data)])
+        self.assertEqual(load_snapshot(self.db, snapshot_id), self.expected(timestamp, data))
+    
+    def test_interleaved_writers(self):
+        # Two processes writing to the same database: each flush must encode
+        # against what the other one committed in between
+        snapshots = list(self.snapshots(6))
+        other = Database(self.path)
+        self.addCleanup(other.close)
+        first = SnapshotWriter(self.db, delta=True)
+        second = SnapshotWriter(other, delta=True)
+        prices = (50000.0, 60000.0, 50000.0, 60000.0, 50000.0, 50000.0)
+        
+        ids = []
+        for writer, (timestamp, data), price in zip([first, second] * 3, snapshots, prices):
+            data["spot_portfolio"][0]["price_usd"] = price
+            data["spot_portfolio"][0]["value_usd"] = price * data["spot_portfolio"][0]["amount"]
+            writer.add(data, timestamp=timestamp, account="main")
+            ids += writer.flush()
+        
+        for snapshot_id, (timestamp, data) in zip(ids, snapshots):
+            self.assertEqual(load_snapshot(self.db, snapshot_id), self.expected(timestamp, data))
+        # One chain, not a fork per writer
+        self.assertEqual(self.db.query("SELECT DISTINCT keyframe_id FROM portfolio_snapshots"), [(ids[0],)])
+        self.assertEqual(self.db.query("SELECT price_usd FROM price_history WHERE asset = 'XXBT' ORDER BY timestamp"),
+                         [(price,) for price in prices[:5]])
+    
+    def test_out_of_order_snapshot(self):
+        snapshots = list(self.snapshots(10))
+        late = snapshots.pop(4)
+        ids = self.write(self.db, snapshots + [late])
+        for snapshot_id, (timestamp, data) in zip(ids, snapshots + [late]):
+            self.assertEqual(load_snapshot(self.db, snapshot_id), self.expected(timestamp, data))
+        self.assertEqual(snapshot_at(self.db, "2024-01-01T00:04:30", "main"), self.expected(*late))
+        self.assertIsNone(snapshot_at(self.db, "2023-12-31T00:00:00", "main"))
+    
+    def test_asset_rollups_match_full_snapshots(self):
+        snapshots = list(self.snapshots(30))
+        self.write(self.db, snapshots, keyframe_interval=8)
+        with tempfile.TemporaryDirectory() as directory:
+            full_path = os.path.join(directory, "full.db")
+            with Database(full_path) as full:
+                with SnapshotWriter(full) as writer:
+                    for timestamp, data in snapshots:
+                        writer.add(data, timestamp=timestamp, account="main")
+                
+                self.assertEqual(analyze_performance.per_asset_performance(self.path),
+                                 analyze_performance.per_asset_performance(full_path))
+                
+                # Recomputed from the chains after a delete
+                for db in (self.db, full):
+                    with db.transaction():
+                        db.execute("DELETE FROM portfolio_snapshots WHERE id IN (1, 17, 30)")
+                        db.execute("DELETE FROM asset_holdings WHERE snapshot_id IN (1, 17, 30)")
+                self.assertEqual(analyze_performance.per_asset_performance(self.path),
+                                 analyze_performance.per_asset_performance(full_path))
+
+
+class TestExistingDatabase(unittest.TestCase):
+    def test_upgrades_and_reads_legacy_snapshots(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "old.db")
+            old = sqlite3.connect(path)
+            old.execute("CREATE TABLE portfolio_snapshots (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                        "timestamp DATETIME, total_value_usd REAL NOT NULL, spot_value_usd REAL, "
+                        "earn_value_usd REAL, holdings_json TEXT NOT NULL, notes TEXT)")
+            old.execute("INSERT INTO portfolio_snapshots (timestamp, total_value_usd, holdings_json) "
+                        "VALUES ('2023-01-01T00:00:00', 1500, ?)", (json.dumps(portfolio()),))
+            old.commit()
+            old.close()
+            
+            with Database(path) as db:
+                loaded = load_snapshot(db, 1)
+        
+        self.assertEqual(loaded["spot_portfolio"], portfolio()["spot_portfolio"])
+        self.assertIsNone(loaded["account"])
+
+
+if __name__ == "__main__":
+    unittest.main()